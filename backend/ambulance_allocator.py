@@ -0,0 +1,305 @@
+"""
+Ambulance fleet and allocator.
+
+Every emergency is inserted as Pending and handed to
+AmbulanceAllocator.request(). A free unit is assigned at once, preferring
+one from the emergency's state. When no unit is free, the emergency waits
+in a binary heap ordered by priority (Critical, High, Medium, Low) and then
+by requested_at. When a unit is released (its emergency is closed) or a new
+unit joins the fleet, it goes straight to the head of that heap. Each of
+these operations is O(log n) in the number of waiting emergencies. When
+the caller knows where the emergency is, the closest free unit is sent
+instead, found through a GridIndex (geo_index.py) of free units placed by
+their state and district.
+
+The database stays the source of truth. Every operation runs in one
+BEGIN IMMEDIATE transaction, so workers take turns. The heap and the
+free-unit sets are this process's view of the pending rows and available
+units. Each operation appends the emergencies and units it touched to the
+allocator_changes table and bumps a generation counter in shared memory
+(created before gunicorn forks its preloaded workers). A worker whose view
+is older than the counter replays the changes it has not seen, re-reading
+each touched row by id, so catching up costs O(k log n) for k changes
+rather than a reload of every pending emergency and free unit. It reloads
+everything only when it fell more than CHANGE_RETENTION changes behind or
+after refresh().
+"""
+import heapq
+import multiprocessing
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+from dispatch_state import DISPATCHED, PENDING
+from gazetteer import locate
+from geo_index import GridIndex
+
+AVAILABLE = 0
+ASSIGNED = 1
+OUT_OF_SERVICE = 2
+UNIT_STATUS_LABELS = {AVAILABLE: 'Available', ASSIGNED: 'Assigned', OUT_OF_SERVICE: 'Out of Service'}
+
+PRIORITY_RANKS = {'Critical': 0, 'High': 1, 'Medium': 2, 'Low': 3}
+DEFAULT_PRIORITY = 'Medium'
+
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS ambulances (
+       id INTEGER PRIMARY KEY AUTOINCREMENT,
+       call_sign TEXT NOT NULL UNIQUE,
+       base_hospital_id INTEGER,
+       state TEXT,
+       district TEXT,
+       status_code INTEGER NOT NULL DEFAULT 0,
+       emergency_id INTEGER,
+       updated_at TEXT
+   )'''
+INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS idx_ambulances_status_code ON ambulances (status_code)',
+    'CREATE INDEX IF NOT EXISTS idx_ambulances_emergency_id ON ambulances (emergency_id)',
+)
+# Rows touched by each allocation, so other workers can apply them instead of reloading.
+# kind is 'emergency', 'ambulance' or 'reload' (everything, after refresh())
+CHANGES_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS allocator_changes (
+       id INTEGER PRIMARY KEY AUTOINCREMENT,
+       kind TEXT NOT NULL,
+       row_id INTEGER
+   )'''
+CHANGE_RETENTION = 10000
+
+Assignment = namedtuple('Assignment', 'emergency_id ambulance_id call_sign base_hospital_id state district distance_km',
+                        defaults=(None,))
+
+
+def dispatch_status_text(call_sign, priority):
+    return f'Ambulance {call_sign} Dispatched - {priority} Priority'
+
+
+def pending_status_text(priority):
+    return f'Awaiting Ambulance - {priority} Priority'
+
+
+class AmbulanceAllocator:
+    """Assigns free ambulances to emergencies, most urgent first."""
+
+    def __init__(self, connect, dispatch_state):
+        self._connect = connect
+        self._dispatch_state = dispatch_state
+        self._lock = threading.Lock()
+        self._generation = multiprocessing.Value('q', 0)
+        self._available = multiprocessing.Value('q', 0, lock=False)
+        self._local_generation = -1
+        self._change_id = 0   # last allocator_changes row applied to the view
+        self._pending = []    # heap of (rank, requested_at, emergency_id, priority)
+        self._queued = set()  # ids still waiting; heap entries not in here are stale
+        self._free = {}       # state -> {ambulance_id: unit row}
+        self._located = GridIndex()  # free units the gazetteer can place
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                if self._local_generation < 0:
+                    self._reload(conn)
+                elif self._generation.value != self._local_generation:
+                    self._catch_up(conn)
+                yield conn
+                # Bump before commit: the next worker to get the lock must see the change
+                with self._generation.get_lock():
+                    self._generation.value += 1
+                    self._local_generation = self._generation.value
+                self._available.value = sum(len(units) for units in self._free.values())
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                self._local_generation = -1  # The local view may be ahead of the database
+                raise
+            finally:
+                conn.close()
+
+    def _reload(self, conn):
+        rows = conn.execute('SELECT id, priority, requested_at FROM emergencies WHERE status_code = ?',
+                            (PENDING,)).fetchall()
+        self._pending = []
+        for emergency_id, priority, requested_at in rows:
+            priority = priority if priority in PRIORITY_RANKS else DEFAULT_PRIORITY
+            self._pending.append((PRIORITY_RANKS[priority], requested_at or '', emergency_id, priority))
+        heapq.heapify(self._pending)
+        self._queued = {row[0] for row in rows}
+        self._free = {}
+        self._located = GridIndex()
+        units = conn.execute('SELECT id, call_sign, base_hospital_id, state, district FROM ambulances '
+                             'WHERE status_code = ?', (AVAILABLE,)).fetchall()
+        for unit in units:
+            self._park(tuple(unit))
+        self._change_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM allocator_changes').fetchone()[0]
+        self._local_generation = self._generation.value
+
+    def _catch_up(self, conn):
+        """Apply the changes other workers made since this view was current."""
+        changes = conn.execute('SELECT id, kind, row_id FROM allocator_changes WHERE id > ? ORDER BY id',
+                               (self._change_id,)).fetchall()
+        if not changes:  # The other transaction rolled back after bumping the counter
+            self._local_generation = self._generation.value
+            return
+        if changes[0][0] != self._change_id + 1 or any(kind == 'reload' for _, kind, _ in changes):
+            self._reload(conn)  # Pruned past this view, or a refresh() asked for it
+            return
+        for _, kind, row_id in changes:
+            if kind == 'emergency':
+                self._apply_emergency(conn, row_id)
+            else:
+                self._apply_unit(conn, row_id)
+        self._change_id = changes[-1][0]
+        self._local_generation = self._generation.value
+
+    def _apply_emergency(self, conn, emergency_id):
+        row = conn.execute('SELECT status_code, priority, requested_at FROM emergencies WHERE id = ?',
+                           (emergency_id,)).fetchone()
+        if row is None or row[0] != PENDING:
+            self._queued.discard(emergency_id)  # Its heap entry is skipped when popped
+        elif emergency_id not in self._queued:
+            priority = row[1] if row[1] in PRIORITY_RANKS else DEFAULT_PRIORITY
+            heapq.heappush(self._pending, (PRIORITY_RANKS[priority], row[2] or '', emergency_id, priority))
+            self._queued.add(emergency_id)
+
+    def _apply_unit(self, conn, ambulance_id):
+        for units in self._free.values():
+            units.pop(ambulance_id, None)
+        self._located.remove(ambulance_id)
+        unit = conn.execute('SELECT id, call_sign, base_hospital_id, state, district FROM ambulances '
+                            'WHERE id = ? AND status_code = ?', (ambulance_id, AVAILABLE)).fetchone()
+        if unit is not None:
+            self._park(tuple(unit))
+
+    def _changed(self, conn, kind, row_id=None):
+        """Log a touched row for the other workers (inside the operation's transaction)."""
+        self._change_id = conn.execute('INSERT INTO allocator_changes (kind, row_id) VALUES (?, ?)',
+                                       (kind, row_id)).lastrowid
+        if self._change_id % 1000 == 0:
+            conn.execute('DELETE FROM allocator_changes WHERE id <= ?', (self._change_id - CHANGE_RETENTION,))
+
+    def refresh(self):
+        """Reload from the database and make every worker reload (after direct writes)."""
+        self._local_generation = -1
+        with self._transaction() as conn:
+            self._changed(conn, 'reload')
+
+    def _park(self, unit):
+        self._free.setdefault(unit[3] or '', {})[unit[0]] = unit
+        point = locate(unit[3], unit[4])
+        if point is not None:
+            self._located.insert(unit[0], point[0], point[1], unit)
+
+    def _take_unit(self, state, point=None):
+        """(unit, distance_km): the closest located unit when point is known, else one from state, else any."""
+        if point is not None and len(self._located):
+            distance, _, unit = self._located.nearest(point[0], point[1])[0]
+            del self._free[unit[3] or ''][unit[0]]
+            self._located.remove(unit[0])
+            return unit, round(distance, 1)
+        units = self._free.get(state or '')
+        if not units:
+            units = next((units for units in self._free.values() if units), None)
+        if not units:
+            return None, None
+        unit = units.popitem()[1]
+        self._located.remove(unit[0])
+        return unit, None
+
+    def _assign(self, conn, emergency_id, unit, priority, distance_km=None):
+        now = datetime.utcnow().isoformat()
+        conn.execute('UPDATE ambulances SET status_code = ?, emergency_id = ?, updated_at = ? WHERE id = ?',
+                     (ASSIGNED, emergency_id, now, unit[0]))
+        conn.execute('UPDATE emergencies SET status_code = ?, status = ?, ambulance_id = ?, status_updated_at = ? '
+                     'WHERE id = ?', (DISPATCHED, dispatch_status_text(unit[1], priority), unit[0], now, emergency_id))
+        self._changed(conn, 'emergency', emergency_id)
+        self._changed(conn, 'ambulance', unit[0])
+        return Assignment(emergency_id, *unit, distance_km)
+
+    def _serve_next(self, conn, unit):
+        """Give a free unit to the most urgent waiting emergency, or park it."""
+        while self._pending:
+            _, _, emergency_id, priority = heapq.heappop(self._pending)
+            if emergency_id in self._queued:
+                self._queued.discard(emergency_id)
+                return self._assign(conn, emergency_id, unit, priority)
+        conn.execute('UPDATE ambulances SET status_code = ?, emergency_id = NULL, updated_at = ? WHERE id = ?',
+                     (AVAILABLE, datetime.utcnow().isoformat(), unit[0]))
+        self._changed(conn, 'ambulance', unit[0])
+        self._park(unit)
+        return None
+
+    def request(self, emergency_id, priority, requested_at, state=None, point=None):
+        """
+        Allocate a unit to a Pending emergency the caller just committed, the
+        closest one when point (lat, lon) is given.
+        Returns an Assignment, or None when the emergency has to wait. Calling it
+        for an emergency that is no longer Pending changes nothing.
+        """
+        priority = priority if priority in PRIORITY_RANKS else DEFAULT_PRIORITY
+        with self._transaction() as conn:
+            row = conn.execute('SELECT status_code FROM emergencies WHERE id = ?', (emergency_id,)).fetchone()
+            if row is None or row[0] != PENDING:
+                # Another worker reloaded the committed row and already served it from its queue
+                self._queued.discard(emergency_id)
+                unit = conn.execute('SELECT id, call_sign, base_hospital_id, state, district FROM ambulances '
+                                    'WHERE emergency_id = ? AND status_code = ?', (emergency_id, ASSIGNED)).fetchone()
+                return Assignment(emergency_id, *unit) if unit else None
+            unit, distance_km = self._take_unit(state, point)
+            if unit is None:
+                if emergency_id not in self._queued:
+                    heapq.heappush(self._pending, (PRIORITY_RANKS[priority], requested_at, emergency_id, priority))
+                    self._queued.add(emergency_id)
+                    self._changed(conn, 'emergency', emergency_id)
+                assignment = None
+            else:
+                self._queued.discard(emergency_id)
+                assignment = self._assign(conn, emergency_id, unit, priority, distance_km)
+        if assignment:
+            self._dispatch_state.moved(PENDING, DISPATCHED)
+        return assignment
+
+    def release(self, emergency_id):
+        """
+        Free the unit of a closed emergency (or drop it from the queue if it was
+        still waiting). Returns the Assignment the unit moved on to, if any.
+        """
+        with self._transaction() as conn:
+            if emergency_id in self._queued:
+                self._queued.discard(emergency_id)
+                self._changed(conn, 'emergency', emergency_id)
+                return None
+            unit = conn.execute('SELECT id, call_sign, base_hospital_id, state, district FROM ambulances '
+                                'WHERE emergency_id = ? AND status_code = ?', (emergency_id, ASSIGNED)).fetchone()
+            assignment = self._serve_next(conn, tuple(unit)) if unit else None
+        if assignment:
+            self._dispatch_state.moved(PENDING, DISPATCHED)
+        return assignment
+
+    def add_unit(self, call_sign, base_hospital_id=None, state=None, district=None):
+        """Add an ambulance to the fleet. Returns the Assignment it was given at once, if any."""
+        with self._transaction() as conn:
+            cur = conn.execute('INSERT INTO ambulances (call_sign, base_hospital_id, state, district, status_code, '
+                               'updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                               (call_sign, base_hospital_id, state, district, AVAILABLE, datetime.utcnow().isoformat()))
+            assignment = self._serve_next(conn, (cur.lastrowid, call_sign, base_hospital_id, state, district))
+        if assignment:
+            self._dispatch_state.moved(PENDING, DISPATCHED)
+        return assignment
+
+    def available_count(self):
+        """Free units as of the last allocation by any worker."""
+        return self._available.value
+
+
+def seed_fleet(conn, size):
+    """Create size unattached units (AMB-001, ...) when the fleet is empty; returns how many were added."""
+    if conn.execute('SELECT COUNT(*) FROM ambulances').fetchone()[0]:
+        return 0
+    now = datetime.utcnow().isoformat()
+    conn.executemany('INSERT INTO ambulances (call_sign, status_code, updated_at) VALUES (?, ?, ?)',
+                     [(f'AMB-{i:03d}', AVAILABLE, now) for i in range(1, size + 1)])
+    conn.commit()
+    return size
@@ -0,0 +1,238 @@
+"""
+Streaming ambulance response-time analytics.
+
+Two response times are tracked per emergency:
+  planned  response_time_minutes, the target set from the priority at insert
+  arrival  minutes from requested_at until the request is marked Arrived
+Each one is folded into running aggregates (count, sum, min, max and a
+log-linear histogram) of the ambulance_stats table, in the transaction
+that inserts the emergency or moves it to Arrived. Aggregates are kept for
+four keys: (state, priority), (state, '*'), ('*', priority) and ('*', '*').
+Each key has three resolutions: 5-minute buckets, hourly buckets and an
+all-time row. The last hour, day and week read at most 12, 24 and 168
+bucket rows of one key, however long the history is. Buckets older than a
+week are pruned once an hour.
+
+The histogram works like an HDR histogram over whole seconds. Values below
+64 s get a bucket each. Above that, every power of two is split into 32
+buckets, so a percentile is within about 3% of the true value and clamped
+to the observed min and max.
+
+Reports are cached per worker. The cache key is a generation counter in
+shared memory (gunicorn forks preloaded workers), bumped by invalidate()
+after each commit, plus the current 5-minute bucket, so windows slide even
+without new calls.
+"""
+import json
+import math
+import multiprocessing
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from dispatch_state import ARRIVED
+
+ALL = '*'
+DEFAULT_STATE = 'All India'
+METRICS = ('planned', 'arrival')
+FINE_SECONDS = 300
+HOUR_SECONDS = 3600
+WEEK_SECONDS = 7 * 24 * HOUR_SECONDS
+ALL_TIME = 0  # resolution of the all-time rows
+WINDOWS = (('hour', FINE_SECONDS, HOUR_SECONDS), ('day', HOUR_SECONDS, 24 * HOUR_SECONDS),
+           ('week', HOUR_SECONDS, WEEK_SECONDS), ('all', ALL_TIME, None))
+PERCENTILES = (50, 90, 99)
+_SUB_BUCKET_BITS = 5
+
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS ambulance_stats (
+       metric TEXT NOT NULL,
+       state TEXT NOT NULL,
+       priority TEXT NOT NULL,
+       resolution INTEGER NOT NULL,
+       bucket INTEGER NOT NULL,
+       count INTEGER NOT NULL,
+       total_seconds REAL NOT NULL,
+       min_seconds REAL NOT NULL,
+       max_seconds REAL NOT NULL,
+       histogram TEXT NOT NULL,
+       PRIMARY KEY (metric, state, priority, resolution, bucket)
+   )'''
+
+
+def histogram_bucket(seconds):
+    """Histogram bucket index of a value in seconds."""
+    value = max(0, int(seconds))
+    if value < 2 << _SUB_BUCKET_BITS:
+        return value
+    exponent = value.bit_length() - 1 - _SUB_BUCKET_BITS
+    return (exponent << _SUB_BUCKET_BITS) + (value >> exponent)
+
+
+def bucket_bounds(index):
+    """[low, high) in seconds of a histogram bucket."""
+    if index < 2 << _SUB_BUCKET_BITS:
+        return index, index + 1
+    exponent = (index >> _SUB_BUCKET_BITS) - 1
+    mantissa = (index & ((1 << _SUB_BUCKET_BITS) - 1)) + (1 << _SUB_BUCKET_BITS)
+    return mantissa << exponent, (mantissa + 1) << exponent
+
+
+def stat_keys(state, priority):
+    """Aggregate keys for one emergency: exact, per state, per priority, overall."""
+    state = state or DEFAULT_STATE
+    priority = priority or 'Unknown'
+    return ((state, priority), (state, ALL), (ALL, priority), (ALL, ALL))
+
+
+def summarize(count, total, low, high, histogram):
+    """Report dict (minutes) for merged aggregates."""
+    if not count:
+        return {'count': 0, 'avg': None, 'min': None, 'max': None,
+                **{f'p{p}': None for p in PERCENTILES}}
+    report = {'count': count, 'avg': round(total / count / 60, 1),
+              'min': round(low / 60, 1), 'max': round(high / 60, 1)}
+    ordered = sorted(histogram.items())
+    for p in PERCENTILES:
+        rank = max(1, math.ceil(p / 100 * count))
+        seen = 0
+        for index, n in ordered:
+            seen += n
+            if seen >= rank:
+                bucket_low, bucket_high = bucket_bounds(index)
+                value = min(max((bucket_low + bucket_high - 1) / 2, low), high)
+                report[f'p{p}'] = round(value / 60, 1)
+                break
+    return report
+
+
+class AmbulanceAnalytics:
+    """Running response-time aggregates per state and priority, with cached windowed reports."""
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._generation = multiprocessing.Value('q', 0)
+        self._pruned_hour = multiprocessing.Value('q', 0, lock=False)
+        self._cache = {}
+
+    def invalidate(self):
+        """Make every worker recompute its reports (after committing a record)."""
+        with self._generation.get_lock():
+            self._generation.value += 1
+
+    def generation(self):
+        return self._generation.value
+
+    def record(self, conn, metric, state, priority, seconds, when):
+        """Fold one response time (seconds) observed at when (UTC) into the aggregates. The caller commits."""
+        epoch = int((when - datetime(1970, 1, 1)).total_seconds())
+        bucket = histogram_bucket(seconds)
+        for key in stat_keys(state, priority):
+            for resolution in (FINE_SECONDS, HOUR_SECONDS, ALL_TIME):
+                row_key = (metric,) + key + (resolution, epoch // resolution if resolution else 0)
+                row = conn.execute('SELECT histogram FROM ambulance_stats WHERE metric = ? AND state = ? AND '
+                                   'priority = ? AND resolution = ? AND bucket = ?', row_key).fetchone()
+                if row is None:
+                    conn.execute('INSERT INTO ambulance_stats (metric, state, priority, resolution, bucket, count, '
+                                 'total_seconds, min_seconds, max_seconds, histogram) VALUES (?, ?, ?, ?, ?, 1, ?, ?, '
+                                 '?, ?)', row_key + (seconds, seconds, seconds, json.dumps({bucket: 1})))
+                    continue
+                histogram = json.loads(row[0])
+                histogram[str(bucket)] = histogram.get(str(bucket), 0) + 1
+                conn.execute('UPDATE ambulance_stats SET count = count + 1, total_seconds = total_seconds + ?, '
+                             'min_seconds = MIN(min_seconds, ?), max_seconds = MAX(max_seconds, ?), histogram = ? '
+                             'WHERE metric = ? AND state = ? AND priority = ? AND resolution = ? AND bucket = ?',
+                             (seconds, seconds, seconds, json.dumps(histogram)) + row_key)
+        hour = epoch // HOUR_SECONDS
+        if hour > self._pruned_hour.value:
+            self._pruned_hour.value = hour
+            conn.execute('DELETE FROM ambulance_stats WHERE (resolution = ? AND bucket < ?) OR '
+                         '(resolution = ? AND bucket < ?)',
+                         (FINE_SECONDS, (epoch - HOUR_SECONDS) // FINE_SECONDS,
+                          HOUR_SECONDS, (epoch - WEEK_SECONDS) // HOUR_SECONDS))
+
+    def record_planned(self, conn, state, priority, minutes, when):
+        if minutes is not None:
+            self.record(conn, 'planned', state, priority, float(minutes) * 60, when)
+
+    def record_arrival(self, conn, emergency_id, arrived_at):
+        """Record the time from request to arrival of an emergency just marked Arrived. The caller commits."""
+        row = conn.execute('SELECT state, priority, requested_at FROM emergencies WHERE id = ?',
+                           (emergency_id,)).fetchone()
+        if row is None:
+            return
+        try:
+            requested = datetime.fromisoformat(row[2])
+        except (TypeError, ValueError):
+            return
+        seconds = (arrived_at - requested).total_seconds()
+        if seconds >= 0:
+            self.record(conn, 'arrival', row[0], row[1], seconds, arrived_at)
+
+    def _windows(self, conn, metric, state, priority, now):
+        rows = conn.execute('SELECT resolution, bucket, count, total_seconds, min_seconds, max_seconds, histogram '
+                            'FROM ambulance_stats WHERE metric = ? AND state = ? AND priority = ? AND '
+                            '((resolution = ? AND bucket > ?) OR (resolution = ? AND bucket > ?) OR resolution = ?)',
+                            (metric, state, priority, FINE_SECONDS, (now - HOUR_SECONDS) // FINE_SECONDS,
+                             HOUR_SECONDS, (now - WEEK_SECONDS) // HOUR_SECONDS, ALL_TIME)).fetchall()
+        report = {}
+        for name, resolution, span in WINDOWS:
+            first = (now - span) // resolution + 1 if span else 0
+            count, total, low, high, histogram = 0, 0.0, math.inf, -math.inf, Counter()
+            for row in rows:
+                if row[0] == resolution and row[1] >= first:
+                    count += row[2]
+                    total += row[3]
+                    low, high = min(low, row[4]), max(high, row[5])
+                    histogram.update({int(k): n for k, n in json.loads(row[6]).items()})
+            report[name] = summarize(count, total, low, high, histogram)
+        return report
+
+    def report(self, state=None, priority=None, now=None):
+        """
+        {'planned': {window: stats}, 'arrival': {window: stats}, 'by_priority': ...}
+        for windows hour/day/week/all, stats in minutes. Cached per generation
+        and 5-minute bucket.
+        """
+        now = int(time.time()) if now is None else int(now)
+        state, priority = state or ALL, priority or ALL
+        cache_key = (self._generation.value, now // FINE_SECONDS, state, priority)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+        conn = self._connect()
+        try:
+            report = {metric: self._windows(conn, metric, state, priority, now) for metric in METRICS}
+            if priority == ALL:
+                found = conn.execute('SELECT DISTINCT priority FROM ambulance_stats WHERE metric IN (?, ?) AND '
+                                     'state = ? AND priority != ? AND resolution = ?',
+                                     METRICS + (state, ALL, ALL_TIME)).fetchall()
+                report['by_priority'] = {row[0]: {metric: self._windows(conn, metric, state, row[0], now)
+                                                  for metric in METRICS} for row in found}
+        finally:
+            conn.close()
+        with self._lock:
+            if len(self._cache) > 64:
+                self._cache.clear()
+            self._cache[cache_key] = report
+        return report
+
+    def rebuild(self, conn):
+        """Refill the aggregates from the emergencies table (for databases that predate it). The caller commits."""
+        conn.execute('DELETE FROM ambulance_stats')
+        rows = conn.execute('SELECT id, state, priority, requested_at, response_time_minutes, status_code, '
+                            'status_updated_at FROM emergencies WHERE requested_at IS NOT NULL '
+                            'ORDER BY requested_at').fetchall()
+        replayed = 0
+        for emergency_id, state, priority, requested_at, minutes, status_code, updated_at in rows:
+            try:
+                when = datetime.fromisoformat(requested_at)
+            except (TypeError, ValueError):
+                continue
+            self.record_planned(conn, state, priority, minutes, when)
+            # Only requests still at Arrived have their arrival time as status_updated_at
+            if status_code == ARRIVED and updated_at:
+                self.record_arrival(conn, emergency_id, datetime.fromisoformat(updated_at))
+            replayed += 1
+        return replayed
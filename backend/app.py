@@ -1,25 +1,60 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, Response
+from flask import (Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, Response,
+                   g, has_request_context, before_render_template, template_rendered)
 import sqlite3
 import os
 import uuid
-import qrcode
 from datetime import datetime, timedelta
 import csv
 import io
-import pickle
 import numpy as np
-import requests
 import random
 import warnings
 import re
-
-# Firebase Admin SDK
-try:
-    import firebase_admin
-    from firebase_admin import credentials, auth
-    FIREBASE_AVAILABLE = True
-except ImportError:
-    FIREBASE_AVAILABLE = False
+import threading
+import time
+import hmac
+import hashlib
+import importlib.util
+import logging
+from functools import wraps
+
+from inference_client import InferenceClient
+from model_artifacts import build_model_registry
+from model_registry import run_blocking
+from prediction_log import PredictionLogger
+from dispatch_state import (ARRIVED, CLOSED, PENDING, INDEX_SQL as DISPATCH_INDEX_SQL,
+                            STATUS_LABELS as DISPATCH_STATUS_LABELS, DispatchState, InvalidTransition,
+                            parse_status as parse_dispatch_status)
+from ambulance_allocator import (CREATE_TABLE_SQL as AMBULANCES_TABLE_SQL, INDEX_SQL as AMBULANCES_INDEX_SQL,
+                                 CHANGES_TABLE_SQL as ALLOCATOR_CHANGES_TABLE_SQL, AmbulanceAllocator,
+                                 pending_status_text, seed_fleet)
+from gazetteer import locate, parse_coordinates
+from demand_forecast import CREATE_TABLE_SQL as DEMAND_TABLE_SQL, DemandForecaster
+from ambulance_analytics import CREATE_TABLE_SQL as AMBULANCE_STATS_TABLE_SQL, AmbulanceAnalytics
+from event_bus import CREATE_TABLE_SQL as EVENTS_TABLE_SQL, EventBus, format_event
+from intake import LIFE_THREAT_KEYWORDS, IntakeGate, IntakeRejected, pre_triage
+from idempotency import (CREATE_TABLE_SQL as SUBMISSIONS_TABLE_SQL, INDEX_SQL as SUBMISSIONS_INDEX_SQL,
+                         SubmissionGuard, fingerprint as submission_fingerprint, submission_key)
+from outbox import CREATE_TABLE_SQL as OUTBOX_TABLE_SQL, INDEX_SQL as OUTBOX_INDEX_SQL, OutboxDispatcher, enqueue
+from geo_index import HospitalIndex
+from sql_profiler import (CREATE_TABLE_SQL as SQL_PROFILE_TABLE_SQL, RequestProfile, SQLProfiler,
+                          connect as profiled_connect, load_report)
+from metrics import CREATE_TABLE_SQL as METRICS_TABLE_SQL, MetricsRegistry
+import tracing
+from tracing import SpanFileExporter, Tracer, traced
+import app_logging
+from app_logging import debug_sampled
+from drift_monitor import (CREATE_TABLE_SQL as DRIFT_STATS_TABLE_SQL, DriftMonitor, FeatureSketch,
+                           drift_report, load_merged_sketch, synthetic_reference)
+import featurizer
+from startup import StartupProfile, rss_mb as startup_rss_mb
+
+# Startup phase timings and RSS, and the warm-up run once the app is serving (see startup.py)
+startup_profile = StartupProfile()
+
+# Firebase Admin SDK (imported when it is initialized, during the warm-up)
+FIREBASE_AVAILABLE = importlib.util.find_spec('firebase_admin') is not None
+if not FIREBASE_AVAILABLE:
     print("[WARNING] Firebase Admin SDK not installed. Install with: pip install firebase-admin")
 
 # Try to use config.py if available, otherwise use direct configuration
@@ -43,6 +78,7 @@ if USE_CONFIG and config:
                 static_folder=config.STATIC_FOLDER)
     app.secret_key = config.SECRET_KEY
     app.config['UPLOAD_FOLDER'] = config.UPLOAD_FOLDER
+    ADMIN_TOKEN = config.ADMIN_TOKEN
     DB_PATH = config.DB_PATH
     FIREBASE_CREDENTIALS_PATH = config.FIREBASE_CREDENTIALS_PATH
     FIREBASE_WEB_API_KEY = config.FIREBASE_WEB_API_KEY
@@ -52,12 +88,40 @@ if USE_CONFIG and config:
     QR_FOLDER = config.QR_FOLDER
     MODEL_PATH = config.MODEL_PATH
     EMERGENCY_MODEL_PATH = config.EMERGENCY_MODEL_PATH
+    MODEL_RELOAD_INTERVAL = config.MODEL_RELOAD_INTERVAL
+    INFERENCE_SOCKET = config.INFERENCE_SOCKET
+    INFERENCE_TIMEOUT_MS = config.INFERENCE_TIMEOUT_MS
+    PREDICTION_LOG_DIR = config.PREDICTION_LOG_DIR
+    PREDICTION_LOG_BATCH = config.PREDICTION_LOG_BATCH
+    PREDICTION_LOG_ROTATE_ROWS = config.PREDICTION_LOG_ROTATE_ROWS
+    DRIFT_PUBLISH_INTERVAL = config.DRIFT_PUBLISH_INTERVAL
+    DISPATCH_RESYNC_SECONDS = config.DISPATCH_RESYNC_SECONDS
+    AMBULANCE_FLEET_SIZE = config.AMBULANCE_FLEET_SIZE
+    EVENT_HEARTBEAT_SECONDS = config.EVENT_HEARTBEAT_SECONDS
+    EVENT_RETENTION = config.EVENT_RETENTION
+    INTAKE_CAPACITY = config.INTAKE_CAPACITY
+    INTAKE_QUEUE_SIZE = config.INTAKE_QUEUE_SIZE
+    INTAKE_MAX_WAIT_SECONDS = config.INTAKE_MAX_WAIT_SECONDS
+    INTAKE_CRITICAL_RESERVE = config.INTAKE_CRITICAL_RESERVE
+    IDEMPOTENCY_KEY_TTL_SECONDS = config.IDEMPOTENCY_KEY_TTL_SECONDS
+    DUPLICATE_WINDOW_SECONDS = config.DUPLICATE_WINDOW_SECONDS
+    OUTBOX_POLL_SECONDS = config.OUTBOX_POLL_SECONDS
+    SQL_PROFILING = config.SQL_PROFILING
+    SLOW_QUERY_MS = config.SLOW_QUERY_MS
+    SQL_REPEAT_THRESHOLD = config.SQL_REPEAT_THRESHOLD
+    METRICS_PUBLISH_INTERVAL = config.METRICS_PUBLISH_INTERVAL
+    TRACE_FILE = config.TRACE_FILE
+    TRACE_SAMPLE_RATE = config.TRACE_SAMPLE_RATE
+    WARM_UP_IN_BACKGROUND = config.WARM_UP_IN_BACKGROUND
+    LOG_LEVEL = config.LOG_LEVEL
+    LOG_DEBUG_SAMPLE_RATE = config.LOG_DEBUG_SAMPLE_RATE
 else:
     # Fallback to direct configuration (backward compatibility)
     app = Flask(__name__, 
                 template_folder=os.path.join(FRONTEND_DIR, 'templates'),
                 static_folder=os.path.join(FRONTEND_DIR, 'static'))
     app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-prod')
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
     DB_PATH = os.path.join(BACKEND_DIR, 'health_system.db')
     FIREBASE_CREDENTIALS_PATH = os.path.join(BACKEND_DIR, 'pkl', 'swasthya-sampark-firebase-adminsdk-fbsvc-121be5c997.json')
     if not os.path.exists(FIREBASE_CREDENTIALS_PATH):
@@ -69,16 +133,55 @@ else:
     QR_FOLDER = os.path.join(FRONTEND_DIR, 'static', 'qr')
     MODEL_PATH = os.path.join(BACKEND_DIR, 'pkl', 'svm_health_risk_model.pkl')
     EMERGENCY_MODEL_PATH = os.path.join(BACKEND_DIR, 'pkl', 'Logistic_regression_prediction.pkl')
+    MODEL_RELOAD_INTERVAL = int(os.environ.get('MODEL_RELOAD_INTERVAL', 30))
+    INFERENCE_SOCKET = os.environ.get('INFERENCE_SOCKET', '')
+    INFERENCE_TIMEOUT_MS = int(os.environ.get('INFERENCE_TIMEOUT_MS', 50))
+    PREDICTION_LOG_DIR = os.environ.get('PREDICTION_LOG_DIR', '')
+    PREDICTION_LOG_BATCH = int(os.environ.get('PREDICTION_LOG_BATCH', 256))
+    PREDICTION_LOG_ROTATE_ROWS = int(os.environ.get('PREDICTION_LOG_ROTATE_ROWS', 50000))
+    DRIFT_PUBLISH_INTERVAL = float(os.environ.get('DRIFT_PUBLISH_INTERVAL', 30))
+    DISPATCH_RESYNC_SECONDS = float(os.environ.get('DISPATCH_RESYNC_SECONDS', 60))
+    AMBULANCE_FLEET_SIZE = int(os.environ.get('AMBULANCE_FLEET_SIZE', 10))
+    EVENT_HEARTBEAT_SECONDS = float(os.environ.get('EVENT_HEARTBEAT_SECONDS', 15))
+    EVENT_RETENTION = int(os.environ.get('EVENT_RETENTION', 1000))
+    INTAKE_CAPACITY = int(os.environ.get('INTAKE_CAPACITY', 8))
+    INTAKE_QUEUE_SIZE = int(os.environ.get('INTAKE_QUEUE_SIZE', 64))
+    INTAKE_MAX_WAIT_SECONDS = float(os.environ.get('INTAKE_MAX_WAIT_SECONDS', 10))
+    INTAKE_CRITICAL_RESERVE = int(os.environ.get('INTAKE_CRITICAL_RESERVE', 4))
+    IDEMPOTENCY_KEY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_KEY_TTL_SECONDS', 600))
+    DUPLICATE_WINDOW_SECONDS = float(os.environ.get('DUPLICATE_WINDOW_SECONDS', 120))
+    OUTBOX_POLL_SECONDS = float(os.environ.get('OUTBOX_POLL_SECONDS', 1))
+    SQL_PROFILING = os.environ.get('SQL_PROFILING', 'False').lower() == 'true'
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+    SQL_REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', 5))
+    METRICS_PUBLISH_INTERVAL = float(os.environ.get('METRICS_PUBLISH_INTERVAL', 15))
+    TRACE_FILE = os.environ.get('TRACE_FILE', '')
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.1))
+    WARM_UP_IN_BACKGROUND = os.environ.get('WARM_UP_IN_BACKGROUND', 'True').lower() == 'true'
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0.01))
     app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# JSON logs through a background writer, no PII or OTP values (see app_logging.py)
+app_logging.configure(LOG_LEVEL)
+logger = logging.getLogger('app')
+startup_profile.mark('configuration')
+
 # Firebase Configuration
 FIREBASE_INITIALIZED = False
 
-# Initialize Firebase Admin SDK
-if FIREBASE_AVAILABLE:
+
+def init_firebase():
+    """Initialize the Firebase Admin SDK (a warm-up task: importing it costs ~140 ms)."""
+    global FIREBASE_INITIALIZED
+    if not FIREBASE_AVAILABLE:
+        print("[WARNING] Firebase Admin SDK not available. OTP verification will use database storage only")
+        return
     try:
         # Try service account JSON first (preferred for Admin SDK)
         if os.path.exists(FIREBASE_CREDENTIALS_PATH):
+            import firebase_admin
+            from firebase_admin import credentials
             cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
             firebase_admin.initialize_app(cred)
             FIREBASE_INITIALIZED = True
@@ -101,148 +204,335 @@ if FIREBASE_AVAILABLE:
     except Exception as e:
         print(f"[ERROR] Failed to initialize Firebase Admin SDK: {e}")
         print("[INFO] OTP verification will use database storage only")
-else:
-    print("[WARNING] Firebase Admin SDK not available. OTP verification will use database storage only")
+
 # Create necessary directories
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(QR_FOLDER, exist_ok=True)
 
-# Load health risk prediction model (SVM)
-health_risk_model = None
-model_scaler = None
-try:
-    if os.path.exists(MODEL_PATH):
-        with open(MODEL_PATH, 'rb') as f:
-            model_data = pickle.load(f)
-            # Handle both old format (just model) and new format (dict with model and scaler)
-            if isinstance(model_data, dict):
-                health_risk_model = model_data.get('model')
-                model_scaler = model_data.get('scaler')
-                print(f"[OK] Health risk model loaded successfully from {MODEL_PATH}")
-                print(f"[OK] Model includes scaler for feature normalization")
-            else:
-                # Old format - just the model
-                health_risk_model = model_data
-                model_scaler = None
-                print(f"[OK] Health risk model loaded (legacy format, no scaler)")
-    else:
-        print(f"[WARNING] Health risk model not found at {MODEL_PATH}")
+# Model registry: loads the newest artifact version for each model, validates
+# it and hot-swaps it without restarting workers (see model_registry.py)
+model_registry = build_model_registry(MODEL_PATH, EMERGENCY_MODEL_PATH, poll_interval=MODEL_RELOAD_INTERVAL)
+
+# Module-level aliases kept for scripts and tests that import them directly
+# (resolved by __getattr__ below, which loads the models if needed).
+# Predictors read model_registry snapshots so they always see a consistent pair.
+_MODEL_ALIASES = {
+    'health_risk_model': ('health_risk', 'model'),
+    'model_scaler': ('health_risk', 'scaler'),
+    'emergency_model': ('emergency', 'model'),
+    'emergency_scaler': ('emergency', 'scaler'),
+}
+
+
+def __getattr__(name):
+    if name not in _MODEL_ALIASES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    slot, field = _MODEL_ALIASES[name]
+    loaded = model_registry.get(slot)
+    return getattr(loaded, field) if loaded is not None else None
+
+
+def load_models():
+    """Load both models (a warm-up task: unpickling them imports scikit-learn)."""
+    model_registry.ensure_loaded()
+    health_risk = model_registry.get('health_risk')
+    if health_risk is None:
+        print(f"[WARNING] Health risk model not available at {MODEL_PATH}")
         print(f"[INFO] Run 'python train_model.py' to train a new model")
-except Exception as e:
-    print(f"[ERROR] Error loading health risk model: {e}")
-    print(f"[INFO] Continuing without AI risk prediction. Emergency triggers will be based on treatment status only.")
+        print(f"[INFO] Continuing without AI risk prediction. Emergency triggers will be based on treatment status only.")
+    elif health_risk.scaler is not None:
+        print(f"[OK] Health risk model includes scaler for feature normalization")
 
-# Load emergency priority prediction model (Logistic Regression)
-emergency_model = None
-emergency_scaler = None
-try:
-    if os.path.exists(EMERGENCY_MODEL_PATH):
-        # Try multiple loading methods including joblib
-        loaded = False
-        
-        # Method 1: Try joblib (common for scikit-learn models)
-        try:
-            import joblib
-            emergency_data = joblib.load(EMERGENCY_MODEL_PATH)
-            if isinstance(emergency_data, dict):
-                emergency_model = emergency_data.get('model') or emergency_data.get('logistic_model') or emergency_data.get('classifier')
-                emergency_scaler = emergency_data.get('scaler')
-            elif hasattr(emergency_data, 'predict'):
-                # Direct model object (LogisticRegression)
-                emergency_model = emergency_data
-                emergency_scaler = None
-            
-            if emergency_model and hasattr(emergency_model, 'predict'):
-                print(f"[OK] Emergency prediction model loaded successfully using joblib")
-                print(f"[OK] Model type: {type(emergency_model).__name__}")
-                if hasattr(emergency_model, 'n_features_in_'):
-                    print(f"[OK] Model expects {emergency_model.n_features_in_} features")
-                if emergency_scaler:
-                    print(f"[OK] Emergency model includes scaler for feature normalization")
-                else:
-                    print(f"[INFO] No scaler found - features will be used as-is")
-                loaded = True
-        except ImportError:
-            print(f"[INFO] joblib not available, trying other methods...")
-        except Exception as e:
-            print(f"[INFO] joblib loading failed: {e}, trying other methods...")
-        
-        # Method 2: Try pickle with different protocols and encodings
-        if not loaded:
-            loading_methods = [
-                ('standard', lambda f: pickle.load(f)),
-                ('latin1', lambda f: pickle.load(f, encoding='latin1')),
-                ('bytes', lambda f: pickle.load(f, encoding='bytes')),
-                ('protocol4', lambda f: pickle.load(f, fix_imports=True)),
-            ]
-            
-            for method_name, load_func in loading_methods:
-                try:
-                    with open(EMERGENCY_MODEL_PATH, 'rb') as f:
-                        emergency_data = load_func(f)
-                        # Handle different formats
-                        if isinstance(emergency_data, dict):
-                            emergency_model = emergency_data.get('model') or emergency_data.get('logistic_model') or emergency_data.get('classifier')
-                            emergency_scaler = emergency_data.get('scaler')
-                            if emergency_model and hasattr(emergency_model, 'predict'):
-                                print(f"[OK] Emergency prediction model loaded successfully ({method_name})")
-                                if emergency_scaler:
-                                    print(f"[OK] Emergency model includes scaler for feature normalization")
-                                loaded = True
-                                break
-                        else:
-                            # Assume it's the model directly
-                            if hasattr(emergency_data, 'predict'):
-                                emergency_model = emergency_data
-                                emergency_scaler = None
-                                print(f"[OK] Emergency prediction model loaded (direct format, {method_name})")
-                                loaded = True
-                                break
-                except Exception as e:
-                    continue  # Try next method
-        
-        # Method 3: Try with dill (more compatible pickle alternative)
-        if not loaded:
-            try:
-                import dill
-                with open(EMERGENCY_MODEL_PATH, 'rb') as f:
-                    emergency_data = dill.load(f)
-                    if isinstance(emergency_data, dict):
-                        emergency_model = emergency_data.get('model') or emergency_data.get('logistic_model') or emergency_data.get('classifier')
-                        emergency_scaler = emergency_data.get('scaler')
-                    elif hasattr(emergency_data, 'predict'):
-                        emergency_model = emergency_data
-                        emergency_scaler = None
-                    
-                    if emergency_model and hasattr(emergency_model, 'predict'):
-                        print(f"[OK] Emergency prediction model loaded successfully using dill")
-                        if emergency_scaler:
-                            print(f"[OK] Emergency model includes scaler for feature normalization")
-                        loaded = True
-            except ImportError:
-                pass  # dill not available
-            except Exception as e:
-                pass  # dill failed
-        
-        if not loaded:
-            print(f"[WARNING] Could not load emergency model with any method")
-            print(f"[INFO] Emergency section will use rule-based priority prediction")
-            print(f"[INFO] To fix: The model file may need to be re-saved with Python 3.x compatible pickle protocol")
-    else:
-        print(f"[WARNING] Emergency prediction model not found at {EMERGENCY_MODEL_PATH}")
+    emergency = model_registry.get('emergency')
+    if emergency is None:
+        print(f"[WARNING] Emergency prediction model not available at {EMERGENCY_MODEL_PATH}")
         print(f"[INFO] Emergency section will use rule-based priority prediction")
-except Exception as e:
-    print(f"[ERROR] Error loading emergency prediction model: {e}")
-    print(f"[INFO] Emergency section will use rule-based priority prediction")
+    else:
+        print(f"[OK] Model type: {type(emergency.model).__name__}")
+        print(f"[OK] Model expects {len(emergency.metadata['feature_names'])} features (schema from artifact)")
+
+
+def warm_up_models():
+    if not model_registry.loaded:  # Nothing to do in a worker forked after preload_models()
+        load_models()
+
+
+def preload_models():
+    """Load the models in the gunicorn master before it forks (when_ready), so workers share them copy-on-write."""
+    warm_up_models()
+    startup_profile.mark('preloaded models')
+
+
+# Both run after the first request (or shortly after boot, see gunicorn_config.py) unless WARM_UP_IN_BACKGROUND is off
+startup_profile.add_warm_up('models', warm_up_models)
+startup_profile.add_warm_up('firebase', lambda: run_blocking(init_firebase))
+startup_profile.mark('model registry')
+if not WARM_UP_IN_BACKGROUND:
+    startup_profile.warm_up(background=False)
+
+# Optional out-of-process inference sidecar shared by all workers.
+# Predictors try it first and fall back to in-process inference when it is down.
+inference_client = InferenceClient(INFERENCE_SOCKET, timeout=INFERENCE_TIMEOUT_MS / 1000.0) if INFERENCE_SOCKET else None
+if inference_client:
+    print(f"[INFO] Inference sidecar enabled at {INFERENCE_SOCKET}")
+
+
+@traced('model.remote_predict')
+def remote_predict(model_name, features, version):
+    """
+    Predict one row on the sidecar; None means run in-process instead.
+
+    The row was encoded with this worker's model schema (``version``); the
+    sidecar polls its own registry, so during a rollout it may hold another
+    model and the row is scored locally.
+    """
+    if inference_client is None:
+        return None
+    return inference_client.predict(model_name, features[0], version=version)
+
+
+# Version of the model behind the most recent prediction on this thread/greenlet,
+# stored alongside records and emergencies so every prediction is traceable
+_prediction_context = threading.local()
+
+
+def last_model_version():
+    """Model version used by the last predict_* call in the current thread."""
+    return getattr(_prediction_context, 'model_version', None)
+
+
+def last_emergency_probabilities():
+    """Class -> probability from the last model-based predict_emergency_priority call, else None."""
+    return getattr(_prediction_context, 'emergency_probabilities', None)
+
+
+# Optional prediction log (features, probabilities, version, latency) for retraining
+# and drift analysis. log() only queues; a background thread does the writing.
+prediction_logger = PredictionLogger(PREDICTION_LOG_DIR, batch_size=PREDICTION_LOG_BATCH,
+                                     rotate_rows=PREDICTION_LOG_ROTATE_ROWS) if PREDICTION_LOG_DIR else None
+if prediction_logger:
+    print(f"[INFO] Prediction log enabled at {PREDICTION_LOG_DIR}")
+
+# Per-worker feature and class-distribution sketches, merged across workers by /admin/model_drift
+drift_monitor = DriftMonitor(DB_PATH, publish_interval=DRIFT_PUBLISH_INTERVAL) if DRIFT_PUBLISH_INTERVAL else None
+
+
+def record_prediction(model_name, feature_names, features, probabilities, classes, prediction, started):
+    """Count one prediction and hand it to the drift monitor and the prediction log (each optional)."""
+    MODEL_LATENCY.observe(time.perf_counter() - started, model_name, str(last_model_version()))
+    MODEL_PREDICTIONS.inc(model_name, str(last_model_version()), str(prediction))
+    if drift_monitor is not None:
+        drift_monitor.observe(model_name, last_model_version(), feature_names, features[0], prediction)
+    if prediction_logger is not None:
+        prediction_logger.log(model_name, features[0], probabilities, classes, last_model_version(),
+                              (time.perf_counter() - started) * 1000.0, prediction)
+
+
+@app.before_request
+def _start_model_watcher():
+    model_registry.start_watching()
+
+
+@app.teardown_request
+def _start_warm_up(error=None):
+    # After the first response, so the warm-up's imports don't hold up that request
+    startup_profile.warm_up()
+
+
+# Request, database, model, OTP and emergency metrics, summed over workers at /metrics (see metrics.py)
+metrics = MetricsRegistry(lambda: sqlite3.connect(DB_PATH), publish_interval=METRICS_PUBLISH_INTERVAL)
+HTTP_REQUESTS = metrics.counter('swasthya_http_requests_total', 'Requests served.', ('route', 'method', 'status'))
+HTTP_LATENCY = metrics.histogram('swasthya_http_request_duration_seconds', 'Request latency in seconds.',
+                                 ('route', 'method'))
+DB_QUERY_LATENCY = metrics.histogram('swasthya_db_query_duration_seconds',
+                                     'SQL statement time in seconds, fetches included.', ('route',),
+                                     buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+DB_QUERIES_PER_REQUEST = metrics.histogram('swasthya_db_queries_per_request', 'SQL statements per request.',
+                                           ('route',), buckets=(0, 1, 2, 5, 10, 20, 50, 100))
+MODEL_LATENCY = metrics.histogram('swasthya_model_inference_seconds', 'Prediction latency in seconds.',
+                                  ('model', 'version'),
+                                  buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+MODEL_PREDICTIONS = metrics.counter('swasthya_model_predictions_total', 'Predictions by class.',
+                                    ('model', 'version', 'class'))
+OTP_SENT = metrics.counter('swasthya_otp_sent_total', 'OTP send attempts.', ('role', 'purpose', 'outcome'))
+OTP_VERIFIED = metrics.counter('swasthya_otp_verifications_total', 'OTP verification attempts.',
+                               ('role', 'purpose', 'outcome'))
+EMERGENCIES = metrics.counter('swasthya_emergencies_total', 'Emergencies created, by priority.',
+                              ('priority', 'source'))
+
+# Per-request statement counts and timings, slow queries and N+1 suspects (see sql_profiler.py)
+sql_profiler = SQLProfiler(lambda: sqlite3.connect(DB_PATH), slow_query_ms=SLOW_QUERY_MS,
+                           repeat_threshold=SQL_REPEAT_THRESHOLD) if SQL_PROFILING else None
+
+# Sampled request traces (DB, model, QR, file and template spans) appended to TRACE_FILE (see tracing.py)
+tracer = Tracer(SpanFileExporter(TRACE_FILE), sample_rate=TRACE_SAMPLE_RATE) if TRACE_FILE else None
+if tracer:
+    print(f"[INFO] Tracing {TRACE_SAMPLE_RATE:.0%} of requests to {TRACE_FILE}")
+
+
+@app.before_request
+def _start_request_telemetry():
+    metrics.start()
+    g.request_started = time.perf_counter()
+    route = request.endpoint or 'unmatched'
+    if tracer is not None:
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.trace = tracer.begin(f'{request.method} {rule}', {'http.method': request.method, 'http.route': rule})
+    # Statements are always timed for /metrics; the profiler adds N+1 checks and slow-query plans
+    g.sql_profile = sql_profiler.begin(route) if sql_profiler is not None else RequestProfile(None, route)
+
+
+@app.after_request
+def _finish_request_telemetry(response):
+    route = request.endpoint or 'unmatched'
+    profile = g.pop('sql_profile', None)
+    if profile is not None:
+        for statement in profile.statements:
+            DB_QUERY_LATENCY.observe(statement.seconds, route)
+        DB_QUERIES_PER_REQUEST.observe(len(profile.statements), route)
+        if profile.profiler is not None:
+            response.headers['X-SQL-Profile'] = sql_profiler.finish(profile)
+    started = g.pop('request_started', None)
+    if started is not None:
+        HTTP_LATENCY.observe(time.perf_counter() - started, route, request.method)
+        HTTP_REQUESTS.inc(route, request.method, str(response.status_code))
+    root = g.get('trace')
+    if root is not None:
+        root.set('http.status_code', response.status_code)
+        if response.status_code >= 500:
+            root.error = f'HTTP {response.status_code}'
+        response.headers['X-Trace-Id'] = root.trace.trace_id
+    return response
+
+
+@app.teardown_request
+def _finish_trace(error=None):
+    # Teardown runs after unhandled errors too, so every sampled trace is ended and exported
+    root = g.pop('trace', None)
+    if root is not None:
+        tracer.finish(root, error)
+
+
+@before_render_template.connect_via(app)
+def _start_template_span(sender, template, context, **extra):
+    span = tracing.start_span('render_template', {'template': template.name or 'string'})
+    if span is not None:
+        g.setdefault('template_spans', []).append(span)
+
+
+@template_rendered.connect_via(app)
+def _end_template_span(sender, template, context, **extra):
+    spans = g.get('template_spans')
+    if spans:
+        spans.pop().end()
 
 
 # Helper function to get DB connection
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+    # Connections opened while serving a request have their statements timed into its profile
+    conn = profiled_connect(DB_PATH, g.get('sql_profile') if has_request_context() else None)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+# Emergency dispatch lifecycle; active counts are shared by all workers (see dispatch_state.py)
+dispatch_state = DispatchState(lambda: get_db_connection(), resync_interval=DISPATCH_RESYNC_SECONDS)
+# Assigns free units to emergencies by priority, then request time (see ambulance_allocator.py)
+ambulance_allocator = AmbulanceAllocator(lambda: get_db_connection(), dispatch_state)
+# Nearest capable hospital for an emergency; rebuilt in every worker after invalidate() (see geo_index.py)
+hospital_index = HospitalIndex(lambda: get_db_connection())
+# Expected call rates per area and hour from an incrementally updated rollup (see demand_forecast.py)
+demand_forecaster = DemandForecaster()
+# Running response-time aggregates and percentiles per state and priority (see ambulance_analytics.py)
+ambulance_analytics = AmbulanceAnalytics(lambda: get_db_connection())
+# Pushes emergencies, AI alerts and dispatch counts to hospital dashboards over /events (see event_bus.py)
+event_bus = EventBus(lambda: get_db_connection(), retention=EVENT_RETENTION)
+
+
+def publish_dispatch_counts():
+    """Push the current active and available counts to every dashboard."""
+    event_bus.publish('counts', {'active_by_status': dispatch_state.counts(),
+                                 'available_ambulances': ambulance_allocator.available_count()})
+
+
+# Bounded, priority-ordered admission to the emergency route, per worker (see intake.py)
+intake_gate = IntakeGate(capacity=INTAKE_CAPACITY, queue_size=INTAKE_QUEUE_SIZE, max_wait=INTAKE_MAX_WAIT_SECONDS,
+                         critical_reserve=INTAKE_CRITICAL_RESERVE)
+
+
+def intake_controlled(view):
+    """Admit POSTs through intake_gate, ranked by a rule-based pre-triage of the form, before any DB work."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'POST':
+            return view(*args, **kwargs)
+        try:
+            with intake_gate.admit(pre_triage(request.form)):
+                return view(*args, **kwargs)
+        except IntakeRejected as e:
+            logger.warning('Emergency intake refused a %s request: %s', e.priority, e.reason)
+            flash('We are receiving an unusually high number of emergency requests. If this is life-threatening, '
+                  f'call 108 now; otherwise please submit again in {e.retry_after} seconds.', 'danger')
+            return (render_template('emergency.html', idempotency_key=request.form.get('idempotency_key')), 503,
+                    {'Retry-After': str(e.retry_after)})
+    return wrapper
+
+
+# Repeated emergency submissions get the first one's result page (see idempotency.py)
+submission_guard = SubmissionGuard(lambda: get_db_connection(), key_ttl=IDEMPOTENCY_KEY_TTL_SECONDS,
+                                   window=DUPLICATE_WINDOW_SECONDS)
+
+
+MAX_SESSION_SUBMISSIONS = 10
+
+
+def _submitted_in_session(submission_id):
+    """Remember that this browser session made the submission, so its repeats may see the result page."""
+    session['submissions'] = (session.get('submissions', []) + [submission_id])[-MAX_SESSION_SUBMISSIONS:]
+
+
+def _may_replay(earlier, key):
+    """The result page has the caller's details: replay it only to the same idempotency key or session."""
+    return (key is not None and earlier.idempotency_key == key) or earlier.id in session.get('submissions', ())
+
+
+def idempotent_submission(view):
+    """Replay the result of an earlier POST with the same idempotency key or phone and location."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'POST':
+            return view(*args, **kwargs)
+        key = submission_key(request.headers.get('Idempotency-Key') or request.form.get('idempotency_key'))
+        fingerprint_ = submission_fingerprint(request.form.get('phone'), request.form.get('location'),
+                                              request.form.get('state'), request.form.get('district'))
+        submission_id = None
+        earlier = submission_guard.find(key, fingerprint_)
+        if earlier is None:
+            submission_id = submission_guard.claim(key, fingerprint_)
+            if submission_id is None:  # A concurrent request with the same key got there first
+                earlier = submission_guard.find(key, fingerprint_)
+        if earlier is not None and earlier.response is not None and _may_replay(earlier, key):
+            logger.info('Repeated emergency submission answered with emergency %s', earlier.emergency_id)
+            return Response(earlier.response, mimetype='text/html', headers={'Idempotent-Replay': 'true'})
+        if submission_id is None:  # Still running, or someone else's submission for the same phone and location
+            flash('Your emergency request has already been received and is being processed.', 'info')
+            return render_template('emergency.html', idempotency_key=uuid.uuid4().hex), 202
+
+        _submitted_in_session(submission_id)
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            submission_guard.release(submission_id, key, fingerprint_)
+            raise
+        if response.status_code == 200 and g.get('emergency_id') is not None:
+            submission_guard.complete(submission_id, key, fingerprint_, g.emergency_id,
+                                      response.get_data(as_text=True))
+        else:
+            submission_guard.release(submission_id, key, fingerprint_)  # Refused or failed: a retry may go through
+        return response
+    return wrapper
+
+
 # Initialize database with basic schema
 def init_db():
     """Initialize database and create all tables if they don't exist"""
@@ -360,6 +650,18 @@ def init_db():
         )
         print("[OK] Created/verified otp_codes table")
 
+        # Per-worker feature-drift sketches (drift_monitor.py)
+        cur.execute(DRIFT_STATS_TABLE_SQL)
+        print("[OK] Created/verified model_drift_stats table")
+
+        # Per-worker SQL profile totals (sql_profiler.py)
+        cur.execute(SQL_PROFILE_TABLE_SQL)
+        print("[OK] Created/verified sql_profile_stats table")
+
+        # Per-worker metric values behind /metrics (metrics.py)
+        cur.execute(METRICS_TABLE_SQL)
+        print("[OK] Created/verified metrics_stats table")
+
         conn.commit()
         
         conn.commit()
@@ -440,6 +742,91 @@ def init_db():
         except sqlite3.OperationalError:
             pass  # Column already exists
         
+        # Version of the model behind each prediction (see model_registry.py)
+        try:
+            cur.execute('ALTER TABLE emergencies ADD COLUMN model_version TEXT')
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        
+        # Dispatch lifecycle (dispatch_state.py): indexed status code next to the display text
+        try:
+            cur.execute('ALTER TABLE emergencies ADD COLUMN status_code INTEGER')
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        
+        try:
+            cur.execute('ALTER TABLE emergencies ADD COLUMN status_updated_at TEXT')
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        
+        cur.execute(DISPATCH_INDEX_SQL)
+        # Statuses never advanced before the lifecycle existed, so older rows are treated as closed
+        cur.execute('UPDATE emergencies SET status_code = ? WHERE status_code IS NULL', (CLOSED,))
+        conn.commit()
+        dispatch_state.resync(conn)
+        
+        # Ambulance fleet (ambulance_allocator.py)
+        cur.execute(AMBULANCES_TABLE_SQL)
+        for index_sql in AMBULANCES_INDEX_SQL:
+            cur.execute(index_sql)
+        cur.execute(ALLOCATOR_CHANGES_TABLE_SQL)
+        try:
+            cur.execute('ALTER TABLE emergencies ADD COLUMN ambulance_id INTEGER')
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        if seed_fleet(conn, AMBULANCE_FLEET_SIZE):
+            print(f"[OK] Created a fleet of {AMBULANCE_FLEET_SIZE} ambulances")
+        
+        # Proximity routing (gazetteer.py, geo_index.py): where the emergency is and the hospital chosen
+        for col_name, col_type in (('district', 'TEXT'), ('latitude', 'REAL'), ('longitude', 'REAL'),
+                                   ('hospital_id', 'INTEGER')):
+            try:
+                cur.execute(f'ALTER TABLE emergencies ADD COLUMN {col_name} {col_type}')
+                conn.commit()
+            except sqlite3.OperationalError:
+                pass  # Column already exists
+        
+        # Demand rollup (demand_forecast.py), filled from existing emergencies on first start
+        cur.execute(DEMAND_TABLE_SQL)
+        if cur.execute('SELECT COUNT(*) FROM emergency_demand').fetchone()[0] == 0:
+            replayed = demand_forecaster.rebuild(conn)
+            conn.commit()
+            if replayed:
+                print(f"[OK] Built demand rollup from {replayed} emergencies")
+        
+        # Response-time aggregates (ambulance_analytics.py), filled from existing emergencies on first start
+        cur.execute(AMBULANCE_STATS_TABLE_SQL)
+        if cur.execute('SELECT COUNT(*) FROM ambulance_stats').fetchone()[0] == 0:
+            replayed = ambulance_analytics.rebuild(conn)
+            conn.commit()
+            if replayed:
+                print(f"[OK] Built response-time aggregates from {replayed} emergencies")
+        
+        # Emergency submissions kept for duplicate suppression (idempotency.py)
+        cur.execute(SUBMISSIONS_TABLE_SQL)
+        for index_sql in SUBMISSIONS_INDEX_SQL:
+            cur.execute(index_sql)
+        submission_guard.reset()
+        
+        # Dashboard event stream (event_bus.py)
+        cur.execute(EVENTS_TABLE_SQL)
+        event_bus.reset(conn)
+        
+        # Outbox for AI-triggered emergencies (outbox.py); one emergency per record
+        cur.execute(OUTBOX_TABLE_SQL)
+        for index_sql in OUTBOX_INDEX_SQL:
+            cur.execute(index_sql)
+        try:
+            cur.execute('ALTER TABLE emergencies ADD COLUMN record_id INTEGER')
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        cur.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_emergencies_record ON emergencies (record_id)')
+        
         try:
             cur.execute('ALTER TABLE hospitals ADD COLUMN district TEXT')
             conn.commit()
@@ -555,7 +942,16 @@ def init_db():
             except sqlite3.OperationalError:
                 pass  # Column already exists
         
+        try:
+            cur.execute('ALTER TABLE records ADD COLUMN model_version TEXT')
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        
         conn.close()
+        ambulance_allocator.refresh()
+        hospital_index.invalidate()
+        ambulance_analytics.invalidate()
         print("[OK] Database initialization completed successfully")
     except Exception as e:
         print(f"[ERROR] Database initialization failed: {e}")
@@ -578,15 +974,51 @@ def generate_health_id():
 
 
 # Utility: create QR code for health ID
+@traced('qr.generate')
 def generate_health_qr(health_id):
     qr_path = os.path.join(QR_FOLDER, f"{health_id}.png")
     if not os.path.exists(qr_path):
+        import qrcode  # Imported on first registration: it pulls in PIL
         img = qrcode.make(health_id)
         img.save(qr_path)
     return f"qr/{health_id}.png"
 
 
+# Health risk features (shared with train_model.py via featurizer.py)
+@traced('features.health_risk')
+def build_health_features(user_data, symptoms, diagnosis, treatment_status, medicines, health_metrics=None):
+    """
+    Build the 1x13 health risk feature row for one record.
+    Priority for age: health_metrics > user_data > default.
+    """
+    health_metrics = health_metrics or {}
+    age = health_metrics.get('age')
+    if age is None and user_data:
+        if hasattr(user_data, 'get'):
+            age = user_data.get('age')
+        else:
+            age = user_data['age'] if 'age' in user_data.keys() else None
+
+    return featurizer.health_risk_features(
+        age=featurizer.parse_metric(age),
+        symptom_severity=featurizer.symptom_severity(symptoms),
+        diagnosis_severity=featurizer.diagnosis_severity(diagnosis),
+        treatment_status=treatment_status,
+        medicine_complexity=featurizer.medicine_complexity(medicines),
+        systolic_bp=featurizer.parse_metric(health_metrics.get('systolic_bp')),
+        diastolic_bp=featurizer.parse_metric(health_metrics.get('diastolic_bp')),
+        bmi=featurizer.parse_metric(health_metrics.get('bmi')),
+        cholesterol=featurizer.parse_metric(health_metrics.get('cholesterol')),
+        glucose=featurizer.parse_metric(health_metrics.get('glucose')),
+        smoking=featurizer.parse_coded(health_metrics.get('smoking')),
+        alcohol=featurizer.parse_coded(health_metrics.get('alcohol')),
+        physical_activity=featurizer.parse_coded(health_metrics.get('physical_activity')),
+        family_history=featurizer.parse_coded(health_metrics.get('family_history')),
+    )
+
+
 # Health Risk Prediction Function
+@traced('predict.health_risk')
 def predict_health_risk(user_data, symptoms, diagnosis, treatment_status, medicines, health_metrics=None):
     """
     Predict health risk using SVM model with rule-based fallback.
@@ -603,211 +1035,53 @@ def predict_health_risk(user_data, symptoms, diagnosis, treatment_status, medici
         medicines: Medicines text
         health_metrics: Dict with health metrics (age, gender, systolic_bp, etc.)
     """
-    # Rule-based fallback if model is not available
-    use_model = health_risk_model is not None
+    started = time.perf_counter()
+    # Rule-based fallback if model is not available.
+    # Take one registry snapshot so a hot swap mid-call can't mix model and scaler.
+    loaded = model_registry.get('health_risk')
+    use_model = loaded is not None
+    _prediction_context.model_version = loaded.version if use_model else 'rule-based'
     
     # Default health_metrics if not provided
     if health_metrics is None:
         health_metrics = {}
     
     try:
-        # Extract features from available data
-        # Priority: health_metrics > user_data > defaults
-        
-        # Age: from health_metrics, then user_data, then default
-        age = health_metrics.get('age')
-        if age is None and user_data:
-            if hasattr(user_data, 'get'):
-                age = user_data.get('age')
-            else:
-                age = user_data['age'] if 'age' in user_data.keys() else None
-        if age is None:
-            age = 40
-        
-        # Ensure age is a number
-        try:
-            age = int(age) if age else 40
-        except (ValueError, TypeError):
-            age = 40
-        
-        age_normalized = min(age / 100.0, 1.0)  # Normalize age to 0-1
-        
-        # Extract health metrics
-        systolic_bp = health_metrics.get('systolic_bp')
-        diastolic_bp = health_metrics.get('diastolic_bp')
-        bmi = health_metrics.get('bmi')
-        cholesterol = health_metrics.get('cholesterol')
-        glucose = health_metrics.get('glucose')
-        smoking = health_metrics.get('smoking', '')
-        alcohol = health_metrics.get('alcohol', '')
-        physical_activity = health_metrics.get('physical_activity', '')
-        family_history = health_metrics.get('family_history', '')
-        
-        # Normalize BP (normal: 120/80, high: >140/90)
-        bp_normalized = 0.5  # Default
-        if systolic_bp and diastolic_bp:
-            if systolic_bp > 140 or diastolic_bp > 90:
-                bp_normalized = 1.0  # High BP
-            elif systolic_bp < 90 or diastolic_bp < 60:
-                bp_normalized = 0.8  # Low BP
-            else:
-                bp_normalized = 0.3  # Normal BP
-        
-        # Normalize BMI (normal: 18.5-24.9, overweight: 25-29.9, obese: >30)
-        bmi_normalized = 0.5  # Default
-        if bmi:
-            if bmi < 18.5:
-                bmi_normalized = 0.6  # Underweight
-            elif bmi > 30:
-                bmi_normalized = 1.0  # Obese
-            elif bmi > 25:
-                bmi_normalized = 0.7  # Overweight
-            else:
-                bmi_normalized = 0.3  # Normal
-        
-        # Normalize cholesterol (normal: <200, high: >240)
-        cholesterol_normalized = 0.5  # Default
-        if cholesterol:
-            if cholesterol > 240:
-                cholesterol_normalized = 1.0  # High
-            elif cholesterol > 200:
-                cholesterol_normalized = 0.7  # Borderline
-            else:
-                cholesterol_normalized = 0.3  # Normal
-        
-        # Normalize glucose (normal: <100, prediabetic: 100-125, diabetic: >125)
-        glucose_normalized = 0.5  # Default
-        if glucose:
-            if glucose > 125:
-                glucose_normalized = 1.0  # High (diabetic)
-            elif glucose > 100:
-                glucose_normalized = 0.7  # Borderline
-            else:
-                glucose_normalized = 0.3  # Normal
-        
-        # Encode lifestyle factors using new encoding scheme
-        # Smoking: 0 = Non-Smoker, 1 = Smoker
-        try:
-            smoking_risk = int(smoking) if smoking and smoking.isdigit() else 0
-        except (ValueError, TypeError):
-            smoking_risk = 0
-        
-        # Alcohol: 0 = Habit Absent, 1 = Habit Present
-        try:
-            alcohol_risk = int(alcohol) if alcohol and alcohol.isdigit() else 0
-        except (ValueError, TypeError):
-            alcohol_risk = 0
-        
-        # Physical Activity: 0-5 scale (0 = No activity/Sedentary, 5 = 5+ hours/week)
-        # For model: normalize to 0-1, but higher activity = lower risk (inverted)
-        try:
-            activity_value = int(physical_activity) if physical_activity and physical_activity.isdigit() else 0
-            # Invert: 0 (no activity) = high risk (1.0), 5 (active) = low risk (0.0)
-            activity_risk = 1.0 - (activity_value / 5.0) if activity_value <= 5 else 0.0
-        except (ValueError, TypeError):
-            activity_risk = 0.5  # Default medium risk
-        
-        # Family History: 0 = No family history, 1 = Family history present
-        try:
-            family_history_risk = int(family_history) if family_history and family_history.isdigit() else 0
-        except (ValueError, TypeError):
-            family_history_risk = 0
-        
-        # Encode symptoms (simple keyword-based severity)
-        symptoms_lower = (symptoms or '').lower()
-        symptom_severity = 0.0
-        critical_keywords = ['chest pain', 'difficulty breathing', 'unconscious', 'severe', 'emergency', 'critical', 'heart attack', 'stroke']
-        high_keywords = ['pain', 'fever', 'bleeding', 'dizziness', 'nausea', 'vomiting']
-        medium_keywords = ['cough', 'headache', 'fatigue', 'weakness']
-        
-        if any(keyword in symptoms_lower for keyword in critical_keywords):
-            symptom_severity = 1.0
-        elif any(keyword in symptoms_lower for keyword in high_keywords):
-            symptom_severity = 0.7
-        elif any(keyword in symptoms_lower for keyword in medium_keywords):
-            symptom_severity = 0.4
-        else:
-            symptom_severity = 0.1
-        
-        # Encode diagnosis severity
-        diagnosis_lower = (diagnosis or '').lower()
-        diagnosis_severity = 0.0
-        critical_diagnosis = ['heart attack', 'stroke', 'severe', 'critical', 'emergency', 'cardiac', 'respiratory failure']
-        high_diagnosis = ['hypertension', 'diabetes', 'infection', 'fracture', 'injury']
-        medium_diagnosis = ['checkup', 'routine', 'follow-up']
-        
-        if any(keyword in diagnosis_lower for keyword in critical_diagnosis):
-            diagnosis_severity = 1.0
-        elif any(keyword in diagnosis_lower for keyword in high_diagnosis):
-            diagnosis_severity = 0.6
-        elif any(keyword in diagnosis_lower for keyword in medium_diagnosis):
-            diagnosis_severity = 0.2
-        else:
-            diagnosis_severity = 0.3
-        
-        # Encode treatment status
-        status_encoding = {
-            'Under Observation': 0.8,
-            'Stable': 0.4,
-            'Recovered': 0.1,
-            'Critical': 1.0,
-            'Emergency': 1.0
-        }
-        treatment_severity = status_encoding.get(treatment_status, 0.5)
-        
-        # Medicine count (more medicines might indicate complexity)
-        medicine_count = len([m.strip() for m in (medicines or '').split(',') if m.strip()]) if medicines else 0
-        medicine_complexity = min(medicine_count / 5.0, 1.0)  # Normalize to 0-1
+        features = build_health_features(user_data, symptoms, diagnosis, treatment_status,
+                                         medicines, health_metrics)
+        probabilities = classes = None
         
         # Use model if available, otherwise use rule-based assessment
         if use_model:
-            # Prepare feature vector with health metrics
-            features = np.array([[
-                age_normalized,
-                symptom_severity,
-                diagnosis_severity,
-                treatment_severity,
-                medicine_complexity,
-                bp_normalized,
-                bmi_normalized,
-                cholesterol_normalized,
-                glucose_normalized,
-                smoking_risk,
-                alcohol_risk,
-                activity_risk,
-                family_history_risk
-            ]])
-            
-            # Scale features if scaler is available
-            if model_scaler is not None:
-                features_scaled = model_scaler.transform(features)
+            remote = remote_predict('health_risk', features, loaded.version)
+            if remote is not None:
+                # Sidecar scaled and predicted this row in a shared batch
+                prediction = remote['prediction']
+                risk_score = float(max(remote['probabilities'])) if remote['probabilities'] else 0.5
+                probabilities, classes = remote['probabilities'], remote['classes']
+                _prediction_context.model_version = remote['version']
             else:
-                features_scaled = features
-            
-            # Make prediction
-            prediction = health_risk_model.predict(features_scaled)[0]
-            
-            # Get prediction probability if available
-            try:
-                probabilities = health_risk_model.predict_proba(features_scaled)[0]
-                risk_score = float(max(probabilities))
-            except:
-                risk_score = 0.5
+                with tracing.span('model.predict', model='health_risk', version=loaded.version):
+                    # Scale features if scaler is available
+                    if loaded.scaler is not None:
+                        features_scaled = loaded.scaler.transform(features)
+                    else:
+                        features_scaled = features
+                    
+                    # Make prediction
+                    prediction = loaded.model.predict(features_scaled)[0]
+                    
+                    # Get prediction probability if available
+                    try:
+                        probabilities = loaded.model.predict_proba(features_scaled)[0]
+                        risk_score = float(max(probabilities))
+                        classes = loaded.model.classes_
+                    except:
+                        risk_score = 0.5
         else:
-            # Rule-based assessment when model is not available
-            # Calculate composite risk score with health metrics
-            base_risk = (symptom_severity * 0.2 + diagnosis_severity * 0.2 + 
-                        treatment_severity * 0.2 + medicine_complexity * 0.1)
-            
-            # Add health metrics to risk calculation
-            # smoking_risk, alcohol_risk, family_history_risk are now 0 or 1 (binary)
-            # activity_risk is inverted (0 = no activity = high risk 1.0, 5 = active = low risk 0.0)
-            health_risk = (bp_normalized * 0.1 + bmi_normalized * 0.1 + 
-                          cholesterol_normalized * 0.05 + glucose_normalized * 0.05 +
-                          float(smoking_risk) * 0.05 + float(alcohol_risk) * 0.03 + 
-                          activity_risk * 0.03 + float(family_history_risk) * 0.02)
-            
-            risk_score = min(base_risk + health_risk, 1.0)  # Cap at 1.0
+            # Rule-based assessment when model is not available:
+            # composite risk score with the same weights the training labels use
+            risk_score = float(featurizer.rule_based_risk_score(features)[0])
             prediction = None  # Will use risk_score for determination
         
         # Determine risk level and emergency trigger
@@ -878,17 +1152,25 @@ def predict_health_risk(user_data, symptoms, diagnosis, treatment_status, medici
             should_emergency = True
         
         # Override: If symptoms or diagnosis contain critical keywords, escalate
+        symptom_severity, diagnosis_severity = features[0, 1], features[0, 2]
         if symptom_severity >= 0.9 or diagnosis_severity >= 0.9:
             if risk_level != 'Critical':
                 risk_level = 'High'
             should_emergency = True
         
+        # Record the model's class by name (the rule-based path only has the level)
+        if prediction is None:
+            label = risk_level
+        elif isinstance(prediction, (int, np.integer)) and 0 <= prediction < len(featurizer.RISK_LEVELS):
+            label = featurizer.RISK_LEVELS[int(prediction)]
+        else:
+            label = str(prediction)
+        record_prediction('health_risk', featurizer.HEALTH_FEATURE_NAMES, features, probabilities, classes,
+                          label, started)
         return risk_level, risk_score, should_emergency
         
     except Exception as e:
-        print(f"[ERROR] Error in health risk prediction: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Health risk prediction failed: %s', e.__class__.__name__)
         # Fallback: use rule-based assessment if model fails
         if treatment_status in ['Critical', 'Emergency']:
             return 'Critical', 0.9, True
@@ -934,9 +1216,9 @@ def send_otp(phone, role, identifier, purpose='login'):
                 
                 # Store verification session info (optional - for Firebase integration)
                 # Firebase would handle actual SMS sending, but we're using our own system
-                print(f"[FIREBASE] Phone number validated: {phone_formatted}")
+                debug_sampled(logger, LOG_DEBUG_SAMPLE_RATE, 'Firebase phone number validated', extra={'role': role})
             except Exception as e:
-                print(f"[FIREBASE WARNING] Phone validation error: {e}")
+                logger.warning('Firebase phone validation error: %s', e)
         
         # Store OTP in database
         conn = get_db_connection()
@@ -962,13 +1244,13 @@ def send_otp(phone, role, identifier, purpose='login'):
         # For now, we'll use a simple approach - in production, use Firebase Auth phone verification
         # or integrate with Firebase Cloud Functions to send SMS
         
-        # Log OTP for debugging (visible in Render logs)
-        print(f"[OTP DEBUG] OTP for {phone} ({role}): {otp_code}")
-        print(f"[OTP INFO] OTP stored in database. Expires at: {expires_at}")
+        # The code and the phone number never go to the logs
+        logger.info('OTP issued', extra={'role': role, 'purpose': purpose, 'expires_at': expires_at})
+        OTP_SENT.inc(role, purpose, 'sent')
         
         # Show OTP in response message (until SMS service is integrated)
         # TODO: Once SMS is integrated, remove OTP from message and only show "OTP sent to your phone"
-        message = f"OTP sent successfully. Your OTP code is: {otp_code} (expires in {OTP_EXPIRY_MINUTES} minutes). Check Render logs if not visible."
+        message = f"OTP sent successfully. Your OTP code is: {otp_code} (expires in {OTP_EXPIRY_MINUTES} minutes)."
         
         # TODO: Integrate with Firebase Cloud Functions or SMS service to actually send SMS
         # For now, OTP is generated and stored - integrate SMS sending service here
@@ -976,10 +1258,12 @@ def send_otp(phone, role, identifier, purpose='login'):
         return True, message
         
     except Exception as e:
-        print(f"[OTP ERROR] {str(e)}")
+        logger.error('OTP send failed: %s', e, extra={'role': role, 'purpose': purpose})
+        OTP_SENT.inc(role, purpose, 'error')
         return False, f"Error sending OTP: {str(e)}"
 
 
+@traced('predict.emergency')
 def predict_emergency_priority(symptoms, age=None, location=None, state=None, zone=None, 
                               day=None, time_slot=None, emergency_type=None, weather=None, user_data=None):
     """
@@ -1003,152 +1287,53 @@ def predict_emergency_priority(symptoms, age=None, location=None, state=None, zo
         - severity: 'Mild', 'Moderate', 'Severe', 'Critical'
         - prediction_score: Probability score (0-1)
     """
-    if emergency_model is None:
+    started = time.perf_counter()
+    loaded = model_registry.get('emergency')
+    _prediction_context.emergency_probabilities = None
+    if loaded is None:
         # Fallback to rule-based prediction
+        _prediction_context.model_version = 'rule-based'
         return predict_emergency_priority_rulebased(symptoms, age, location, state, zone, 
                                                      day, time_slot, emergency_type, weather, user_data)
     
+    emergency_model, emergency_scaler = loaded.model, loaded.scaler
+    _prediction_context.model_version = loaded.version
     try:
-        # Extract features from symptoms and other inputs
-        # This is a simplified feature extraction - adjust based on your model's requirements
-        symptom_text = str(symptoms).lower() if symptoms else ''
+        # Encode with the feature schema stored with this model (resolved at load time)
+        with tracing.span('features.emergency'):
+            encoder = featurizer.emergency_encoder(loaded.metadata['feature_names'])
+            features = encoder.transform_one(
+                age=age, symptoms=symptoms, state=state, zone=zone, day=day,
+                time_slot=time_slot, emergency_type=emergency_type, weather=weather,
+            )
         
-        # Feature extraction (adjust based on your model's actual features)
-        # Common emergency features:
-        features = []
-        
-        # Age normalization (0-1 scale, assuming 0-100 range)
-        age_normalized = (age / 100.0) if age else 0.5
-        
-        # Symptom severity keywords
-        critical_keywords = ['chest pain', 'difficulty breathing', 'unconscious', 'severe', 'emergency', 
-                            'critical', 'heart attack', 'stroke', 'bleeding', 'trauma', 'accident']
-        high_keywords = ['pain', 'fever', 'vomiting', 'dizziness', 'nausea', 'weakness']
-        moderate_keywords = ['discomfort', 'mild', 'ache', 'tired']
-        
-        symptom_severity = 0.0
-        if any(keyword in symptom_text for keyword in critical_keywords):
-            symptom_severity = 1.0
-        elif any(keyword in symptom_text for keyword in high_keywords):
-            symptom_severity = 0.7
-        elif any(keyword in symptom_text for keyword in moderate_keywords):
-            symptom_severity = 0.4
-        else:
-            symptom_severity = 0.2
-        
-        # States list (35 states/UTs)
-        states_list = ['All India', 'Uttar Pradesh', 'Maharashtra', 'West Bengal', 'Jharkhand',
-                       'Madhya Pradesh', 'Bihar', 'Rajasthan', 'Tamil Nadu', 'Orissa', 'Assam',
-                       'Karnataka', 'Andhra Pradesh', 'Haryana', 'Chhatisgarh', 'Jammu and Kashmir',
-                       'Telangana', 'Uttarakhand', 'Himachal Pradesh', 'Gujarat', 'Kerala',
-                       'Arunachal Pradesh', 'Delhi', 'Nagaland', 'Mizoram', 'Meghalaya',
-                       'Tripura', 'Manipur', 'Goa', 'Andaman and Nicobar Island', 'Ladakh',
-                       'Sikkim', 'Puducherry', 'Dadra and Nagar Haveli and Daman and Diu', 'Chandigarh']
-        
-        # Zone options (3)
-        zone_options = ['Urban', 'Rural', 'Highway']
-        
-        # Day options (7)
-        day_options = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        
-        # Time slot options (4)
-        time_slot_options = ['Morning', 'Afternoon', 'Evening', 'Night']
-        
-        # Emergency type options (3)
-        emergency_type_options = ['EMS', 'Traffic', 'Fire']
-        
-        # Weather options (4)
-        weather_options = ['Rain', 'Heatwave', 'Fog', 'Clear']
-        
-        # Build feature vector with one-hot encoding for categorical variables
-        # The model expects 50 features, which likely includes:
-        # - Age (1 feature)
-        # - Symptom severity (1 feature)
-        # - State one-hot (35 features)
-        # - Zone one-hot (3 features)
-        # - Day one-hot (7 features)
-        # - Time slot one-hot (4 features)
-        # - Emergency type one-hot (3 features)
-        # - Weather one-hot (4 features)
-        # Total: 1 + 1 + 35 + 3 + 7 + 4 + 3 + 4 = 58 features (but model expects 50)
-        # Let's build it step by step and pad/truncate as needed
-        
-        features_list = []
-        
-        # 1. Age (normalized)
-        features_list.append(age_normalized)
-        
-        # 2. Symptom severity
-        features_list.append(symptom_severity)
-        
-        # 3. State one-hot encoding (35 features)
-        state_onehot = [0] * len(states_list)
-        if state and state in states_list:
-            state_onehot[states_list.index(state)] = 1
-        features_list.extend(state_onehot)
-        
-        # 4. Zone one-hot encoding (3 features)
-        zone_onehot = [0] * len(zone_options)
-        if zone and zone in zone_options:
-            zone_onehot[zone_options.index(zone)] = 1
-        features_list.extend(zone_onehot)
-        
-        # 5. Day one-hot encoding (7 features)
-        day_onehot = [0] * len(day_options)
-        if day and day in day_options:
-            day_onehot[day_options.index(day)] = 1
-        features_list.extend(day_onehot)
-        
-        # 6. Time slot one-hot encoding (4 features)
-        time_slot_onehot = [0] * len(time_slot_options)
-        if time_slot and time_slot in time_slot_options:
-            time_slot_onehot[time_slot_options.index(time_slot)] = 1
-        features_list.extend(time_slot_onehot)
-        
-        # 7. Emergency type one-hot encoding (3 features)
-        emergency_type_onehot = [0] * len(emergency_type_options)
-        if emergency_type and emergency_type in emergency_type_options:
-            emergency_type_onehot[emergency_type_options.index(emergency_type)] = 1
-        features_list.extend(emergency_type_onehot)
-        
-        # 8. Weather one-hot encoding (4 features)
-        weather_onehot = [0] * len(weather_options)
-        if weather and weather in weather_options:
-            weather_onehot[weather_options.index(weather)] = 1
-        features_list.extend(weather_onehot)
-        
-        # Total features: 1 + 1 + 35 + 3 + 7 + 4 + 3 + 4 = 58
-        base_features = features_list
-        
-        # Build feature vector (adjust based on your model's expected features)
-        if hasattr(emergency_model, 'n_features_in_'):
-            n_features = emergency_model.n_features_in_
-            if len(base_features) < n_features:
-                features = np.array([base_features + [0.0] * (n_features - len(base_features))])
-            elif len(base_features) > n_features:
-                features = np.array([base_features[:n_features]])
+        remote = remote_predict('emergency', features, loaded.version)
+        if remote is not None:
+            # Sidecar scaled and predicted this row in a shared batch
+            prediction = remote['prediction']
+            if remote['probabilities']:
+                prediction_score = float(max(remote['probabilities']))
+                _prediction_context.emergency_probabilities = dict(zip(remote['classes'], remote['probabilities']))
             else:
-                features = np.array([base_features])
-        else:
-            # Default: use all features we have
-            features = np.array([base_features])
-        
-        # Scale features if scaler is available
-        if emergency_scaler:
-            features = emergency_scaler.transform(features)
-        
-        # Make prediction (suppress feature name warnings)
-        with warnings.catch_warnings():
-            warnings.filterwarnings('ignore', category=UserWarning)
-            if hasattr(emergency_model, 'predict_proba'):
-                # Get probability scores
-                probabilities = emergency_model.predict_proba(features)[0]
-                prediction_score = float(max(probabilities))
-                prediction = emergency_model.predict(features)[0]
-            else:
-                # Binary or single output
-                prediction = emergency_model.predict(features)[0]
                 prediction_score = 0.8 if prediction > 0 else 0.2
+            _prediction_context.model_version = remote['version']
+        else:
+            # Scale features if scaler is available (the prediction log keeps the unscaled row)
+            model_input = emergency_scaler.transform(features) if emergency_scaler else features
+            
+            # Make prediction (suppress feature name warnings)
+            with warnings.catch_warnings(), tracing.span('model.predict', model='emergency', version=loaded.version):
+                warnings.filterwarnings('ignore', category=UserWarning)
+                if hasattr(emergency_model, 'predict_proba'):
+                    # Get probability scores
+                    probabilities = emergency_model.predict_proba(model_input)[0]
+                    prediction_score = float(max(probabilities))
+                    prediction = emergency_model.predict(model_input)[0]
+                    _prediction_context.emergency_probabilities = dict(zip(emergency_model.classes_, probabilities))
+                else:
+                    # Binary or single output
+                    prediction = emergency_model.predict(model_input)[0]
+                    prediction_score = 0.8 if prediction > 0 else 0.2
         
         # Convert prediction to priority levels
         # Model classes are: ['High', 'Low', 'Medium'] - no 'Critical'
@@ -1202,11 +1387,16 @@ def predict_emergency_priority(symptoms, age=None, location=None, state=None, zo
             priority = 'Critical'
             severity = 'Critical'
         
+        class_probabilities = last_emergency_probabilities() or {}
+        record_prediction('emergency', loaded.metadata['feature_names'], features,
+                          list(class_probabilities.values()) or None, list(class_probabilities) or None,
+                          prediction, started)
         return priority, severity, float(prediction_score)
         
     except Exception as e:
-        print(f"[ERROR] Emergency prediction error: {e}")
+        logger.error('Emergency prediction failed, using rules: %s', e)
         # Fallback to rule-based
+        _prediction_context.model_version = 'rule-based'
         return predict_emergency_priority_rulebased(symptoms, age, location, state, zone, 
                                                 day, time_slot, emergency_type, weather, user_data)
 
@@ -1310,26 +1500,29 @@ def verify_otp(phone, code, role, identifier, purpose='login'):
                         # Use Firebase Web API Key for verification
                         # In production, you can use Firebase Authentication REST API
                         # to verify phone number authentication tokens
-                        print(f"[FIREBASE] OTP verification using Web API Key for {phone_formatted}")
+                        debug_sampled(logger, LOG_DEBUG_SAMPLE_RATE, 'Firebase OTP verification (Web API Key)')
                         
                         # Optional: Verify Firebase ID token if using Firebase Auth
                         # token = request.headers.get('Authorization', '').replace('Bearer ', '')
                         # decoded_token = auth.verify_id_token(token)
                     else:
-                        print(f"[FIREBASE] OTP verification for {phone_formatted}")
+                        debug_sampled(logger, LOG_DEBUG_SAMPLE_RATE, 'Firebase OTP verification')
                 except Exception as e:
-                    print(f"[FIREBASE WARNING] Verification error: {e}")
+                    logger.warning('Firebase verification error: %s', e)
                     # Continue with database verification even if Firebase check fails
             
             # Mark OTP as verified in database
             cur.execute('UPDATE otp_codes SET verified = 1 WHERE id = ?', (otp_record['id'],))
             conn.commit()
             conn.close()
+            OTP_VERIFIED.inc(role, purpose, 'verified')
             return True, "OTP verified successfully"
         else:
             conn.close()
+            OTP_VERIFIED.inc(role, purpose, 'invalid')
             return False, "Invalid or expired OTP"
     except Exception as e:
+        OTP_VERIFIED.inc(role, purpose, 'error')
         return False, f"Error verifying OTP: {str(e)}"
 
 
@@ -1368,6 +1561,7 @@ def hospital_register():
                 (name, reg_no, email, password, state, district),
             )
             conn.commit()
+            hospital_index.invalidate()
             flash('Hospital registered successfully. Please login.', 'success')
             return redirect(url_for('hospital_login'))
         except sqlite3.IntegrityError:
@@ -1382,7 +1576,9 @@ def hospital_register():
 def hospital_login():
     if request.method == 'POST':
         login_type = request.form.get('login_type', 'password')
-        print(f"[DEBUG] Hospital login - login_type: {login_type}, form data: {dict(request.form)}")
+        # Field names only: the values are passwords, OTPs, emails and phone numbers
+        debug_sampled(logger, LOG_DEBUG_SAMPLE_RATE, 'Hospital login attempt',
+                      extra={'login_type': login_type, 'fields': sorted(request.form)})
         
         if login_type == 'otp':
             # OTP login
@@ -1520,6 +1716,7 @@ def hospital_profile():
                 WHERE id = ?
             ''', (name, email, phone, state, district, hospital_id))
             conn.commit()
+            hospital_index.invalidate()
             flash('Profile updated successfully', 'success')
             conn.close()
             return redirect(url_for('hospital_profile'))
@@ -1654,6 +1851,7 @@ def delete_doctor(doctor_id):
     cur.execute('DELETE FROM doctors WHERE id = ? AND hospital_id = ?', (doctor_id, hospital_id))
     conn.commit()
     conn.close()
+    hospital_index.invalidate()
 
     flash('Doctor deleted successfully.', 'success')
     return redirect(url_for('hospital_dashboard'))
@@ -1806,6 +2004,7 @@ def add_doctor():
             (hospital_id, name, email, password, specialization),
         )
         conn.commit()
+        hospital_index.invalidate()
         flash('Doctor added successfully.', 'success')
     except sqlite3.IntegrityError:
         flash('Doctor with this email already exists.', 'danger')
@@ -1815,6 +2014,35 @@ def add_doctor():
     return redirect(url_for('hospital_dashboard'))
 
 
+@app.route('/hospital/add_ambulance', methods=['POST'])
+def add_ambulance():
+    if current_role() != 'hospital':
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('index'))
+
+    hospital_id = current_user_id()
+    call_sign = request.form.get('call_sign', '').strip().upper()
+    if not call_sign:
+        flash('Call sign is required.', 'danger')
+        return redirect(url_for('hospital_dashboard'))
+
+    conn = get_db_connection()
+    hospital = conn.execute('SELECT state, district FROM hospitals WHERE id = ?', (hospital_id,)).fetchone()
+    conn.close()
+    try:
+        assignment = ambulance_allocator.add_unit(call_sign, hospital_id,
+                                                  hospital['state'] if hospital else None,
+                                                  hospital['district'] if hospital else None)
+    except sqlite3.IntegrityError:
+        flash('An ambulance with this call sign already exists.', 'danger')
+        return redirect(url_for('hospital_dashboard'))
+    if assignment:
+        flash(f'Ambulance {call_sign} added and dispatched to a waiting emergency.', 'success')
+    else:
+        flash(f'Ambulance {call_sign} added to the fleet.', 'success')
+    return redirect(url_for('hospital_dashboard'))
+
+
 # -----------------
 # Doctor auth & dashboard
 # -----------------
@@ -1824,7 +2052,9 @@ def add_doctor():
 def doctor_login():
     if request.method == 'POST':
         login_type = request.form.get('login_type', 'password')
-        print(f"[DEBUG] Doctor login - login_type: {login_type}, form data: {dict(request.form)}")
+        # Field names only: the values are passwords, OTPs, emails and phone numbers
+        debug_sampled(logger, LOG_DEBUG_SAMPLE_RATE, 'Doctor login attempt',
+                      extra={'login_type': login_type, 'fields': sorted(request.form)})
         
         if login_type == 'otp':
             # OTP login
@@ -2054,6 +2284,7 @@ def doctor_profile():
                 WHERE id = ?
             ''', (name, email, phone, specialization, doctor_id))
             conn.commit()
+            hospital_index.invalidate()
             flash('Profile updated successfully', 'success')
             conn.close()
             return redirect(url_for('doctor_profile'))
@@ -2231,6 +2462,86 @@ def doctor_patient_export_csv(user_id):
     return response
 
 
+def deliver_ai_emergency(message_id, payload):
+    """
+    Outbox handler for add_record: create the record's emergency, request an
+    ambulance and alert the treating hospital. Safe to run again for the same
+    message: the emergency is keyed on its record, and requesting a unit for
+    an emergency that already has one changes nothing.
+    """
+    risk_level = payload['risk_level']
+    requested_at = payload['requested_at']
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        # Route from the treating doctor's hospital
+        cur.execute('''SELECT h.id, h.state, h.district FROM doctors d JOIN hospitals h ON h.id = d.hospital_id
+                       WHERE d.id = ?''', (payload['doctor_id'],))
+        treating_hospital = cur.fetchone()
+        state = treating_hospital['state'] if treating_hospital else None
+        point = locate(state, treating_hospital['district']) if treating_hospital else None
+        existing = cur.execute('SELECT id FROM emergencies WHERE record_id = ?', (payload['record_id'],)).fetchone()
+        if existing:
+            emergency_id = existing['id']
+            logger.info('Outbox message %s redelivered; emergency %s already exists', message_id, emergency_id)
+        else:
+            user_data = cur.execute('SELECT name, phone, address FROM users WHERE id = ?',
+                                    (payload['user_id'],)).fetchone()
+            patient_location = (user_data and user_data['address']) or 'Location not specified'
+            cur.execute(
+                '''INSERT INTO emergencies (user_id, name, phone, location, status, requested_at, response_time_minutes,
+                                            model_version, status_code, priority, state, district, hospital_id,
+                                            record_id)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (
+                    payload['user_id'],
+                    (user_data and user_data['name']) or 'Patient',
+                    (user_data and user_data['phone']) or 'Not provided',
+                    f"{patient_location} (Auto-triggered by AI Risk Assessment)",
+                    pending_status_text(risk_level),
+                    requested_at,
+                    10,  # Faster response for AI-detected emergencies
+                    payload['model_version'],
+                    PENDING,
+                    risk_level,
+                    state,
+                    treating_hospital['district'] if treating_hospital else None,
+                    treating_hospital['id'] if treating_hospital else None,
+                    payload['record_id'],
+                ),
+            )
+            emergency_id = cur.lastrowid
+            requested_when = datetime.fromisoformat(requested_at)
+            demand_forecaster.record(conn, state, None, None, None, requested_when)
+            ambulance_analytics.record_planned(conn, state, risk_level, 10, requested_when)
+            conn.commit()
+            dispatch_state.opened(PENDING)
+            ambulance_analytics.invalidate()
+            EMERGENCIES.inc(risk_level, 'ai')
+    finally:
+        conn.close()
+    assignment = ambulance_allocator.request(emergency_id, risk_level, requested_at, state, point)
+    # Alert the treating hospital's dashboards; no patient details leave the database
+    event_bus.publish('alert', {
+        'emergency_id': emergency_id,
+        'risk_level': risk_level,
+        'risk_score': round(float(payload['risk_score']), 2),
+        'ambulance': assignment.call_sign if assignment else None,
+        'requested_at': requested_at,
+    }, hospital_id=treating_hospital['id'] if treating_hospital else None)
+    publish_dispatch_counts()
+
+
+# Runs follow-up work committed with a request, at least once, in the background of each worker (see outbox.py)
+outbox_dispatcher = OutboxDispatcher(lambda: get_db_connection(), {'ai_emergency': deliver_ai_emergency},
+                                     poll_interval=OUTBOX_POLL_SECONDS)
+
+
+@app.before_request
+def _start_outbox_dispatcher():
+    outbox_dispatcher.start()
+
+
 @app.route('/doctor/add_record/<int:user_id>', methods=['POST'])
 def add_record(user_id):
     if current_role() != 'doctor':
@@ -2286,13 +2597,15 @@ def add_record(user_id):
     if blood_report_file and blood_report_file.filename:
         blood_report_filename = f"blood_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{blood_report_file.filename}"
         blood_report_path = os.path.join(app.config['UPLOAD_FOLDER'], blood_report_filename)
-        blood_report_file.save(blood_report_path)
+        with tracing.span('file.save', kind='blood_report'):
+            blood_report_file.save(blood_report_path)
 
     prescription_filename = None
     if prescription_file and prescription_file.filename:
         prescription_filename = f"presc_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{prescription_file.filename}"
         prescription_path = os.path.join(app.config['UPLOAD_FOLDER'], prescription_filename)
-        prescription_file.save(prescription_path)
+        with tracing.span('file.save', kind='prescription'):
+            prescription_file.save(prescription_path)
 
     conn = get_db_connection()
     cur = conn.cursor()
@@ -2320,6 +2633,7 @@ def add_record(user_id):
     risk_level, risk_score, should_trigger_emergency = predict_health_risk(
         user_data, symptoms, diagnosis, treatment_status, medicines, health_metrics
     )
+    model_version = last_model_version()
     
     # Insert medical record with risk prediction and health metrics
     # Note: report_filename is kept for backward compatibility, using blood_report_filename value
@@ -2328,8 +2642,9 @@ def add_record(user_id):
            (user_id, doctor_id, date, symptoms, diagnosis, medicines, dosage, treatment_status,
             consultation_duration, prescription_text, prescription_filename, blood_report_filename,
             report_filename, created_at, risk_level, risk_score,
-            systolic_bp, diastolic_bp, bmi, cholesterol, glucose, smoking, alcohol, physical_activity, family_history)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            systolic_bp, diastolic_bp, bmi, cholesterol, glucose, smoking, alcohol, physical_activity, family_history,
+            model_version)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
         (
             user_id,
             doctor_id,
@@ -2356,48 +2671,30 @@ def add_record(user_id):
             alcohol,
             physical_activity,
             family_history,
+            model_version,
         ),
     )
-    conn.commit()
-    
-    # If high risk predicted, automatically create emergency record
-    emergency_created = False
+    # High risk: the emergency is created by the outbox dispatcher, from a message saved with the record
+    emergency_queued = False
     if should_trigger_emergency and user_data:
-        try:
-            # Get patient location (use address or default)
-            # Handle both dict and Row objects
-            if hasattr(user_data, 'get'):
-                patient_location = user_data.get('address', 'Location not specified')
-                patient_name = user_data.get('name', 'Patient')
-                patient_phone = user_data.get('phone', 'Not provided')
-            else:
-                patient_location = user_data['address'] if 'address' in user_data.keys() and user_data['address'] else 'Location not specified'
-                patient_name = user_data['name'] if 'name' in user_data.keys() and user_data['name'] else 'Patient'
-                patient_phone = user_data['phone'] if 'phone' in user_data.keys() and user_data['phone'] else 'Not provided'
-            
-            cur.execute(
-                '''INSERT INTO emergencies (user_id, name, phone, location, status, requested_at, response_time_minutes)
-                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                (
-                    user_id,
-                    patient_name,
-                    patient_phone,
-                    f"{patient_location} (Auto-triggered by AI Risk Assessment)",
-                    'Ambulance Dispatched',
-                    datetime.utcnow().isoformat(),
-                    10,  # Faster response for AI-detected emergencies
-                ),
-            )
-            conn.commit()
-            emergency_created = True
-        except Exception as e:
-            print(f"Error creating emergency record: {e}")
-    
+        enqueue(conn, 'ai_emergency', {
+            'record_id': cur.lastrowid,
+            'user_id': user_id,
+            'doctor_id': doctor_id,
+            'risk_level': risk_level,
+            'risk_score': risk_score,
+            'model_version': model_version,
+            'requested_at': datetime.utcnow().isoformat(),
+        })
+        emergency_queued = True
+    conn.commit()
     conn.close()
+    if emergency_queued:
+        outbox_dispatcher.notify()
     
     # Flash messages based on risk assessment
-    if emergency_created:
-        flash(f'⚠️ HIGH RISK DETECTED! Record added. Emergency ambulance automatically dispatched. Risk Level: {risk_level} (Score: {risk_score:.2f})', 'danger')
+    if emergency_queued:
+        flash(f'⚠️ HIGH RISK DETECTED! Record added. Emergency ambulance is being dispatched automatically. Risk Level: {risk_level} (Score: {risk_score:.2f})', 'danger')
     elif risk_level:
         if risk_level in ['High', 'Critical']:
             flash(f'⚠️ Record added. High risk detected (Level: {risk_level}, Score: {risk_score:.2f}). Please monitor patient closely.', 'warning')
@@ -2457,7 +2754,9 @@ def user_register():
 def user_login():
     if request.method == 'POST':
         login_type = request.form.get('login_type', 'password')
-        print(f"[DEBUG] User login - login_type: {login_type}, form data: {dict(request.form)}")
+        # Field names only: the values are passwords, OTPs, emails and phone numbers
+        debug_sampled(logger, LOG_DEBUG_SAMPLE_RATE, 'User login attempt',
+                      extra={'login_type': login_type, 'fields': sorted(request.form)})
         
         if login_type == 'otp':
             # OTP login
@@ -2968,6 +3267,8 @@ def hospital_patient_export_csv(user_id):
 
 
 @app.route('/emergency', methods=['GET', 'POST'])
+@intake_controlled  # Outermost: requests are ranked and admitted before the submission guard touches the DB
+@idempotent_submission
 def emergency():
     user_id = current_user_id() if current_role() == 'user' else None
 
@@ -2986,6 +3287,13 @@ def emergency():
         time_slot = request.form.get('time_slot')
         emergency_type = request.form.get('emergency_type')
         weather = request.form.get('weather')
+        district = request.form.get('district') or None
+        
+        # Device coordinates when shared, else the district or state from the gazetteer
+        point = parse_coordinates(request.form.get('latitude'), request.form.get('longitude')) or \
+            locate(state, district)
+        nearest_hospitals = hospital_index.nearest(point, emergency_type) if point else []
+        hospital = nearest_hospitals[0] if nearest_hospitals else None
         
         # Auto-detect day if not provided
         if not day:
@@ -3028,6 +3336,8 @@ def emergency():
             weather=weather,
             user_data=user_data
         )
+        model_version = last_model_version()
+        emergency_probabilities = last_emergency_probabilities()
 
         # Calculate response time based on priority
         response_time_map = {
@@ -3038,29 +3348,26 @@ def emergency():
         }
         response_time = response_time_map.get(priority, 15)
 
-        # Determine status based on priority
-        status_map = {
-            'Critical': 'Ambulance Dispatched - Critical Priority',
-            'High': 'Ambulance Dispatched - High Priority',
-            'Medium': 'Ambulance Dispatched - Medium Priority',
-            'Low': 'Ambulance Dispatched - Low Priority'
-        }
-        status = status_map.get(priority, 'Ambulance Dispatched')
+        # Stored as Pending; the allocator dispatches a unit below or queues the request
+        status = pending_status_text(priority)
+        requested_when = datetime.utcnow()
+        requested_at = requested_when.isoformat()
 
         conn = get_db_connection()
         cur = conn.cursor()
         cur.execute(
             '''INSERT INTO emergencies (user_id, name, phone, location, status, requested_at, 
                response_time_minutes, priority, severity, prediction_score, symptoms, age,
-               state, zone, day, time_slot, emergency_type, weather)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+               state, zone, day, time_slot, emergency_type, weather, model_version, status_code,
+               district, latitude, longitude, hospital_id)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
             (
                 user_id,
                 name,
                 phone,
                 location,
                 status,
-                datetime.utcnow().isoformat(),
+                requested_at,
                 response_time,
                 priority,
                 severity,
@@ -3072,132 +3379,50 @@ def emergency():
                 day,
                 time_slot,
                 emergency_type,
-                weather
+                weather,
+                model_version,
+                PENDING,
+                district,
+                point[0] if point else None,
+                point[1] if point else None,
+                hospital['id'] if hospital else None,
             ),
         )
+        demand_forecaster.record(conn, state, zone, day, time_slot, requested_when)
+        ambulance_analytics.record_planned(conn, state, priority, response_time, requested_when)
         conn.commit()
+        dispatch_state.opened(PENDING)
+        ambulance_analytics.invalidate()
+        EMERGENCIES.inc(priority, 'form')
 
         # Get emergency ID for result page
         emergency_id = cur.lastrowid
-
-        # Calculate active requests (pending emergencies, excluding current one)
-        cur.execute('SELECT COUNT(*) AS c FROM emergencies WHERE id != ? AND status LIKE ?', 
-                   (emergency_id, '%Dispatched%'))
-        active_requests = cur.fetchone()['c']
-        
-        # Calculate available ambulances (simulated: total ambulances - active requests)
-        # In a real system, this would come from ambulance tracking system
-        total_ambulances = 10  # Simulated total ambulances
-        available_ambulances = max(0, total_ambulances - active_requests - 1)  # -1 for current dispatch
-        
-        # Get prediction probabilities for all classes
+        g.emergency_id = emergency_id
+
+        # Assign the closest free unit (same state without a location), or queue the request by priority
+        assignment = ambulance_allocator.request(emergency_id, priority, requested_at, state, point)
+        event_bus.publish('emergency', {
+            'emergency_id': emergency_id,
+            'priority': priority,
+            'emergency_type': emergency_type,
+            'state': state,
+            'district': district,
+            'ambulance': assignment.call_sign if assignment else None,
+            'requested_at': requested_at,
+        }, hospital_id=hospital['id'] if hospital else None)
+        publish_dispatch_counts()
+
+        # Active requests (not yet closed), excluding the current one
+        active_requests = max(0, dispatch_state.active_count() - 1)
+        available_ambulances = ambulance_allocator.available_count()
+        queued_requests = dispatch_state.counts()['Pending']
+        
+        # Prediction probabilities for all classes, as computed by predict_emergency_priority
         prediction_probabilities = {}
-        if emergency_model and hasattr(emergency_model, 'predict_proba'):
-            try:
-                # Re-extract features for probability calculation
-                symptom_text = str(symptoms).lower() if symptoms else ''
-                age_normalized = (age / 100.0) if age else 0.5
-                
-                # Symptom severity
-                critical_keywords = ['chest pain', 'difficulty breathing', 'unconscious', 'severe', 'emergency', 
-                                    'critical', 'heart attack', 'stroke', 'bleeding', 'trauma', 'accident']
-                high_keywords = ['pain', 'fever', 'vomiting', 'dizziness', 'nausea', 'weakness']
-                moderate_keywords = ['discomfort', 'mild', 'ache', 'tired']
-                
-                symptom_severity = 0.0
-                if any(keyword in symptom_text for keyword in critical_keywords):
-                    symptom_severity = 1.0
-                elif any(keyword in symptom_text for keyword in high_keywords):
-                    symptom_severity = 0.7
-                elif any(keyword in symptom_text for keyword in moderate_keywords):
-                    symptom_severity = 0.4
-                else:
-                    symptom_severity = 0.2
-                
-                # Build features (same as in predict_emergency_priority)
-                states_list = ['All India', 'Uttar Pradesh', 'Maharashtra', 'West Bengal', 'Jharkhand',
-                               'Madhya Pradesh', 'Bihar', 'Rajasthan', 'Tamil Nadu', 'Orissa', 'Assam',
-                               'Karnataka', 'Andhra Pradesh', 'Haryana', 'Chhatisgarh', 'Jammu and Kashmir',
-                               'Telangana', 'Uttarakhand', 'Himachal Pradesh', 'Gujarat', 'Kerala',
-                               'Arunachal Pradesh', 'Delhi', 'Nagaland', 'Mizoram', 'Meghalaya',
-                               'Tripura', 'Manipur', 'Goa', 'Andaman and Nicobar Island', 'Ladakh',
-                               'Sikkim', 'Puducherry', 'Dadra and Nagar Haveli and Daman and Diu', 'Chandigarh']
-                zone_options = ['Urban', 'Rural', 'Highway']
-                day_options = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-                time_slot_options = ['Morning', 'Afternoon', 'Evening', 'Night']
-                emergency_type_options = ['EMS', 'Traffic', 'Fire']
-                weather_options = ['Rain', 'Heatwave', 'Fog', 'Clear']
-                
-                features_list = [age_normalized, symptom_severity]
-                
-                # State one-hot
-                state_onehot = [0] * len(states_list)
-                if state and state in states_list:
-                    state_onehot[states_list.index(state)] = 1
-                features_list.extend(state_onehot)
-                
-                # Zone one-hot
-                zone_onehot = [0] * len(zone_options)
-                if zone and zone in zone_options:
-                    zone_onehot[zone_options.index(zone)] = 1
-                features_list.extend(zone_onehot)
-                
-                # Day one-hot
-                day_onehot = [0] * len(day_options)
-                if day and day in day_options:
-                    day_onehot[day_options.index(day)] = 1
-                features_list.extend(day_onehot)
-                
-                # Time slot one-hot
-                time_slot_onehot = [0] * len(time_slot_options)
-                if time_slot and time_slot in time_slot_options:
-                    time_slot_onehot[time_slot_options.index(time_slot)] = 1
-                features_list.extend(time_slot_onehot)
-                
-                # Emergency type one-hot
-                emergency_type_onehot = [0] * len(emergency_type_options)
-                if emergency_type and emergency_type in emergency_type_options:
-                    emergency_type_onehot[emergency_type_options.index(emergency_type)] = 1
-                features_list.extend(emergency_type_onehot)
-                
-                # Weather one-hot
-                weather_onehot = [0] * len(weather_options)
-                if weather and weather in weather_options:
-                    weather_onehot[weather_options.index(weather)] = 1
-                features_list.extend(weather_onehot)
-                
-                # Truncate to model's expected features
-                n_features = emergency_model.n_features_in_
-                if len(features_list) > n_features:
-                    features_list = features_list[:n_features]
-                elif len(features_list) < n_features:
-                    features_list = features_list + [0.0] * (n_features - len(features_list))
-                
-                features = np.array([features_list])
-                
-                # Get probabilities
-                with warnings.catch_warnings():
-                    warnings.filterwarnings('ignore', category=UserWarning)
-                    probabilities = emergency_model.predict_proba(features)[0]
-                    classes = emergency_model.classes_
-                    
-                    # Map probabilities to priority levels
-                    for i, class_name in enumerate(classes):
-                        if class_name == 'Low':
-                            prediction_probabilities['Low'] = float(probabilities[i]) * 100
-                        elif class_name == 'Medium':
-                            prediction_probabilities['Medium'] = float(probabilities[i]) * 100
-                        elif class_name == 'High':
-                            prediction_probabilities['High'] = float(probabilities[i]) * 100
-            except Exception as e:
-                print(f"[WARNING] Could not get prediction probabilities: {e}")
-                # Fallback probabilities
-                if priority == 'Low':
-                    prediction_probabilities = {'Low': 75.0, 'Medium': 20.0, 'High': 5.0}
-                elif priority == 'Medium':
-                    prediction_probabilities = {'Low': 20.0, 'Medium': 60.0, 'High': 20.0}
-                else:
-                    prediction_probabilities = {'Low': 10.0, 'Medium': 30.0, 'High': 60.0}
+        if emergency_probabilities:
+            for class_name in ('Low', 'Medium', 'High'):
+                if class_name in emergency_probabilities:
+                    prediction_probabilities[class_name] = float(emergency_probabilities[class_name]) * 100
         else:
             # Fallback probabilities
             if priority == 'Low':
@@ -3207,45 +3432,14 @@ def emergency():
             else:
                 prediction_probabilities = {'Low': 10.0, 'Medium': 30.0, 'High': 60.0}
         
-        # Calculate area demand forecast
-        demand_factors = []
-        if day and day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']:
-            demand_factors.append('Weekday')
-        if time_slot in ['Morning', 'Afternoon']:
-            demand_factors.append(f'{time_slot.lower()} time slot')
-        if weather == 'Clear':
-            demand_factors.append('Clear weather conditions')
-        elif weather in ['Rain', 'Fog']:
-            demand_factors.append(f'{weather.lower()} conditions')
-        
-        # Historical frequency (simulated)
-        cur.execute('SELECT COUNT(*) AS c FROM emergencies WHERE state = ?', (state or 'All India',))
-        historical_count = cur.fetchone()['c']
-        if historical_count < 5:
-            demand_factors.append('Low historical emergency frequency')
-        elif historical_count < 20:
-            demand_factors.append('Moderate historical emergency frequency')
-        else:
-            demand_factors.append('High historical emergency frequency')
-        
-        if available_ambulances >= 3:
-            demand_factors.append('Adequate ambulance availability')
-        else:
-            demand_factors.append('Limited ambulance availability')
-        
-        # Determine demand level
-        if available_ambulances >= 4 and historical_count < 10:
-            demand_level = 'LOW'
-        elif available_ambulances >= 2 and historical_count < 20:
-            demand_level = 'MEDIUM'
-        else:
-            demand_level = 'HIGH'
+        # Area demand forecast from the rollup's smoothed call rates (the current week is not part of it)
+        demand = demand_forecaster.forecast(conn, state, zone, day, time_slot, requested_when, available_ambulances)
+        demand_level = demand['level']
+        demand_factors = demand['factors']
         
         # Determine life threat risk
         symptom_text = str(symptoms).lower() if symptoms else ''
-        life_threat_keywords = ['chest pain', 'heart attack', 'stroke', 'unconscious', 'bleeding', 
-                               'difficulty breathing', 'trauma', 'accident', 'severe']
-        life_threat_risk = 'Yes' if any(keyword in symptom_text for keyword in life_threat_keywords) else 'No'
+        life_threat_risk = 'Yes' if any(keyword in symptom_text for keyword in LIFE_THREAT_KEYWORDS) else 'No'
         
         # Determine dispatch type
         dispatch_type_map = {
@@ -3275,10 +3469,6 @@ def emergency():
         else:
             decision_logic.append(f'{active_requests} other active emergency requests')
         
-        # Simple analytics: total emergencies, avg response time
-        cur.execute('SELECT COUNT(*) AS c, AVG(response_time_minutes) AS avg_rt FROM emergencies')
-        stats = cur.fetchone()
-
         # Get the emergency record with predictions
         cur.execute('SELECT * FROM emergencies WHERE id = ?', (emergency_id,))
         emergency_record = cur.fetchone()
@@ -3287,7 +3477,6 @@ def emergency():
 
         flash(f'Emergency request submitted. Ambulance is on the way! Priority: {priority}', 'success')
         return render_template('emergency_result.html', 
-                             stats=stats, 
                              emergency=emergency_record,
                              priority=priority,
                              severity=severity,
@@ -3305,9 +3494,12 @@ def emergency():
                              dispatch_type=dispatch_type,
                              decision_logic=decision_logic,
                              prediction_probabilities=prediction_probabilities,
-                             response_time=response_time)
+                             response_time=response_time,
+                             assignment=assignment,
+                             queued_requests=queued_requests,
+                             hospital=hospital)
 
-    return render_template('emergency.html')
+    return render_template('emergency.html', idempotency_key=uuid.uuid4().hex)
 
 
 # -------------
@@ -3315,17 +3507,215 @@ def emergency():
 # -------------
 
 
-@app.route('/analytics/ambulance')
-def ambulance_analytics():
+def admin_authorized():
+    """Admin endpoints need the ADMIN_TOKEN in an X-Admin-Token header; no token configured, no access."""
+    supplied = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+
+@app.route('/admin/model_drift')
+def admin_model_drift():
+    """
+    Live feature and prediction distributions of each model version, merged
+    across workers, next to its training-time reference with PSI/KL scores.
+    ?health_risk_version= / ?emergency_version= select an older version.
+    """
+    if not admin_authorized():
+        return {'error': 'Unauthorized'}, 403
+    if drift_monitor is None:
+        return {'error': 'Drift monitoring is disabled (DRIFT_PUBLISH_INTERVAL=0)'}, 404
+    drift_monitor.publish()  # Include this worker's latest rows
+
+    models = {}
+    for name in ('health_risk', 'emergency'):
+        loaded = model_registry.get(name)
+        version = request.args.get(f'{name}_version') or (loaded.version if loaded else 'rule-based')
+        observed, workers = load_merged_sketch(DB_PATH, name, version)
+        if name == 'health_risk':
+            feature_names = featurizer.HEALTH_FEATURE_NAMES
+        else:
+            feature_names = loaded.metadata['feature_names'] if loaded else None
+
+        reference, reference_source = None, None
+        stored = loaded.metadata.get('reference_stats') if loaded else None
+        if stored:
+            reference, reference_source = FeatureSketch.from_dict(stored), 'artifact'
+        elif feature_names:
+            reference, reference_source = synthetic_reference(name, tuple(feature_names)), 'synthetic'
+        models[name] = {'version': version, 'workers': workers, 'reference_source': reference_source,
+                        **drift_report(observed, reference)}
+    return {'models': models, 'registry': model_registry.status()}
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """
+    Prometheus text exposition of every worker's metrics. Needs the admin
+    token, as an X-Admin-Token header or an Authorization: Bearer header.
+    """
+    bearer = request.headers.get('Authorization', '')
+    if not admin_authorized() and not (
+            ADMIN_TOKEN and bearer.startswith('Bearer ')
+            and hmac.compare_digest(bearer[7:].encode(), ADMIN_TOKEN.encode())):
+        return {'error': 'Unauthorized'}, 403
+    return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/admin/sql_profile')
+def admin_sql_profile():
+    """
+    SQL statements per route, the costliest statements and recent slow
+    queries with their plans, merged across workers. ?top= limits the lists.
+    """
+    if not admin_authorized():
+        return {'error': 'Unauthorized'}, 403
+    if sql_profiler is None:
+        return {'error': 'SQL profiling is disabled (SQL_PROFILING=False)'}, 404
+    sql_profiler.publish()  # Include this worker's latest totals
+    report, workers = load_report(lambda: sqlite3.connect(DB_PATH), top=request.args.get('top', 50, type=int))
+    return {'workers': workers, 'slow_query_ms': sql_profiler.slow_query_ms,
+            'repeat_threshold': sql_profiler.repeat_threshold, **report}
+
+
+@app.route('/admin/startup')
+def admin_startup():
+    """Startup phases of the worker serving this request: time, RSS and modules imported in each."""
+    if not admin_authorized():
+        return {'error': 'Unauthorized'}, 403
+    return {'pid': os.getpid(), 'rss_mb': round(startup_rss_mb(), 1), 'warm_up_done': startup_profile.warm_up_done,
+            'phases': startup_profile.report()}
+
+
+def emergency_hospitals(emergency_id):
+    """Hospitals responsible for an emergency (routed to it, or basing its ambulance); None if there is no such id."""
     conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute('SELECT COUNT(*) AS c, AVG(response_time_minutes) AS avg_rt FROM emergencies')
-    stats = cur.fetchone()
-    conn.close()
-    return {
-        'total_emergencies': stats['c'] if stats else 0,
-        'avg_response_time': round(stats['avg_rt'], 1) if stats and stats['avg_rt'] else None,
+    try:
+        row = conn.execute('''SELECT e.hospital_id, a.base_hospital_id FROM emergencies e
+                              LEFT JOIN ambulances a ON a.id = e.ambulance_id WHERE e.id = ?''',
+                           (emergency_id,)).fetchone()
+    finally:
+        conn.close()
+    return None if row is None else {hospital_id for hospital_id in row if hospital_id is not None}
+
+
+@app.route('/emergency/<int:emergency_id>/status', methods=['POST'])
+def update_emergency_status(emergency_id):
+    """
+    Advance an emergency along Dispatched -> En Route -> Arrived -> Closed.
+    Admins may move any emergency; a hospital only those routed to it or served by one of its ambulances.
+    """
+    is_admin = admin_authorized()
+    if current_role() != 'hospital' and not is_admin:
+        return {'error': 'Unauthorized'}, 403
+    try:
+        status_code = parse_dispatch_status(request.form.get('status', ''))
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    if not is_admin:
+        hospitals = emergency_hospitals(emergency_id)
+        if hospitals is None:
+            return {'error': f'emergency {emergency_id} not found'}, 404
+        if current_user_id() not in hospitals:
+            logger.warning('Hospital %s refused a status change on emergency %s', current_user_id(), emergency_id)
+            return {'error': 'Unauthorized'}, 403
+    def record_arrival(conn, old_code, new_code, when):
+        if new_code == ARRIVED:
+            ambulance_analytics.record_arrival(conn, emergency_id, when)
+
+    try:
+        previous = dispatch_state.advance(emergency_id, status_code, before_commit=record_arrival)
+    except LookupError as e:
+        return {'error': str(e)}, 404
+    except InvalidTransition as e:
+        return {'error': str(e)}, 409
+    if status_code == ARRIVED:
+        ambulance_analytics.invalidate()
+    response = {
+        'id': emergency_id,
+        'status': DISPATCH_STATUS_LABELS[status_code],
+        'previous_status': DISPATCH_STATUS_LABELS.get(previous),
     }
+    if status_code == CLOSED:
+        # The freed unit goes straight to the most urgent waiting emergency
+        next_assignment = ambulance_allocator.release(emergency_id)
+        if next_assignment:
+            response['ambulance_reassigned'] = next_assignment._asdict()
+    publish_dispatch_counts()
+    return response
+
+
+@app.route('/events')
+def event_stream():
+    """
+    Server-sent events for the signed-in hospital: 'emergency' (new requests
+    routed to it or unrouted), 'alert' (AI-triggered emergencies of its
+    doctors) and 'counts' (active and available counts). Reconnects with
+    Last-Event-ID get the events they missed.
+    """
+    if current_role() != 'hospital':
+        return {'error': 'Unauthorized'}, 403
+    hospital_id = current_user_id()
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    subscription = event_bus.subscribe(hospital_id)
+
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            delivered = 0
+            if last_event_id.isdigit():
+                for event in event_bus.replay(int(last_event_id), hospital_id):
+                    delivered = event.id
+                    yield format_event(event)
+            while not subscription.lost:
+                events = subscription.wait(EVENT_HEARTBEAT_SECONDS)
+                if not events and not subscription.lost:
+                    yield ': keep-alive\n\n'  # Lets proxies and the server notice closed connections
+                for event in events:
+                    if event.id > delivered:
+                        yield format_event(event)
+            # Fell behind: end the stream, the browser reconnects with Last-Event-ID and catches up
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/analytics/ambulance', endpoint='ambulance_analytics')
+def ambulance_analytics_view():
+    """
+    Response-time counts, averages and p50/p90/p99 (minutes) for the last
+    hour, day and week and all time, from the running aggregates.
+    ?state= and ?priority= narrow them down. Answered with 304 while the
+    ETag still matches.
+    """
+    state = request.args.get('state') or None
+    priority = request.args.get('priority') or None
+    active_by_status = dispatch_state.counts()
+    available = ambulance_allocator.available_count()
+    # Everything in the body changes with one of these, so a match needs no database access
+    version = (ambulance_analytics.generation(), int(time.time()) // 300, state, priority,
+               tuple(active_by_status.values()), available)
+    etag = hashlib.sha1(repr(version).encode()).hexdigest()[:20]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        report = ambulance_analytics.report(state, priority)
+        overall = report['planned']['all']
+        response = app.make_response({
+            'total_emergencies': overall['count'],
+            'avg_response_time': overall['avg'],
+            'response_times': report,
+            'active_by_status': active_by_status,
+            'available_ambulances': available,
+        })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+startup_profile.mark('routes and services')
+print(f"[INFO] Startup: {startup_profile.summary()}")
 
 
 if __name__ == '__main__':
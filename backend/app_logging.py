@@ -0,0 +1,164 @@
+"""
+Structured JSON logs written by a background listener.
+
+configure() puts a single QueueHandler on the root logger. A request
+handler only builds the record and puts it on a bounded queue. A
+QueueListener thread formats each record as one JSON line and writes it to
+stdout. When the queue is full, records are dropped and counted instead of
+making the request wait.
+
+LOG_LEVEL takes a root level and optional per-logger levels:
+    LOG_LEVEL=INFO,sql_profiler=DEBUG,model_registry=WARNING
+
+Hot paths log their debug lines through debug_sampled(), which checks the
+level first and then keeps only a fraction of the records.
+
+Nothing sensitive reaches the output. Extra fields named like a password,
+OTP, phone or email are replaced by "[redacted]". The formatter also masks
+email addresses and runs of six or more digits (phone numbers, OTP codes)
+in messages and tracebacks.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+QUEUE_SIZE = 10000
+SENSITIVE_FIELDS = frozenset({'password', 'new_password', 'confirm_password', 'otp', 'otp_code', 'code',
+                              'phone', 'email', 'identifier', 'aadhaar'})
+REDACTED = '[redacted]'
+_EMAIL = re.compile(r'[\w.+-]+@[\w-]+(\.[\w-]+)+')
+_LONG_NUMBER = re.compile(r'(?<![\w.])\+?\d{6,}\b')
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def scrub(text):
+    """Mask email addresses and long digit runs (phone numbers, OTP codes)."""
+    return _LONG_NUMBER.sub(REDACTED, _EMAIL.sub(REDACTED, text))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, message, extra fields and exc."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': scrub(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = REDACTED if key.lower() in SENSITIVE_FIELDS else value
+        if record.exc_text:
+            entry['exc'] = scrub(record.exc_text)
+        elif record.exc_info:
+            entry['exc'] = scrub(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at the time (test runners swap it)."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room: the queue may be full when stop() is called
+        self.queue.put(self._sentinel)
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """QueueHandler whose listener thread is started in (and belongs to) the process that logs."""
+
+    def __init__(self, stream=None, queue_size=QUEUE_SIZE):
+        super().__init__(queue.Queue(queue_size))
+        self.stream = stream
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.listener = None
+        self._listener_pid = None
+
+    def _start_listener(self):
+        # gunicorn forks after preload: each worker gets a fresh queue and its own writer thread
+        self.queue = queue.Queue(self.queue_size)
+        output = logging.StreamHandler(self.stream) if self.stream is not None else _StdoutHandler()
+        output.setFormatter(JsonFormatter())
+        self.listener = _Listener(self.queue, output)
+        self.listener.start()
+        self._listener_pid = os.getpid()
+        atexit.register(self.stop)
+
+    def prepare(self, record):
+        # Merge the arguments now (they may change later) but leave formatting to the listener
+        record = logging.makeLogRecord(vars(record))
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._listener_pid != os.getpid():
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Write out what is queued (at exit)."""
+        if self.listener is not None and self._listener_pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self._listener_pid = None
+
+
+def parse_levels(spec):
+    """'INFO,sql_profiler=DEBUG' -> ('INFO', {'sql_profiler': 'DEBUG'})."""
+    root, levels = 'INFO', {}
+    for item in filter(None, (part.strip() for part in str(spec or '').split(','))):
+        name, _, level = item.rpartition('=')
+        if level.upper() not in logging.getLevelNamesMapping():
+            raise ValueError(f'unknown log level {level!r} in LOG_LEVEL')
+        if name:
+            levels[name.strip()] = level.upper()
+        else:
+            root = level.upper()
+    return root, levels
+
+
+def configure(level_spec='INFO', stream=None, queue_size=QUEUE_SIZE):
+    """Route all logging through one background JSON writer; returns the handler."""
+    root_level, levels = parse_levels(level_spec)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, BackgroundQueueHandler):
+            handler.stop()
+            root.removeHandler(handler)
+    handler = BackgroundQueueHandler(stream, queue_size)
+    root.addHandler(handler)
+    root.setLevel(root_level)
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+    return handler
+
+
+def debug_sampled(logger, rate, msg, *args, **kwargs):
+    """logger.debug() for a random fraction `rate` of calls; nearly free when DEBUG is off."""
+    if logger.isEnabledFor(logging.DEBUG) and (rate >= 1 or random.random() < rate):
+        logger.debug(msg, *args, **kwargs)
@@ -0,0 +1,260 @@
+"""
+Load test for the ambulance allocator.
+
+Fires thousands of simultaneous emergency requests at AmbulanceAllocator
+from many threads, optionally in several forked processes sharing one
+allocator the way preloaded gunicorn workers do. Meanwhile requesters
+close some of their dispatched calls, which frees units for the queue.
+Afterwards every remaining call is closed one at a time, so the queue
+drains. The run then checks that:
+  - no unit is assigned to two open emergencies
+  - every dispatched emergency has a unit and every waiting one has none
+  - the queue drained in priority order (priority, then requested_at)
+  - the shared counters match the database
+It also reports request()/release() latency percentiles and throughput.
+
+    python bench_allocator.py --requests 5000 --threads 64 --fleet 50
+    python bench_allocator.py --processes 4
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ambulance_allocator import (ASSIGNED, AVAILABLE, CHANGES_TABLE_SQL, CREATE_TABLE_SQL, INDEX_SQL,
+                                 PRIORITY_RANKS, AmbulanceAllocator, pending_status_text)
+from dispatch_state import (ACTIVE_CODES, CLOSED, DISPATCHED, INDEX_SQL as DISPATCH_INDEX_SQL, PENDING,
+                            DispatchState)
+
+PRIORITIES = ['Critical', 'High', 'Medium', 'Low']
+PRIORITY_WEIGHTS = [0.1, 0.25, 0.35, 0.3]
+STATES = ['Bihar', 'Delhi', 'Kerala', 'Maharashtra', None]
+
+
+def make_db(path, fleet_size):
+    """Emergencies and ambulances tables as init_db creates them (only the columns used here)."""
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE emergencies (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        location TEXT, status TEXT, requested_at TEXT, priority TEXT, state TEXT,
+                        status_code INTEGER, status_updated_at TEXT, ambulance_id INTEGER)''')
+    conn.execute(DISPATCH_INDEX_SQL)
+    conn.execute(CREATE_TABLE_SQL)
+    for index_sql in INDEX_SQL:
+        conn.execute(index_sql)
+    conn.execute(CHANGES_TABLE_SQL)
+    conn.commit()
+    states = [STATES[i % len(STATES)] for i in range(fleet_size)]
+    conn.executemany('INSERT INTO ambulances (call_sign, state, status_code) VALUES (?, ?, ?)',
+                     [(f'AMB-{i:04d}', state, AVAILABLE) for i, state in enumerate(states, 1)])
+    conn.commit()
+    conn.close()
+
+
+def build(path):
+    connect = lambda: sqlite3.connect(path, timeout=60)
+    dispatch_state = DispatchState(connect, resync_interval=3600)
+    allocator = AmbulanceAllocator(connect, dispatch_state)
+    dispatch_state.resync()
+    allocator.refresh()
+    return dispatch_state, allocator
+
+
+def run_load(path, dispatch_state, allocator, n_requests, n_threads, close_probability, seed):
+    """Submit n_requests from n_threads threads; returns (request latencies, release latencies) in ms."""
+    clock = datetime(2026, 1, 1)
+    counter = iter(range(n_requests))
+    counter_lock = threading.Lock()
+    request_ms, release_ms = [], []
+    errors = []
+
+    def requester(thread_seed):
+        rng = random.Random(thread_seed)
+        conn = sqlite3.connect(path, timeout=60)
+        mine = []
+        try:
+            while True:
+                with counter_lock:
+                    i = next(counter, None)
+                if i is None:
+                    break
+                priority = rng.choices(PRIORITIES, PRIORITY_WEIGHTS)[0]
+                state = rng.choice(STATES)
+                requested_at = (clock + timedelta(milliseconds=rng.randrange(10 ** 7))).isoformat()
+                cur = conn.execute('INSERT INTO emergencies (location, status, requested_at, priority, state, '
+                                   'status_code) VALUES (?, ?, ?, ?, ?, ?)',
+                                   ('load test', pending_status_text(priority), requested_at, priority, state, PENDING))
+                conn.commit()
+                dispatch_state.opened(PENDING)
+                start = time.perf_counter()
+                assignment = allocator.request(cur.lastrowid, priority, requested_at, state)
+                request_ms.append((time.perf_counter() - start) * 1000.0)
+                if assignment:
+                    mine.append(assignment.emergency_id)
+                if mine and rng.random() < close_probability:
+                    emergency_id = mine.pop(rng.randrange(len(mine)))
+                    dispatch_state.advance(emergency_id, CLOSED)
+                    start = time.perf_counter()
+                    allocator.release(emergency_id)
+                    release_ms.append((time.perf_counter() - start) * 1000.0)
+        except Exception as e:
+            errors.append(repr(e))
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=requester, args=(seed * 1000 + t,)) for t in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise RuntimeError(f'{len(errors)} requester errors, first: {errors[0]}')
+    return request_ms, release_ms
+
+
+def _process_main(path, dispatch_state, allocator, n_requests, n_threads, close_probability, seed, queue):
+    try:
+        queue.put(('ok', run_load(path, dispatch_state, allocator, n_requests, n_threads, close_probability, seed)))
+    except Exception as e:
+        queue.put(('error', repr(e)))
+
+
+def drain(path, dispatch_state, allocator):
+    """Close open calls one by one until the queue is empty; returns the order waiting calls were served in."""
+    served = []
+    conn = sqlite3.connect(path, timeout=60)
+    try:
+        while True:
+            row = conn.execute('SELECT id FROM emergencies WHERE status_code = ? LIMIT 1', (DISPATCHED,)).fetchone()
+            if row is None:
+                break
+            dispatch_state.advance(row[0], CLOSED)
+            assignment = allocator.release(row[0])
+            if assignment:
+                priority, requested_at = conn.execute('SELECT priority, requested_at FROM emergencies WHERE id = ?',
+                                                      (assignment.emergency_id,)).fetchone()
+                served.append((PRIORITY_RANKS[priority], requested_at))
+    finally:
+        conn.close()
+    return served
+
+
+def verify(path, dispatch_state, allocator, served):
+    """List of invariant violations (empty when the run was consistent)."""
+    problems = []
+    conn = sqlite3.connect(path)
+    open_codes = tuple(code for code in ACTIVE_CODES if code != PENDING)
+    marks = ', '.join('?' * len(open_codes))
+    doubled = conn.execute(f'SELECT ambulance_id, COUNT(*) FROM emergencies WHERE status_code IN ({marks}) '
+                           f'GROUP BY ambulance_id HAVING COUNT(*) > 1', open_codes).fetchall()
+    if doubled:
+        problems.append(f'{len(doubled)} units assigned to more than one open emergency')
+    if conn.execute(f'SELECT COUNT(*) FROM emergencies WHERE status_code IN ({marks}) AND ambulance_id IS NULL',
+                    open_codes).fetchone()[0]:
+        problems.append('dispatched emergencies without a unit')
+    open_calls = conn.execute(f'SELECT COUNT(*) FROM emergencies WHERE status_code IN ({marks})',
+                              open_codes).fetchone()[0]
+    assigned = conn.execute('SELECT COUNT(*) FROM ambulances WHERE status_code = ?', (ASSIGNED,)).fetchone()[0]
+    if open_calls != assigned:
+        problems.append(f'{open_calls} open calls but {assigned} assigned units')
+    available = conn.execute('SELECT COUNT(*) FROM ambulances WHERE status_code = ?', (AVAILABLE,)).fetchone()[0]
+    if available != allocator.available_count():
+        problems.append(f'allocator reports {allocator.available_count()} free units, database has {available}')
+    pending = conn.execute('SELECT COUNT(*) FROM emergencies WHERE status_code = ?', (PENDING,)).fetchone()[0]
+    if pending:
+        problems.append(f'{pending} emergencies still waiting after the drain')
+    conn.close()
+    if served != sorted(served):
+        problems.append('waiting emergencies were not served in priority order')
+    counts = dispatch_state.counts()
+    dispatch_state.resync()
+    if counts != dispatch_state.counts():
+        problems.append(f'shared counters {counts} differ from the database {dispatch_state.counts()}')
+    return problems
+
+
+def run(n_requests=5000, n_threads=64, fleet_size=50, processes=1, close_probability=0.3, seed=7, db_path=None):
+    """Run the load test; returns a report dict (report['problems'] lists any invariant violations)."""
+    db_path = db_path or os.path.join(tempfile.mkdtemp(), 'allocator_load.db')
+    make_db(db_path, fleet_size)
+    dispatch_state, allocator = build(db_path)
+
+    start = time.perf_counter()
+    if processes > 1:
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        share = n_requests // processes
+        workers = [context.Process(target=_process_main,
+                                   args=(db_path, dispatch_state, allocator, share, n_threads, close_probability,
+                                         seed + p, queue))
+                   for p in range(processes)]
+        for worker in workers:
+            worker.start()
+        outcomes = [queue.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        failed = [detail for status, detail in outcomes if status != 'ok']
+        if failed:
+            raise RuntimeError(f'worker failed: {failed[0]}')
+        request_ms = [ms for _, (requests, _) in outcomes for ms in requests]
+        release_ms = [ms for _, (_, releases) in outcomes for ms in releases]
+        n_requests = share * processes
+    else:
+        request_ms, release_ms = run_load(db_path, dispatch_state, allocator, n_requests, n_threads,
+                                          close_probability, seed)
+    elapsed = time.perf_counter() - start
+
+    served = drain(db_path, dispatch_state, allocator)
+    report = {
+        'requests': n_requests,
+        'threads': n_threads,
+        'processes': processes,
+        'fleet': fleet_size,
+        'seconds': round(elapsed, 2),
+        'requests_per_second': round(n_requests / elapsed, 1),
+        'request_p50_ms': round(float(np.percentile(request_ms, 50)), 3),
+        'request_p99_ms': round(float(np.percentile(request_ms, 99)), 3),
+        'release_p50_ms': round(float(np.percentile(release_ms, 50)), 3) if release_ms else None,
+        'release_p99_ms': round(float(np.percentile(release_ms, 99)), 3) if release_ms else None,
+        'served_from_queue': len(served),
+        'problems': verify(db_path, dispatch_state, allocator, served),
+    }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=64, help='Concurrent requesters per process')
+    parser.add_argument('--processes', type=int, default=1, help='Forked workers sharing the allocator')
+    parser.add_argument('--fleet', type=int, default=50)
+    parser.add_argument('--close-probability', type=float, default=0.3,
+                        help='Chance a requester closes one of its calls after each request')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    report = run(args.requests, args.threads, args.fleet, args.processes, args.close_probability, args.seed)
+    for key, value in report.items():
+        if key != 'problems':
+            print(f"{key:>20}: {value}")
+    if report['problems']:
+        print("\n[ERROR] Allocator invariants violated:")
+        for problem in report['problems']:
+            print(f"  {problem}")
+        return 1
+    print("\n[OK] Allocation stayed consistent under load")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,402 @@
+"""
+Load test for the whole app.
+
+Seeds load-test hospitals, doctors, patients and records, then runs a
+number of virtual users for a fixed time. Each user logs in as a doctor
+and picks requests from a weighted mix:
+  login             password login (POST /doctor/login)
+  doctor_dashboard  a Health ID search on the doctor dashboard
+  add_record        a new record with vitals, scored by the risk model
+  export_csv        a patient's visit history as CSV
+  emergency         a public emergency request from a new caller
+On top of that, a burst of concurrent emergency requests arrives every few
+seconds, the way calls bunch up after an accident. The traffic goes either
+through the app's WSGI interface in this process, or over HTTP to a running
+server (gunicorn):
+
+    python bench_app.py --users 16 --duration 30
+    gunicorn -c ../gunicorn_config.py wsgi:app   # from the repository root
+    python bench_app.py --url http://127.0.0.1:5000 --users 64 --duration 60
+
+For HTTP runs, seed the database the server uses: --db defaults to the app's
+DB_PATH, which a server started from this checkout opens too. Seeded rows use
+the loadtest.example email domain and are reused by later runs.
+
+The report lists per-route throughput, p50/p95/p99 latency and status
+codes. Like bench_predictors.py, a run is compared with a JSON baseline and
+exits with 1 when a route got slower or lost throughput beyond a tolerance.
+Baselines depend on the machine and the transport, so record one per setup:
+
+    python bench_app.py --baseline wsgi.json --update-baseline
+    python bench_app.py --baseline wsgi.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gazetteer import DISTRICT_COORDINATES
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, 'bench_app_baseline.json')
+EMAIL_DOMAIN = 'loadtest.example'
+PASSWORD = 'loadtest'
+MIX = {'doctor_dashboard': 0.35, 'add_record': 0.2, 'export_csv': 0.15, 'login': 0.1, 'emergency': 0.2}
+SYMPTOMS = ['fever and cough', 'mild headache', 'chest pain', 'back ache', 'difficulty breathing',
+            'nausea and dizziness', 'patient unconscious', 'severe bleeding after a fall']
+DIAGNOSES = ['viral infection', 'hypertension', 'diabetes', 'routine checkup', 'migraine']
+MEDICINES = ['', 'paracetamol', 'metformin', 'amlodipine, atorvastatin', 'cetirizine']
+EMERGENCY_TYPES = ['EMS', 'Cardiac', 'Traffic', 'Fire', 'Maternity']
+STATES = sorted(DISTRICT_COORDINATES)
+
+Fixture = namedtuple('Fixture', 'doctors patients')  # doctor emails; (user id, health id) pairs
+
+
+def seed(conn, hospitals=4, doctors_per_hospital=3, patients=200, records_per_patient=3, seed=7):
+    """
+    Add the load-test hospitals, doctors, patients and records to an
+    initialized database, unless an earlier run already did; returns the Fixture.
+    """
+    cur = conn.cursor()
+    if cur.execute('SELECT COUNT(*) FROM doctors WHERE email LIKE ?', (f'%@{EMAIL_DOMAIN}',)).fetchone()[0] == 0:
+        rng = random.Random(seed)
+        doctor_ids = []
+        for h in range(hospitals):
+            state = STATES[h % len(STATES)]
+            district = sorted(DISTRICT_COORDINATES[state])[0]
+            cur.execute('INSERT INTO hospitals (name, reg_no, email, password, state, district) '
+                        'VALUES (?, ?, ?, ?, ?, ?)', (f'Load Test Hospital {h}', f'LT-{h:04d}',
+                                                      f'hospital{h}@{EMAIL_DOMAIN}', PASSWORD, state, district))
+            hospital_id = cur.lastrowid
+            for d in range(doctors_per_hospital):
+                cur.execute('INSERT INTO doctors (hospital_id, name, email, password, specialization) '
+                            'VALUES (?, ?, ?, ?, ?)', (hospital_id, f'Dr Load {h}-{d}',
+                                                       f'doctor{h}-{d}@{EMAIL_DOMAIN}', PASSWORD, 'General'))
+                doctor_ids.append(cur.lastrowid)
+        today = date.today()
+        for p in range(patients):
+            cur.execute('INSERT INTO users (name, email, password, phone, address, health_id, age, gender) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        (f'Patient {p}', f'patient{p}@{EMAIL_DOMAIN}', PASSWORD, f'90000{p:05d}',
+                         f'{p} Test Road', f'LT-{p:08d}', rng.randint(1, 90), rng.choice(['Male', 'Female'])))
+            user_id = cur.lastrowid
+            cur.executemany(
+                'INSERT INTO records (user_id, doctor_id, date, symptoms, diagnosis, medicines, dosage, '
+                'treatment_status, prescription_text, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(user_id, rng.choice(doctor_ids), (today - timedelta(days=rng.randint(0, 730))).isoformat(),
+                  rng.choice(SYMPTOMS), rng.choice(DIAGNOSES), rng.choice(MEDICINES), '1-0-1',
+                  rng.choice(['Recovered', 'Under Observation']), '', today.isoformat())
+                 for _ in range(records_per_patient)])
+        conn.commit()
+    doctors = [row[0] for row in cur.execute('SELECT email FROM doctors WHERE email LIKE ? ORDER BY id',
+                                              (f'%@{EMAIL_DOMAIN}',))]
+    patients = [tuple(row) for row in cur.execute('SELECT id, health_id FROM users WHERE email LIKE ? ORDER BY id',
+                                                   (f'%@{EMAIL_DOMAIN}',))]
+    return Fixture(doctors, patients)
+
+
+class WSGITransport:
+    """Requests through the Flask app's WSGI interface, in this process."""
+
+    name = 'wsgi'
+
+    def __init__(self, flask_app):
+        self._app = flask_app
+
+    def session(self):
+        client = self._app.test_client()
+
+        def send(method, path, data=None):
+            response = client.open(path, method=method, data=data, follow_redirects=True)
+            response.get_data()
+            return response.status_code
+        return send
+
+
+class HTTPTransport:
+    """Requests over HTTP to a running server."""
+
+    name = 'http'
+
+    def __init__(self, base_url, timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def session(self):
+        import requests
+        http = requests.Session()
+
+        def send(method, path, data=None):
+            return http.request(method, self.base_url + path, data=data, timeout=self.timeout).status_code
+        return send
+
+
+def _new_record(rng):
+    return {
+        'date': date.today().isoformat(),
+        'symptoms': rng.choice(SYMPTOMS),
+        'diagnosis': rng.choice(DIAGNOSES),
+        'medicines': rng.choice(MEDICINES),
+        'dosage': '1-0-1',
+        'treatment_status': rng.choice(['Under Observation', 'Stable', 'Critical']),
+        'age': str(rng.randint(18, 90)),
+        'systolic_bp': str(rng.randint(100, 190)),
+        'diastolic_bp': str(rng.randint(60, 120)),
+        'bmi': f'{rng.uniform(17, 38):.1f}',
+        'glucose': str(rng.randint(70, 250)),
+        'smoking': rng.choice(['Yes', 'No']),
+    }
+
+
+def _new_emergency(rng):
+    state = rng.choice(STATES)
+    return {
+        'name': 'Load Test Caller',
+        'phone': f'7{rng.randrange(10 ** 9):09d}',  # A new caller each time, so no request is a duplicate
+        'location': f'{rng.randint(1, 999)} Main Road',
+        'state': state,
+        'district': rng.choice(sorted(DISTRICT_COORDINATES[state])),
+        'symptoms': rng.choice(SYMPTOMS),
+        'age': str(rng.randint(1, 90)),
+        'emergency_type': rng.choice(EMERGENCY_TYPES),
+        'idempotency_key': uuid.uuid4().hex,
+    }
+
+
+def _request(route, send, rng, fixture, doctor):
+    """One request of the given route; returns its status code."""
+    if route == 'login':
+        return send('POST', '/doctor/login', {'email': doctor, 'password': PASSWORD})
+    if route == 'doctor_dashboard':
+        return send('POST', '/doctor/dashboard', {'search_health_id': rng.choice(fixture.patients)[1]})
+    if route == 'add_record':
+        return send('POST', f'/doctor/add_record/{rng.choice(fixture.patients)[0]}', _new_record(rng))
+    if route == 'export_csv':
+        return send('GET', f'/doctor/patient/{rng.choice(fixture.patients)[0]}/export/csv')
+    return send('POST', '/emergency', _new_emergency(rng))
+
+
+class _Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+
+    def timed(self, route, call):
+        start = time.perf_counter()
+        try:
+            status = call()
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.setdefault(route, []).append(elapsed)
+            self.statuses.setdefault(route, Counter())[str(status)] += 1
+
+
+def _summarize(latencies, statuses, elapsed):
+    ms = np.array(latencies) * 1000
+    errors = sum(n for status, n in statuses.items() if not status.isdigit() or int(status) >= 500)
+    return {
+        'requests': len(ms),
+        'errors': errors,
+        'statuses': dict(statuses),
+        'throughput_rps': round(len(ms) / elapsed, 2),
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2),
+        'max_ms': round(float(ms.max()), 2),
+    }
+
+
+def run(transport, fixture, users=8, duration=10.0, mix=None, burst_size=10, burst_interval=5.0, seed=11):
+    """Run the traffic for duration seconds; returns the report (meta plus per-route results)."""
+    mix = mix or MIX
+    routes, weights = list(mix), list(mix.values())
+    recorder = _Recorder()
+    begin = time.perf_counter()
+    deadline = begin + duration
+    stop = threading.Event()
+
+    def virtual_user(index):
+        rng = random.Random(seed * 1000 + index)
+        send = transport.session()
+        doctor = fixture.doctors[index % len(fixture.doctors)]
+        recorder.timed('login', lambda: _request('login', send, rng, fixture, doctor))
+        while time.perf_counter() < deadline:
+            route = rng.choices(routes, weights)[0]
+            recorder.timed(route, lambda: _request(route, send, rng, fixture, doctor))
+
+    def emergency_bursts():
+        rng = random.Random(seed)
+        while not stop.wait(burst_interval):
+            callers = [threading.Thread(target=recorder.timed, args=(
+                'emergency_burst', lambda r=random.Random(rng.random()): _request('emergency', transport.session(),
+                                                                                  r, fixture, None)))
+                       for _ in range(burst_size)]
+            for caller in callers:
+                caller.start()
+            for caller in callers:
+                caller.join()
+
+    threads = [threading.Thread(target=virtual_user, args=(i,), daemon=True) for i in range(users)]
+    burster = threading.Thread(target=emergency_bursts, daemon=True)
+    for thread in threads:
+        thread.start()
+    if burst_size and burst_interval:
+        burster.start()
+    for thread in threads:
+        thread.join()
+    stop.set()
+    if burster.is_alive():
+        burster.join()
+    elapsed = time.perf_counter() - begin
+
+    results = {route: _summarize(recorder.latencies[route], recorder.statuses[route], elapsed)
+               for route in sorted(recorder.latencies)}
+    everything = [s for route in recorder.latencies for s in recorder.latencies[route]]
+    all_statuses = sum(recorder.statuses.values(), Counter())
+    results['total'] = _summarize(everything, all_statuses, elapsed)
+    meta = {
+        'transport': transport.name,
+        'users': users,
+        'duration_s': round(elapsed, 2),
+        'mix': mix,
+        'burst_size': burst_size,
+        'burst_interval_s': burst_interval,
+        'seed': seed,
+        'doctors': len(fixture.doctors),
+        'patients': len(fixture.patients),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'revision': _revision(),
+    }
+    return {'meta': meta, 'routes': results}
+
+
+def _revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, tolerance=0.25, p99_tolerance=0.5, throughput_tolerance=0.2, min_slack_ms=2.0):
+    """
+    Regressions of results against baseline, as a list of messages.
+
+    A route regresses when its p50/p95 latency exceeds baseline * (1 +
+    tolerance) plus min_slack_ms, its p99 exceeds the looser p99_tolerance,
+    its throughput drops by more than throughput_tolerance, or it returns
+    errors the baseline did not have. Routes missing from either side are skipped.
+    """
+    regressions = []
+    for route, base in baseline.get('routes', {}).items():
+        current = results.get('routes', {}).get(route)
+        if current is None:
+            continue
+        for metric, tol in (('p50_ms', tolerance), ('p95_ms', tolerance), ('p99_ms', p99_tolerance)):
+            limit = base[metric] * (1 + tol) + min_slack_ms
+            if current[metric] > limit:
+                regressions.append(f"{route} {metric}: {current[metric]:.1f} > {limit:.1f} "
+                                   f"(baseline {base[metric]:.1f})")
+        floor = base['throughput_rps'] * (1 - throughput_tolerance)
+        if current['throughput_rps'] < floor:
+            regressions.append(f"{route} throughput_rps: {current['throughput_rps']:.1f} < {floor:.1f} "
+                               f"(baseline {base['throughput_rps']:.1f})")
+        if current['errors'] and not base['errors']:
+            regressions.append(f"{route} errors: {current['errors']} (baseline 0)")
+    return regressions
+
+
+def print_results(results, baseline=None):
+    base_routes = (baseline or {}).get('routes', {})
+    print(f"\n{'route':<18}{'requests':>9}{'errors':>7}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"  vs baseline p95  statuses")
+    for route, r in results['routes'].items():
+        base = base_routes.get(route)
+        delta = f"{(r['p95_ms'] / base['p95_ms'] - 1) * 100:+.0f}%" if base and base['p95_ms'] else '-'
+        statuses = ' '.join(f'{status}:{n}' for status, n in sorted(r['statuses'].items()))
+        print(f"{route:<18}{r['requests']:>9}{r['errors']:>7}{r['throughput_rps']:>8.1f}{r['p50_ms']:>9.1f}"
+              f"{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}  {delta:<16} {statuses}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Send the traffic over HTTP to this server instead of through WSGI')
+    parser.add_argument('--db', help='Database to seed (default: a temporary one for WSGI runs, DB_PATH for HTTP)')
+    parser.add_argument('--users', type=int, default=8, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds of traffic')
+    parser.add_argument('--burst-size', type=int, default=10, help='Emergency requests per burst (0 disables)')
+    parser.add_argument('--burst-interval', type=float, default=5.0, help='Seconds between bursts')
+    parser.add_argument('--hospitals', type=int, default=4)
+    parser.add_argument('--doctors-per-hospital', type=int, default=3)
+    parser.add_argument('--patients', type=int, default=200)
+    parser.add_argument('--records-per-patient', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='Record this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p50/p95 slowdown (0.25 = 25%%)')
+    parser.add_argument('--p99-tolerance', type=float, default=0.5, help='Allowed p99 slowdown')
+    parser.add_argument('--throughput-tolerance', type=float, default=0.2, help='Allowed throughput drop')
+    parser.add_argument('--output', help='Also write this run as JSON')
+    args = parser.parse_args(argv)
+
+    import app
+    if args.db or not args.url:
+        app.DB_PATH = args.db or os.path.join(tempfile.mkdtemp(), 'health_system.db')
+    app.init_db()
+    conn = app.get_db_connection()
+    try:
+        fixture = seed(conn, args.hospitals, args.doctors_per_hospital, args.patients, args.records_per_patient)
+    finally:
+        conn.close()
+    print(f"[OK] {len(fixture.doctors)} doctors and {len(fixture.patients)} patients ready in {app.DB_PATH}")
+
+    transport = HTTPTransport(args.url) if args.url else WSGITransport(app.app)
+    results = run(transport, fixture, args.users, args.duration, burst_size=args.burst_size,
+                  burst_interval=args.burst_interval, seed=args.seed)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline or baseline is None:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[OK] Baseline written to {args.baseline}")
+        return 0
+    base_meta = baseline.get('meta', {})
+    if (base_meta.get('transport'), base_meta.get('users')) != (transport.name, args.users):
+        print("[WARNING] Transport or user count differs from the baseline; comparing anyway")
+
+    regressions = compare(results, baseline, args.tolerance, args.p99_tolerance, args.throughput_tolerance)
+    if regressions:
+        print("\n[ERROR] Performance regressions:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print("\n[OK] No regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
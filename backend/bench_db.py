@@ -0,0 +1,337 @@
+"""
+Seeded benchmark databases at a chosen scale.
+
+build() creates a SQLite database with the app's own schema (init_db) and
+bulk-loads it with generated data:
+  hospitals    spread over the states, most in a few populous ones
+  doctors      a fixed number per hospital; caseloads are skewed, so a few
+               doctors write most of the records
+  users        patients with a unique Health ID each
+  records      lognormal visits per patient around --records-per-user, so
+               most patients have a few records and some have hundreds,
+               dated over the last --days days
+  emergencies  closed past emergencies across all states, weighted like the
+               hospitals, with more calls in the evening than at night
+  ambulances   a few units based at each hospital
+Rows come from one seeded generator, so the same parameters always give the
+same database. The load runs in one transaction with the journal off. The
+explicit indexes are dropped first and created again afterwards, and then
+the tables are analyzed. A final init_db() fills the demand and
+response-time rollups, so the app starts on the database without a rebuild.
+
+Doctors and patients use the load-test email domain and password of
+bench_app.py, so a load test runs against a copy as it is:
+
+    python bench_db.py --scale small
+    python bench_db.py --scale large              # about 2M records
+    python bench_db.py --users 20000 --records-per-user 8 --output /tmp/custom.db
+    python bench_app.py --db /tmp/copy-of-snapshot.db
+
+snapshot() returns a shared, versioned snapshot for a scale and seed, and
+builds it on first use. The file name carries the generator's
+FORMAT_VERSION and a hash of the app's schema, so a schema change gets a
+new snapshot instead of a stale one. A JSON manifest next to it records the
+parameters, row counts and build time. Benchmarks and query-plan tests
+should copy a snapshot (copy_snapshot) rather than write to it.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ambulance_allocator import AVAILABLE
+from bench_app import DIAGNOSES, EMAIL_DOMAIN, EMERGENCY_TYPES, MEDICINES, PASSWORD, SYMPTOMS
+from dispatch_state import CLOSED
+from gazetteer import DISTRICT_COORDINATES, STATE_CAPITALS
+
+FORMAT_VERSION = 1  # Raise when the generator writes different data for the same parameters
+DEFAULT_SNAPSHOT_DIR = os.environ.get('BENCH_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'swasthya-bench'))
+SCALES = {
+    'tiny': dict(hospitals=4, doctors_per_hospital=3, users=500, records_per_user=4, emergencies=1000),
+    'small': dict(hospitals=20, doctors_per_hospital=5, users=10_000, records_per_user=5, emergencies=20_000),
+    'medium': dict(hospitals=100, doctors_per_hospital=8, users=100_000, records_per_user=5, emergencies=100_000),
+    'large': dict(hospitals=400, doctors_per_hospital=10, users=400_000, records_per_user=5, emergencies=200_000),
+}
+LOADED_TABLES = ('hospitals', 'doctors', 'users', 'records', 'emergencies', 'ambulances')
+CHUNK_ROWS = 50_000
+STATES = sorted(STATE_CAPITALS)
+DISTRICTS = {state: sorted(districts) for state, districts in DISTRICT_COORDINATES.items()}
+PRIORITIES = ['Critical', 'High', 'Medium', 'Low']
+PRIORITY_WEIGHTS = [0.08, 0.22, 0.4, 0.3]
+# Share of emergency calls per hour of day, lowest before dawn and highest in the evening
+HOUR_WEIGHTS = np.array([2, 1.5, 1, 1, 1, 1.5, 2.5, 3.5, 4.5, 5, 5, 5, 5, 5, 5, 5, 5.5, 6, 6.5, 6.5, 6, 5, 4, 3])
+TREATMENT_STATUSES = ['Recovered', 'Under Observation', 'Stable', 'Critical']
+ZONES = ['Urban', 'Rural', 'Highway']
+
+
+def _skewed(rng, n, exponent):
+    """Zipf-like probabilities for n items in a seeded random order."""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def _district(state, u):
+    """The district of state at fraction u of its sorted list, or None where the gazetteer has none."""
+    districts = DISTRICTS.get(state)
+    return districts[int(u * len(districts))] if districts else None
+
+
+def _time_slot(hour):
+    if 6 <= hour < 12:
+        return 'Morning'
+    if 12 <= hour < 17:
+        return 'Afternoon'
+    if 17 <= hour < 21:
+        return 'Evening'
+    return 'Night'
+
+
+def _load(conn, rng, params, now):
+    state_weights = _skewed(rng, len(STATES), 0.8)
+    hospital_states = rng.choice(len(STATES), params['hospitals'], p=state_weights)
+    hospitals = [(f'Benchmark Hospital {h}', f'BM-{h:06d}', f'hospital{h}@{EMAIL_DOMAIN}', PASSWORD,
+                  STATES[s], _district(STATES[s], u), f'80{h:08d}')
+                 for h, (s, u) in enumerate(zip(hospital_states, rng.random(params['hospitals'])))]
+    conn.executemany('INSERT INTO hospitals (name, reg_no, email, password, state, district, phone) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?)', hospitals)
+
+    specializations = ['General', 'Cardiology', 'Pediatrics', 'Orthopedics', 'Neurology']
+    doctors = [(h + 1, f'Dr Bench {h}-{d}', f'doctor{h}-{d}@{EMAIL_DOMAIN}', PASSWORD,
+                specializations[d % len(specializations)], f'81{h:05d}{d:03d}')
+               for h in range(params['hospitals']) for d in range(params['doctors_per_hospital'])]
+    conn.executemany('INSERT INTO doctors (hospital_id, name, email, password, specialization, phone) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', doctors)
+
+    ambulances = [(f'AMB-{h + 1:04d}-{u}', h + 1, hospital[4], hospital[5], AVAILABLE, now.isoformat())
+                  for h, hospital in enumerate(hospitals) for u in range(params['ambulances_per_hospital'])]
+    conn.execute('DELETE FROM ambulances')
+    conn.executemany('INSERT INTO ambulances (call_sign, base_hospital_id, state, district, status_code, '
+                     'updated_at) VALUES (?, ?, ?, ?, ?, ?)', ambulances)
+
+    n_users = params['users']
+    for start in range(0, n_users, CHUNK_ROWS):
+        ids = range(start, min(start + CHUNK_ROWS, n_users))
+        ages = rng.integers(1, 95, len(ids)).tolist()
+        genders = rng.choice(['Male', 'Female'], len(ids)).tolist()
+        conn.executemany('INSERT INTO users (name, email, password, phone, address, health_id, age, gender) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         [(f'Patient {i}', f'patient{i}@{EMAIL_DOMAIN}', PASSWORD, f'9{i:09d}', f'{i % 500} Main Road',
+                           f'H-{i >> 16:04X}-{i & 0xFFFF:04X}', age, gender)
+                          for i, age, gender in zip(ids, ages, genders)])
+
+    # Visits per patient: lognormal around the requested mean, at least one
+    visits = np.maximum(1, np.rint(rng.lognormal(0.0, 1.0, n_users) * params['records_per_user'] / np.exp(0.5)))
+    owners = np.repeat(np.arange(1, n_users + 1), visits.astype(np.int64))
+    doctor_weights = _skewed(rng, len(doctors), 0.6)
+    day_seconds = params['days'] * 86400
+    for start in range(0, len(owners), CHUNK_ROWS):
+        user_ids = owners[start:start + CHUNK_ROWS]
+        n = len(user_ids)
+        doctor_ids = rng.choice(len(doctors), n, p=doctor_weights) + 1
+        offsets = rng.integers(0, day_seconds, n)
+        risk_scores = rng.beta(2, 5, n)
+        columns = (
+            user_ids.tolist(), doctor_ids.tolist(),
+            rng.choice(SYMPTOMS, n).tolist(), rng.choice(DIAGNOSES, n).tolist(), rng.choice(MEDICINES, n).tolist(),
+            rng.choice(TREATMENT_STATUSES, n, p=[0.45, 0.3, 0.2, 0.05]).tolist(),
+            rng.integers(5, 60, n).tolist(), offsets.tolist(), risk_scores.round(3).tolist(),
+            rng.integers(95, 185, n).tolist(), rng.integers(60, 115, n).tolist(),
+            rng.normal(25, 4, n).round(1).tolist(), rng.integers(70, 240, n).tolist(),
+        )
+        rows = []
+        for (user_id, doctor_id, symptoms, diagnosis, medicines, status, duration, offset, score,
+             systolic, diastolic, bmi, glucose) in zip(*columns):
+            created = now - timedelta(seconds=offset)
+            risk = 'Critical' if score > 0.75 else 'High' if score > 0.5 else 'Medium' if score > 0.25 else 'Low'
+            rows.append((user_id, doctor_id, created.date().isoformat(), symptoms, diagnosis, medicines, '1-0-1',
+                         status, duration, '', created.isoformat(), risk, score, systolic, diastolic, bmi, glucose))
+        conn.executemany('INSERT INTO records (user_id, doctor_id, date, symptoms, diagnosis, medicines, dosage, '
+                         'treatment_status, consultation_duration, prescription_text, created_at, risk_level, '
+                         'risk_score, systolic_bp, diastolic_bp, bmi, glucose) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    hospitals_by_state = {}
+    for h, hospital in enumerate(hospitals):
+        hospitals_by_state.setdefault(hospital[4], []).append(h + 1)
+    hour_weights = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+    n_emergencies = params['emergencies']
+    for start in range(0, n_emergencies, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, n_emergencies - start)
+        states = rng.choice(len(STATES), n, p=state_weights)
+        days_ago = rng.integers(0, params['days'], n)
+        hours = rng.choice(24, n, p=hour_weights)
+        minutes = rng.integers(0, 60, n)
+        response = rng.integers(5, 45, n)
+        callers = np.where(rng.random(n) < 0.3, rng.integers(1, max(n_users, 1) + 1, n), 0)
+        columns = (states.tolist(), days_ago.tolist(), hours.tolist(), minutes.tolist(), response.tolist(),
+                   callers.tolist(), rng.choice(PRIORITIES, n, p=PRIORITY_WEIGHTS).tolist(),
+                   rng.choice(SYMPTOMS, n).tolist(), rng.integers(1, 95, n).tolist(),
+                   rng.choice(EMERGENCY_TYPES, n).tolist(), rng.choice(ZONES, n, p=[0.6, 0.3, 0.1]).tolist(),
+                   rng.random(n).tolist())
+        rows = []
+        for (s, day_offset, hour, minute, response_minutes, caller, priority, symptoms, age, emergency_type,
+             zone, u) in zip(*columns):
+            state = STATES[s]
+            requested = (now - timedelta(days=day_offset)).replace(hour=hour, minute=minute, second=0,
+                                                                  microsecond=0)
+            closed = requested + timedelta(minutes=response_minutes + 30)
+            candidates = hospitals_by_state.get(state)
+            hospital_id = candidates[(start + len(rows)) % len(candidates)] if candidates else None
+            rows.append((caller or None, 'Benchmark Caller', f'7{(start + len(rows)) % 10 ** 9:09d}',
+                         f'{state} (benchmark)', 'Closed', requested.isoformat(), response_minutes, priority,
+                         symptoms, age, state, _district(state, u), emergency_type, zone,
+                         requested.strftime('%A'), _time_slot(hour), CLOSED, closed.isoformat(), hospital_id))
+        conn.executemany('INSERT INTO emergencies (user_id, name, phone, location, status, requested_at, '
+                         'response_time_minutes, priority, symptoms, age, state, district, emergency_type, zone, '
+                         'day, time_slot, status_code, status_updated_at, hospital_id) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+
+def _row_counts(conn):
+    return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in LOADED_TABLES}
+
+
+def _with_app_db(path, action):
+    """Run action(app) with the app pointed at the database at path."""
+    import app
+    saved_db = app.DB_PATH
+    app.DB_PATH = path
+    try:
+        return action(app)
+    finally:
+        app.DB_PATH = saved_db
+
+
+def schema_hash():
+    """Hash of the schema init_db creates, so snapshots follow schema changes."""
+    path = os.path.join(tempfile.mkdtemp(), 'schema.db')
+    _with_app_db(path, lambda app: app.init_db())
+    conn = sqlite3.connect(path)
+    try:
+        statements = sorted(row[0] for row in conn.execute('SELECT sql FROM sqlite_master WHERE sql IS NOT NULL'))
+    finally:
+        conn.close()
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    return hashlib.sha1('\n'.join(statements).encode()).hexdigest()[:10]
+
+
+def build(path, hospitals=4, doctors_per_hospital=3, users=500, records_per_user=4, emergencies=1000,
+          ambulances_per_hospital=2, days=730, seed=1):
+    """Build a benchmark database at path (replacing it); returns its manifest."""
+    params = dict(hospitals=hospitals, doctors_per_hospital=doctors_per_hospital, users=users,
+                  records_per_user=records_per_user, emergencies=emergencies,
+                  ambulances_per_hospital=ambulances_per_hospital, days=days, seed=seed)
+    started = time.perf_counter()
+    partial = f'{path}.partial'
+    for leftover in (partial, f'{partial}-journal'):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    _with_app_db(partial, lambda app: app.init_db())
+
+    conn = sqlite3.connect(partial)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('PRAGMA cache_size = -200000')  # About 200 MB
+        placeholders = ', '.join('?' * len(LOADED_TABLES))
+        indexes = conn.execute(f'SELECT name, sql FROM sqlite_master WHERE type = ? AND sql IS NOT NULL '
+                               f'AND tbl_name IN ({placeholders})', ('index',) + LOADED_TABLES).fetchall()
+        for name, _ in indexes:
+            conn.execute(f'DROP INDEX {name}')
+        # Fixed reference time from the seed, so the same parameters give the same rows
+        now = datetime(2026, 1, 1) + timedelta(days=seed % 365)
+        _load(conn, np.random.default_rng(seed), params, now)
+        for _, sql in indexes:
+            conn.execute(sql)
+        conn.commit()
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+    _with_app_db(partial, lambda app: app.init_db())  # Fills the rollups from the loaded emergencies
+
+    conn = sqlite3.connect(partial)
+    try:
+        counts = _row_counts(conn)
+    finally:
+        conn.close()
+    os.replace(partial, path)
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'schema': schema_hash(),
+        'params': params,
+        'rows': counts,
+        'build_seconds': round(time.perf_counter() - started, 1),
+        'built_at': datetime.utcnow().isoformat(),
+    }
+    with open(f'{path}.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def snapshot(scale='small', seed=1, directory=None):
+    """Path of the shared snapshot for scale and seed, built on first use."""
+    if scale not in SCALES:
+        raise ValueError(f'unknown scale {scale!r} (one of {", ".join(SCALES)})')
+    directory = directory or DEFAULT_SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{scale}-s{seed}-v{FORMAT_VERSION}-{schema_hash()}.db')
+    if not (os.path.exists(path) and os.path.exists(f'{path}.json')):
+        print(f"[INFO] Building the {scale} benchmark snapshot at {path}")
+        build(path, seed=seed, **SCALES[scale])
+    return path
+
+
+def copy_snapshot(path, destination=None):
+    """A private copy of a snapshot to run against; returns its path."""
+    destination = destination or os.path.join(tempfile.mkdtemp(), os.path.basename(path))
+    shutil.copyfile(path, destination)
+    return destination
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), help='Preset sizes; other flags override them')
+    parser.add_argument('--output', help='Build here instead of the shared snapshot directory')
+    parser.add_argument('--dir', help=f'Snapshot directory (default {DEFAULT_SNAPSHOT_DIR})')
+    parser.add_argument('--hospitals', type=int)
+    parser.add_argument('--doctors-per-hospital', type=int)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--records-per-user', type=float)
+    parser.add_argument('--emergencies', type=int)
+    parser.add_argument('--ambulances-per-hospital', type=int, default=2)
+    parser.add_argument('--days', type=int, default=730, help='Records and emergencies span this many days')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    overrides = {key: getattr(args, key) for key in ('hospitals', 'doctors_per_hospital', 'users',
+                                                      'records_per_user', 'emergencies')
+                 if getattr(args, key) is not None}
+    if args.scale and not overrides and not args.output and args.days == 730 and args.ambulances_per_hospital == 2:
+        path = snapshot(args.scale, args.seed, args.dir)
+        with open(f'{path}.json') as f:
+            manifest = json.load(f)
+    else:
+        params = dict(SCALES[args.scale or 'tiny'], **overrides)
+        path = args.output or os.path.join(args.dir or DEFAULT_SNAPSHOT_DIR, f'custom-s{args.seed}.db')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        manifest = build(path, ambulances_per_hospital=args.ambulances_per_hospital, days=args.days,
+                         seed=args.seed, **params)
+    rows = ', '.join(f'{n} {table}' for table, n in manifest['rows'].items())
+    print(f"[OK] {path}: {rows} (built in {manifest['build_seconds']} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
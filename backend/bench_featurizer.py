@@ -0,0 +1,126 @@
+"""
+Benchmark: shared vectorized featurizer vs the old per-field if-chains.
+
+legacy_features() is the encoding predict_health_risk used before
+featurizer.py, one Python if-chain per field and one row at a time
+(with the flat 1.0 for high BP). The benchmark featurizes the same random
+rows both ways and also reports the cost of a single row, which is what
+one /add_record request pays.
+
+Usage (from the backend directory):
+    python bench_featurizer.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import featurizer
+
+STATUS_ENCODING = {'Under Observation': 0.8, 'Stable': 0.4, 'Recovered': 0.1, 'Critical': 1.0, 'Emergency': 1.0}
+
+
+def legacy_features(age, symptom_severity, diagnosis_severity, treatment_status, medicine_complexity,
+                    systolic_bp, diastolic_bp, bmi, cholesterol, glucose,
+                    smoking, alcohol, activity_value, family_history):
+    """Per-row if-chains as they were in app.predict_health_risk."""
+    bp_normalized = 0.5
+    if systolic_bp and diastolic_bp:
+        if systolic_bp > 140 or diastolic_bp > 90:
+            bp_normalized = 1.0
+        elif systolic_bp < 90 or diastolic_bp < 60:
+            bp_normalized = 0.8
+        else:
+            bp_normalized = 0.3
+    bmi_normalized = 0.5
+    if bmi:
+        if bmi < 18.5:
+            bmi_normalized = 0.6
+        elif bmi > 30:
+            bmi_normalized = 1.0
+        elif bmi > 25:
+            bmi_normalized = 0.7
+        else:
+            bmi_normalized = 0.3
+    cholesterol_normalized = 0.5
+    if cholesterol:
+        if cholesterol > 240:
+            cholesterol_normalized = 1.0
+        elif cholesterol > 200:
+            cholesterol_normalized = 0.7
+        else:
+            cholesterol_normalized = 0.3
+    glucose_normalized = 0.5
+    if glucose:
+        if glucose > 125:
+            glucose_normalized = 1.0
+        elif glucose > 100:
+            glucose_normalized = 0.7
+        else:
+            glucose_normalized = 0.3
+    activity_risk = 1.0 - (activity_value / 5.0) if activity_value <= 5 else 0.0
+    return [
+        min(age / 100.0, 1.0), symptom_severity, diagnosis_severity,
+        STATUS_ENCODING.get(treatment_status, 0.5), medicine_complexity,
+        bp_normalized, bmi_normalized, cholesterol_normalized, glucose_normalized,
+        smoking, alcohol, activity_risk, family_history,
+    ]
+
+
+def random_columns(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        rng.integers(18, 85, n).astype(float),
+        rng.beta(2, 5, n),
+        rng.beta(2, 5, n),
+        rng.choice(np.array(['Recovered', 'Stable', 'Under Observation', 'Critical']), n),
+        rng.beta(2, 4, n),
+        rng.normal(120, 20, n),
+        rng.normal(80, 15, n),
+        rng.normal(25, 5, n),
+        rng.normal(200, 40, n),
+        rng.normal(100, 25, n),
+        (rng.random(n) < 0.3).astype(float),
+        (rng.random(n) < 0.4).astype(float),
+        rng.integers(0, 6, n).astype(float),
+        (rng.random(n) < 0.3).astype(float),
+    ]
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    columns = random_columns(args.rows)
+    rows = [tuple(c[i].item() for c in columns) for i in range(args.rows)]
+
+    legacy = best_of(lambda: np.array([legacy_features(*row) for row in rows]), args.repeat)
+    vectorized = best_of(lambda: featurizer.health_risk_features(*columns), args.repeat)
+    print(f"{args.rows} rows | if-chains {legacy * 1000:8.1f} ms | vectorized {vectorized * 1000:7.1f} ms "
+          f"| {legacy / vectorized:5.1f}x faster")
+
+    single = rows[:1000]
+    legacy_row = best_of(lambda: [legacy_features(*row) for row in single], args.repeat) / len(single)
+    vectorized_row = best_of(lambda: [featurizer.health_risk_features(*row) for row in single],
+                             args.repeat) / len(single)
+    print(f"single row  | if-chains {legacy_row * 1e6:8.1f} us | vectorized {vectorized_row * 1e6:7.1f} us")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
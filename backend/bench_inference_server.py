@@ -0,0 +1,143 @@
+"""
+Benchmark: in-process inference vs the inference sidecar under mixed load.
+
+Simulates one gevent worker serving two kinds of requests at once:
+  - inference requests (health risk / emergency predictions)
+  - light requests that only need the event loop (template renders, redirects)
+and reports p50/p99 latency for both. With in-process inference every
+predict_proba blocks the loop, so light requests queue behind it; with the
+sidecar the worker just waits on a socket.
+
+Usage (from the backend directory):
+    python bench_inference_server.py --duration 5 --concurrency 32
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import gevent
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from inference_client import InferenceClient
+from model_artifacts import build_model_registry
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BACKEND_DIR, 'pkl', 'svm_health_risk_model.pkl')
+EMERGENCY_MODEL_PATH = os.path.join(BACKEND_DIR, 'pkl', 'Logistic_regression_prediction.pkl')
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000.0 if values else float('nan')
+
+
+def in_process_predict(registry, name, row):
+    loaded = registry.get(name)
+    X = np.asarray([row], dtype=float)
+    if loaded.scaler is not None:
+        X = loaded.scaler.transform(X)
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', category=UserWarning)
+        loaded.model.predict(X)
+        if hasattr(loaded.model, 'predict_proba'):
+            loaded.model.predict_proba(X)
+
+
+def run_mode(mode, registry, client, rows, duration, concurrency):
+    inference_latencies = []
+    light_latencies = []
+    fallbacks = [0]
+    stop_at = time.perf_counter() + duration
+
+    def inference_worker(seed):
+        rng = np.random.default_rng(seed)
+        names = list(rows)
+        while time.perf_counter() < stop_at:
+            name = names[rng.integers(len(names))]
+            row = rows[name][rng.integers(len(rows[name]))]
+            start = time.perf_counter()
+            if mode == 'sidecar':
+                if client.predict(name, row) is None:
+                    fallbacks[0] += 1
+                    in_process_predict(registry, name, row)
+            else:
+                in_process_predict(registry, name, row)
+            inference_latencies.append(time.perf_counter() - start)
+            gevent.sleep(0)
+
+    def light_worker():
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            gevent.sleep(0.001)
+            light_latencies.append(time.perf_counter() - start - 0.001)
+
+    greenlets = [gevent.spawn(inference_worker, i) for i in range(concurrency)]
+    greenlets += [gevent.spawn(light_worker) for _ in range(concurrency)]
+    gevent.joinall(greenlets)
+
+    throughput = len(inference_latencies) / duration
+    print(f"{mode:>10} | {throughput:8.0f} pred/s | inference p50 {percentile(inference_latencies, 50):7.2f} ms "
+          f"p99 {percentile(inference_latencies, 99):7.2f} ms | light p50 {percentile(light_latencies, 50):6.2f} ms "
+          f"p99 {percentile(light_latencies, 99):6.2f} ms | fallbacks {fallbacks[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--batch-window-ms', type=float, default=2.0)
+    parser.add_argument('--models-dir', default=os.path.join(BACKEND_DIR, 'pkl'),
+                        help='Directory holding the model artifacts to benchmark')
+    args = parser.parse_args()
+
+    model_path = os.path.join(args.models_dir, os.path.basename(MODEL_PATH))
+    emergency_path = os.path.join(args.models_dir, os.path.basename(EMERGENCY_MODEL_PATH))
+    registry = build_model_registry(model_path, emergency_path, poll_interval=0)
+    registry.load_all()
+    rng = np.random.default_rng(42)
+    rows = {}
+    for name in ('health_risk', 'emergency'):
+        loaded = registry.get(name)
+        if loaded is not None:
+            n_features = getattr(loaded.model, 'n_features_in_', 13)
+            rows[name] = rng.random((256, n_features)).tolist()
+    if not rows:
+        print("[ERROR] No models could be loaded; nothing to benchmark")
+        return 1
+    print(f"[INFO] Models under test: {', '.join(rows)}")
+
+    socket_path = os.path.join(tempfile.mkdtemp(), 'inference.sock')
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, 'inference_server.py'),
+         '--socket', socket_path, '--batch-window-ms', str(args.batch_window_ms),
+         '--models-dir', args.models_dir],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        client = InferenceClient(socket_path, timeout=1.0, retry_after=0.1)
+        for _ in range(100):
+            if os.path.exists(socket_path) and client.ping() is not None:
+                break
+            gevent.sleep(0.1)
+        else:
+            print("[ERROR] Inference server did not start")
+            return 1
+
+        run_mode('in-process', registry, client, rows, args.duration, args.concurrency)
+        run_mode('sidecar', registry, client, rows, args.duration, args.concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
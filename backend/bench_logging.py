@@ -0,0 +1,130 @@
+"""
+Logging overhead on /user/login.
+
+Posts password logins (and every tenth request an OTP request) for a seeded
+patient through the WSGI test client. Each request logs a debug line and
+OTP requests an info line as well. The output goes to a sink whose write()
+sleeps --write-ms, like stdout piped to a log collector that is falling
+behind. Three setups are compared:
+  quiet  LOG_LEVEL=WARNING: nothing is written
+  queue  DEBUG with every hot-path line kept, through app_logging's
+         background writer
+  sync   the same lines written on the request thread, like the print()
+         calls they replaced
+
+    python bench_logging.py --requests 400 --write-ms 1
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app_logging
+
+MODES = ('quiet', 'queue', 'sync')
+
+
+class SlowSink:
+    """A stream that takes write_ms per write and keeps only a line count."""
+
+    def __init__(self, write_ms):
+        self.write_ms = write_ms
+        self.lines = 0
+
+    def write(self, text):
+        time.sleep(self.write_ms / 1000.0)
+        self.lines += text.count('\n')
+
+    def flush(self):
+        pass
+
+
+def _seed(app):
+    conn = app.get_db_connection()
+    conn.execute("INSERT OR IGNORE INTO users (name, email, password, phone, address, health_id) "
+                 "VALUES ('Bench Patient', 'bench@loadtest.example', 'bench', '9000000001', 'Patna', 'H-BENCH')")
+    conn.commit()
+    conn.close()
+
+
+def _use(mode, sink):
+    """Point the root logger at the sink the way the mode asks; returns the queue handler, if any."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, app_logging.BackgroundQueueHandler):
+            handler.stop()
+        root.removeHandler(handler)
+    if mode == 'queue':
+        return app_logging.configure('DEBUG', stream=sink)
+    if mode == 'sync':
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(app_logging.JsonFormatter())
+        root.addHandler(handler)
+        root.setLevel('DEBUG')
+    else:
+        root.setLevel('WARNING')
+    return None
+
+
+def run(mode, requests=400, write_ms=1.0):
+    """Latency of `requests` logins under one logging setup; returns a result row."""
+    import app
+    saved = app.DB_PATH, app.LOG_DEBUG_SAMPLE_RATE
+    app.DB_PATH = os.path.join(tempfile.mkdtemp(), 'health_system.db')
+    app.LOG_DEBUG_SAMPLE_RATE = 1.0
+    sink = SlowSink(write_ms)
+    try:
+        app.init_db()
+        _seed(app)
+        client = app.app.test_client()
+        handler = _use(mode, sink)
+        latencies = []
+        for i in range(requests):
+            if i % 10 == 9:
+                form = {'login_type': 'otp', 'action': 'send_otp', 'identifier': 'H-BENCH', 'phone': '9000000001'}
+            else:
+                form = {'login_type': 'password', 'identifier': 'H-BENCH', 'password': 'bench'}
+            start = time.perf_counter()
+            client.post('/user/login', data=form)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        drained_at = time.perf_counter()
+        if handler is not None:
+            handler.stop()
+        drain_ms = (time.perf_counter() - drained_at) * 1000.0
+    finally:
+        app.DB_PATH, app.LOG_DEBUG_SAMPLE_RATE = saved
+        app_logging.configure(app.LOG_LEVEL)
+    latencies = np.array(latencies)
+    return {'mode': mode, 'requests': requests, 'lines': sink.lines,
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+            'mean_ms': round(float(latencies.mean()), 3), 'drain_ms': round(drain_ms, 1),
+            'dropped': handler.dropped if handler is not None else 0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--write-ms', type=float, default=1.0, help='Time each write to the log sink takes')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    args = parser.parse_args(argv)
+
+    rows = [run(mode, args.requests, args.write_ms) for mode in args.modes]
+    quiet = next((row for row in rows if row['mode'] == 'quiet'), None)
+    print(f"{'mode':>6} {'lines':>6} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'overhead':>9} "
+          f"{'drain ms':>9} {'dropped':>8}")
+    for row in rows:
+        overhead = f"{row['mean_ms'] - quiet['mean_ms']:+.3f}" if quiet else '-'
+        print(f"{row['mode']:>6} {row['lines']:>6} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['mean_ms']:>8} "
+              f"{overhead:>9} {row['drain_ms']:>9} {row['dropped']:>8}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
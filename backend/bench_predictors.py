@@ -0,0 +1,286 @@
+"""
+Benchmark and regression gate for the triage predictors.
+
+Runs predict_health_risk, predict_emergency_priority and
+predict_emergency_priority_rulebased on fixed seeded corpora:
+  single         one call at a time, per-call latency
+  batch          the whole corpus through the vectorized path the inference
+                 sidecar uses (featurizer + one predict_proba), per-row cost
+  model_missing  the predictor with its model slot empty (rule-based fallback)
+and records p50/p99 latency plus tracemalloc peak and retained bytes per call.
+
+Results are compared with a JSON baseline; the run fails (exit code 1) when a
+case is slower or allocates more than the baseline plus a tolerance. Latency
+baselines are machine specific, so record one on the machine that gates:
+
+    python bench_predictors.py --update-baseline
+    python bench_predictors.py                      # compare against it
+    python bench_predictors.py --models-dir /path/to/pkl --corpus-size 500
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, 'bench_predictors_baseline.json')
+DEFAULT_SEED = 1234
+TREATMENT_STATUSES = ['Recovered', 'Stable', 'Under Observation', 'Critical', 'Emergency']
+SYMPTOMS = ['mild headache', 'fever and cough', 'chest pain', 'difficulty breathing', 'back ache',
+            'nausea and dizziness', 'feeling tired', '']
+DIAGNOSES = ['routine checkup', 'hypertension', 'diabetes', 'cardiac arrest', 'viral infection', '']
+MEDICINES = ['', 'paracetamol', 'metformin, amlodipine', 'aspirin, atorvastatin, metoprolol, insulin']
+
+
+class EmptyRegistry:
+    """Stand-in registry with no models loaded (model-missing cases)."""
+
+    def get(self, name):
+        return None
+
+
+def health_corpus(n, seed=DEFAULT_SEED):
+    """Seeded predict_health_risk calls shaped like add_record's arguments."""
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for _ in range(n):
+        corpus.append({
+            'user_data': {'age': int(rng.integers(18, 90))},
+            'symptoms': str(rng.choice(SYMPTOMS)),
+            'diagnosis': str(rng.choice(DIAGNOSES)),
+            'treatment_status': str(rng.choice(TREATMENT_STATUSES)),
+            'medicines': str(rng.choice(MEDICINES)),
+            'health_metrics': {
+                'systolic_bp': int(rng.normal(125, 20)),
+                'diastolic_bp': int(rng.normal(80, 12)),
+                'bmi': round(float(rng.normal(25, 5)), 1),
+                'cholesterol': round(float(rng.normal(200, 40)), 1),
+                'glucose': round(float(rng.normal(105, 25)), 1),
+                'smoking': str(rng.integers(0, 2)),
+                'alcohol': str(rng.integers(0, 2)),
+                'physical_activity': str(rng.integers(0, 6)),
+                'family_history': str(rng.integers(0, 2)),
+            },
+        })
+    return corpus
+
+
+def emergency_corpus(n, seed=DEFAULT_SEED):
+    """Seeded predict_emergency_priority calls shaped like the /emergency form."""
+    from featurizer import EMERGENCY_CATEGORIES, EMERGENCY_FIELDS
+    rng = np.random.default_rng(seed + 1)
+    corpus = []
+    for _ in range(n):
+        call = {field: str(rng.choice(EMERGENCY_CATEGORIES[prefix])) for prefix, field in EMERGENCY_FIELDS.items()}
+        call.update({'symptoms': str(rng.choice(SYMPTOMS)), 'age': int(rng.integers(1, 95))})
+        corpus.append(call)
+    return corpus
+
+
+def time_calls(func, corpus, warmup=20, rounds=5):
+    """
+    Per-call latencies in microseconds, one array per round over the corpus.
+    Percentiles are taken per round and the best round is kept (like timeit),
+    so a burst of noise from other processes does not fail the gate.
+    """
+    for kwargs in corpus[:warmup]:
+        func(**kwargs)
+    all_rounds = []
+    for _ in range(rounds):
+        timings = np.empty(len(corpus))
+        for i, kwargs in enumerate(corpus):
+            start = time.perf_counter_ns()
+            func(**kwargs)
+            timings[i] = (time.perf_counter_ns() - start) / 1000.0
+        all_rounds.append(timings)
+    return all_rounds
+
+
+def measure_allocations(func, corpus):
+    """
+    Allocations per call, traced with tracemalloc (separately from timing):
+    peak bytes allocated during a call and bytes still held after it (leaks, caches).
+    """
+    calls = corpus[:min(len(corpus), 100)]
+    func(**calls[0])
+    tracemalloc.start()
+    peaks = []
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    for kwargs in calls:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func(**kwargs)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    retained = tracemalloc.get_traced_memory()[0] - start_bytes
+    tracemalloc.stop()
+    return float(np.mean(peaks)), max(retained, 0) / len(calls)
+
+
+def summarize(rounds, peak_bytes, retained_bytes, per='call'):
+    return {
+        'p50_us': min(float(np.percentile(timings, 50)) for timings in rounds),
+        'p99_us': min(float(np.percentile(timings, 99)) for timings in rounds),
+        'peak_bytes': float(peak_bytes),
+        'retained_bytes': float(retained_bytes),
+        'per': per,
+        'n': int(len(rounds[0])),
+        'rounds': len(rounds),
+    }
+
+
+def run_suite(corpus_size=300, models_dir=None, seed=DEFAULT_SEED, rounds=5):
+    """Run every case and return {case_name: stats}."""
+    import app
+    from featurizer import emergency_encoder
+    from model_artifacts import build_model_registry
+
+    if models_dir:
+        registry = build_model_registry(os.path.join(models_dir, os.path.basename(app.MODEL_PATH)),
+                                        os.path.join(models_dir, os.path.basename(app.EMERGENCY_MODEL_PATH)),
+                                        poll_interval=0)
+        registry.load_all()
+        app.model_registry = registry
+    registry = app.model_registry
+
+    health = health_corpus(corpus_size, seed)
+    emergency = emergency_corpus(corpus_size, seed)
+    results = {}
+
+    def add(name, func, corpus):
+        timings = time_calls(func, corpus, rounds=rounds)
+        results[name] = summarize(timings, *measure_allocations(func, corpus))
+
+    def batch_case(name, model_name, corpus, encode):
+        loaded = registry.get(model_name)
+        if loaded is None:
+            return
+        calls = [corpus] * 20
+
+        def predict_corpus(rows):
+            X = encode(loaded, rows)
+            if loaded.scaler is not None:
+                X = loaded.scaler.transform(X)
+            loaded.model.predict_proba(X)
+
+        timings = time_calls(lambda rows: predict_corpus(rows), [{'rows': c} for c in calls], warmup=2, rounds=rounds)
+        peak_bytes, retained_bytes = measure_allocations(lambda rows: predict_corpus(rows), [{'rows': corpus}] * 5)
+        n = len(corpus)
+        results[name] = summarize([t / n for t in timings], peak_bytes / n, retained_bytes / n, per='row')
+
+    def encode_health(loaded, rows):
+        return np.vstack([app.build_health_features(**row) for row in rows])
+
+    def encode_emergency(loaded, rows):
+        return emergency_encoder(loaded.metadata['feature_names']).transform(rows)
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', category=UserWarning)
+        add('health_risk.single', app.predict_health_risk, health)
+        batch_case('health_risk.batch', 'health_risk', health, encode_health)
+        add('emergency.single', app.predict_emergency_priority, emergency)
+        batch_case('emergency.batch', 'emergency', emergency, encode_emergency)
+        add('emergency_rulebased.single', app.predict_emergency_priority_rulebased, emergency)
+
+        app.model_registry = EmptyRegistry()
+        try:
+            add('health_risk.model_missing', app.predict_health_risk, health)
+            add('emergency.model_missing', app.predict_emergency_priority, emergency)
+        finally:
+            app.model_registry = registry
+
+    meta = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'corpus_size': corpus_size,
+        'rounds': rounds,
+        'seed': seed,
+        'models': {name: registry.version(name) for name in ('health_risk', 'emergency')},
+    }
+    return {'meta': meta, 'cases': results}
+
+
+def compare(results, baseline, tolerance=0.25, p99_tolerance=0.5, alloc_tolerance=0.1, min_slack_us=5.0):
+    """
+    Regressions of results against baseline, as a list of messages.
+
+    A latency regresses when it exceeds baseline * (1 + tolerance) plus
+    min_slack_us (tiny timings are noisy); p99 gets its own, looser tolerance.
+    Cases missing from either side are skipped (e.g. a model not loaded).
+    """
+    regressions = []
+    for name, base in baseline.get('cases', {}).items():
+        current = results.get('cases', {}).get(name)
+        if current is None:
+            continue
+        limits = [('p50_us', tolerance, min_slack_us), ('p99_us', p99_tolerance, min_slack_us),
+                  ('peak_bytes', alloc_tolerance, 256.0), ('retained_bytes', alloc_tolerance, 64.0)]
+        for metric, tol, slack in limits:
+            limit = base[metric] * (1 + tol) + slack
+            if current[metric] > limit:
+                regressions.append(f"{name} {metric}: {current[metric]:.1f} > {limit:.1f} "
+                                   f"(baseline {base[metric]:.1f})")
+    return regressions
+
+
+def print_results(results, baseline=None):
+    base_cases = (baseline or {}).get('cases', {})
+    print(f"\n{'case':<30}{'p50 us':>10}{'p99 us':>10}{'peak B':>10}{'kept B':>8}  per   vs baseline p50")
+    for name, r in results['cases'].items():
+        base = base_cases.get(name)
+        delta = f"{(r['p50_us'] / base['p50_us'] - 1) * 100:+.0f}%" if base and base['p50_us'] else '-'
+        print(f"{name:<30}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}{r['peak_bytes']:>10.0f}"
+              f"{r['retained_bytes']:>8.0f}  {r['per']:<5} {delta}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='Record this run as the new baseline')
+    parser.add_argument('--corpus-size', type=int, default=300)
+    parser.add_argument('--rounds', type=int, default=5, help='Timing rounds per case; the best round counts')
+    parser.add_argument('--models-dir', help='Benchmark the models in this directory instead of pkl/')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p50 slowdown (0.25 = 25%%)')
+    parser.add_argument('--p99-tolerance', type=float, default=0.5, help='Allowed p99 slowdown')
+    parser.add_argument('--alloc-tolerance', type=float, default=0.1, help='Allowed allocation growth')
+    parser.add_argument('--output', help='Also write this run as JSON')
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.corpus_size, args.models_dir, rounds=args.rounds)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline or baseline is None:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[OK] Baseline written to {args.baseline}")
+        return 0
+    if baseline.get('meta', {}).get('models') != results['meta']['models']:
+        print("[WARNING] Model versions differ from the baseline; comparing anyway")
+
+    regressions = compare(results, baseline, args.tolerance, args.p99_tolerance, args.alloc_tolerance)
+    if regressions:
+        print("\n[ERROR] Performance regressions:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print("\n[OK] No regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Time to first request, eager vs background warm-up.
+
+Starts fresh Python processes that do what a gunicorn worker does: import
+app, run init_db() and (in background mode) schedule the warm-up the way
+post_worker_init does. Each process then serves through the WSGI test client:
+  - GET /, a page that needs neither the models nor Firebase
+  - POST /emergency, which needs the emergency model
+Times are measured from process start. RSS is read at the first request
+and again after the warm-up has finished. Two modes are compared:
+  eager       WARM_UP_IN_BACKGROUND=False: models and Firebase load at import
+  background  the default: both load on a thread after the first request
+Then `python -X importtime` breaks down `import app` by top-level package
+in both modes.
+
+    python bench_startup.py --runs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MODES = {'eager': 'False', 'background': 'True'}
+
+_CHILD = r'''
+import json, os, sys, tempfile, time
+sys.path.insert(0, {backend!r})
+import app
+from startup import process_age, rss_mb
+app.DB_PATH = os.path.join(tempfile.mkdtemp(), 'health_system.db')
+app.init_db()
+app.startup_profile.warm_up(delay=2.0)  # What gunicorn's post_worker_init does
+ready = process_age()
+client = app.app.test_client()
+client.get('/')
+first_request, first_request_rss = process_age(), rss_mb()
+client.post('/emergency', data={{'location': 'Patna', 'phone': '9000000001', 'state': 'Bihar',
+                                 'emergency_type': 'EMS', 'symptoms': 'chest pain'}})
+first_prediction = process_age()
+while not app.startup_profile.warm_up_done:
+    time.sleep(0.01)
+print('RESULT ' + json.dumps({{'ready': ready, 'first_request': first_request, 'first_request_rss': first_request_rss,
+                             'first_prediction': first_prediction, 'warm': process_age(), 'warm_rss': rss_mb(),
+                             'phases': app.startup_profile.report()}}))
+'''
+
+
+def _env(mode):
+    return dict(os.environ, WARM_UP_IN_BACKGROUND=MODES[mode], LOG_LEVEL='WARNING')
+
+
+def run_once(mode):
+    """One fresh process in the given mode; returns its RESULT dict."""
+    output = subprocess.run([sys.executable, '-c', _CHILD.format(backend=BACKEND_DIR)], env=_env(mode),
+                            capture_output=True, text=True, check=True, cwd=BACKEND_DIR).stdout
+    line = next(line for line in output.splitlines() if line.startswith('RESULT '))
+    return json.loads(line[len('RESULT '):])
+
+
+def import_breakdown(mode):
+    """Self import time in ms per top-level package for `import app`."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], env=_env(mode),
+                            capture_output=True, text=True, check=True, cwd=BACKEND_DIR).stderr
+    totals = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        totals[name.strip().split('.')[0]] += int(self_us) / 1000.0
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='Processes per mode (medians are shown)')
+    parser.add_argument('--top', type=int, default=12, help='Packages in the import breakdown')
+    args = parser.parse_args(argv)
+
+    results = {mode: [run_once(mode) for _ in range(args.runs)] for mode in MODES}
+    keys = ('ready', 'first_request', 'first_prediction', 'warm', 'first_request_rss', 'warm_rss')
+    print(f"{'mode':>10} {'ready s':>8} {'1st req s':>9} {'1st pred s':>10} {'warm s':>7} "
+          f"{'RSS@req MB':>10} {'RSS warm MB':>11}")
+    medians = {}
+    for mode, runs in results.items():
+        medians[mode] = {key: float(np.median([run[key] for run in runs])) for key in keys}
+        m = medians[mode]
+        print(f"{mode:>10} {m['ready']:>8.2f} {m['first_request']:>9.2f} {m['first_prediction']:>10.2f} "
+              f"{m['warm']:>7.2f} {m['first_request_rss']:>10.0f} {m['warm_rss']:>11.0f}")
+    print(f"[INFO] Time to first request: {medians['background']['first_request'] / medians['eager']['first_request']:.0%}"
+          f" of eager")
+
+    for mode, runs in results.items():
+        print(f"\nStartup phases ({mode}, last run)")
+        for phase in runs[-1]['phases']:
+            print(f"  {phase['phase']:<22} {phase['ms']:>8.1f} ms {phase['rss_mb']:>7.1f} MB "
+                  f"{phase['modules']:>5} modules")
+
+    breakdown = {mode: import_breakdown(mode) for mode in MODES}
+    packages = sorted(breakdown['eager'], key=lambda name: -breakdown['eager'][name])[:args.top]
+    print(f"\n{'import app: self ms by package':<32} {'eager':>8} {'background':>11}")
+    for name in packages:
+        print(f"{name:<32} {breakdown['eager'][name]:>8.1f} {breakdown['background'].get(name, 0.0):>11.1f}")
+    print(f"{'total':<32} {sum(breakdown['eager'].values()):>8.1f} {sum(breakdown['background'].values()):>11.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -22,6 +22,8 @@ class Config:
     """Base configuration class"""
     # Flask Configuration
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-prod')
+    # Token for the /admin/* endpoints (X-Admin-Token header); empty disables them
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
     DEBUG = os.environ.get('FLASK_DEBUG', '0') == '1'
     TESTING = False
     
@@ -52,6 +54,51 @@ class Config:
     # ML Model Paths
     MODEL_PATH = str(BACKEND_DIR / 'pkl' / 'svm_health_risk_model.pkl')
     EMERGENCY_MODEL_PATH = str(BACKEND_DIR / 'pkl' / 'Logistic_regression_prediction.pkl')
+    # Seconds between checks of the models directory for new artifact versions (0 disables hot reload)
+    MODEL_RELOAD_INTERVAL = int(os.environ.get('MODEL_RELOAD_INTERVAL', 30))
+    
+    # Seconds between re-reads of the shared active-dispatch counters from the database
+    DISPATCH_RESYNC_SECONDS = float(os.environ.get('DISPATCH_RESYNC_SECONDS', 60))
+    # Units created (AMB-001, ...) when the ambulances table is empty
+    AMBULANCE_FLEET_SIZE = int(os.environ.get('AMBULANCE_FLEET_SIZE', 10))
+    # Dashboard event stream (/events): keep-alive comment interval and events kept for reconnects
+    EVENT_HEARTBEAT_SECONDS = float(os.environ.get('EVENT_HEARTBEAT_SECONDS', 15))
+    EVENT_RETENTION = int(os.environ.get('EVENT_RETENTION', 1000))
+    # Emergency intake per worker: concurrent requests, waiting requests, max wait and extra Critical slots
+    INTAKE_CAPACITY = int(os.environ.get('INTAKE_CAPACITY', 8))
+    INTAKE_QUEUE_SIZE = int(os.environ.get('INTAKE_QUEUE_SIZE', 64))
+    INTAKE_MAX_WAIT_SECONDS = float(os.environ.get('INTAKE_MAX_WAIT_SECONDS', 10))
+    INTAKE_CRITICAL_RESERVE = int(os.environ.get('INTAKE_CRITICAL_RESERVE', 4))
+    # Repeated emergency submissions: how long an idempotency key and a phone+location match are remembered
+    IDEMPOTENCY_KEY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_KEY_TTL_SECONDS', 600))
+    DUPLICATE_WINDOW_SECONDS = float(os.environ.get('DUPLICATE_WINDOW_SECONDS', 120))
+    # Seconds between outbox polls of each worker (AI-triggered emergencies from add_record)
+    OUTBOX_POLL_SECONDS = float(os.environ.get('OUTBOX_POLL_SECONDS', 1))
+    # Per-request SQL profiling (sql_profiler.py): off by default; slow-query threshold and N+1 repeat count
+    SQL_PROFILING = os.environ.get('SQL_PROFILING', 'False').lower() == 'true'
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+    SQL_REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', 5))
+    # Seconds between publishes of each worker's /metrics values (0: /metrics shows the serving worker only)
+    METRICS_PUBLISH_INTERVAL = float(os.environ.get('METRICS_PUBLISH_INTERVAL', 15))
+    # Request tracing (tracing.py): OTLP JSON lines appended to TRACE_FILE (empty disables) for a sample of requests
+    TRACE_FILE = os.environ.get('TRACE_FILE', '')
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.1))
+    # Load the models and Firebase after startup in each worker (startup.py); False loads them at import
+    WARM_UP_IN_BACKGROUND = os.environ.get('WARM_UP_IN_BACKGROUND', 'True').lower() == 'true'
+    
+    # Optional inference sidecar (inference_server.py); empty disables it
+    INFERENCE_SOCKET = os.environ.get('INFERENCE_SOCKET', '')
+    INFERENCE_TIMEOUT_MS = int(os.environ.get('INFERENCE_TIMEOUT_MS', 50))
+    INFERENCE_BATCH_WINDOW_MS = float(os.environ.get('INFERENCE_BATCH_WINDOW_MS', 2))
+    INFERENCE_MAX_BATCH = int(os.environ.get('INFERENCE_MAX_BATCH', 64))
+    
+    # Optional prediction log for retraining/drift analysis (prediction_log.py); empty disables it
+    PREDICTION_LOG_DIR = os.environ.get('PREDICTION_LOG_DIR', '')
+    PREDICTION_LOG_BATCH = int(os.environ.get('PREDICTION_LOG_BATCH', 256))
+    PREDICTION_LOG_ROTATE_ROWS = int(os.environ.get('PREDICTION_LOG_ROTATE_ROWS', 50000))
+    
+    # Seconds between publishes of each worker's feature-drift statistics (0 disables drift monitoring)
+    DRIFT_PUBLISH_INTERVAL = float(os.environ.get('DRIFT_PUBLISH_INTERVAL', 30))
     
     # Flask Template/Static Configuration
     TEMPLATE_FOLDER = str(FRONTEND_DIR / 'templates')
@@ -62,8 +109,10 @@ class Config:
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
     
-    # Logging
+    # Logging: a root level plus optional per-module levels, e.g. 'INFO,sql_profiler=DEBUG' (app_logging.py)
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    # Fraction of hot-path debug lines (logins, OTP checks) kept when DEBUG is on
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0.01))
 
 class DevelopmentConfig(Config):
     """Development configuration"""
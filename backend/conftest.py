@@ -0,0 +1,48 @@
+"""
+Shared pytest fixtures for the backend test scripts
+
+app_db points the Flask app at a fresh database for one test. The scripts
+can still be run directly (python test_x.py); their runners use
+temporary_app_db(), which does the same outside pytest.
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+
+def _use_app_db(monkeypatch, folder):
+    """Point app.DB_PATH into folder, create the schema and reset the per-database singletons."""
+    import app
+    db_path = os.path.join(str(folder), 'health_system.db')
+    monkeypatch.setattr(app, 'DB_PATH', db_path)
+    app.init_db()
+    # init_db does these too, but it reports failures instead of raising; a
+    # half-built database must fail the test, not leave the last test's state behind
+    conn = app.get_db_connection()
+    try:
+        app.dispatch_state.resync(conn)
+        app.event_bus.reset(conn)
+    finally:
+        conn.close()
+    app.ambulance_allocator.refresh()
+    app.submission_guard.reset()
+    app.hospital_index.invalidate()
+    app.ambulance_analytics.invalidate()
+    return db_path
+
+
+@pytest.fixture
+def app_db(monkeypatch, tmp_path):
+    """Path of a fresh app database, used by the app for the duration of the test."""
+    return _use_app_db(monkeypatch, tmp_path)
+
+
+@contextmanager
+def temporary_app_db():
+    """app_db for the script runners; the database is removed on exit."""
+    with pytest.MonkeyPatch.context() as monkeypatch, tempfile.TemporaryDirectory() as folder:
+        yield _use_app_db(monkeypatch, folder)
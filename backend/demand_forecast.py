@@ -0,0 +1,165 @@
+"""
+Incremental emergency demand rollup and forecaster.
+
+Every emergency insert bumps three rows of the emergency_demand table in the
+same transaction:
+  (state, zone, day, time_slot, hour)  the exact slot of the call
+  (state, '*', day, '*', hour)         the state at that weekday and hour
+  (state, '*', '*', '*', -1)           the state's weekly total
+The hour comes from requested_at (UTC).
+
+Each row keeps an exponentially weighted moving average of its count per
+occurrence. An occurrence is one week, since every slot recurs weekly. The
+average is updated incrementally: the count of the latest week is folded in
+when a later week starts, and weeks without calls decay it by (1 - alpha)
+each. The average starts at zero, so forecasts divide by
+1 - (1 - alpha)^weeks (as in bias-corrected EWMAs). A forecast is
+therefore a few primary-key lookups plus O(1) arithmetic, instead of a COUNT
+over the emergencies table.
+"""
+from datetime import date, datetime
+
+from tracing import traced
+
+ALL = '*'
+ALL_HOURS = -1
+HOURS_PER_WEEK = 168
+DEFAULT_STATE = 'All India'
+_FIRST_MONDAY = date(1970, 1, 5)
+
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS emergency_demand (
+       state TEXT NOT NULL,
+       zone TEXT NOT NULL,
+       day TEXT NOT NULL,
+       time_slot TEXT NOT NULL,
+       hour INTEGER NOT NULL,
+       total INTEGER NOT NULL DEFAULT 0,
+       ewma REAL NOT NULL DEFAULT 0,
+       first_week INTEGER NOT NULL,
+       last_week INTEGER NOT NULL,
+       last_week_count INTEGER NOT NULL DEFAULT 0,
+       PRIMARY KEY (state, zone, day, time_slot, hour)
+   )'''
+
+
+def week_number(when):
+    """Weeks since the Monday 1970-01-05."""
+    return (when.date() - _FIRST_MONDAY).days // 7
+
+
+def demand_keys(state, zone, day, time_slot, hour):
+    """Rollup keys for one call: exact slot, state at that weekday and hour, state week."""
+    state = state or DEFAULT_STATE
+    return (
+        (state, zone or ALL, day or ALL, time_slot or ALL, hour),
+        (state, ALL, day or ALL, ALL, hour),
+        (state, ALL, ALL, ALL, ALL_HOURS),
+    )
+
+
+class DemandForecaster:
+    """EWMA demand per rollup key; all state lives in the emergency_demand table."""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+
+    def _folded(self, ewma, last_week, last_week_count, week):
+        """The average over all weeks before week."""
+        if week <= last_week:
+            return ewma
+        ewma = (1 - self.alpha) * ewma + self.alpha * last_week_count
+        return ewma * (1 - self.alpha) ** (week - last_week - 1)
+
+    @traced('demand_forecast.record')
+    def record(self, conn, state, zone, day, time_slot, when):
+        """Count one call at when (a UTC datetime). The caller commits."""
+        week = week_number(when)
+        for key in demand_keys(state, zone, day, time_slot, when.hour):
+            row = conn.execute('SELECT ewma, first_week, last_week, last_week_count FROM emergency_demand '
+                               'WHERE state = ? AND zone = ? AND day = ? AND time_slot = ? AND hour = ?',
+                               key).fetchone()
+            if row is None:
+                conn.execute('INSERT INTO emergency_demand (state, zone, day, time_slot, hour, total, ewma, first_week, '
+                             'last_week, last_week_count) VALUES (?, ?, ?, ?, ?, 1, 0, ?, ?, 1)', key + (week, week))
+                continue
+            ewma, first_week, last_week, last_week_count = row
+            if week == last_week:
+                last_week_count += 1
+            elif week > last_week:
+                ewma, last_week, last_week_count = self._folded(ewma, last_week, last_week_count, week), week, 1
+            else:
+                # A late call: add its weight to the average of the weeks before last_week
+                ewma += self.alpha * (1 - self.alpha) ** (last_week - 1 - week)
+                first_week = min(first_week, week)
+            conn.execute('UPDATE emergency_demand SET total = total + 1, ewma = ?, first_week = ?, last_week = ?, '
+                         'last_week_count = ? WHERE state = ? AND zone = ? AND day = ? AND time_slot = ? AND hour = ?',
+                         (ewma, first_week, last_week, last_week_count) + key)
+
+    def expected(self, conn, key, when):
+        """Expected calls for key in the week of when, or None without a completed week of history."""
+        row = conn.execute('SELECT ewma, first_week, last_week, last_week_count FROM emergency_demand '
+                           'WHERE state = ? AND zone = ? AND day = ? AND time_slot = ? AND hour = ?', key).fetchone()
+        week = week_number(when)
+        if row is None or week <= row[1]:
+            return None
+        ewma = self._folded(row[0], row[2], row[3], week)
+        return ewma / (1 - (1 - self.alpha) ** (week - row[1]))
+
+    @traced('demand_forecast.forecast')
+    def forecast(self, conn, state, zone, day, time_slot, when, available_ambulances):
+        """
+        Demand level (LOW/MEDIUM/HIGH), explanation factors and the rates they
+        come from, for a call in this slot.
+        """
+        exact_key, area_key, week_key = demand_keys(state, zone, day, time_slot, when.hour)
+        area = self.expected(conn, area_key, when)
+        weekly = self.expected(conn, week_key, when)
+        exact = self.expected(conn, exact_key, when)
+        place = area_key[0]
+        factors = []
+        if area is None or not weekly:
+            factors.append(f'No demand history for {place} at this hour yet')
+            level = 'HIGH' if available_ambulances == 0 else 'MEDIUM'
+            baseline = ratio = None
+        else:
+            baseline = weekly / HOURS_PER_WEEK
+            ratio = area / baseline
+            factors.append(f'Expected {area:.1f} calls/hour in {place} on {day or "this day"}s at {when.hour:02d}:00 UTC')
+            factors.append(f'{ratio:.1f}x the average of {baseline:.2f} calls/hour for {place}')
+            if exact is not None and (zone or time_slot):
+                factors.append(f'{exact:.1f} calls/hour expected for {zone or "all"} zones in the '
+                               f'{(time_slot or "current").lower()} slot')
+            # Most hours of a week see no calls, so an hour at or below the average is quiet
+            if area >= available_ambulances or ratio >= 2.0:
+                level = 'HIGH'
+            elif ratio < 1.0:
+                level = 'LOW'
+            else:
+                level = 'MEDIUM'
+        if available_ambulances > (2 if area is None else area):
+            factors.append(f'Adequate ambulance availability ({available_ambulances} free)')
+        else:
+            factors.append(f'Limited ambulance availability ({available_ambulances} free)')
+        return {
+            'level': level,
+            'factors': factors,
+            'expected_per_hour': None if area is None else round(area, 3),
+            'slot_expected_per_hour': None if exact is None else round(exact, 3),
+            'baseline_per_hour': None if baseline is None else round(baseline, 3),
+            'ratio': None if ratio is None else round(ratio, 2),
+        }
+
+    def rebuild(self, conn):
+        """Refill the rollup from the emergencies table (for databases that predate it). The caller commits."""
+        conn.execute('DELETE FROM emergency_demand')
+        rows = conn.execute('SELECT state, zone, day, time_slot, requested_at FROM emergencies '
+                            'WHERE requested_at IS NOT NULL ORDER BY requested_at').fetchall()
+        replayed = 0
+        for state, zone, day, time_slot, requested_at in rows:
+            try:
+                when = datetime.fromisoformat(requested_at)
+            except (TypeError, ValueError):
+                continue
+            self.record(conn, state, zone, day, time_slot, when)
+            replayed += 1
+        return replayed
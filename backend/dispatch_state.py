@@ -0,0 +1,151 @@
+"""
+Emergency dispatch lifecycle and live active-request counts.
+
+Each emergency moves Pending -> Dispatched -> En Route -> Arrived -> Closed;
+any active request can also be closed directly (cancelled). Only the
+ambulance allocator (ambulance_allocator.py) moves a request to Dispatched,
+when it assigns a unit. The state is stored
+as an indexed integer code in emergencies.status_code next to the
+human-readable status text. Each transition reads and updates the state in
+one write transaction, so two workers can never both move the same request
+out of the same state.
+
+Counts of requests per active state live in shared memory. gunicorn
+imports the app once and forks its workers from it (preload_app), so all
+workers update and read the same counters: /emergency gets active and
+available counts in O(1) instead of scanning the emergencies table. The
+counters are re-read from the database (an index-only count of active
+rows) every resync_interval seconds, which bounds drift from writes made
+outside this module and makes non-preloaded processes converge as well.
+"""
+import multiprocessing
+import time
+from datetime import datetime
+
+PENDING = 0
+DISPATCHED = 1
+EN_ROUTE = 2
+ARRIVED = 3
+CLOSED = 4
+
+STATUS_LABELS = {PENDING: 'Pending', DISPATCHED: 'Dispatched', EN_ROUTE: 'En Route', ARRIVED: 'Arrived',
+                 CLOSED: 'Closed'}
+ACTIVE_CODES = (PENDING, DISPATCHED, EN_ROUTE, ARRIVED)
+# State -> states it may be entered from by hand (Dispatched is set by the allocator)
+TRANSITIONS = {
+    EN_ROUTE: (DISPATCHED,),
+    ARRIVED: (DISPATCHED, EN_ROUTE),
+    CLOSED: ACTIVE_CODES,
+}
+
+INDEX_SQL = 'CREATE INDEX IF NOT EXISTS idx_emergencies_status_code ON emergencies (status_code)'
+
+
+class InvalidTransition(ValueError):
+    """Raised when a request cannot move to the requested state."""
+
+
+def parse_status(value):
+    """Status code from a code or a label ('en route', 'En Route', '2', ...)."""
+    text = str(value).strip().lower().replace('_', ' ')
+    if text.isdigit() and int(text) in STATUS_LABELS:
+        return int(text)
+    for code, label in STATUS_LABELS.items():
+        if label.lower() == text:
+            return code
+    raise ValueError(f'unknown dispatch status: {value!r}')
+
+
+class DispatchState:
+    """Dispatch transitions plus per-state active counts shared by all workers."""
+
+    def __init__(self, connect, resync_interval=60.0):
+        self._connect = connect
+        self.resync_interval = resync_interval
+        # Indexed by status code; CLOSED is not counted (it only grows)
+        self._counts = multiprocessing.Array('q', max(STATUS_LABELS) + 1)
+        self._synced_at = multiprocessing.Value('d', 0.0, lock=False)
+
+    def resync(self, conn=None):
+        """Reload the active counts from the database."""
+        own_conn = conn is None
+        conn = conn or self._connect()
+        try:
+            rows = conn.execute(
+                f'SELECT status_code, COUNT(*) FROM emergencies WHERE status_code IN '
+                f'({", ".join("?" * len(ACTIVE_CODES))}) GROUP BY status_code', ACTIVE_CODES
+            ).fetchall()
+        finally:
+            if own_conn:
+                conn.close()
+        counts = dict((row[0], row[1]) for row in rows)
+        with self._counts.get_lock():
+            for code in ACTIVE_CODES:
+                self._counts[code] = counts.get(code, 0)
+            self._synced_at.value = time.time()
+
+    def _maybe_resync(self):
+        if time.time() - self._synced_at.value >= self.resync_interval:
+            self.resync()
+
+    def counts(self):
+        """{'Pending': n, 'Dispatched': n, 'En Route': n, 'Arrived': n}"""
+        self._maybe_resync()
+        with self._counts.get_lock():
+            return {STATUS_LABELS[code]: self._counts[code] for code in ACTIVE_CODES}
+
+    def active_count(self):
+        """Number of requests not yet closed."""
+        self._maybe_resync()
+        with self._counts.get_lock():
+            return sum(self._counts[code] for code in ACTIVE_CODES)
+
+    def opened(self, code=PENDING):
+        """Count a request the caller just inserted with this status_code (after commit)."""
+        with self._counts.get_lock():
+            self._counts[code] += 1
+
+    def moved(self, old_code, new_code):
+        """Count a transition the caller just committed."""
+        with self._counts.get_lock():
+            self._counts[old_code] -= 1
+            if new_code in ACTIVE_CODES:
+                self._counts[new_code] += 1
+
+    def advance(self, emergency_id, status, before_commit=None):
+        """
+        Move one emergency to status (a code or label) and return the previous code.
+        Raises LookupError for an unknown id and InvalidTransition otherwise.
+        before_commit(conn, old_code, new_code, when) runs inside the transaction,
+        after the update.
+        """
+        new_code = parse_status(status)
+        if new_code not in TRANSITIONS:
+            raise InvalidTransition(f'requests cannot be moved to {STATUS_LABELS[new_code]} by hand')
+        allowed = TRANSITIONS[new_code]
+        conn = self._connect()
+        try:
+            # Lock the database for writing so the read and the update see the same state
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT status_code FROM emergencies WHERE id = ?', (emergency_id,)).fetchone()
+            if row is None:
+                conn.rollback()
+                raise LookupError(f'emergency {emergency_id} not found')
+            old_code = row[0]
+            if old_code not in allowed:
+                conn.rollback()
+                raise InvalidTransition(f'emergency {emergency_id} is {STATUS_LABELS.get(old_code, old_code)}, '
+                                        f'cannot move to {STATUS_LABELS[new_code]}')
+            now = datetime.utcnow()
+            conn.execute(
+                'UPDATE emergencies SET status_code = ?, status = ?, status_updated_at = ? WHERE id = ?',
+                (new_code, STATUS_LABELS[new_code], now.isoformat(), emergency_id),
+            )
+            if before_commit is not None:
+                before_commit(conn, old_code, new_code, now)
+            conn.commit()
+        finally:
+            conn.close()
+
+        self.moved(old_code, new_code)
+        return old_code
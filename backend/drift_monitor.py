@@ -0,0 +1,358 @@
+"""
+Live feature-drift and class-distribution statistics for the deployed models.
+
+predict_health_risk and predict_emergency_priority hand DriftMonitor.observe()
+the feature row they encoded and the class they predicted. Each worker keeps
+one FeatureSketch per model version, updated in O(1) per feature:
+  - running mean and variance (Welford)
+  - a fixed-bin histogram per feature (one-hot columns give category frequencies)
+  - per-class prediction counts
+A background thread publishes the sketches to the model_drift_stats table,
+one row per worker, model and version. /admin/model_drift merges the rows of
+all workers (sketches are mergeable) and compares them with the training-time
+reference sketch stored in the artifact as reference_stats, scoring drift
+with the population stability index (PSI) and KL divergence.
+"""
+import atexit
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from featurizer import EMERGENCY_FIELDS
+from model_registry import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Equal-width histogram bins over [0, 1], the range every encoded feature is scaled into
+N_BINS = 10
+# Usual PSI reading: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant shift
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+MIN_OBSERVATIONS = 100
+STATS_RETENTION_DAYS = 7
+_EPSILON = 1e-4
+
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS model_drift_stats (
+       worker TEXT NOT NULL,
+       model_name TEXT NOT NULL,
+       model_version TEXT NOT NULL,
+       state TEXT NOT NULL,
+       updated_at TEXT NOT NULL,
+       PRIMARY KEY (worker, model_name, model_version)
+   )'''
+
+
+class FeatureSketch:
+    """Mergeable streaming statistics of one model's feature rows and predictions."""
+
+    def __init__(self, feature_names, n_bins=N_BINS):
+        self.feature_names = list(feature_names)
+        self.n_bins = n_bins
+        n_features = len(self.feature_names)
+        self._columns = np.arange(n_features)
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.hist = np.zeros((n_features, n_bins), dtype=np.int64)
+        self.class_counts = {}
+
+    def _bins(self, values):
+        # Values outside [0, 1] land in the first or last bin
+        return np.clip((values * self.n_bins).astype(np.int64), 0, self.n_bins - 1)
+
+    def update(self, row, predicted_class=None):
+        """Add one feature row (and its predicted class)."""
+        x = np.asarray(row, dtype=np.float64).ravel()
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.hist[self._columns, self._bins(x)] += 1
+        if predicted_class is not None:
+            label = str(predicted_class)
+            self.class_counts[label] = self.class_counts.get(label, 0) + 1
+
+    def update_batch(self, X, labels=None):
+        """Add a matrix of rows at once (training-time reference statistics)."""
+        X = np.asarray(X, dtype=np.float64)
+        if not len(X):
+            return self
+        batch_mean = X.mean(axis=0)
+        self._combine(len(X), batch_mean, ((X - batch_mean) ** 2).sum(axis=0))
+        bins = self._bins(X)
+        for j in self._columns:
+            self.hist[j] += np.bincount(bins[:, j], minlength=self.n_bins)
+        if labels is not None:
+            for label, count in zip(*np.unique(np.asarray(labels).astype(str), return_counts=True)):
+                self.class_counts[str(label)] = self.class_counts.get(str(label), 0) + int(count)
+        return self
+
+    def _combine(self, count, mean, m2):
+        # Chan et al. parallel update of mean and sum of squared deviations
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    def merge(self, other):
+        """Fold another sketch of the same schema into this one."""
+        if other.feature_names != self.feature_names or other.n_bins != self.n_bins:
+            raise ValueError('cannot merge sketches with different feature schemas')
+        if other.count:
+            self._combine(other.count, other.mean, other.m2)
+            self.hist += other.hist
+        for label, count in other.class_counts.items():
+            self.class_counts[label] = self.class_counts.get(label, 0) + count
+        return self
+
+    def std(self):
+        return np.sqrt(self.m2 / self.count) if self.count else np.zeros(len(self.feature_names))
+
+    def to_dict(self):
+        return {
+            'feature_names': self.feature_names,
+            'n_bins': self.n_bins,
+            'count': self.count,
+            'mean': self.mean.tolist(),
+            'm2': self.m2.tolist(),
+            'hist': self.hist.tolist(),
+            'class_counts': dict(self.class_counts),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state['feature_names'], state['n_bins'])
+        sketch.count = int(state['count'])
+        sketch.mean = np.array(state['mean'], dtype=np.float64)
+        sketch.m2 = np.array(state['m2'], dtype=np.float64)
+        sketch.hist = np.array(state['hist'], dtype=np.int64).reshape(len(sketch.feature_names), sketch.n_bins)
+        sketch.class_counts = {str(k): int(v) for k, v in state['class_counts'].items()}
+        return sketch
+
+
+def reference_stats(feature_names, X, labels=None):
+    """Reference sketch of a training set, stored in artifacts as reference_stats."""
+    return FeatureSketch(feature_names).update_batch(X, labels).to_dict()
+
+
+@lru_cache(maxsize=8)
+def synthetic_reference(model_name, feature_names, n_samples=10000):
+    """
+    Reference sketch for artifacts saved without reference_stats, rebuilt from
+    the seeded synthetic generator the training script uses.
+    """
+    if model_name == 'health_risk':
+        from featurizer import RISK_LEVELS
+        from train_model import generate_synthetic_data
+        X, y = generate_synthetic_data(n_samples)
+        y = np.take(RISK_LEVELS, y)
+    else:
+        from featurizer import emergency_encoder
+        from train_emergency_model import generate_synthetic_requests
+        requests, y = generate_synthetic_requests(n_samples)
+        X = emergency_encoder(list(feature_names)).transform(requests)
+    return FeatureSketch(feature_names).update_batch(X, y)
+
+
+def distribution_drift(observed, reference):
+    """PSI and KL(observed || reference) between two count vectors."""
+    p = np.asarray(observed, dtype=np.float64)
+    q = np.asarray(reference, dtype=np.float64)
+    # Floor empty bins so a category unseen on one side gives a large but finite score
+    p = np.maximum(p / max(p.sum(), 1.0), _EPSILON)
+    q = np.maximum(q / max(q.sum(), 1.0), _EPSILON)
+    log_ratio = np.log(p / q)
+    return {'psi': round(float(np.sum((p - q) * log_ratio)), 4), 'kl': round(float(np.sum(p * log_ratio)), 4)}
+
+
+def one_hot_groups(feature_names):
+    """{'State': [(column index, 'Bihar'), ...]} for one-hot columns named <Prefix>_<Value>."""
+    groups = {}
+    for i, name in enumerate(feature_names):
+        for prefix in EMERGENCY_FIELDS:
+            if name.startswith(prefix + '_'):
+                groups.setdefault(prefix, []).append((i, name[len(prefix) + 1:]))
+                break
+    return groups
+
+
+def _category_counts(sketch, columns):
+    # Mean of a 0/1 column is its frequency; drop_first layouts leave the rest to the baseline
+    counts = {value: sketch.mean[i] * sketch.count for i, value in columns}
+    counts['(baseline)'] = max(sketch.count - sum(counts.values()), 0.0)
+    return counts
+
+
+def _rates(counts):
+    total = sum(counts.values())
+    return {key: round(value / total, 4) for key, value in counts.items()} if total else {}
+
+
+def drift_report(observed, reference=None):
+    """
+    Observed statistics next to the reference, with PSI/KL per numeric
+    feature, per one-hot group and for the predicted class distribution.
+    """
+    report = {'observed': observed.count if observed else 0,
+              'reference': reference.count if reference else 0,
+              'features': {}, 'one_hot': {}, 'classes': {}, 'max_psi': None, 'status': 'no_reference'}
+    base = observed or reference
+    if base is None:
+        report['status'] = 'no_data'
+        return report
+    if observed and reference and observed.feature_names != reference.feature_names:
+        reference = None
+        report['status'] = 'schema_mismatch'
+    compare = observed is not None and reference is not None and observed.count > 0
+    psis = []
+
+    groups = one_hot_groups(base.feature_names)
+    grouped = {i for columns in groups.values() for i, _ in columns}
+    for i, name in enumerate(base.feature_names):
+        if i in grouped:
+            continue
+        entry = {}
+        if observed and observed.count:
+            entry.update(mean=round(float(observed.mean[i]), 4), std=round(float(observed.std()[i]), 4))
+        if reference:
+            entry.update(reference_mean=round(float(reference.mean[i]), 4),
+                         reference_std=round(float(reference.std()[i]), 4))
+        if compare:
+            entry.update(distribution_drift(observed.hist[i], reference.hist[i]))
+            psis.append(entry['psi'])
+        report['features'][name] = entry
+
+    for prefix, columns in groups.items():
+        entry = {}
+        observed_counts = _category_counts(observed, columns) if observed and observed.count else None
+        reference_counts = _category_counts(reference, columns) if reference else None
+        if observed_counts:
+            entry['frequencies'] = _rates(observed_counts)
+        if reference_counts:
+            entry['reference_frequencies'] = _rates(reference_counts)
+        if compare:
+            entry.update(distribution_drift(list(observed_counts.values()), list(reference_counts.values())))
+            psis.append(entry['psi'])
+        report['one_hot'][prefix] = entry
+
+    labels = sorted(set(observed.class_counts if observed else {}) | set(reference.class_counts if reference else {}))
+    classes = {}
+    if observed and observed.class_counts:
+        classes['rates'] = _rates(observed.class_counts)
+    if reference and reference.class_counts:
+        classes['reference_rates'] = _rates(reference.class_counts)
+    if compare and observed.class_counts and reference.class_counts:
+        classes.update(distribution_drift([observed.class_counts.get(k, 0) for k in labels],
+                                          [reference.class_counts.get(k, 0) for k in labels]))
+        psis.append(classes['psi'])
+    report['classes'] = classes
+
+    if compare:
+        report['max_psi'] = max(psis) if psis else 0.0
+        if observed.count < MIN_OBSERVATIONS:
+            report['status'] = 'insufficient_data'
+        elif report['max_psi'] >= PSI_SIGNIFICANT:
+            report['status'] = 'significant'
+        elif report['max_psi'] >= PSI_MODERATE:
+            report['status'] = 'moderate'
+        else:
+            report['status'] = 'stable'
+    return report
+
+
+class DriftMonitor:
+    """Per-worker sketches of served predictions, published to SQLite for aggregation."""
+
+    def __init__(self, db_path, publish_interval=30.0):
+        self.db_path = db_path
+        self.publish_interval = publish_interval
+        self.worker_id = None
+        self._sketches = {}
+        self._lock = threading.Lock()
+        self._publisher_pid = None
+
+    def observe(self, model_name, model_version, feature_names, row, predicted_class=None):
+        """Add one prediction to this worker's sketch of the model version."""
+        if self._publisher_pid != os.getpid():
+            self._start_publisher()
+        key = (model_name, str(model_version))
+        with self._lock:
+            sketch = self._sketches.get(key)
+            if sketch is None:
+                sketch = self._sketches[key] = FeatureSketch(feature_names)
+            if len(row) == len(sketch.feature_names):
+                sketch.update(row, predicted_class)
+
+    def _start_publisher(self):
+        # gunicorn forks after preload: every worker publishes under its own id
+        with self._lock:
+            if self._publisher_pid == os.getpid():
+                return
+            self._publisher_pid = os.getpid()
+            self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{int(time.time())}"
+            self._sketches = {}
+        thread = threading.Thread(target=self._publish_loop, name='drift-monitor-publisher', daemon=True)
+        thread.start()
+        atexit.register(self._try_publish)
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(self.publish_interval)
+            self._try_publish()
+
+    def _try_publish(self):
+        try:
+            self.publish()
+        except Exception as e:
+            logger.warning('Drift statistics publish failed: %s', e)
+
+    def publish(self):
+        """Write this worker's sketches to model_drift_stats."""
+        with self._lock:
+            rows = [(self.worker_id, model_name, version, json.dumps(sketch.to_dict()))
+                    for (model_name, version), sketch in self._sketches.items()]
+        if rows:
+            run_blocking(self._write, rows)
+
+    def _write(self, rows):
+        now = datetime.utcnow()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO model_drift_stats (worker, model_name, model_version, state, updated_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [row + (now.isoformat(),) for row in rows],
+            )
+            # Workers that stopped long ago
+            conn.execute('DELETE FROM model_drift_stats WHERE updated_at < ?',
+                         ((now - timedelta(days=STATS_RETENTION_DAYS)).isoformat(),))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def load_merged_sketch(db_path, model_name, model_version):
+    """Merge the published sketches of all workers. Returns (sketch or None, worker count)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('SELECT state FROM model_drift_stats WHERE model_name = ? AND model_version = ?',
+                            (model_name, str(model_version))).fetchall()
+    finally:
+        conn.close()
+    merged = None
+    for (state,) in rows:
+        sketch = FeatureSketch.from_dict(json.loads(state))
+        if merged is None:
+            merged = sketch
+        elif sketch.feature_names == merged.feature_names:
+            merged.merge(sketch)
+    return merged, len(rows)
@@ -0,0 +1,185 @@
+"""
+Server-sent events for hospital dashboards.
+
+EventBus delivers small JSON events to the subscribers of every worker:
+new emergencies, AI alerts raised by add_record and dispatch count updates.
+The events table of the database stands in for a message broker.
+publish() appends a row and raises a sequence number in shared memory
+(gunicorn forks its workers from the preloaded app). One listener thread
+per worker sleeps until the sequence moves past the last row it has seen,
+reads the new rows once and hands them to its local subscribers. An idle
+dashboard is a small queue plus a greenlet waiting on a condition (the
+gevent worker patches threading), so idle connections never touch the
+database.
+
+Event ids are row ids. A reconnecting EventSource sends Last-Event-ID and
+replay() returns what it missed, as long as it is still among the last
+`retention` events. A subscriber whose queue overflows is marked lost and
+its stream ends, so the browser reconnects and catches up the same way.
+"""
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS events (
+       id INTEGER PRIMARY KEY AUTOINCREMENT,
+       topic TEXT NOT NULL,
+       hospital_id INTEGER,
+       data TEXT NOT NULL,
+       created_at TEXT NOT NULL
+   )'''
+
+Event = namedtuple('Event', 'id topic hospital_id data')
+
+
+def format_event(event):
+    """The event as an SSE frame."""
+    return f'id: {event.id}\nevent: {event.topic}\ndata: {event.data}\n\n'
+
+
+class Subscription:
+    """Events for one dashboard: broadcasts plus those addressed to its hospital."""
+
+    def __init__(self, hospital_id, queue_size):
+        self.hospital_id = hospital_id
+        self.lost = False
+        self._events = deque()
+        self._queue_size = queue_size
+        self._ready = threading.Condition()
+
+    def wants(self, event):
+        return event.hospital_id is None or event.hospital_id == self.hospital_id
+
+    def put(self, event):
+        with self._ready:
+            if self.lost:
+                return
+            if len(self._events) >= self._queue_size:
+                self.lost = True
+                self._events.clear()
+            else:
+                self._events.append(event)
+            self._ready.notify()
+
+    def wait(self, timeout):
+        """Events queued so far, waiting up to timeout seconds for the first one."""
+        with self._ready:
+            if not self._events and not self.lost:
+                self._ready.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+        return events
+
+
+class EventBus:
+    """Cross-worker publish/subscribe over the events table."""
+
+    def __init__(self, connect, poll_interval=0.25, retention=1000, queue_size=100):
+        self._connect = connect
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.queue_size = queue_size
+        self._sequence = multiprocessing.Value('q', 0)
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._seen = None
+        self._listener = None
+
+    def publish(self, topic, data, hospital_id=None):
+        """Store an event for all subscribers (or those of one hospital); returns its id."""
+        conn = self._connect()
+        try:
+            cur = conn.execute('INSERT INTO events (topic, hospital_id, data, created_at) VALUES (?, ?, ?, ?)',
+                               (topic, hospital_id, json.dumps(data, separators=(',', ':')),
+                                datetime.utcnow().isoformat()))
+            event_id = cur.lastrowid
+            if event_id % 100 == 0:
+                conn.execute('DELETE FROM events WHERE id <= ?', (event_id - self.retention,))
+            conn.commit()
+        finally:
+            conn.close()
+        with self._sequence.get_lock():
+            self._sequence.value = max(self._sequence.value, event_id)
+        return event_id
+
+    def reset(self, conn):
+        """Take the sequence from the events table (at startup, before workers fork)."""
+        latest = conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+        with self._sequence.get_lock():
+            self._sequence.value = latest
+        self._seen = latest
+
+    def _read_since(self, conn, last_id, limit):
+        rows = conn.execute('SELECT id, topic, hospital_id, data FROM events WHERE id > ? ORDER BY id LIMIT ?',
+                            (last_id, limit)).fetchall()
+        return [Event(*row) for row in rows]
+
+    def replay(self, last_id, hospital_id):
+        """Events after last_id that a subscriber of hospital_id would have received."""
+        conn = self._connect()
+        try:
+            events = self._read_since(conn, last_id, self.retention)
+        finally:
+            conn.close()
+        return [event for event in events if event.hospital_id is None or event.hospital_id == hospital_id]
+
+    def subscribe(self, hospital_id=None):
+        subscription = Subscription(hospital_id, self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._listener is None:
+                if self._seen is None:
+                    conn = self._connect()
+                    try:
+                        self.reset(conn)
+                    finally:
+                        conn.close()
+                self._listener = threading.Thread(target=self._listen, name='event-bus', daemon=True)
+                self._listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def _listen(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning('Event bus poll failed: %s', e)
+
+    def poll(self):
+        """Hand events published since the last poll to this worker's subscribers."""
+        published = self._sequence.value
+        if published <= self._seen:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            self._seen = published
+            return
+        conn = self._connect()
+        try:
+            events = self._read_since(conn, self._seen, self.retention)
+        finally:
+            conn.close()
+        for event in events:
+            for subscription in subscribers:
+                if subscription.wants(event):
+                    subscription.put(event)
+        if len(events) == self.retention:
+            self._seen = events[-1].id  # More to read on the next poll
+        else:
+            # Rows up to published were committed before it was raised, so none is left behind
+            self._seen = max(published, events[-1].id if events else 0)
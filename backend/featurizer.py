@@ -0,0 +1,356 @@
+"""
+Shared featurizers for the health risk and emergency priority models.
+
+Single source of truth for turning raw health metrics into the 13-feature
+vector the SVM was trained on. train_model.py calls it on whole synthetic
+columns and app.predict_health_risk calls it on one row, so the thresholds
+for BP, BMI, cholesterol, glucose, activity inversion and treatment status
+can no longer drift apart between training and serving.
+
+All encoders take array-likes (or scalars) and use NaN for a missing value.
+
+The emergency priority encoder (EmergencyEncoder) is driven by the feature
+schema stored with each model artifact, and is shared the same way between
+train_emergency_model.py and app.predict_emergency_priority.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+HEALTH_FEATURE_NAMES = [
+    'age_normalized',
+    'symptom_severity',
+    'diagnosis_severity',
+    'treatment_severity',
+    'medicine_complexity',
+    'bp_normalized',
+    'bmi_normalized',
+    'cholesterol_normalized',
+    'glucose_normalized',
+    'smoking_risk',
+    'alcohol_risk',
+    'activity_risk',
+    'family_history_risk',
+]
+N_HEALTH_FEATURES = len(HEALTH_FEATURE_NAMES)
+# Health risk class labels, indexed by the model's integer classes
+RISK_LEVELS = ['Low', 'Medium', 'High', 'Critical']
+
+# Score used for any metric that was not measured
+MISSING_METRIC_SCORE = 0.5
+DEFAULT_AGE = 40
+
+TREATMENT_STATUS_ENCODING = {
+    'Recovered': 0.1,
+    'Stable': 0.4,
+    'Under Observation': 0.8,
+    'Critical': 1.0,
+    'Emergency': 1.0,
+}
+TREATMENT_STATUS_DEFAULT = 0.5
+
+# Weights of the composite risk score. Training labels are derived from it and
+# the rule-based fallback uses it when no model is loaded (age is not weighted).
+RISK_WEIGHTS = np.array([0.0, 0.2, 0.2, 0.2, 0.1, 0.1, 0.1, 0.05, 0.05, 0.05, 0.03, 0.03, 0.02])
+
+SYMPTOM_KEYWORDS = [
+    (1.0, ['chest pain', 'difficulty breathing', 'unconscious', 'severe', 'emergency', 'critical',
+           'heart attack', 'stroke']),
+    (0.7, ['pain', 'fever', 'bleeding', 'dizziness', 'nausea', 'vomiting']),
+    (0.4, ['cough', 'headache', 'fatigue', 'weakness']),
+]
+SYMPTOM_DEFAULT = 0.1
+
+DIAGNOSIS_KEYWORDS = [
+    (1.0, ['heart attack', 'stroke', 'severe', 'critical', 'emergency', 'cardiac', 'respiratory failure']),
+    (0.6, ['hypertension', 'diabetes', 'infection', 'fracture', 'injury']),
+    (0.2, ['checkup', 'routine', 'follow-up']),
+]
+DIAGNOSIS_DEFAULT = 0.3
+
+
+def _as_float(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def encode_age(age):
+    """Age in years -> 0-1 (capped at 100); missing age counts as DEFAULT_AGE."""
+    age = _as_float(age)
+    return np.minimum(np.where(np.isnan(age), DEFAULT_AGE, age) / 100.0, 1.0)
+
+
+def encode_bp(systolic, diastolic):
+    """
+    Blood pressure risk (normal: 120/80, high: >140/90).
+    High BP grows with systolic (0.5 at 140, capped at 1.0), low BP (<90/60)
+    is 0.8, normal is 0.3 and a missing reading is 0.5.
+    """
+    systolic = _as_float(systolic)
+    diastolic = _as_float(diastolic)
+    # Nested np.where rather than np.select: same result, far cheaper on a single row
+    encoded = np.where(
+        (systolic > 140) | (diastolic > 90),
+        np.minimum(1.0, 0.5 + (systolic - 140) / 100),
+        np.where((systolic < 90) | (diastolic < 60), 0.8, 0.3),
+    )
+    return np.where(np.isnan(systolic) | np.isnan(diastolic), MISSING_METRIC_SCORE, encoded)
+
+
+def encode_bmi(bmi):
+    """BMI risk: underweight (<18.5) 0.6, normal 0.3, overweight (>25) 0.7, obese (>30) 1.0."""
+    bmi = _as_float(bmi)
+    encoded = np.where(bmi < 18.5, 0.6, np.where(bmi > 30, 1.0, np.where(bmi > 25, 0.7, 0.3)))
+    return np.where(np.isnan(bmi), MISSING_METRIC_SCORE, encoded)
+
+
+_BANDED_LEVELS = np.array([0.3, 0.7, 1.0])
+
+
+def _encode_banded(values, bands):
+    values = _as_float(values)
+    # np.digitize sorts NaN into the top band, so missing values are masked explicitly
+    encoded = _BANDED_LEVELS[np.digitize(values, bands, right=True)]
+    return np.where(np.isnan(values), MISSING_METRIC_SCORE, encoded)
+
+
+def encode_cholesterol(cholesterol):
+    """Cholesterol risk: normal (<=200) 0.3, borderline (<=240) 0.7, high 1.0."""
+    return _encode_banded(cholesterol, [200, 240])
+
+
+def encode_glucose(glucose):
+    """Glucose risk: normal (<=100) 0.3, prediabetic (<=125) 0.7, diabetic 1.0."""
+    return _encode_banded(glucose, [100, 125])
+
+
+def encode_flag(values):
+    """Binary lifestyle factor (smoking, alcohol, family history): anything > 0 is 1."""
+    # NaN > 0 is False, so a missing flag encodes as 0
+    return (_as_float(values) > 0).astype(np.float64)
+
+
+def encode_activity(activity_value):
+    """
+    Physical activity 0-5 hours/week, inverted so more activity = lower risk:
+    0 (none or missing) -> 1.0, 5 or more -> 0.0.
+    """
+    # fmax maps NaN to 0; plain ufuncs instead of np.clip/np.nan_to_num keep one row cheap
+    activity = np.minimum(np.fmax(_as_float(activity_value), 0.0), 5.0)
+    return 1.0 - activity / 5.0
+
+
+def encode_treatment_status(statuses):
+    """Treatment status strings -> severity via TREATMENT_STATUS_ENCODING."""
+    if statuses is None or isinstance(statuses, str):
+        return np.array(TREATMENT_STATUS_ENCODING.get(statuses, TREATMENT_STATUS_DEFAULT))
+    statuses = np.asarray(statuses)
+    encoded = np.full(statuses.shape, TREATMENT_STATUS_DEFAULT)
+    # One comparison pass per known status beats sorting the column with np.unique
+    for status, severity in TREATMENT_STATUS_ENCODING.items():
+        encoded[statuses == status] = severity
+    return encoded
+
+
+def _keyword_severity(text, table, default):
+    text = (text or '').lower()
+    for score, keywords in table:
+        if any(keyword in text for keyword in keywords):
+            return score
+    return default
+
+
+def symptom_severity(text):
+    """Keyword-based severity of a free-text symptom description."""
+    return _keyword_severity(text, SYMPTOM_KEYWORDS, SYMPTOM_DEFAULT)
+
+
+def diagnosis_severity(text):
+    """Keyword-based severity of a free-text diagnosis."""
+    return _keyword_severity(text, DIAGNOSIS_KEYWORDS, DIAGNOSIS_DEFAULT)
+
+
+def medicine_complexity(medicines):
+    """Number of comma-separated medicines, normalized to 0-1 (5 or more = 1.0)."""
+    count = len([m for m in (medicines or '').split(',') if m.strip()])
+    return min(count / 5.0, 1.0)
+
+
+def parse_metric(value):
+    """
+    Raw form/DB value -> float, NaN when missing or unparseable.
+    Zero counts as missing, matching how the dashboard treats blank metrics.
+    """
+    if value is None or value == '':
+        return np.nan
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return value if value else np.nan
+
+
+def parse_coded(value):
+    """Coded select value ('0'-'5', 0/1) -> float; non-numeric text counts as 0."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = (value or '').strip()
+    return float(value) if value.isdigit() else 0.0
+
+
+def health_risk_features(age, symptom_severity, diagnosis_severity, treatment_status, medicine_complexity,
+                         systolic_bp, diastolic_bp, bmi, cholesterol, glucose,
+                         smoking, alcohol, physical_activity, family_history):
+    """
+    Build the (n, 13) health risk feature matrix from raw columns.
+
+    Every argument is an array-like of length n (or a scalar, broadcast).
+    treatment_status holds status strings; the severities and medicine
+    complexity are already on a 0-1 scale; the rest are raw measurements
+    with NaN for missing values.
+    """
+    columns = [
+        encode_age(age),
+        _as_float(symptom_severity),
+        _as_float(diagnosis_severity),
+        encode_treatment_status(treatment_status),
+        _as_float(medicine_complexity),
+        encode_bp(systolic_bp, diastolic_bp),
+        encode_bmi(bmi),
+        encode_cholesterol(cholesterol),
+        encode_glucose(glucose),
+        encode_flag(smoking),
+        encode_flag(alcohol),
+        encode_activity(physical_activity),
+        encode_flag(family_history),
+    ]
+    n_rows = max(np.size(c) for c in columns)
+    features = np.empty((n_rows, N_HEALTH_FEATURES), dtype=np.float64)
+    for i, column in enumerate(columns):
+        features[:, i] = column
+    return features
+
+
+def rule_based_risk_score(features):
+    """Composite 0-1 risk score for each row of a health risk feature matrix."""
+    return np.minimum(np.asarray(features) @ RISK_WEIGHTS, 1.0)
+
+
+# Emergency priority features.
+# Categorical inputs of the emergency form, keyed by the column prefix used in
+# model schemas ('State_Bihar', 'Time_Slot_Night', ...). Order matches the form.
+EMERGENCY_CATEGORIES = {
+    'State': ['All India', 'Uttar Pradesh', 'Maharashtra', 'West Bengal', 'Jharkhand',
+              'Madhya Pradesh', 'Bihar', 'Rajasthan', 'Tamil Nadu', 'Orissa', 'Assam',
+              'Karnataka', 'Andhra Pradesh', 'Haryana', 'Chhatisgarh', 'Jammu and Kashmir',
+              'Telangana', 'Uttarakhand', 'Himachal Pradesh', 'Gujarat', 'Kerala',
+              'Arunachal Pradesh', 'Delhi', 'Nagaland', 'Mizoram', 'Meghalaya',
+              'Tripura', 'Manipur', 'Goa', 'Andaman and Nicobar Island', 'Ladakh',
+              'Sikkim', 'Puducherry', 'Dadra and Nagar Haveli and Daman and Diu', 'Chandigarh'],
+    'Zone': ['Urban', 'Rural', 'Highway'],
+    'Day': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+    'Time_Slot': ['Morning', 'Afternoon', 'Evening', 'Night'],
+    'Emergency_Type': ['EMS', 'Traffic', 'Fire'],
+    'Weather': ['Rain', 'Heatwave', 'Fog', 'Clear'],
+}
+# Schema prefix -> keyword of the request dicts passed to EmergencyEncoder.transform
+EMERGENCY_FIELDS = {
+    'State': 'state',
+    'Zone': 'zone',
+    'Day': 'day',
+    'Time_Slot': 'time_slot',
+    'Emergency_Type': 'emergency_type',
+    'Weather': 'weather',
+}
+EMERGENCY_NUMERIC_FEATURES = ('Age', 'Symptom_Severity')
+EMERGENCY_DEFAULT_AGE_SCORE = 0.5
+
+EMERGENCY_SYMPTOM_KEYWORDS = [
+    (1.0, ['chest pain', 'difficulty breathing', 'unconscious', 'severe', 'emergency', 'critical',
+           'heart attack', 'stroke', 'bleeding', 'trauma', 'accident']),
+    (0.7, ['pain', 'fever', 'vomiting', 'dizziness', 'nausea', 'weakness']),
+    (0.4, ['discomfort', 'mild', 'ache', 'tired']),
+]
+EMERGENCY_SYMPTOM_DEFAULT = 0.2
+
+
+def emergency_symptom_severity(text):
+    """Keyword-based severity of an emergency symptom description."""
+    return _keyword_severity(text, EMERGENCY_SYMPTOM_KEYWORDS, EMERGENCY_SYMPTOM_DEFAULT)
+
+
+def emergency_feature_names(include_numeric=True, drop_first=False):
+    """
+    Feature schema for a new emergency model: optional Age and
+    Symptom_Severity, then one column per category value. drop_first
+    reproduces pandas.get_dummies(drop_first=True) naming with sorted values.
+    """
+    names = list(EMERGENCY_NUMERIC_FEATURES) if include_numeric else []
+    for prefix, values in EMERGENCY_CATEGORIES.items():
+        values = sorted(values)[1:] if drop_first else values
+        names.extend(f'{prefix}_{value}' for value in values)
+    return names
+
+
+class EmergencyEncoder:
+    """
+    Encodes emergency requests for one model's feature schema.
+
+    The schema is the artifact's list of column names; every column is either
+    a numeric feature (EMERGENCY_NUMERIC_FEATURES) or '<Prefix>_<value>' for a
+    categorical field. It is parsed once per model, so serving never has to
+    guess widths or pad rows. A value the schema has no column for (including
+    a drop_first baseline or a missing input) leaves that field all zeros.
+    """
+
+    def __init__(self, feature_names):
+        self.feature_names = list(feature_names)
+        self.n_features = len(self.feature_names)
+        self.numeric = {}
+        self.onehot = {}
+        # Longest prefix first so 'Emergency_Type_' is not read as some shorter prefix
+        prefixes = sorted(EMERGENCY_FIELDS, key=len, reverse=True)
+        for index, name in enumerate(self.feature_names):
+            if name in EMERGENCY_NUMERIC_FEATURES:
+                self.numeric[name] = index
+                continue
+            prefix = next((p for p in prefixes if name.startswith(p + '_')), None)
+            if prefix is None:
+                raise ValueError(f'unknown emergency feature {name!r}')
+            self.onehot[(EMERGENCY_FIELDS[prefix], name[len(prefix) + 1:])] = index
+
+    def transform(self, requests):
+        """
+        Encode a list of request dicts (keys: age, symptoms, state, zone, day,
+        time_slot, emergency_type, weather) into an (n, n_features) matrix.
+        """
+        features = np.zeros((len(requests), self.n_features), dtype=np.float64)
+        if 'Age' in self.numeric:
+            ages = np.array([parse_metric(r.get('age')) for r in requests], dtype=np.float64)
+            features[:, self.numeric['Age']] = np.where(
+                np.isnan(ages), EMERGENCY_DEFAULT_AGE_SCORE, ages / 100.0)
+        if 'Symptom_Severity' in self.numeric:
+            features[:, self.numeric['Symptom_Severity']] = [
+                emergency_symptom_severity(r.get('symptoms')) for r in requests]
+        rows, cols = [], []
+        for row, request in enumerate(requests):
+            for field in EMERGENCY_FIELDS.values():
+                col = self.onehot.get((field, request.get(field)))
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        features[rows, cols] = 1.0
+        return features
+
+    def transform_one(self, **request):
+        """Encode a single request given as keyword arguments; returns a 1-row matrix."""
+        return self.transform([request])
+
+
+@lru_cache(maxsize=8)
+def _cached_emergency_encoder(feature_names):
+    return EmergencyEncoder(feature_names)
+
+
+def emergency_encoder(feature_names):
+    """Shared EmergencyEncoder for a schema (built once per distinct schema)."""
+    return _cached_emergency_encoder(tuple(feature_names))
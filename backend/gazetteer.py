@@ -0,0 +1,168 @@
+"""
+Offline gazetteer for proximity routing.
+
+Approximate coordinates (district headquarters, to about 0.01 degrees) for
+every district in the state -> district dropdown in frontend/static/app.js,
+plus the capital of every state on the emergency form as a coarser fallback.
+Hospital and ambulance districts are free text, so lookups ignore case,
+punctuation and a trailing "district", and accept a few common old names.
+"""
+import re
+
+DISTRICT_COORDINATES = {
+    'Andhra Pradesh': {
+        'Anantapur': (14.68, 77.60), 'Chittoor': (13.22, 79.10), 'East Godavari': (16.96, 82.24),
+        'Guntur': (16.31, 80.44), 'Krishna': (16.19, 81.14), 'Kurnool': (15.83, 78.04),
+        'Nellore': (14.44, 79.99), 'Prakasam': (15.51, 80.05), 'Srikakulam': (18.30, 83.90),
+        'Visakhapatnam': (17.69, 83.22), 'Vizianagaram': (18.11, 83.40), 'West Godavari': (16.71, 81.10),
+        'YSR Kadapa': (14.47, 78.82),
+    },
+    'Karnataka': {
+        'Bagalkot': (16.18, 75.70), 'Ballari': (15.14, 76.92), 'Belagavi': (15.85, 74.50),
+        'Bengaluru Rural': (13.29, 77.54), 'Bengaluru Urban': (12.97, 77.59), 'Bidar': (17.91, 77.52),
+        'Chamarajanagar': (11.92, 76.94), 'Chikkaballapur': (13.43, 77.73), 'Chikkamagaluru': (13.32, 75.77),
+        'Chitradurga': (14.23, 76.40), 'Dakshina Kannada': (12.91, 74.86), 'Davangere': (14.46, 75.92),
+        'Dharwad': (15.46, 75.01), 'Gadag': (15.43, 75.63), 'Hassan': (13.00, 76.10), 'Haveri': (14.79, 75.40),
+        'Kalaburagi': (17.33, 76.83), 'Kodagu': (12.42, 75.74), 'Kolar': (13.14, 78.13), 'Koppal': (15.35, 76.15),
+        'Mandya': (12.52, 76.90), 'Mysuru': (12.30, 76.64), 'Raichur': (16.21, 77.36), 'Ramanagara': (12.72, 77.28),
+        'Shivamogga': (13.93, 75.57), 'Tumakuru': (13.34, 77.10), 'Udupi': (13.34, 74.75),
+        'Uttara Kannada': (14.81, 74.13), 'Vijayapura': (16.83, 75.71), 'Yadgir': (16.77, 77.14),
+    },
+    'Jharkhand': {
+        'Bokaro': (23.67, 86.15), 'Chatra': (24.21, 84.87), 'Deoghar': (24.48, 86.70), 'Dhanbad': (23.80, 86.43),
+        'Dumka': (24.27, 87.25), 'East Singhbhum': (22.80, 86.20), 'Garhwa': (24.16, 83.81),
+        'Giridih': (24.19, 86.30), 'Godda': (24.83, 87.21), 'Gumla': (23.04, 84.54), 'Hazaribagh': (23.99, 85.36),
+        'Jamtara': (23.96, 86.80), 'Khunti': (23.07, 85.28), 'Koderma': (24.47, 85.60), 'Latehar': (23.74, 84.50),
+        'Lohardaga': (23.43, 84.68), 'Pakur': (24.63, 87.85), 'Palamu': (24.03, 84.07), 'Ramgarh': (23.63, 85.51),
+        'Ranchi': (23.34, 85.31), 'Sahibganj': (25.25, 87.64), 'Seraikela Kharsawan': (22.70, 85.93),
+        'Simdega': (22.62, 84.50), 'West Singhbhum': (22.55, 85.81),
+    },
+    'Maharashtra': {
+        'Ahmednagar': (19.09, 74.74), 'Akola': (20.70, 77.00), 'Amravati': (20.93, 77.75),
+        'Aurangabad': (19.88, 75.34), 'Beed': (18.99, 75.76), 'Bhandara': (21.17, 79.65),
+        'Buldhana': (20.53, 76.18), 'Chandrapur': (19.96, 79.30), 'Dhule': (20.90, 74.77),
+        'Gadchiroli': (20.18, 80.00), 'Gondia': (21.46, 80.20), 'Hingoli': (19.72, 77.15),
+        'Jalgaon': (21.00, 75.56), 'Jalna': (19.84, 75.88), 'Kolhapur': (16.70, 74.24), 'Latur': (18.41, 76.56),
+        'Mumbai City': (18.94, 72.83), 'Mumbai Suburban': (19.12, 72.85), 'Nagpur': (21.15, 79.09),
+        'Nanded': (19.14, 77.32), 'Nandurbar': (21.37, 74.24), 'Nashik': (20.00, 73.79),
+        'Osmanabad': (18.19, 76.04), 'Palghar': (19.70, 72.77), 'Parbhani': (19.27, 76.77), 'Pune': (18.52, 73.86),
+        'Raigad': (18.64, 72.87), 'Ratnagiri': (16.99, 73.31), 'Sangli': (16.85, 74.58), 'Satara': (17.69, 74.00),
+        'Sindhudurg': (16.10, 73.69), 'Solapur': (17.66, 75.91), 'Thane': (19.22, 72.98), 'Wardha': (20.74, 78.60),
+        'Washim': (20.11, 77.13), 'Yavatmal': (20.39, 78.12),
+    },
+    'Tamil Nadu': {
+        'Chennai': (13.08, 80.27), 'Coimbatore': (11.02, 76.96), 'Cuddalore': (11.75, 79.75),
+        'Dharmapuri': (12.13, 78.16), 'Dindigul': (10.36, 77.98), 'Erode': (11.34, 77.72),
+        'Kancheepuram': (12.83, 79.70), 'Kanniyakumari': (8.18, 77.41), 'Karur': (10.96, 78.08),
+        'Krishnagiri': (12.52, 78.21), 'Madurai': (9.93, 78.12), 'Nagapattinam': (10.77, 79.84),
+        'Namakkal': (11.22, 78.17), 'Perambalur': (11.23, 78.88), 'Pudukkottai': (10.38, 78.82),
+        'Ramanathapuram': (9.37, 78.83), 'Salem': (11.66, 78.15), 'Sivaganga': (9.85, 78.48),
+        'Thanjavur': (10.79, 79.14), 'The Nilgiris': (11.41, 76.70), 'Theni': (10.01, 77.48),
+        'Thiruvallur': (13.14, 79.91), 'Thiruvarur': (10.77, 79.64), 'Thoothukudi': (8.76, 78.13),
+        'Tiruchirappalli': (10.79, 78.70), 'Tirunelveli': (8.71, 77.76), 'Tiruppur': (11.11, 77.34),
+        'Tiruvannamalai': (12.23, 79.07), 'Vellore': (12.92, 79.13), 'Viluppuram': (11.94, 79.49),
+        'Virudhunagar': (9.58, 77.96),
+    },
+    'Uttar Pradesh': {
+        'Agra': (27.18, 78.01), 'Aligarh': (27.88, 78.08), 'Allahabad': (25.44, 81.85),
+        'Ambedkar Nagar': (26.43, 82.54), 'Amethi': (26.21, 81.69), 'Amroha': (28.90, 78.47),
+        'Auraiya': (26.47, 79.51), 'Azamgarh': (26.07, 83.18), 'Baghpat': (28.94, 77.22), 'Bahraich': (27.57, 81.60),
+        'Ballia': (25.76, 84.15), 'Balrampur': (27.43, 82.18), 'Banda': (25.48, 80.34), 'Barabanki': (26.93, 81.19),
+        'Bareilly': (28.37, 79.43), 'Basti': (26.80, 82.73), 'Bhadohi': (25.39, 82.57), 'Bijnor': (29.37, 78.14),
+        'Budaun': (28.04, 79.13), 'Bulandshahr': (28.41, 77.85), 'Chandauli': (25.26, 83.27),
+        'Chitrakoot': (25.20, 80.90), 'Deoria': (26.50, 83.78), 'Etah': (27.56, 78.66), 'Etawah': (26.78, 79.02),
+        'Faizabad': (26.78, 82.14), 'Farrukhabad': (27.39, 79.58), 'Fatehpur': (25.93, 80.81),
+        'Firozabad': (27.15, 78.40), 'Gautam Buddha Nagar': (28.47, 77.51), 'Ghaziabad': (28.67, 77.45),
+        'Ghazipur': (25.58, 83.58), 'Gonda': (27.13, 81.96), 'Gorakhpur': (26.76, 83.37), 'Hamirpur': (25.95, 80.15),
+        'Hardoi': (27.40, 80.13), 'Hathras': (27.60, 78.05), 'Jalaun': (25.99, 79.45), 'Jaunpur': (25.75, 82.69),
+        'Jhansi': (25.45, 78.57), 'Kannauj': (27.06, 79.92), 'Kanpur Dehat': (26.42, 79.95),
+        'Kanpur Nagar': (26.45, 80.33), 'Kasganj': (27.81, 78.65), 'Kaushambi': (25.53, 81.38),
+        'Kheri': (27.95, 80.78), 'Kushinagar': (26.90, 83.98), 'Lalitpur': (24.69, 78.41), 'Lucknow': (26.85, 80.95),
+        'Maharajganj': (27.13, 83.56), 'Mahoba': (25.29, 79.87), 'Mainpuri': (27.23, 79.02), 'Mathura': (27.49, 77.67),
+        'Mau': (25.94, 83.56), 'Meerut': (28.98, 77.71), 'Mirzapur': (25.15, 82.57), 'Moradabad': (28.84, 78.77),
+        'Muzaffarnagar': (29.47, 77.70), 'Pilibhit': (28.63, 79.80), 'Pratapgarh': (25.90, 81.94),
+        'Rae Bareli': (26.23, 81.23), 'Rampur': (28.80, 79.03), 'Saharanpur': (29.96, 77.55),
+        'Sambhal': (28.58, 78.57), 'Sant Kabir Nagar': (26.77, 83.07), 'Shahjahanpur': (27.88, 79.91),
+        'Shamli': (29.45, 77.31), 'Shravasti': (27.71, 81.93), 'Siddharthnagar': (27.28, 83.09),
+        'Sitapur': (27.57, 80.68), 'Sonbhadra': (24.69, 83.07), 'Sultanpur': (26.26, 82.07), 'Unnao': (26.55, 80.49),
+        'Varanasi': (25.32, 82.97),
+    },
+    'Delhi': {
+        'Central Delhi': (28.65, 77.23), 'East Delhi': (28.62, 77.30), 'New Delhi': (28.61, 77.21),
+        'North Delhi': (28.70, 77.20), 'North East Delhi': (28.69, 77.29), 'North West Delhi': (28.72, 77.07),
+        'Shahdara': (28.67, 77.29), 'South Delhi': (28.53, 77.22), 'South East Delhi': (28.56, 77.26),
+        'South West Delhi': (28.58, 77.06), 'West Delhi': (28.65, 77.06),
+    },
+}
+
+# Used when only the state is known
+STATE_CAPITALS = {
+    'Andaman and Nicobar Island': (11.62, 92.73), 'Andhra Pradesh': (16.51, 80.52),
+    'Arunachal Pradesh': (27.08, 93.61), 'Assam': (26.14, 91.79), 'Bihar': (25.59, 85.14),
+    'Chandigarh': (30.73, 76.78), 'Chhatisgarh': (21.25, 81.63),
+    'Dadra and Nagar Haveli and Daman and Diu': (20.40, 72.83), 'Delhi': (28.61, 77.21), 'Goa': (15.49, 73.83),
+    'Gujarat': (23.22, 72.65), 'Haryana': (30.73, 76.78), 'Himachal Pradesh': (31.10, 77.17),
+    'Jammu and Kashmir': (34.08, 74.80), 'Jharkhand': (23.34, 85.31), 'Karnataka': (12.97, 77.59),
+    'Kerala': (8.52, 76.94), 'Ladakh': (34.15, 77.58), 'Madhya Pradesh': (23.26, 77.41),
+    'Maharashtra': (18.94, 72.83), 'Manipur': (24.82, 93.94), 'Meghalaya': (25.58, 91.89),
+    'Mizoram': (23.73, 92.72), 'Nagaland': (25.67, 94.11), 'Orissa': (20.30, 85.82), 'Puducherry': (11.94, 79.81),
+    'Rajasthan': (26.91, 75.79), 'Sikkim': (27.33, 88.61), 'Tamil Nadu': (13.08, 80.27),
+    'Telangana': (17.39, 78.49), 'Tripura': (23.83, 91.29), 'Uttar Pradesh': (26.85, 80.95),
+    'Uttarakhand': (30.32, 78.03), 'West Bengal': (22.57, 88.36),
+}
+
+# Common alternative spellings -> gazetteer names
+ALIASES = {
+    'bangalore': 'bengaluru urban', 'bengaluru': 'bengaluru urban', 'bombay': 'mumbai city',
+    'mumbai': 'mumbai city', 'madras': 'chennai', 'prayagraj': 'allahabad', 'ayodhya': 'faizabad',
+    'noida': 'gautam buddha nagar', 'kanpur': 'kanpur nagar', 'mysore': 'mysuru', 'belgaum': 'belagavi',
+    'gulbarga': 'kalaburagi', 'bellary': 'ballari', 'shimoga': 'shivamogga', 'tumkur': 'tumakuru',
+    'mangalore': 'dakshina kannada', 'jamshedpur': 'east singhbhum', 'chaibasa': 'west singhbhum',
+    'trichy': 'tiruchirappalli', 'tuticorin': 'thoothukudi', 'ooty': 'the nilgiris', 'nilgiris': 'the nilgiris',
+    'vizag': 'visakhapatnam', 'kadapa': 'ysr kadapa', 'odisha': 'orissa',
+    'chhattisgarh': 'chhatisgarh', 'andaman and nicobar islands': 'andaman and nicobar island',
+}
+
+
+def _normalize(name):
+    text = re.sub(r'[^a-z ]+', ' ', str(name or '').lower())
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = re.sub(r' district$', '', text)
+    return ALIASES.get(text, text)
+
+
+_STATES = {_normalize(state): state for state in set(DISTRICT_COORDINATES) | set(STATE_CAPITALS)}
+_DISTRICTS = {}  # normalized district -> [(state, coordinates)]
+for _state, _districts in DISTRICT_COORDINATES.items():
+    for _district, _point in _districts.items():
+        _DISTRICTS.setdefault(_normalize(_district), []).append((_state, _point))
+
+
+def canonical_state(state):
+    """Gazetteer spelling of a state name, or None."""
+    return _STATES.get(_normalize(state))
+
+
+def locate(state=None, district=None):
+    """
+    (lat, lon) for a district, else for the state capital, else None.
+    A district name is only used without a matching state when it is unique.
+    """
+    state = canonical_state(state)
+    matches = _DISTRICTS.get(_normalize(district), []) if district else []
+    if state:
+        matches = [match for match in matches if match[0] == state]
+    if len(matches) == 1:
+        return matches[0][1]
+    return STATE_CAPITALS.get(state) if state else None
+
+
+def parse_coordinates(lat, lon):
+    """(lat, lon) floats from form values, or None when missing or out of range."""
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0) or lat != lat or lon != lon:
+        return None
+    return lat, lon
@@ -0,0 +1,189 @@
+"""
+Spatial index for nearest-hospital and nearest-ambulance routing.
+
+GridIndex buckets points into cells of cell_degrees x cell_degrees and
+answers k-nearest queries by scanning rings of cells outward from the
+query point. Results are ranked by great-circle (haversine) distance. The
+scan stops once no unscanned cell can hold a closer point, so the result
+is exact. Points can be inserted and removed in O(1), which suits the
+ambulance fleet, where units leave and rejoin the index with every
+dispatch. Longitudes do not wrap around the antimeridian, which India
+never crosses.
+
+HospitalIndex keeps a GridIndex of hospitals, placed by state and district
+through the gazetteer, and picks the closest one able to treat an
+emergency type. Any worker that changes hospitals or doctors calls
+invalidate(). That bumps a generation counter in shared memory (gunicorn
+forks its workers after import), so every worker rebuilds its index before
+its next query.
+"""
+import heapq
+import math
+import multiprocessing
+import threading
+
+from gazetteer import locate
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Emergency type -> doctor specializations (lower-case substrings) a hospital needs
+REQUIRED_SPECIALIZATIONS = {
+    'Traffic': ('trauma', 'ortho', 'surg', 'emergency'),
+    'Fire': ('burn', 'plastic', 'surg', 'emergency'),
+}
+
+
+def haversine_km(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+class GridIndex:
+    """Points on a lat/lon grid with exact k-nearest queries."""
+
+    def __init__(self, cell_degrees=0.5):
+        self.cell_degrees = cell_degrees
+        self._cells = {}   # (row, col) -> {key: (lat, lon, value)}
+        self._where = {}   # key -> (row, col)
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees))
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def insert(self, key, lat, lon, value=None):
+        self.remove(key)
+        cell = self._cell(lat, lon)
+        self._cells.setdefault(cell, {})[key] = (lat, lon, value)
+        self._where[key] = cell
+
+    def remove(self, key):
+        cell = self._where.pop(key, None)
+        if cell is not None:
+            points = self._cells[cell]
+            del points[key]
+            if not points:
+                del self._cells[cell]
+
+    def _ring(self, row, col, r):
+        if r == 0:
+            yield row, col
+            return
+        for c in range(col - r, col + r + 1):
+            yield row - r, c
+            yield row + r, c
+        for rr in range(row - r + 1, row + r):
+            yield rr, col - r
+            yield rr, col + r
+
+    def nearest(self, lat, lon, k=1, accept=None):
+        """
+        Up to k (distance_km, key, value) tuples, closest first. accept(key, value)
+        filters candidates; rejected points do not count towards k.
+        """
+        if not self._where or k <= 0:
+            return []
+        point = (lat, lon)
+        row, col = self._cell(lat, lon)
+        best = []  # max-heap of (-distance, key, value)
+        cos_lat = math.cos(math.radians(lat))
+        scanned = 0
+        r = 0
+        while scanned < len(self._cells):
+            # Unscanned points are at least (r - 1) cells away in latitude or longitude
+            if len(best) == k and r > 1:
+                reach = math.radians(min((r - 1) * self.cell_degrees, 90.0))
+                if EARTH_RADIUS_KM * math.asin(cos_lat * math.sin(reach)) > -best[0][0]:
+                    break
+            if 8 * r > len(self._cells):
+                # The ring has more cells than the index holds: scan the remaining ones directly
+                cells = [cell for cell in self._cells if max(abs(cell[0] - row), abs(cell[1] - col)) >= r]
+            else:
+                cells = self._ring(row, col, r)
+            for cell in cells:
+                points = self._cells.get(cell)
+                if not points:
+                    continue
+                scanned += 1
+                for key, (p_lat, p_lon, value) in points.items():
+                    if accept is not None and not accept(key, value):
+                        continue
+                    distance = haversine_km(point, (p_lat, p_lon))
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, key, value))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, key, value))
+            r += 1
+        return [(-neg, key, value) for neg, key, value in sorted(best, reverse=True)]
+
+
+class HospitalIndex:
+    """Closest capable hospital for an emergency, shared-generation invalidated."""
+
+    def __init__(self, connect, cell_degrees=0.5):
+        self._connect = connect
+        self.cell_degrees = cell_degrees
+        self._lock = threading.Lock()
+        self._generation = multiprocessing.Value('q', 0)
+        self._local_generation = -1
+        self._index = GridIndex(cell_degrees)
+
+    def invalidate(self):
+        """Make every worker rebuild its index (after hospitals or doctors change)."""
+        with self._generation.get_lock():
+            self._generation.value += 1
+
+    def _rebuild(self):
+        generation = self._generation.value
+        conn = self._connect()
+        try:
+            rows = conn.execute('''SELECT h.id, h.name, h.state, h.district, COUNT(d.id),
+                                          GROUP_CONCAT(LOWER(d.specialization), '|')
+                                   FROM hospitals h LEFT JOIN doctors d ON d.hospital_id = h.id
+                                   GROUP BY h.id''').fetchall()
+        finally:
+            conn.close()
+        index = GridIndex(self.cell_degrees)
+        for hospital_id, name, state, district, doctors, specializations in rows:
+            point = locate(state, district)
+            if point is not None:
+                index.insert(hospital_id, point[0], point[1],
+                             {'id': hospital_id, 'name': name, 'state': state, 'district': district,
+                              'doctors': doctors, 'specializations': specializations or ''})
+        self._index = index
+        self._local_generation = generation
+
+    def __len__(self):
+        return len(self._current())
+
+    def _current(self):
+        if self._local_generation != self._generation.value:
+            with self._lock:
+                if self._local_generation != self._generation.value:
+                    self._rebuild()
+        return self._index
+
+    def nearest(self, point, emergency_type=None, k=1):
+        """
+        Up to k hospitals closest to point (lat, lon), each a dict with
+        distance_km and capable. Hospitals able to treat emergency_type come
+        first; without any, the closest staffed and then any hospital are used.
+        """
+        index = self._current()
+        required = REQUIRED_SPECIALIZATIONS.get(emergency_type, ())
+
+        def capable(_, hospital):
+            return hospital['doctors'] > 0 and (
+                not required or any(word in hospital['specializations'] for word in required))
+
+        for accept in (capable, lambda _, hospital: hospital['doctors'] > 0, None):
+            found = index.nearest(point[0], point[1], k, accept)
+            if found:
+                return [dict(hospital, distance_km=round(distance, 1), capable=capable(None, hospital))
+                        for distance, _, hospital in found]
+        return []
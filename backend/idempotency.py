@@ -0,0 +1,213 @@
+"""
+Duplicate suppression for emergency submissions.
+
+A submission is identified two ways:
+  key          an Idempotency-Key header, or the idempotency_key hidden
+               field that each rendering of the emergency form carries
+  fingerprint  a hash of the normalized phone number and location, so a
+               caller who reloads the form and submits again within
+               `window` seconds is recognized too
+The first submission claims both in the emergency_submissions table, then
+stores its emergency id and rendered result page there. A repeat does not
+run the model or write an emergency. The result page has the caller's
+details, so only a repeat with the same key (or from the same session, which
+app.py checks) gets it back; a fingerprint match from anyone else is only
+told the request was received. A repeat that arrives while the first is
+still running waits for its result.
+
+Lookups go to a per-worker TTLIndex first. Only a miss reads the table,
+through the unique key or the (fingerprint, created_at) index. That covers
+repeats that land on another worker or after a restart. Two workers can
+still both accept the same fingerprint if its two submissions arrive within
+milliseconds of each other; the unique key closes that gap for the form
+itself.
+"""
+import hashlib
+import heapq
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS emergency_submissions (
+       id INTEGER PRIMARY KEY AUTOINCREMENT,
+       idempotency_key TEXT UNIQUE,
+       fingerprint TEXT,
+       emergency_id INTEGER,
+       response TEXT,
+       created_at REAL NOT NULL
+   )'''
+INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS idx_submissions_fingerprint ON emergency_submissions (fingerprint, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_submissions_created_at ON emergency_submissions (created_at)',
+)
+
+MAX_KEY_LENGTH = 128
+
+Submission = namedtuple('Submission', 'id emergency_id response idempotency_key')
+
+
+def submission_key(value):
+    """A client-supplied idempotency key, trimmed, or None."""
+    value = str(value or '').strip()[:MAX_KEY_LENGTH]
+    return value or None
+
+
+def normalize_phone(phone):
+    """Digits only, without a country code or leading zero (last 10 digits)."""
+    return re.sub(r'\D', '', str(phone or ''))[-10:]
+
+
+def normalize_location(location):
+    return ' '.join(re.findall(r'[a-z0-9]+', str(location or '').lower()))
+
+
+def fingerprint(phone, location, state=None, district=None):
+    """Hash of phone and location (with state and district), or None without a phone number to go on."""
+    phone = normalize_phone(phone)
+    if not phone:
+        return None
+    place = '|'.join(normalize_location(part) for part in (location, state, district))
+    return hashlib.sha1(f'{phone}|{place}'.encode()).hexdigest()[:24]
+
+
+class TTLIndex:
+    """Dict whose entries expire after their ttl; expired entries are purged as new ones arrive."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}   # key -> (expires_at, value)
+        self._expiries = []  # heap of (expires_at, key)
+
+    def get(self, key, now=None):
+        now = time.time() if now is None else now
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= now:
+            return None
+        return entry[1]
+
+    def put(self, key, value, ttl, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._entries[key] = (now + ttl, value)
+            heapq.heappush(self._expiries, (now + ttl, key))
+            while self._expiries and self._expiries[0][0] <= now:
+                expires_at, old_key = heapq.heappop(self._expiries)
+                entry = self._entries.get(old_key)
+                if entry is not None and entry[0] <= now:
+                    del self._entries[old_key]
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SubmissionGuard:
+    """
+    Claims submissions and finds earlier ones by key (see submission_key)
+    or fingerprint.
+    """
+
+    def __init__(self, connect, key_ttl=600.0, window=120.0, wait=5.0):
+        self._connect = connect
+        self.key_ttl = key_ttl
+        self.window = window
+        self.wait = wait
+        self._index = TTLIndex()
+
+    def reset(self):
+        """Drop this worker's cached submissions (at startup)."""
+        self._index = TTLIndex()
+
+    def _cached(self, key, fingerprint_):
+        for name in (('key', key), ('fp', fingerprint_)):
+            if name[1]:
+                found = self._index.get(name)
+                if found is not None:
+                    return found
+        return None
+
+    def _stored(self, key, fingerprint_):
+        conn = self._connect()
+        try:
+            row = None
+            if key:
+                row = conn.execute('SELECT id, emergency_id, response, idempotency_key FROM emergency_submissions '
+                                   'WHERE idempotency_key = ?', (key,)).fetchone()
+            if row is None and fingerprint_:
+                row = conn.execute('SELECT id, emergency_id, response, idempotency_key FROM emergency_submissions '
+                                   'WHERE fingerprint = ? AND created_at > ? ORDER BY created_at DESC LIMIT 1',
+                                   (fingerprint_, time.time() - self.window)).fetchone()
+        finally:
+            conn.close()
+        return Submission(*row) if row else None
+
+    def _remember(self, submission, key, fingerprint_):
+        if key:
+            self._index.put(('key', key), submission, self.key_ttl)
+        if fingerprint_:
+            self._index.put(('fp', fingerprint_), submission, self.window)
+
+    def find(self, key, fingerprint_):
+        """
+        The earlier Submission with this key or fingerprint, or None. When it
+        is still running, waits up to `wait` seconds for its response.
+        """
+        if not key and not fingerprint_:
+            return None
+        submission = self._cached(key, fingerprint_)
+        if submission is None or submission.response is None:
+            submission = self._stored(key, fingerprint_)
+        deadline = time.time() + self.wait
+        while submission is not None and submission.response is None and time.time() < deadline:
+            time.sleep(0.05)
+            submission = self._stored(key, fingerprint_)  # None if the first request failed and released it
+        if submission is not None and submission.response is not None:
+            self._remember(submission, key, fingerprint_)
+        return submission
+
+    def claim(self, key, fingerprint_):
+        """
+        Record a new submission; returns its id, or None when another request
+        claimed the same key first.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            cur = conn.execute('INSERT INTO emergency_submissions (idempotency_key, fingerprint, created_at) '
+                               'VALUES (?, ?, ?)', (key, fingerprint_, now))
+            conn.execute('DELETE FROM emergency_submissions WHERE created_at < ?', (now - self.key_ttl,))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            return None
+        finally:
+            conn.close()
+        self._remember(Submission(cur.lastrowid, None, None, key), key, fingerprint_)
+        return cur.lastrowid
+
+    def complete(self, submission_id, key, fingerprint_, emergency_id, response):
+        """Store the result of a claimed submission for its repeats."""
+        conn = self._connect()
+        try:
+            conn.execute('UPDATE emergency_submissions SET emergency_id = ?, response = ? WHERE id = ?',
+                         (emergency_id, response, submission_id))
+            conn.commit()
+        finally:
+            conn.close()
+        self._remember(Submission(submission_id, emergency_id, response, key), key, fingerprint_)
+
+    def release(self, submission_id, key, fingerprint_):
+        """Forget a claim whose request failed, so a retry goes through."""
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM emergency_submissions WHERE id = ?', (submission_id,))
+            conn.commit()
+        finally:
+            conn.close()
+        for name in (('key', key), ('fp', fingerprint_)):
+            if name[1]:
+                self._index.discard(name)
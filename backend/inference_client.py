@@ -0,0 +1,136 @@
+"""
+Client for the local inference sidecar (inference_server.py).
+
+Gunicorn workers send feature rows over a Unix domain socket instead of
+running predict_proba on the gevent loop. Socket I/O is cooperative under
+gevent, so a worker keeps serving other greenlets while the sidecar
+computes. When the sidecar is down or slow the client returns None and the
+caller falls back to in-process inference.
+"""
+import json
+import socket
+import struct
+import threading
+import time
+
+# Frame format shared with the server: 4-byte big-endian length + JSON body
+FRAME_HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 1024 * 1024
+
+
+def encode_frame(payload):
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            raise ConnectionError('inference server closed the connection')
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_frame(sock):
+    (size,) = FRAME_HEADER.unpack(_recv_exactly(sock, FRAME_HEADER.size))
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f'frame of {size} bytes exceeds limit')
+    return json.loads(_recv_exactly(sock, size).decode('utf-8'))
+
+
+class InferenceClient:
+    """
+    Pooled client for the inference sidecar.
+
+    Each pooled connection carries one request at a time, so no request ids
+    are needed. After any transport failure the client stops trying for
+    ``retry_after`` seconds, keeping the fallback path cheap while the
+    sidecar is down.
+    """
+
+    def __init__(self, socket_path, timeout=0.05, retry_after=5.0, pool_size=8):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.pool_size = pool_size
+        self._pool = []
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    def _acquire(self):
+        with self._lock:
+            if self._pool:
+                return self._pool.pop()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _release(self, sock):
+        with self._lock:
+            if len(self._pool) < self.pool_size:
+                self._pool.append(sock)
+                return
+        sock.close()
+
+    def _mark_down(self):
+        self._down_until = time.monotonic() + self.retry_after
+        with self._lock:
+            pool, self._pool = self._pool, []
+        for sock in pool:
+            sock.close()
+
+    def request(self, payload):
+        """Send one request frame and return the decoded response, or None."""
+        if not self.available():
+            return None
+        try:
+            sock = self._acquire()
+        except OSError:
+            self._mark_down()
+            return None
+        try:
+            sock.sendall(encode_frame(payload))
+            response = recv_frame(sock)
+        except (OSError, ValueError, ConnectionError):
+            sock.close()
+            self._mark_down()
+            return None
+        self._release(sock)
+        return response
+
+    def predict(self, model_name, row, version=None):
+        """
+        Predict one feature row on the sidecar.
+
+        ``version`` is the model version the row was encoded for; the sidecar
+        refuses the row if it serves another one (e.g. mid-rollout).
+
+        Returns a dict with 'prediction', 'probabilities', 'classes' and
+        'version', or None if the caller should run inference in-process.
+        """
+        payload = {'model': model_name, 'features': [float(x) for x in row]}
+        if version is not None:
+            payload['version'] = version
+        response = self.request(payload)
+        if not response or 'error' in response:
+            return None
+        if version is not None and response.get('version') != version:
+            return None
+        return response
+
+    def ping(self):
+        """Return the sidecar's model versions, or None if it is unreachable."""
+        response = self.request({'op': 'ping'})
+        return response.get('versions') if response else None
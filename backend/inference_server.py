@@ -0,0 +1,234 @@
+"""
+Out-of-process inference server for Swasthya Sampark.
+
+Runs next to the gunicorn workers and accepts feature rows from all of them
+over a Unix domain socket. Rows for the same model that arrive within a
+short window (a few milliseconds) are stacked into one matrix and predicted
+in a single vectorized predict/predict_proba call on a dedicated inference
+thread, optionally pinned to its own CPU core.
+
+Usage (from the backend directory):
+    python inference_server.py --socket /tmp/swasthya-inference.sock --cpu 1
+
+Then set INFERENCE_SOCKET=/tmp/swasthya-inference.sock for the web workers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from inference_client import FRAME_HEADER, MAX_FRAME_SIZE, encode_frame
+from model_artifacts import build_model_registry
+
+try:
+    from config import get_config
+    config = get_config()
+except ImportError:
+    config = None
+
+
+def _to_builtin(value):
+    """numpy scalars -> plain Python values for JSON."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _predict_rows(loaded, rows):
+    """Scale and predict rows with one model snapshot."""
+    X = np.asarray(rows, dtype=float)
+    if loaded.scaler is not None:
+        X = loaded.scaler.transform(X)
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', category=UserWarning)
+        predictions = loaded.model.predict(X)
+        probabilities = loaded.model.predict_proba(X) if hasattr(loaded.model, 'predict_proba') else None
+    classes = [_to_builtin(c) for c in getattr(loaded.model, 'classes_', [])]
+    results = []
+    for i, prediction in enumerate(predictions):
+        results.append({
+            'prediction': _to_builtin(prediction),
+            'probabilities': probabilities[i].tolist() if probabilities is not None else None,
+            'classes': classes,
+            'version': loaded.version,
+        })
+    return results
+
+
+def predict_batch(registry, model_name, rows, versions=None):
+    """
+    Vectorized prediction for a batch of rows of one model.
+
+    ``versions`` holds, per row, the model version the caller encoded the
+    row for (None skips the check). A row encoded for another version gets
+    an error instead of a prediction: its columns may not be in this
+    model's order.
+
+    Returns one response dict per row. Runs on the inference thread.
+    """
+    loaded = registry.get(model_name)
+    if loaded is None:
+        return [{'error': f'model {model_name} not loaded'}] * len(rows)
+    stale = [version is not None and version != loaded.version for version in versions or ()]
+    if not any(stale):
+        return _predict_rows(loaded, rows)
+    mismatch = {'error': f'{model_name} model is version {loaded.version}'}
+    fresh = iter(_predict_rows(loaded, [row for row, s in zip(rows, stale) if not s]) if not all(stale) else ())
+    return [mismatch if s else next(fresh) for s in stale]
+
+
+class MicroBatcher:
+    """Collects rows for one model and flushes them as a single batch."""
+
+    def __init__(self, registry, model_name, executor, window_ms=2.0, max_batch=64):
+        self.registry = registry
+        self.model_name = model_name
+        self.executor = executor
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.rows = 0
+
+    async def submit(self, row, version=None):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, version, future))
+        return await future
+
+    def _run(self, rows, versions):
+        try:
+            return predict_batch(self.registry, self.model_name, rows, versions)
+        except Exception:
+            # One malformed row (e.g. wrong width) must not fail the whole batch
+            results = []
+            for row, version in zip(rows, versions):
+                try:
+                    results.extend(predict_batch(self.registry, self.model_name, [row], [version]))
+                except Exception as e:
+                    results.append({'error': str(e)})
+            return results
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            rows = [row for row, _, _ in batch]
+            versions = [version for _, version, _ in batch]
+            results = await loop.run_in_executor(self.executor, self._run, rows, versions)
+            self.batches += 1
+            self.rows += len(rows)
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class InferenceServer:
+    def __init__(self, registry, socket_path, window_ms=2.0, max_batch=64):
+        self.registry = registry
+        self.socket_path = socket_path
+        # A single inference thread: batches run back to back on one core
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference')
+        self.batchers = {
+            name: MicroBatcher(registry, name, self.executor, window_ms, max_batch)
+            for name in ('health_risk', 'emergency')
+        }
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(FRAME_HEADER.size)
+                (size,) = FRAME_HEADER.unpack(header)
+                if size > MAX_FRAME_SIZE:
+                    break
+                request = json.loads(await reader.readexactly(size))
+                if request.get('op') == 'ping':
+                    versions = {name: self.registry.version(name) for name in self.batchers}
+                    response = {'ok': True, 'versions': versions}
+                else:
+                    batcher = self.batchers.get(request.get('model'))
+                    if batcher is None:
+                        response = {'error': f"unknown model {request.get('model')}"}
+                    else:
+                        response = await batcher.submit(request.get('features') or [], request.get('version'))
+                writer.write(encode_frame(response))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Stale socket from a previous run
+        server = await asyncio.start_unix_server(self.handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        for batcher in self.batchers.values():
+            asyncio.ensure_future(batcher.run())
+        print(f"[OK] Inference server listening on {self.socket_path}")
+        async with server:
+            await server.serve_forever()
+
+
+def pin_to_cpu(cpu):
+    """Pin this process to one CPU core (Linux only)."""
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+        print(f"[OK] Inference server pinned to CPU {cpu}")
+    else:
+        print("[WARNING] CPU pinning not supported on this platform")
+
+
+def main(argv=None):
+    default_socket = config.INFERENCE_SOCKET if config else ''
+    parser = argparse.ArgumentParser(description='Swasthya Sampark inference sidecar')
+    parser.add_argument('--socket', default=default_socket or '/tmp/swasthya-inference.sock')
+    parser.add_argument('--cpu', type=int, default=None, help='CPU core to pin inference to')
+    parser.add_argument('--batch-window-ms', type=float,
+                        default=config.INFERENCE_BATCH_WINDOW_MS if config else 2.0)
+    parser.add_argument('--max-batch', type=int, default=config.INFERENCE_MAX_BATCH if config else 64)
+    parser.add_argument('--models-dir', default=None, help='Load models from this directory instead of pkl/')
+    args = parser.parse_args(argv)
+
+    if args.cpu is not None:
+        pin_to_cpu(args.cpu)
+
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    model_path = config.MODEL_PATH if config else os.path.join(backend_dir, 'pkl', 'svm_health_risk_model.pkl')
+    emergency_path = config.EMERGENCY_MODEL_PATH if config else os.path.join(
+        backend_dir, 'pkl', 'Logistic_regression_prediction.pkl')
+    if args.models_dir:
+        model_path = os.path.join(args.models_dir, os.path.basename(model_path))
+        emergency_path = os.path.join(args.models_dir, os.path.basename(emergency_path))
+    registry = build_model_registry(model_path, emergency_path,
+                                    poll_interval=config.MODEL_RELOAD_INTERVAL if config else 30)
+    registry.load_all()
+    registry.start_watching()
+    for name, status in registry.status().items():
+        print(f"[INFO] {name}: version={status['version']} error={status['last_error']}")
+
+    server = InferenceServer(registry, args.socket, args.batch_window_ms, args.max_batch)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Admission control for emergency requests.
+
+pre_triage() ranks a request from its form alone (symptom keywords,
+emergency type, age) before any database or model work. The ML model still
+sets the stored priority; this rank only decides who is served first when
+the route is overloaded.
+
+IntakeGate lets at most `capacity` requests of a worker run the emergency
+route at once. The rest wait in a bounded queue ordered by that rank, then
+by arrival. While the queue is full a new request is refused at once
+(backpressure, 503 with Retry-After) unless it outranks someone waiting,
+who is then refused instead. Critical requests are accepted
+immediately: they may use `critical_reserve` slots beyond the capacity, and
+beyond that they go to the head of the queue. Requests still waiting after
+max_wait seconds are refused, well inside gunicorn's 30 s worker timeout.
+Waiting happens on a condition variable, which the gevent worker turns into
+a cooperative wait.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PRIORITIES = ('Critical', 'High', 'Medium', 'Low')
+RANKS = {priority: rank for rank, priority in enumerate(PRIORITIES)}
+
+LIFE_THREAT_KEYWORDS = ('chest pain', 'heart attack', 'stroke', 'unconscious', 'bleeding', 'difficulty breathing',
+                        'trauma', 'accident', 'severe')
+CRITICAL_KEYWORDS = ('not breathing', 'cardiac arrest', 'heart attack', 'unconscious', 'unresponsive', 'stroke',
+                     'severe bleeding', 'choking', 'seizure', 'anaphylaxis', 'burns')
+URGENT_TYPES = ('Fire', 'Traffic')
+
+
+def pre_triage(form):
+    """Intake priority (Critical/High/Medium/Low) from the submitted form; no I/O."""
+    symptoms = str(form.get('symptoms') or '').lower()
+    if any(keyword in symptoms for keyword in CRITICAL_KEYWORDS):
+        return 'Critical'
+    age = form.get('age')
+    age = int(age) if age and str(age).isdigit() else None
+    if (any(keyword in symptoms for keyword in LIFE_THREAT_KEYWORDS) or form.get('emergency_type') in URGENT_TYPES
+            or (age is not None and (age >= 65 or age <= 5))):
+        return 'High'
+    return 'Medium' if symptoms.strip() else 'Low'
+
+
+class IntakeRejected(Exception):
+    """Raised when a request is refused; retry_after is a hint in seconds."""
+
+    def __init__(self, priority, reason, retry_after):
+        super().__init__(f'{priority} request refused: {reason}')
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('priority', 'evicted')
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.evicted = False
+
+
+class IntakeGate:
+    """Bounded, priority-ordered admission to a route, per worker."""
+
+    def __init__(self, capacity=8, queue_size=64, max_wait=10.0, critical_reserve=4, clock=time.monotonic):
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.critical_reserve = critical_reserve
+        self._clock = clock
+        self._ready = threading.Condition()
+        self._running = 0
+        self._waiting = []  # heap of (rank, arrival, waiter)
+        self._arrivals = itertools.count()
+        self._admitted = Counter()
+        self._rejected = Counter()
+
+    def _refuse(self, priority, reason):
+        self._rejected[priority] += 1
+        return IntakeRejected(priority, reason, retry_after=max(1, int(self.max_wait)))
+
+    def _acquire(self, priority):
+        rank = RANKS.get(priority, RANKS['Medium'])
+        with self._ready:
+            limit = self.capacity + (self.critical_reserve if rank == 0 else 0)
+            if self._running < limit and (rank == 0 or not self._waiting):
+                self._running += 1
+                self._admitted[priority] += 1
+                return
+            if len(self._waiting) >= self.queue_size:
+                worst = max(self._waiting, default=None)  # Lowest priority, latest arrival
+                if worst is None or worst[0] <= rank:
+                    raise self._refuse(priority, 'intake queue full')
+                self._waiting.remove(worst)
+                heapq.heapify(self._waiting)
+                worst[2].evicted = True
+                self._ready.notify_all()
+            waiter = _Waiter(priority)
+            entry = (rank, next(self._arrivals), waiter)
+            heapq.heappush(self._waiting, entry)
+            deadline = self._clock() + self.max_wait
+            while True:
+                if waiter.evicted:
+                    raise self._refuse(priority, 'displaced by a more urgent request')
+                remaining = deadline - self._clock()
+                if remaining <= 0:  # Checked first: a slot freed after max_wait goes to someone still in time
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._ready.notify_all()
+                    raise self._refuse(priority, 'timed out waiting for intake')
+                if self._waiting[0] is entry and self._running < limit:
+                    heapq.heappop(self._waiting)
+                    self._running += 1
+                    self._admitted[priority] += 1
+                    self._ready.notify_all()  # The next waiter may fit too
+                    return
+                self._ready.wait(remaining)
+
+    def _release(self):
+        with self._ready:
+            self._running -= 1
+            self._ready.notify_all()
+
+    @contextmanager
+    def admit(self, priority):
+        """Hold an intake slot for the block; raises IntakeRejected when refused."""
+        self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self):
+        with self._ready:
+            return {'running': self._running, 'waiting': len(self._waiting),
+                    'admitted': dict(self._admitted), 'rejected': dict(self._rejected)}
@@ -0,0 +1,223 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counter.inc() and Histogram.observe() only touch a dict keyed by the label
+values, well under a microsecond per call, so they are safe on hot paths.
+There is no lock: greenlets are not preempted inside a call, and a
+native-thread race can at worst lose a single increment.
+
+Each gunicorn worker keeps its own values. A background thread publishes
+them to the metrics_stats table, one row per worker, like drift_monitor.py.
+/metrics sums the rows of all workers. Rows of workers that exited are kept
+for STATS_RETENTION_DAYS, so totals don't drop when a worker restarts.
+"""
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from model_registry import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Seconds; the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATS_RETENTION_DAYS = 7
+
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS metrics_stats (
+       worker TEXT PRIMARY KEY,
+       state TEXT NOT NULL,
+       updated_at TEXT NOT NULL
+   )'''
+
+
+class Counter:
+    """Monotonic count per combination of label values."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def inc(self, *labels):
+        values = self.values
+        values[labels] = values.get(labels, 0) + 1
+
+    def samples(self, values):
+        for labels, value in values.items():
+            yield self.name, dict(zip(self.labels, labels)), value
+
+
+class Histogram:
+    """Bucketed observations per combination of label values."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self.values = {}
+
+    def observe(self, value, *labels):
+        row = self.values.get(labels)
+        if row is None:
+            row = self.values[labels] = [0] * (len(self.buckets) + 2)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def samples(self, values):
+        for labels, row in values.items():
+            names = dict(zip(self.labels, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), row):
+                cumulative += count
+                yield f'{self.name}_bucket', dict(names, le=_format_value(bound)), cumulative
+            yield f'{self.name}_count', names, cumulative
+            yield f'{self.name}_sum', names, row[-1]
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """This worker's metrics, published to SQLite and merged across workers for /metrics."""
+
+    def __init__(self, connect, publish_interval=15.0):
+        self.connect = connect
+        self.publish_interval = publish_interval
+        self.worker_id = None
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._publisher_pid = None
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def start(self):
+        """Start publishing for this process (call per request; cheap once started)."""
+        if self._publisher_pid == os.getpid():
+            return
+        # gunicorn forks after preload: every worker publishes under its own id, from zero
+        with self._lock:
+            if self._publisher_pid == os.getpid():
+                return
+            self._publisher_pid = os.getpid()
+            self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{int(time.time())}"
+            for metric in self._metrics.values():
+                metric.values = {}
+        if self.publish_interval:
+            thread = threading.Thread(target=self._publish_loop, name='metrics-publisher', daemon=True)
+            thread.start()
+            atexit.register(self._try_publish)
+
+    def state(self):
+        """{metric name: [[label values, value or bucket row], ...]} of this worker."""
+        # list() copies each dict in one step, so concurrent recording can't break the iteration
+        return {name: [[list(labels), list(value) if isinstance(value, list) else value]
+                       for labels, value in list(metric.values.items())]
+                for name, metric in self._metrics.items()}
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(self.publish_interval)
+            self._try_publish()
+
+    def _try_publish(self):
+        try:
+            self.publish()
+        except Exception as e:
+            logger.warning('Metrics publish failed: %s', e)
+
+    def publish(self):
+        """Write this worker's values to metrics_stats."""
+        if self.worker_id is not None:
+            run_blocking(self._write, json.dumps(self.state()))
+
+    def _write(self, state):
+        now = datetime.utcnow()
+        conn = self.connect()
+        try:
+            conn.execute('INSERT OR REPLACE INTO metrics_stats (worker, state, updated_at) VALUES (?, ?, ?)',
+                         (self.worker_id, state, now.isoformat()))
+            # Workers that stopped long ago
+            conn.execute('DELETE FROM metrics_stats WHERE updated_at < ?',
+                         ((now - timedelta(days=STATS_RETENTION_DAYS)).isoformat(),))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def collect(self):
+        """Merged values of all workers: ({metric name: {labels: value}}, live worker count)."""
+        if not self.publish_interval:
+            return self._merge([self.state()]), 1
+        self.publish()  # Include this worker's latest values
+        conn = self.connect()
+        try:
+            rows = conn.execute('SELECT state, updated_at FROM metrics_stats').fetchall()
+        finally:
+            conn.close()
+        live_since = (datetime.utcnow() - timedelta(seconds=3 * self.publish_interval)).isoformat()
+        live = sum(updated_at >= live_since for _, updated_at in rows)
+        return self._merge([json.loads(state) for state, _ in rows]), live
+
+    def _merge(self, states):
+        merged = {name: {} for name in self._metrics}
+        for state in states:
+            for name, entries in state.items():
+                values = merged.get(name)
+                if values is None:
+                    continue  # A metric an older release published
+                for labels, value in entries:
+                    labels = tuple(labels)
+                    current = values.get(labels)
+                    if current is None:
+                        values[labels] = value
+                    elif isinstance(value, list):
+                        values[labels] = [a + b for a, b in zip(current, value)]
+                    else:
+                        values[labels] = current + value
+        return merged
+
+    def exposition(self):
+        """All metrics in the Prometheus text format (version 0.0.4)."""
+        merged, workers = self.collect()
+        lines = ['# HELP swasthya_workers Workers that published metrics recently.',
+                 '# TYPE swasthya_workers gauge',
+                 f'swasthya_workers {workers}']
+        for name, metric in self._metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for sample, labels, value in metric.samples(merged[name]):
+                if labels:
+                    rendered = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+                    lines.append(f'{sample}{{{rendered}}} {_format_value(value)}')
+                else:
+                    lines.append(f'{sample} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
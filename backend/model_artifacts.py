@@ -0,0 +1,174 @@
+"""
+Model artifact loaders and golden-set validators.
+
+Shared by the Flask app and the out-of-process inference server
+(inference_server.py) so both load and validate models the same way.
+"""
+import logging
+import os
+import pickle
+import warnings
+
+import numpy as np
+
+from featurizer import emergency_encoder
+from model_registry import ModelRegistry, ModelValidationError
+
+logger = logging.getLogger(__name__)
+
+
+def load_health_risk_artifact(path):
+    """Load a health risk model artifact. Returns (model, scaler, metadata)."""
+    with open(path, 'rb') as f:
+        model_data = pickle.load(f)
+    # Handle both old format (just model) and new format (dict with model and scaler)
+    if isinstance(model_data, dict):
+        metadata = {k: v for k, v in model_data.items() if k not in ('model', 'scaler')}
+        return model_data.get('model'), model_data.get('scaler'), metadata
+    # Old format - just the model
+    return model_data, None, {}
+
+
+def _unpack_emergency_artifact(emergency_data):
+    """Split a loaded emergency artifact into (model, scaler, metadata)."""
+    if isinstance(emergency_data, dict):
+        model = emergency_data.get('model') or emergency_data.get('logistic_model') or emergency_data.get('classifier')
+        metadata = {k: v for k, v in emergency_data.items()
+                    if k not in ('model', 'logistic_model', 'classifier', 'scaler')}
+        return model, emergency_data.get('scaler'), metadata
+    if hasattr(emergency_data, 'predict'):
+        # Direct model object (LogisticRegression)
+        return emergency_data, None, {}
+    return None, None, {}
+
+
+def load_emergency_artifact(path):
+    """
+    Load an emergency priority model artifact. Returns (model, scaler, metadata).
+
+    metadata['feature_names'] always holds the model's feature schema: taken
+    from the artifact (train_emergency_model.py saves it) or, for older
+    artifacts, from the model's feature_names_in_. It is checked against the
+    model width here, once, instead of on every request.
+    """
+    model, scaler, metadata = _load_emergency_object(path)
+    feature_names = metadata.get('feature_names')
+    if feature_names is None and hasattr(model, 'feature_names_in_'):
+        feature_names = [str(name) for name in model.feature_names_in_]
+    if not feature_names:
+        raise ModelValidationError('emergency artifact has no feature schema '
+                                   '(retrain it with train_emergency_model.py)')
+    n_features = getattr(model, 'n_features_in_', len(feature_names))
+    if len(feature_names) != n_features:
+        raise ModelValidationError(f'schema has {len(feature_names)} features, model takes {n_features}')
+    try:
+        emergency_encoder(feature_names)
+    except ValueError as e:
+        raise ModelValidationError(str(e))
+    metadata['feature_names'] = list(feature_names)
+    return model, scaler, metadata
+
+
+def _load_emergency_object(path):
+    """Try joblib, several pickle encodings and dill in turn."""
+    # Method 1: Try joblib (common for scikit-learn models)
+    try:
+        import joblib
+        model, scaler, metadata = _unpack_emergency_artifact(joblib.load(path))
+        if model is not None and hasattr(model, 'predict'):
+            return model, scaler, metadata
+    except ImportError:
+        logger.info('joblib not available, trying other methods')
+    except Exception as e:
+        logger.info('joblib loading failed (%s), trying other methods', e)
+
+    # Method 2: Try pickle with different protocols and encodings
+    loading_methods = [
+        ('standard', lambda f: pickle.load(f)),
+        ('latin1', lambda f: pickle.load(f, encoding='latin1')),
+        ('bytes', lambda f: pickle.load(f, encoding='bytes')),
+        ('protocol4', lambda f: pickle.load(f, fix_imports=True)),
+    ]
+    for method_name, load_func in loading_methods:
+        try:
+            with open(path, 'rb') as f:
+                model, scaler, metadata = _unpack_emergency_artifact(load_func(f))
+            if model is not None and hasattr(model, 'predict'):
+                return model, scaler, metadata
+        except Exception:
+            continue  # Try next method
+
+    # Method 3: Try with dill (more compatible pickle alternative)
+    try:
+        import dill
+        with open(path, 'rb') as f:
+            model, scaler, metadata = _unpack_emergency_artifact(dill.load(f))
+        if model is not None and hasattr(model, 'predict'):
+            return model, scaler, metadata
+    except ImportError:
+        pass  # dill not available
+    except Exception:
+        pass  # dill failed
+
+    raise ValueError('Could not load emergency model with any method '
+                     '(the file may need to be re-saved with a Python 3.x compatible pickle protocol)')
+
+
+# Golden inputs used to validate a candidate model before it is swapped in.
+# Health risk rows use the 13-feature layout from train_model.py: a healthy
+# adult, a moderate case and a critical case.
+HEALTH_RISK_GOLDEN_ROWS = [
+    [0.30, 0.1, 0.2, 0.1, 0.2, 0.3, 0.3, 0.3, 0.3, 0, 0, 0.2, 0],
+    [0.45, 0.4, 0.6, 0.8, 0.4, 0.5, 0.7, 0.7, 0.7, 0, 1, 0.6, 1],
+    [0.70, 1.0, 1.0, 1.0, 0.8, 1.0, 1.0, 1.0, 1.0, 1, 1, 1.0, 1],
+]
+
+
+def _validate_classifier(model, scaler, features):
+    """Run a candidate on golden rows and check predictions are well formed."""
+    if scaler is not None:
+        features = scaler.transform(features)
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', category=UserWarning)
+        predictions = model.predict(features)
+        if len(predictions) != len(features):
+            raise ModelValidationError('prediction count does not match golden input count')
+        if hasattr(model, 'predict_proba'):
+            probabilities = model.predict_proba(features)
+            if not np.all(np.isfinite(probabilities)) or not np.allclose(probabilities.sum(axis=1), 1.0, atol=1e-3):
+                raise ModelValidationError('predict_proba returned invalid probabilities')
+
+
+def validate_health_risk_model(model, scaler):
+    n_features = getattr(model, 'n_features_in_', len(HEALTH_RISK_GOLDEN_ROWS[0]))
+    if n_features != len(HEALTH_RISK_GOLDEN_ROWS[0]):
+        raise ModelValidationError(f'expected 13 features, model takes {n_features}')
+    _validate_classifier(model, scaler, np.array(HEALTH_RISK_GOLDEN_ROWS))
+
+
+def validate_emergency_model(model, scaler):
+    # All-baseline row plus one row per feature switched on
+    n_features = getattr(model, 'n_features_in_', None)
+    if not n_features:
+        raise ModelValidationError('emergency model does not declare n_features_in_')
+    golden = np.vstack([np.zeros((1, n_features)), np.eye(n_features)])
+    _validate_classifier(model, scaler, golden)
+    classes = set(str(c) for c in getattr(model, 'classes_', []))
+    if classes and not classes <= {'Low', 'Medium', 'High', 'Critical', '0', '1', '2', '3'}:
+        raise ModelValidationError(f'unexpected emergency classes: {sorted(classes)}')
+
+
+def artifact_pattern(path):
+    """'pkl/svm_health_risk_model.pkl' -> 'pkl/svm_health_risk_model*.pkl' (matches -v2, -v3, ...)"""
+    stem, ext = os.path.splitext(path)
+    return f'{stem}*{ext}'
+
+
+def build_model_registry(model_path, emergency_model_path, poll_interval=30):
+    """Create a ModelRegistry with the health risk and emergency slots registered."""
+    registry = ModelRegistry(os.path.dirname(model_path), poll_interval=poll_interval)
+    registry.register('health_risk', artifact_pattern(model_path),
+                      load_health_risk_artifact, validate_health_risk_model)
+    registry.register('emergency', artifact_pattern(emergency_model_path),
+                      load_emergency_artifact, validate_emergency_model)
+    return registry
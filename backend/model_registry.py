@@ -0,0 +1,255 @@
+"""
+Hot-reloadable model registry for Swasthya Sampark.
+
+Each model slot (health risk SVM, emergency priority model) watches the
+models directory for new artifact versions. A new file is loaded and
+validated on a golden input set in the background, then swapped in with a
+single reference assignment, so requests in flight keep using the snapshot
+they started with and never wait on a reload. The first load happens in a
+warm-up thread after startup (see startup.py), or in the first get() that
+comes before it.
+"""
+import glob
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Immutable snapshot of a loaded model. Predictors grab one snapshot per call
+# so a swap in the middle of a prediction can never mix model and scaler.
+LoadedModel = namedtuple(
+    'LoadedModel',
+    ['name', 'model', 'scaler', 'version', 'path', 'metadata', 'loaded_at'],
+)
+
+
+class ModelValidationError(Exception):
+    """Raised when a candidate model fails golden-set validation."""
+
+
+def run_blocking(func, *args, **kwargs):
+    """
+    Run CPU-bound work (unpickling, validation) off the event loop.
+
+    Under gevent (gunicorn's worker class) the work is handed to the hub's
+    native thread pool so other greenlets keep serving; otherwise it is
+    called directly since we are already on a background thread.
+    """
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            from gevent import get_hub
+            return get_hub().threadpool.apply(func, args, kwargs)
+    except ImportError:
+        pass
+    return func(*args, **kwargs)
+
+
+def file_digest(path, length=12):
+    """Short SHA-256 of a file, used as the version of unversioned artifacts."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+class _ModelSlot:
+    """Bookkeeping for one named model."""
+
+    def __init__(self, name, pattern, loader, validator):
+        self.name = name
+        self.pattern = pattern
+        self.loader = loader
+        self.validator = validator
+        self.current = None
+        self.fingerprint = None
+        self.rejected_fingerprint = None
+        self.last_error = None
+
+
+class ModelRegistry:
+    """
+    Registry of named models backed by versioned artifacts on disk.
+
+    Artifacts are matched by a glob pattern inside ``models_dir`` (e.g.
+    ``svm_health_risk_model*.pkl``), and the most recently modified match is
+    the active candidate. Dropping ``svm_health_risk_model-v2.pkl`` next to
+    the old file is enough to roll out a new version.
+    """
+
+    def __init__(self, models_dir, poll_interval=30):
+        self.models_dir = models_dir
+        self.poll_interval = poll_interval
+        self._slots = {}
+        self._listeners = []
+        self._write_lock = threading.Lock()
+        self._watcher_pid = None
+        self._loaded = False
+        self._load_lock = None
+        self._load_lock_pid = None
+
+    def register(self, name, pattern, loader, validator=None):
+        """
+        Register a model slot.
+
+        Args:
+            name: Slot name used by predictors, e.g. 'health_risk'
+            pattern: Glob pattern, relative to models_dir or absolute
+            loader: Callable(path) -> (model, scaler, metadata dict)
+            validator: Optional callable(model, scaler) that raises
+                ModelValidationError (or any exception) for a bad model
+        """
+        self._slots[name] = _ModelSlot(name, pattern, loader, validator)
+
+    def add_listener(self, callback):
+        """Call ``callback(name, loaded_model)`` after every successful swap."""
+        self._listeners.append(callback)
+
+    def get(self, name):
+        """Return the current LoadedModel snapshot for a slot, or None (loads every slot on first use)."""
+        if not self._loaded:
+            self.ensure_loaded()
+        slot = self._slots.get(name)
+        return slot.current if slot else None
+
+    def version(self, name):
+        """Return the version string of the current model, or None."""
+        current = self.get(name)
+        return current.version if current else None
+
+    def status(self):
+        """Summary of every slot, for logs and admin pages."""
+        summary = {}
+        for name, slot in self._slots.items():
+            current = slot.current
+            summary[name] = {
+                'version': current.version if current else None,
+                'path': current.path if current else None,
+                'loaded_at': current.loaded_at if current else None,
+                'last_error': slot.last_error,
+            }
+        return summary
+
+    def _candidate(self, slot):
+        """Return (path, fingerprint) of the newest artifact for a slot."""
+        paths = glob.glob(os.path.join(self.models_dir, slot.pattern))
+        best = None
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # File removed between glob and stat
+            fingerprint = (path, stat.st_mtime_ns, stat.st_size)
+            if best is None or stat.st_mtime_ns > best[1][1]:
+                best = (path, fingerprint)
+        return best
+
+    def _load_and_validate(self, slot, path):
+        model, scaler, metadata = slot.loader(path)
+        if model is None:
+            raise ModelValidationError(f'loader returned no model for {path}')
+        if slot.validator is not None:
+            slot.validator(model, scaler)
+        metadata = metadata or {}
+        version = metadata.get('version')
+        if not version:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            version = f"{stem}@{file_digest(path)}"
+        return LoadedModel(slot.name, model, scaler, str(version), path, metadata, time.time())
+
+    def refresh(self, name):
+        """
+        Load the newest artifact for one slot if it changed on disk.
+
+        Returns True when a new model was swapped in. A candidate that fails
+        to load or validate is remembered so it is not retried every poll;
+        the previous model keeps serving.
+        """
+        slot = self._slots[name]
+        candidate = self._candidate(slot)
+        if candidate is None:
+            return False
+        path, fingerprint = candidate
+        if fingerprint in (slot.fingerprint, slot.rejected_fingerprint):
+            return False
+
+        with self._write_lock:
+            if fingerprint in (slot.fingerprint, slot.rejected_fingerprint):
+                return False  # Another thread got here first
+            try:
+                loaded = run_blocking(self._load_and_validate, slot, path)
+            except Exception as e:
+                slot.rejected_fingerprint = fingerprint
+                slot.last_error = f'{os.path.basename(path)}: {e}'
+                logger.warning('Rejected %s model %s: %s', name, os.path.basename(path), e)
+                return False
+
+            # The swap itself: one reference assignment, atomic under the GIL
+            slot.current = loaded
+            slot.fingerprint = fingerprint
+            slot.last_error = None
+
+        logger.info('%s model version %s active', name, loaded.version)
+        for callback in self._listeners:
+            try:
+                callback(name, loaded)
+            except Exception as e:
+                logger.warning('Model swap listener failed: %s', e)
+        return True
+
+    def load_all(self):
+        """Synchronously load every slot."""
+        for name in self._slots:
+            self.refresh(name)
+        self._loaded = True
+
+    @property
+    def loaded(self):
+        """True once every slot was loaded in this process, or in the master it was forked from."""
+        return self._loaded
+
+    def ensure_loaded(self):
+        """
+        Load every slot unless that already happened in this process (or the
+        master it was forked from). Concurrent callers wait for one load.
+        """
+        if self._loaded:
+            return
+        # Created per process, after gevent has patched threading, so waiting on it yields to other greenlets
+        if self._load_lock_pid != os.getpid():
+            self._load_lock = threading.RLock()
+            self._load_lock_pid = os.getpid()
+        with self._load_lock:
+            if not self._loaded:
+                self.load_all()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            for name in list(self._slots):
+                try:
+                    self.refresh(name)
+                except Exception as e:
+                    logger.warning('Model registry poll failed for %s: %s', name, e)
+
+    def start_watching(self):
+        """
+        Start the background watcher once per process.
+
+        Safe to call on every request: gunicorn forks workers after the app
+        is preloaded, so the thread has to be started in each worker rather
+        than at import time in the master.
+        """
+        if not self.poll_interval or self._watcher_pid == os.getpid():
+            return
+        with self._write_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        thread = threading.Thread(target=self._watch_loop, name='model-registry-watcher', daemon=True)
+        thread.start()
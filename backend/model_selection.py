@@ -0,0 +1,172 @@
+"""
+Latency-aware model selection for the health risk model.
+
+Trains several candidate classifiers on the same split in parallel worker
+processes, then measures every candidate in the parent process one at a
+time (so timings are not skewed by the other trainings):
+  - test accuracy
+  - single-row latency (scaler + predict + predict_proba, as one request pays)
+  - batch latency per row
+  - pickled artifact size and load time
+
+The winner is the most accurate candidate whose single-row p99 fits the
+latency budget; candidates within ACCURACY_TOLERANCE of the best accuracy
+are treated as equal and the fastest of them wins.
+"""
+import os
+import pickle
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score
+from sklearn.svm import SVC, LinearSVC
+
+ACCURACY_TOLERANCE = 0.005
+DEFAULT_LATENCY_BUDGET_MS = 2.0
+SINGLE_ROW_CALLS = 300
+BATCH_SIZE = 256
+
+
+def _svc_rbf():
+    # Platt scaling (probability=True) runs an internal 5-fold CV: ~5x the fit cost
+    return SVC(kernel='rbf', C=1.0, gamma='scale', probability=True,
+               class_weight='balanced', random_state=42)
+
+
+def _linear_svc():
+    return CalibratedClassifierCV(LinearSVC(C=1.0, class_weight='balanced', dual=False, random_state=42),
+                                  method='sigmoid', cv=3)
+
+
+def _logistic_regression():
+    return LogisticRegression(C=1.0, class_weight='balanced', max_iter=1000)
+
+
+def _gradient_boosting():
+    return HistGradientBoostingClassifier(max_iter=200, learning_rate=0.1, random_state=42)
+
+
+CANDIDATES = {
+    'svc_rbf': ('SVM (RBF kernel, Platt scaling)', _svc_rbf),
+    'linear_svc': ('Linear SVM + sigmoid calibration', _linear_svc),
+    'logistic_regression': ('Logistic regression', _logistic_regression),
+    'gradient_boosting': ('Gradient-boosted trees (histogram)', _gradient_boosting),
+}
+
+
+def _fit_candidate(name, X_train, y_train):
+    """Worker process: fit one candidate and return it pickled."""
+    model = CANDIDATES[name][1]()
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    return name, pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL), time.perf_counter() - start
+
+
+def _predict_row(model, scaler, row):
+    features = scaler.transform(row) if scaler is not None else row
+    model.predict(features)
+    model.predict_proba(features)
+
+
+def measure_candidate(name, model_bytes, scaler, X_test, y_test, fit_seconds):
+    """Accuracy, latency, size and load time of one fitted candidate."""
+    start = time.perf_counter()
+    model = pickle.loads(model_bytes)
+    load_ms = (time.perf_counter() - start) * 1000.0
+
+    X_test_scaled = scaler.transform(X_test) if scaler is not None else X_test
+    accuracy = accuracy_score(y_test, model.predict(X_test_scaled))
+
+    rows = [X_test[i:i + 1] for i in range(min(SINGLE_ROW_CALLS, len(X_test)))]
+    for row in rows[:20]:
+        _predict_row(model, scaler, row)  # Warm-up
+    timings = []
+    for row in rows:
+        start = time.perf_counter()
+        _predict_row(model, scaler, row)
+        timings.append(time.perf_counter() - start)
+
+    batch = X_test[:BATCH_SIZE]
+    start = time.perf_counter()
+    _predict_row(model, scaler, batch)
+    batch_ms = (time.perf_counter() - start) * 1000.0
+
+    return {
+        'name': name,
+        'description': CANDIDATES[name][0],
+        'accuracy': float(accuracy),
+        'fit_seconds': fit_seconds,
+        'single_row_p50_ms': float(np.percentile(timings, 50)) * 1000.0,
+        'single_row_p99_ms': float(np.percentile(timings, 99)) * 1000.0,
+        'batch_per_row_us': batch_ms * 1000.0 / len(batch),
+        'size_kb': len(model_bytes) / 1024.0,
+        'load_ms': load_ms,
+        'model': model,
+    }
+
+
+def pick_winner(results, latency_budget_ms=DEFAULT_LATENCY_BUDGET_MS, tolerance=ACCURACY_TOLERANCE):
+    """
+    Most accurate candidate within the single-row p99 budget (fastest among
+    near-ties). If nothing fits the budget, the fastest candidate wins.
+    Returns (winner, within_budget).
+    """
+    eligible = [r for r in results if r['single_row_p99_ms'] <= latency_budget_ms]
+    if not eligible:
+        return min(results, key=lambda r: r['single_row_p99_ms']), False
+    best_accuracy = max(r['accuracy'] for r in eligible)
+    near_best = [r for r in eligible if r['accuracy'] >= best_accuracy - tolerance]
+    return min(near_best, key=lambda r: r['single_row_p99_ms']), True
+
+
+def select_model(X_train, y_train, X_test, y_test, scaler, candidates=None, jobs=None,
+                 latency_budget_ms=DEFAULT_LATENCY_BUDGET_MS):
+    """
+    Train candidates in parallel, measure them and pick a winner.
+
+    X_train must already be scaled; X_test is raw (scaling is part of the
+    measured serving cost). Returns (winner, results) where every result is
+    a dict from measure_candidate.
+    """
+    candidates = list(candidates or CANDIDATES)
+    unknown = [c for c in candidates if c not in CANDIDATES]
+    if unknown:
+        raise ValueError(f"Unknown candidates: {', '.join(unknown)} (choose from {', '.join(CANDIDATES)})")
+    jobs = jobs or min(len(candidates), os.cpu_count() or 1)
+
+    print(f"\nTraining {len(candidates)} candidates in {jobs} worker process(es)...")
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(_fit_candidate, name, X_train, y_train) for name in candidates]
+        fitted = [future.result() for future in futures]
+
+    results = []
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', category=UserWarning)
+        for name, model_bytes, fit_seconds in fitted:
+            results.append(measure_candidate(name, model_bytes, scaler, X_test, y_test, fit_seconds))
+    winner, within_budget = pick_winner(results, latency_budget_ms)
+    print_report(results, winner, latency_budget_ms)
+    if not within_budget:
+        print(f"[WARNING] No candidate fits the {latency_budget_ms} ms budget; picked the fastest")
+    return winner, results
+
+
+def print_report(results, winner, latency_budget_ms):
+    print(f"\nCandidate report (latency budget: single-row p99 <= {latency_budget_ms} ms)")
+    print(f"{'candidate':<22}{'accuracy':>9}{'fit s':>8}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'batch us/row':>14}{'size KB':>10}{'load ms':>9}")
+    for r in sorted(results, key=lambda r: -r['accuracy']):
+        marker = ' <- winner' if r is winner else ''
+        print(f"{r['name']:<22}{r['accuracy']:>9.4f}{r['fit_seconds']:>8.1f}{r['single_row_p50_ms']:>9.3f}"
+              f"{r['single_row_p99_ms']:>9.3f}{r['batch_per_row_us']:>14.1f}{r['size_kb']:>10.1f}"
+              f"{r['load_ms']:>9.2f}{marker}")
+
+
+def report_rows(results):
+    """Results without the fitted models, for JSON reports and artifact metadata."""
+    return [{k: v for k, v in r.items() if k != 'model'} for r in results]
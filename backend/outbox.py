@@ -0,0 +1,158 @@
+"""
+Transactional outbox for work that must follow a database write.
+
+A request that needs follow-up work (creating an emergency, assigning an
+ambulance, alerting dashboards) calls enqueue() on its own connection,
+before its commit. The message is then stored in the same transaction as
+the row it belongs to: both are saved, or neither is. The request itself
+returns without doing that work.
+
+OutboxDispatcher drains the table from a background thread in each worker
+(started on the first request, like the model watcher). A message is
+leased for `lease_seconds` before its handler runs, so two workers never
+run the same message at once. It is marked processed only after the
+handler returns. Delivery is therefore at least once: a worker that dies
+mid-handler leaves the lease to expire and another worker runs the message
+again. Handlers must be idempotent, and the outbox id is passed to them to
+key that on. A handler that raises is retried with exponential backoff up
+to `max_backoff` seconds between attempts; emergency messages are never
+dropped.
+
+notify() wakes the local dispatcher right after a commit; other workers
+find new messages on their next poll.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS outbox (
+       id INTEGER PRIMARY KEY AUTOINCREMENT,
+       topic TEXT NOT NULL,
+       payload TEXT NOT NULL,
+       created_at REAL NOT NULL,
+       available_at REAL NOT NULL,
+       attempts INTEGER NOT NULL DEFAULT 0,
+       processed_at REAL,
+       last_error TEXT
+   )'''
+INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (processed_at, available_at)',
+)
+
+Message = namedtuple('Message', 'id topic payload attempts')
+
+
+def enqueue(conn, topic, payload, now=None):
+    """Add a message in the caller's transaction (the caller commits); returns its id."""
+    now = time.time() if now is None else now
+    cur = conn.execute('INSERT INTO outbox (topic, payload, created_at, available_at) VALUES (?, ?, ?, ?)',
+                       (topic, json.dumps(payload, separators=(',', ':')), now, now))
+    return cur.lastrowid
+
+
+class OutboxDispatcher:
+    """Runs the handler of each outbox message's topic, at least once."""
+
+    def __init__(self, connect, handlers, poll_interval=1.0, batch_size=20, lease_seconds=30.0,
+                 retry_base=1.0, max_backoff=60.0, retention=86400.0):
+        self._connect = connect
+        self.handlers = handlers  # topic -> handler(message_id, payload)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.retry_base = retry_base
+        self.max_backoff = max_backoff
+        self.retention = retention
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+        self._dispatcher_pid = None
+
+    def start(self):
+        """Start the dispatcher thread once per process; safe to call on every request."""
+        if not self.poll_interval or self._dispatcher_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._dispatcher_pid == os.getpid():
+                return
+            self._dispatcher_pid = os.getpid()
+        thread = threading.Thread(target=self._run, name='outbox-dispatcher', daemon=True)
+        thread.start()
+
+    def notify(self):
+        """Wake this worker's dispatcher; call after committing a message."""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                while self.drain() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.warning('Outbox drain failed: %s', e)
+
+    def _lease(self, now):
+        """Due messages this dispatcher now holds the lease for."""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT id, topic, payload, attempts FROM outbox '
+                                'WHERE processed_at IS NULL AND available_at <= ? ORDER BY id LIMIT ?',
+                                (now, self.batch_size)).fetchall()
+            leased = []
+            for row in rows:
+                cur = conn.execute('UPDATE outbox SET available_at = ?, attempts = attempts + 1 '
+                                   'WHERE id = ? AND processed_at IS NULL AND available_at <= ?',
+                                   (now + self.lease_seconds, row[0], now))
+                if cur.rowcount:  # Otherwise another worker leased it in between
+                    leased.append(Message(row[0], row[1], json.loads(row[2]), row[3] + 1))
+            conn.commit()
+        finally:
+            conn.close()
+        return leased
+
+    def _finish(self, message, error, now):
+        conn = self._connect()
+        try:
+            if error is None:
+                conn.execute('UPDATE outbox SET processed_at = ?, last_error = NULL WHERE id = ?',
+                             (now, message.id))
+                if message.id % 100 == 0:
+                    conn.execute('DELETE FROM outbox WHERE processed_at < ?', (now - self.retention,))
+            else:
+                backoff = min(self.max_backoff, self.retry_base * 2 ** (message.attempts - 1))
+                conn.execute('UPDATE outbox SET available_at = ?, last_error = ? WHERE id = ?',
+                             (now + backoff, error[:500], message.id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def drain(self, now=None):
+        """Lease and handle up to batch_size due messages; returns how many were leased."""
+        fixed_now = now
+        messages = self._lease(time.time() if now is None else now)
+        for message in messages:
+            handler = self.handlers.get(message.topic)
+            error = None
+            try:
+                if handler is None:
+                    raise LookupError(f'no handler for topic {message.topic!r}')
+                handler(message.id, message.payload)
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+                logger.warning('Outbox message %s (%s) failed on attempt %d: %s', message.id, message.topic,
+                               message.attempts, error)
+            self._finish(message, error, time.time() if fixed_now is None else fixed_now)
+        return len(messages)
+
+    def pending_count(self):
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM outbox WHERE processed_at IS NULL').fetchone()[0]
+        finally:
+            conn.close()
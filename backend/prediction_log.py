@@ -0,0 +1,241 @@
+"""
+Asynchronous prediction log for retraining and drift analysis.
+
+predict_health_risk and predict_emergency_priority hand every prediction
+(feature vector, class probabilities, model version, latency) to
+PredictionLogger.log(), which only appends to an in-memory queue. A
+background thread drains the queue in batches and appends each batch to
+an active JSON-lines segment per model and process, with one write and
+flush per batch. Once a segment reaches rotate_rows it is rewritten as a
+columnar .npz file:
+
+    <log_dir>/<model>/<model>-<timestamp>-<pid>-<seq>.npz
+        timestamp (n,)  model_version (n,)  prediction (n,)  latency_ms (n,)
+        features (n, n_features)  probabilities (n, n_classes)  classes (n_classes,)
+
+load_prediction_log() reads those files (plus active segments) back into
+NumPy arrays for retraining.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from model_registry import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionLogger:
+    """
+    Non-blocking prediction log.
+
+    log() never waits on disk: when the queue is full (the writer has fallen
+    behind) the row is dropped and counted in stats()['dropped'].
+    """
+
+    def __init__(self, log_dir, batch_size=256, flush_interval=1.0, rotate_rows=50000, max_queue=10000):
+        self.log_dir = log_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rotate_rows = rotate_rows
+        self.max_queue = max_queue
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._segments = {}
+        self._writer_pid = None
+        self._seq = 0
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.rotated = 0
+
+    def log(self, model_name, features, probabilities, classes, model_version, latency_ms, prediction=None):
+        """Queue one prediction; returns immediately."""
+        if self._writer_pid != os.getpid():
+            self._start_writer()
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append((time.time(), model_name, features, probabilities, classes,
+                            model_version, latency_ms, prediction))
+        self.logged += 1
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def stats(self):
+        return {'logged': self.logged, 'written': self.written, 'dropped': self.dropped,
+                'rotated': self.rotated, 'queued': len(self._queue)}
+
+    def _start_writer(self):
+        # gunicorn forks after preload: one writer thread per worker process,
+        # and a forked child must not reuse the parent's open segments
+        with self._flush_lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+            self._segments = {}
+            self._queue.clear()
+        thread = threading.Thread(target=self._writer_loop, name='prediction-log-writer', daemon=True)
+        thread.start()
+        atexit.register(self.flush)
+
+    def _writer_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning('Prediction log write failed: %s', e)
+
+    def flush(self, rotate=False):
+        """Write everything queued so far; with rotate=True also close active segments."""
+        with self._flush_lock:
+            while self._queue:
+                batch = []
+                while self._queue and len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+                run_blocking(self._write_batch, batch)
+            if rotate:
+                for model_name in list(self._segments):
+                    run_blocking(self._rotate, model_name)
+
+    def _write_batch(self, batch):
+        lines = {}
+        for timestamp, model_name, features, probabilities, classes, version, latency_ms, prediction in batch:
+            row = {
+                't': timestamp,
+                'v': version,
+                'f': np.asarray(features, dtype=float).ravel().tolist(),
+                'p': None if probabilities is None else [float(p) for p in probabilities],
+                'c': None if classes is None else [str(c) for c in classes],
+                'y': None if prediction is None else str(prediction),
+                'ms': round(float(latency_ms), 4),
+            }
+            lines.setdefault(model_name, []).append(json.dumps(row))
+        for model_name, model_lines in lines.items():
+            segment = self._segments.get(model_name)
+            if segment is None:
+                segment = self._open_segment(model_name)
+            segment['file'].write('\n'.join(model_lines) + '\n')
+            segment['file'].flush()
+            segment['rows'] += len(model_lines)
+            self.written += len(model_lines)
+            if segment['rows'] >= self.rotate_rows:
+                self._rotate(model_name)
+
+    def _open_segment(self, model_name):
+        directory = os.path.join(self.log_dir, model_name)
+        os.makedirs(directory, exist_ok=True)
+        self._seq += 1
+        stem = f"{model_name}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{self._seq:04d}"
+        path = os.path.join(directory, stem + '.jsonl')
+        segment = {'path': path, 'file': open(path, 'a'), 'rows': 0}
+        self._segments[model_name] = segment
+        return segment
+
+    def _rotate(self, model_name):
+        """Rewrite the active segment as a columnar .npz file and start a new one."""
+        segment = self._segments.pop(model_name, None)
+        if segment is None:
+            return
+        segment['file'].close()
+        rows = _read_segment(segment['path'])
+        if rows:
+            target = segment['path'][:-len('.jsonl')] + '.npz'
+            for part, columns in enumerate(_to_columns(rows)):
+                path = target if part == 0 else target.replace('.npz', f'-{part}.npz')
+                tmp = path + '.tmp'
+                with open(tmp, 'wb') as f:
+                    np.savez(f, **columns)
+                os.replace(tmp, path)
+        os.unlink(segment['path'])
+        self.rotated += 1
+
+
+def _read_segment(path):
+    rows = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue  # Torn last line after a crash
+    return rows
+
+
+def _to_columns(rows):
+    """
+    JSON rows -> column dicts. Rows whose feature width or classes differ
+    (a model swap mid-segment) go into separate column sets.
+    """
+    groups = {}
+    for row in rows:
+        key = (len(row['f']), tuple(row['c'] or ()))
+        groups.setdefault(key, []).append(row)
+    for (n_features, classes), group in groups.items():
+        n_classes = len(classes)
+        probabilities = np.full((len(group), n_classes), np.nan)
+        for i, row in enumerate(group):
+            if row['p'] is not None and len(row['p']) == n_classes:
+                probabilities[i] = row['p']
+        yield {
+            'timestamp': np.array([row['t'] for row in group], dtype=np.float64),
+            'model_version': np.array([row['v'] or '' for row in group], dtype=str),
+            'prediction': np.array([row['y'] or '' for row in group], dtype=str),
+            'latency_ms': np.array([row['ms'] for row in group], dtype=np.float32),
+            'features': np.array([row['f'] for row in group], dtype=np.float64).reshape(len(group), n_features),
+            'probabilities': probabilities,
+            'classes': np.array(classes, dtype=str),
+        }
+
+
+def load_prediction_log(log_dir, model_name, model_version=None, include_active=True):
+    """
+    Load logged predictions of one model into NumPy arrays.
+
+    Returns a dict with timestamp, model_version, prediction, latency_ms,
+    features (n, n_features), probabilities (n, n_classes) and classes,
+    sorted by timestamp. Pass model_version to keep one version only; rows
+    with a different feature width or class list than the newest rows are
+    skipped (they belong to an incompatible model).
+    """
+    directory = os.path.join(log_dir, model_name)
+    parts = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.npz'))):
+        with np.load(path) as data:
+            parts.append({key: data[key] for key in data.files})
+    if include_active:
+        for path in sorted(glob.glob(os.path.join(directory, '*.jsonl'))):
+            parts.extend(_to_columns(_read_segment(path)))
+
+    if model_version is not None:
+        filtered = []
+        for part in parts:
+            keep = part['model_version'] == model_version
+            if keep.any():
+                filtered.append({k: (v if k == 'classes' else v[keep]) for k, v in part.items()})
+        parts = filtered
+    if not parts:
+        return None
+
+    newest = max(parts, key=lambda part: part['timestamp'].max())
+    schema = (newest['features'].shape[1], tuple(newest['classes']))
+    parts = [part for part in parts if (part['features'].shape[1], tuple(part['classes'])) == schema]
+    combined = {key: np.concatenate([part[key] for part in parts])
+                for key in newest if key != 'classes'}
+    order = np.argsort(combined['timestamp'], kind='stable')
+    combined = {key: value[order] for key, value in combined.items()}
+    combined['classes'] = newest['classes']
+    return combined
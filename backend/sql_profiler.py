@@ -0,0 +1,372 @@
+"""
+Per-request SQL profiling: statement counts, timings, N+1 suspects and slow queries.
+
+When SQL_PROFILING is on, get_db_connection() opens its connections with
+ProfiledConnection for the request being served. Every execute/executemany
+and every fetch is timed through ProfiledCursor and recorded on the
+request's RequestProfile, so a SELECT whose rows are read later is charged
+its full cost. When the request is traced (tracing.py), each statement
+also gets a span named after its verb and table, which its fetches extend.
+At the end of the request the profile is summarised:
+  - statement count and total time, sent back in the X-SQL-Profile header
+  - repeated statements: the same SQL run repeat_threshold times or more
+    (the usual N+1 shape, a query per row of an earlier result)
+  - duplicates: the same SQL with the same parameters run more than once
+Statements slower than slow_query_ms are logged once with their
+EXPLAIN QUERY PLAN. Parameters are only hashed, never logged or stored:
+they hold emails, phone numbers and OTPs.
+
+Per-route and per-statement totals are kept per worker and published to the
+sql_profile_stats table like drift_monitor.py does; /admin/sql_profile
+merges the rows of all workers.
+"""
+import atexit
+import json
+import logging
+import os
+import socket
+import sqlite3
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from functools import lru_cache
+from time import perf_counter
+
+from model_registry import run_blocking
+from tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+MAX_STATEMENTS = 500
+MAX_SQL_LENGTH = 500
+STATS_RETENTION_DAYS = 7
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+(\w+)', re.IGNORECASE)
+
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS sql_profile_stats (
+       worker TEXT PRIMARY KEY,
+       state TEXT NOT NULL,
+       updated_at TEXT NOT NULL
+   )'''
+
+
+def normalize(sql):
+    """One line of SQL for logs and aggregation keys."""
+    text = ' '.join(sql.split())
+    return text if len(text) <= MAX_SQL_LENGTH else text[:MAX_SQL_LENGTH] + '...'
+
+
+@lru_cache(maxsize=1024)
+def span_attributes(sql):
+    """('SELECT users', {db.system, db.statement}) for a statement's trace span."""
+    text = normalize(sql)
+    table = _TABLE.search(text)
+    name = text.split(' ', 1)[0].upper() + (f' {table.group(1)}' if table else '')
+    return name, {'db.system': 'sqlite', 'db.statement': text}
+
+
+def _start_db_span(sql):
+    name, attributes = span_attributes(sql)
+    return start_span(name, attributes)
+
+
+class _Statement:
+    __slots__ = ('sql', 'key', 'seconds', 'explained', 'span')
+
+    def __init__(self, sql, key, seconds, span=None):
+        self.sql = sql
+        self.key = key
+        self.seconds = seconds
+        self.explained = False
+        self.span = span
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that times its statements and fetches into the connection's profile."""
+
+    _entry = None
+    _parameters = None
+
+    def execute(self, sql, parameters=()):
+        profile = self.connection.profile
+        if profile is None:
+            return super().execute(sql, parameters)
+        db_span = _start_db_span(sql)
+        start = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._entry = profile.record(sql, hash((sql, repr(parameters))), perf_counter() - start, db_span)
+            if db_span is not None:
+                db_span.end()
+            self._parameters = parameters
+            profile.check_slow(self._entry, self.connection, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        profile = self.connection.profile
+        if profile is None:
+            return super().executemany(sql, seq_of_parameters)
+        db_span = _start_db_span(sql)
+        start = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # The parameters may be a consumed generator: no duplicate key and no plan
+            self._entry = profile.record(sql, None, perf_counter() - start, db_span)
+            if db_span is not None:
+                db_span.end()
+            self._parameters = None
+
+    def _timed(self, fetch, *args):
+        entry = self._entry
+        if entry is None:
+            return fetch(*args)
+        start = perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            entry.seconds += perf_counter() - start
+            if entry.span is not None:
+                entry.span.end_ns = time.time_ns()
+            self.connection.profile.check_slow(entry, self.connection, self._parameters)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+    def __next__(self):
+        return self._timed(super().__next__)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors report to a RequestProfile."""
+
+    profile = None
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect(database, profile=None, **kwargs):
+    """sqlite3.connect(), profiled into profile when one is given."""
+    if profile is None:
+        return sqlite3.connect(database, **kwargs)
+    conn = sqlite3.connect(database, factory=ProfiledConnection, **kwargs)
+    conn.profile = profile
+    return conn
+
+
+class RequestProfile:
+    """The statements one request ran, in order (profiler is None when only /metrics needs them)."""
+
+    def __init__(self, profiler, route):
+        self.profiler = profiler
+        self.route = route
+        self.statements = []
+
+    def record(self, sql, key, seconds, span=None):
+        entry = _Statement(sql, key, seconds, span)
+        self.statements.append(entry)
+        return entry
+
+    def check_slow(self, entry, conn, parameters):
+        # Without a profiler the statements are only timed (for /metrics)
+        if self.profiler is None:
+            return
+        if not entry.explained and entry.seconds * 1000 >= self.profiler.slow_query_ms:
+            entry.explained = True
+            self.profiler.log_slow(self.route, entry, conn, parameters)
+
+    def summary(self):
+        """(statement count, total ms, repeated SQL texts, duplicate executions)."""
+        by_sql, by_key = {}, {}
+        for entry in self.statements:
+            by_sql[entry.sql] = by_sql.get(entry.sql, 0) + 1
+            if entry.key is not None:
+                by_key[entry.key] = by_key.get(entry.key, 0) + 1
+        repeated = [sql for sql, count in by_sql.items() if count >= self.profiler.repeat_threshold]
+        duplicates = sum(count - 1 for count in by_key.values())
+        total_ms = sum(entry.seconds for entry in self.statements) * 1000
+        return len(self.statements), total_ms, repeated, duplicates
+
+
+def explain(conn, sql, parameters):
+    """EXPLAIN QUERY PLAN details joined into one line (not recorded by the profiler)."""
+    try:
+        rows = sqlite3.Cursor(conn).execute('EXPLAIN QUERY PLAN ' + sql, parameters or ()).fetchall()
+    except (sqlite3.Error, ValueError) as e:
+        return f'unavailable ({e.__class__.__name__})'
+    return '; '.join(str(row[-1]) for row in rows) or 'no plan'
+
+
+class SQLProfiler:
+    """Per-worker aggregation of request profiles, published to SQLite for /admin/sql_profile."""
+
+    def __init__(self, connect, slow_query_ms=100.0, repeat_threshold=5, publish_interval=30.0, max_slow=50):
+        self.connect = connect
+        self.slow_query_ms = slow_query_ms
+        self.repeat_threshold = repeat_threshold
+        self.publish_interval = publish_interval
+        self.worker_id = None
+        self._routes = {}
+        self._statements = {}
+        self._slow = deque(maxlen=max_slow)
+        self._reported = set()
+        self._lock = threading.Lock()
+        self._publisher_pid = None
+
+    def begin(self, route):
+        """Start profiling one request."""
+        if self._publisher_pid != os.getpid():
+            self._start_publisher()
+        return RequestProfile(self, route or 'unknown')
+
+    def finish(self, profile):
+        """Fold a finished request into the worker totals; returns the X-SQL-Profile header value."""
+        count, total_ms, repeated, duplicates = profile.summary()
+        new_suspects = []
+        with self._lock:
+            route = self._routes.get(profile.route)
+            if route is None:
+                route = self._routes[profile.route] = {'requests': 0, 'statements': 0, 'sql_ms': 0.0,
+                                                       'max_statements': 0, 'requests_with_repeats': 0,
+                                                       'duplicates': 0}
+            route['requests'] += 1
+            route['statements'] += count
+            route['sql_ms'] += total_ms
+            route['max_statements'] = max(route['max_statements'], count)
+            route['requests_with_repeats'] += bool(repeated)
+            route['duplicates'] += duplicates
+            for entry in profile.statements:
+                sql = normalize(entry.sql)
+                stats = self._statements.get(sql)
+                if stats is None:
+                    if len(self._statements) >= MAX_STATEMENTS:
+                        continue
+                    stats = self._statements[sql] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'routes': []}
+                ms = entry.seconds * 1000
+                stats['count'] += 1
+                stats['total_ms'] += ms
+                stats['max_ms'] = max(stats['max_ms'], ms)
+                if profile.route not in stats['routes']:
+                    stats['routes'].append(profile.route)
+            for sql in repeated:
+                if (profile.route, sql) not in self._reported:
+                    self._reported.add((profile.route, sql))
+                    new_suspects.append(sql)
+        for sql in new_suspects:
+            # Once per route and statement per worker, not on every request
+            logger.warning('Possible N+1 in %s: statement run %d times in one request: %s', profile.route,
+                           sum(e.sql == sql for e in profile.statements), normalize(sql))
+        return f"statements={count}; time_ms={total_ms:.1f}; repeated={len(repeated)}; duplicates={duplicates}"
+
+    def log_slow(self, route, entry, conn, parameters):
+        ms = entry.seconds * 1000
+        plan = explain(conn, entry.sql, parameters)
+        sql = normalize(entry.sql)
+        logger.warning('Slow query in %s (%.1f ms): %s | plan: %s', route, ms, sql, plan)
+        with self._lock:
+            self._slow.append({'route': route, 'sql': sql, 'ms': round(ms, 1), 'plan': plan,
+                               'at': datetime.utcnow().isoformat(timespec='seconds')})
+
+    def state(self):
+        with self._lock:
+            return {'routes': {name: dict(stats) for name, stats in self._routes.items()},
+                    'statements': {sql: dict(stats, routes=list(stats['routes']))
+                                   for sql, stats in self._statements.items()},
+                    'slow': list(self._slow)}
+
+    def _start_publisher(self):
+        # gunicorn forks after preload: every worker publishes under its own id
+        with self._lock:
+            if self._publisher_pid == os.getpid():
+                return
+            self._publisher_pid = os.getpid()
+            self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{int(time.time())}"
+            self._routes, self._statements, self._reported = {}, {}, set()
+            self._slow.clear()
+        if self.publish_interval:
+            thread = threading.Thread(target=self._publish_loop, name='sql-profile-publisher', daemon=True)
+            thread.start()
+        atexit.register(self._try_publish)
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(self.publish_interval)
+            self._try_publish()
+
+    def _try_publish(self):
+        try:
+            self.publish()
+        except Exception as e:
+            logger.warning('SQL profile publish failed: %s', e)
+
+    def publish(self):
+        """Write this worker's totals to sql_profile_stats."""
+        if self.worker_id is not None:
+            run_blocking(self._write, json.dumps(self.state()))
+
+    def _write(self, state):
+        now = datetime.utcnow()
+        conn = self.connect()
+        try:
+            conn.execute('INSERT OR REPLACE INTO sql_profile_stats (worker, state, updated_at) VALUES (?, ?, ?)',
+                         (self.worker_id, state, now.isoformat()))
+            # Workers that stopped long ago
+            conn.execute('DELETE FROM sql_profile_stats WHERE updated_at < ?',
+                         ((now - timedelta(days=STATS_RETENTION_DAYS)).isoformat(),))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def merge_states(states, top=50):
+    """Combine worker states into the /admin/sql_profile report."""
+    routes, statements, slow = {}, {}, []
+    for state in states:
+        for name, stats in state['routes'].items():
+            merged = routes.setdefault(name, dict.fromkeys(stats, 0))
+            for field, value in stats.items():
+                merged[field] = max(merged[field], value) if field == 'max_statements' else merged[field] + value
+        for sql, stats in state['statements'].items():
+            merged = statements.setdefault(sql, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'routes': []})
+            merged['count'] += stats['count']
+            merged['total_ms'] += stats['total_ms']
+            merged['max_ms'] = max(merged['max_ms'], stats['max_ms'])
+            merged['routes'] += [route for route in stats['routes'] if route not in merged['routes']]
+        slow += state['slow']
+
+    for stats in routes.values():
+        stats['sql_ms'] = round(stats['sql_ms'], 1)
+        stats['avg_statements'] = round(stats['statements'] / stats['requests'], 1) if stats['requests'] else 0.0
+        stats['avg_sql_ms'] = round(stats['sql_ms'] / stats['requests'], 2) if stats['requests'] else 0.0
+    ranked = sorted(statements.items(), key=lambda item: item[1]['total_ms'], reverse=True)[:top]
+    return {
+        'routes': dict(sorted(routes.items(), key=lambda item: item[1]['sql_ms'], reverse=True)),
+        'statements': [{'sql': sql, **stats, 'total_ms': round(stats['total_ms'], 1),
+                        'max_ms': round(stats['max_ms'], 1),
+                        'avg_ms': round(stats['total_ms'] / stats['count'], 3)} for sql, stats in ranked],
+        'slow_queries': sorted(slow, key=lambda item: item['at'], reverse=True)[:top],
+    }
+
+
+def load_report(connect, top=50):
+    """Merge the published totals of all workers. Returns (report, worker count)."""
+    conn = connect()
+    try:
+        rows = conn.execute('SELECT state FROM sql_profile_stats').fetchall()
+    finally:
+        conn.close()
+    return merge_states([json.loads(state) for (state,) in rows], top), len(rows)
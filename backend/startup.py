@@ -0,0 +1,149 @@
+"""
+Startup profiling and background warm-up.
+
+app.py marks the end of each startup phase on a StartupProfile. Each phase
+records its wall time, the process RSS when it ended and how many modules
+it imported. The first phase, "imports", is timed from process start.
+
+Work that requests do not need right away goes into warm-up tasks instead of
+running at import:
+  - unpickling the models, which pulls in scikit-learn
+  - initializing the Firebase Admin SDK
+warm_up() runs these tasks once per process on a background thread. It
+starts when the worker's first response has been sent. gunicorn's
+post_worker_init also schedules it a couple of seconds after boot, for
+workers that stay idle. It does not start earlier because loading
+scikit-learn's extension modules holds the GIL for most of a second; if
+that ran next to the first request, the request would gain nothing. If code
+needs something before the warm-up reaches it, that code loads it directly
+(ModelRegistry.get does this, and concurrent callers wait for that one load).
+
+Under gunicorn with preload_app, the master loads the models itself before
+forking (when_ready in gunicorn_config.py). The workers then share the
+unpickled models copy-on-write instead of each holding its own copy, and
+their warm-up only has Firebase left to do. The models warm-up task matters
+for processes without a preloading master, such as the development server.
+
+Run bench_startup.py to compare this with loading everything at import.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_mb():
+    """Resident set size of this process in MB (peak RSS where /proc is missing)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2**20
+    except (OSError, IndexError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def process_age():
+    """Seconds since this process started (Linux), else None."""
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the command name, which may contain spaces; starttime is field 22
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class StartupProfile:
+    """Per-phase startup timings and RSS, plus the warm-up tasks run after the app is up."""
+
+    def __init__(self):
+        self.phases = []
+        self.tasks = []
+        self.warm_up_done = False
+        self._warm_up_pid = None
+        self._go = None
+        self._running = None
+        self._modules = len(sys.modules)
+        self._last = time.perf_counter()
+        age = process_age()
+        # Everything before the profile was created: interpreter start and app.py's imports
+        self._record('imports', age if age is not None else 0.0, self._modules)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=self._before_fork)
+
+    def _record(self, name, seconds, modules):
+        self.phases.append({'phase': name, 'ms': round(seconds * 1000, 1), 'rss_mb': round(rss_mb(), 1),
+                            'modules': modules, 'pid': os.getpid()})
+
+    def mark(self, name):
+        """End the phase called name (it began at the previous mark)."""
+        now = time.perf_counter()
+        modules = len(sys.modules)
+        self._record(name, now - self._last, modules - self._modules)
+        self._last, self._modules = now, modules
+
+    def add_warm_up(self, name, func):
+        """Register func to run during warm_up(), as a phase called 'warm-up <name>'."""
+        self.tasks.append((name, func))
+
+    def warm_up(self, background=True, delay=0.0):
+        """
+        Run the warm-up tasks once, on a daemon thread unless background is
+        False. The thread waits up to delay seconds first; calling warm_up()
+        again starts it right away.
+        """
+        if self.warm_up_done:
+            return
+        if self._warm_up_pid == os.getpid():
+            self._go.set()
+            return
+        self._warm_up_pid = os.getpid()
+        if not background:
+            self._run_tasks()
+            return
+        # Created per process, after gevent has patched threading
+        self._go = threading.Event()
+        self._running = threading.RLock()
+        if not delay:
+            self._go.set()
+        threading.Thread(target=self._run_after, args=(delay,), name='startup-warm-up', daemon=True).start()
+
+    def _run_after(self, delay):
+        self._go.wait(delay)
+        with self._running:
+            self._run_tasks()
+
+    def _before_fork(self):
+        # A child forked mid warm-up would inherit import locks held by a thread it doesn't have
+        if self._running is not None and self._warm_up_pid == os.getpid():
+            with self._running:
+                pass
+
+    def _run_tasks(self):
+        started = time.perf_counter()
+        self._last, self._modules = started, len(sys.modules)
+        for name, func in self.tasks:
+            try:
+                func()
+            except Exception as e:
+                logger.warning('Warm-up of %s failed: %s', name, e)
+            self.mark(f'warm-up {name}')
+        self.warm_up_done = True
+        logger.info('Warm-up finished in %.0f ms (pid %d, RSS %.0f MB)', (time.perf_counter() - started) * 1000,
+                    os.getpid(), rss_mb())
+
+    def report(self):
+        """Phases recorded so far, oldest first."""
+        return list(self.phases)
+
+    def summary(self):
+        """All phases on one line, for startup output."""
+        return '; '.join(f"{p['phase']} {p['ms']:.0f} ms/{p['rss_mb']:.0f} MB" for p in self.phases)
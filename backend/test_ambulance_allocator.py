@@ -0,0 +1,184 @@
+"""
+Test script for the ambulance fleet allocator
+Covers assignment, the priority queue, forked workers, the load test and /emergency
+"""
+import sys
+import os
+import multiprocessing
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ambulance_allocator import ASSIGNED, AVAILABLE, AmbulanceAllocator, pending_status_text
+from bench_allocator import make_db, run
+from conftest import temporary_app_db
+from dispatch_state import CLOSED, DISPATCHED, PENDING, DispatchState
+
+
+def _setup(fleet_size):
+    path = os.path.join(tempfile.mkdtemp(), 'fleet.db')
+    make_db(path, 0)
+    conn = sqlite3.connect(path)
+    conn.executemany('INSERT INTO ambulances (call_sign, state, status_code) VALUES (?, ?, ?)',
+                     [(f'AMB-{i}', 'Bihar' if i % 2 else 'Kerala', AVAILABLE) for i in range(1, fleet_size + 1)])
+    conn.commit()
+    conn.close()
+    connect = lambda: sqlite3.connect(path, timeout=30)
+    dispatch_state = DispatchState(connect, resync_interval=3600)
+    allocator = AmbulanceAllocator(connect, dispatch_state)
+    allocator.refresh()
+    return path, dispatch_state, allocator
+
+
+def _new_emergency(path, dispatch_state, priority, requested_at, state=None):
+    conn = sqlite3.connect(path)
+    cur = conn.execute('INSERT INTO emergencies (status, requested_at, priority, state, status_code) '
+                       'VALUES (?, ?, ?, ?, ?)', (pending_status_text(priority), requested_at, priority, state, PENDING))
+    conn.commit()
+    conn.close()
+    dispatch_state.opened(PENDING)
+    return cur.lastrowid
+
+
+def _close(dispatch_state, allocator, emergency_id):
+    dispatch_state.advance(emergency_id, CLOSED)
+    return allocator.release(emergency_id)
+
+
+def test_assignment_prefers_same_state():
+    """A free unit from the caller's state is used first, then any free unit"""
+    print("\n=== Testing Direct Assignment ===")
+    path, dispatch_state, allocator = _setup(3)  # Bihar, Kerala, Bihar
+    first = allocator.request(_new_emergency(path, dispatch_state, 'High', 't1', 'Kerala'), 'High', 't1', 'Kerala')
+    second = allocator.request(_new_emergency(path, dispatch_state, 'High', 't2', 'Kerala'), 'High', 't2', 'Kerala')
+    assert first.state == 'Kerala' and second.state == 'Bihar'
+    assert allocator.available_count() == 1
+    assert dispatch_state.counts()['Dispatched'] == 2 and dispatch_state.counts()['Pending'] == 0
+
+    conn = sqlite3.connect(path)
+    status, ambulance_id = conn.execute('SELECT status, ambulance_id FROM emergencies WHERE id = ?',
+                                        (first.emergency_id,)).fetchone()
+    conn.close()
+    assert ambulance_id == first.ambulance_id and first.call_sign in status
+    print(f"[OK] Kerala call got {first.call_sign}, the next one {second.call_sign} from Bihar")
+
+
+def test_queue_serves_priority_then_time():
+    """Waiting requests are served Critical first, then oldest first"""
+    print("\n=== Testing Priority Queue ===")
+    path, dispatch_state, allocator = _setup(1)
+    busy = _new_emergency(path, dispatch_state, 'Low', 't0')
+    assert allocator.request(busy, 'Low', 't0') is not None
+
+    waiting = {}
+    for priority, requested_at in (('Low', 't1'), ('Critical', 't3'), ('High', 't2'), ('Critical', 't2')):
+        emergency_id = _new_emergency(path, dispatch_state, priority, requested_at)
+        assert allocator.request(emergency_id, priority, requested_at) is None
+        waiting[emergency_id] = (priority, requested_at)
+    assert dispatch_state.counts()['Pending'] == 4
+
+    served = []
+    current = busy
+    for _ in range(4):
+        assignment = _close(dispatch_state, allocator, current)
+        current = assignment.emergency_id
+        served.append(waiting[current])
+    assert served == [('Critical', 't2'), ('Critical', 't3'), ('High', 't2'), ('Low', 't1')], served
+    assert _close(dispatch_state, allocator, current) is None
+    assert allocator.available_count() == 1 and dispatch_state.active_count() == 0
+    print(f"[OK] Served in order: {served}")
+
+
+def test_cancel_and_new_unit():
+    """Cancelled waiting requests leave the queue; a new unit serves the queue at once"""
+    print("\n=== Testing Cancellation and New Units ===")
+    path, dispatch_state, allocator = _setup(1)
+    allocator.request(_new_emergency(path, dispatch_state, 'Medium', 't0'), 'Medium', 't0')
+    cancelled = _new_emergency(path, dispatch_state, 'Critical', 't1')
+    waiting = _new_emergency(path, dispatch_state, 'Low', 't2')
+    assert allocator.request(cancelled, 'Critical', 't1') is None
+    assert allocator.request(waiting, 'Low', 't2') is None
+    assert _close(dispatch_state, allocator, cancelled) is None
+
+    assignment = allocator.add_unit('AMB-NEW', state='Delhi')
+    assert assignment.emergency_id == waiting and assignment.call_sign == 'AMB-NEW'
+    assert allocator.request(waiting, 'Low', 't2') == assignment  # Repeat calls change nothing
+    assert dispatch_state.counts() == {'Pending': 0, 'Dispatched': 2, 'En Route': 0, 'Arrived': 0}
+    print("[OK] Cancelled request skipped, AMB-NEW went to the waiting one")
+
+
+def _child_requests(path, dispatch_state, allocator, n):
+    for i in range(n):
+        emergency_id = _new_emergency(path, dispatch_state, 'High', f't{i}')
+        allocator.request(emergency_id, 'High', f't{i}')
+
+
+def test_forked_workers_share_the_fleet():
+    """Workers forked after import see each other's assignments through the change log"""
+    print("\n=== Testing Forked Workers ===")
+    path, dispatch_state, allocator = _setup(10)
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_child_requests, args=(path, dispatch_state, allocator, 5)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    conn = sqlite3.connect(path)
+    assigned = conn.execute('SELECT COUNT(*) FROM ambulances WHERE status_code = ?', (ASSIGNED,)).fetchone()[0]
+    dispatched = conn.execute('SELECT COUNT(DISTINCT ambulance_id) FROM emergencies WHERE status_code = ?',
+                              (DISPATCHED,)).fetchone()[0]
+    conn.close()
+    assert assigned == dispatched == 10
+    assert allocator.available_count() == 0
+    assert dispatch_state.counts()['Pending'] == 10 and dispatch_state.counts()['Dispatched'] == 10
+
+    # The parent has not allocated since the fork; it applies the children's logged changes, without a reload
+    conn = sqlite3.connect(path)
+    unit_emergency = conn.execute('SELECT emergency_id FROM ambulances LIMIT 1').fetchone()[0]
+    conn.close()
+    reloads = []
+    full_reload = allocator._reload
+    allocator._reload = lambda conn: reloads.append(conn) or full_reload(conn)
+    assignment = _close(dispatch_state, allocator, unit_emergency)
+    assert assignment is not None and assignment.ambulance_id is not None
+    assert reloads == []
+    print("[OK] 4 workers x 5 requests: 10 dispatched, 10 queued, no unit assigned twice")
+
+
+def test_load():
+    """A smaller run of the load test keeps every invariant"""
+    print("\n=== Testing Under Load ===")
+    report = run(n_requests=1000, n_threads=32, fleet_size=20, processes=2)
+    assert not report['problems'], report['problems']
+    print(f"[OK] {report['requests']} requests at {report['requests_per_second']}/s, "
+          f"request p99 {report['request_p99_ms']} ms")
+
+
+def test_emergency_page_shows_assignment(app_db):
+    """The result page names the dispatched unit, or says the request is queued"""
+    print("\n=== Testing /emergency ===")
+    import app
+    form = {'name': 'Test', 'phone': '9999999999', 'location': 'Patna', 'symptoms': 'chest pain',
+            'age': '60', 'state': 'Bihar', 'emergency_type': 'Cardiac'}
+    fleet = app.ambulance_allocator.available_count()
+    assert fleet == app.AMBULANCE_FLEET_SIZE
+    client = app.app.test_client()
+    for i in range(fleet):  # Distinct callers; identical resubmits would be replayed
+        page = client.post('/emergency', data=dict(form, phone=f'98765{i:05d}')).get_data(as_text=True)
+        assert 'has been dispatched' in page and 'AMB-' in page
+    page = client.post('/emergency', data=form).get_data(as_text=True)
+    assert 'Queued (1 waiting)' in page
+    assert app.ambulance_allocator.available_count() == 0
+    print(f"[OK] {fleet} units dispatched, the next request queued")
+
+
+if __name__ == '__main__':
+    test_assignment_prefers_same_state()
+    test_queue_serves_priority_then_time()
+    test_cancel_and_new_unit()
+    test_forked_workers_share_the_fleet()
+    test_load()
+    with temporary_app_db() as db_path:
+        test_emergency_page_shows_assignment(db_path)
+    print("\n[SUCCESS] All ambulance allocator tests passed!")
@@ -0,0 +1,183 @@
+"""
+Test script for the streaming ambulance analytics
+Covers histogram accuracy, windowed aggregates, rebuilds and the ETag-cached endpoint
+"""
+import sys
+import os
+import random
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ambulance_analytics import CREATE_TABLE_SQL, AmbulanceAnalytics, bucket_bounds, histogram_bucket
+from conftest import temporary_app_db
+from dispatch_state import ARRIVED
+
+NOW = datetime(2026, 3, 2, 12, 0)
+EPOCH_NOW = int((NOW - datetime(1970, 1, 1)).total_seconds())
+
+
+def _temp_db():
+    path = os.path.join(tempfile.mkdtemp(), 'analytics.db')
+    conn = sqlite3.connect(path)
+    conn.execute(CREATE_TABLE_SQL)
+    conn.execute('''CREATE TABLE emergencies (id INTEGER PRIMARY KEY, state TEXT, priority TEXT, requested_at TEXT,
+                    response_time_minutes INTEGER, status_code INTEGER, status_updated_at TEXT)''')
+    conn.commit()
+    return path, conn
+
+
+def _exact_percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(1, -(-p * len(ordered) // 100)) - 1]
+
+
+def test_histogram_buckets():
+    """Every value falls in its bucket and buckets are at most 1/32 wide"""
+    print("\n=== Testing Histogram Buckets ===")
+    previous = -1
+    for seconds in range(0, 200000, 7):
+        index = histogram_bucket(seconds)
+        low, high = bucket_bounds(index)
+        assert low <= seconds < high and index >= previous
+        assert seconds < 64 or (high - low) / low <= 1 / 32
+        previous = index
+    print("[OK] Log-linear buckets cover 0-55 h within 3.2%")
+
+
+def test_windows_and_percentiles():
+    """Hour/day/week/all windows count the right calls and percentiles stay within the bucket error"""
+    print("\n=== Testing Windowed Aggregates ===")
+    path, conn = _temp_db()
+    analytics = AmbulanceAnalytics(lambda: sqlite3.connect(path))
+    rng = random.Random(4)
+    ages = {'hour': timedelta(minutes=30), 'day': timedelta(hours=5), 'week': timedelta(days=3),
+            'all': timedelta(days=30)}
+    values = {name: [] for name in ages}
+    for name, age in ages.items():
+        for _ in range(200):
+            seconds = rng.lognormvariate(6.5, 0.6)
+            when = NOW - age
+            analytics.record(conn, 'arrival', rng.choice(['Bihar', 'Kerala']), 'High', seconds, when)
+            values[name].append(seconds)
+    conn.commit()
+
+    report = analytics.report(now=EPOCH_NOW)
+    cumulative = []
+    for name in ('hour', 'day', 'week', 'all'):
+        cumulative += values[name]
+        stats = report['arrival'][name]
+        assert stats['count'] == len(cumulative), (name, stats)
+        assert abs(stats['avg'] - sum(cumulative) / len(cumulative) / 60) < 0.06
+        for p in (50, 90, 99):
+            exact = _exact_percentile(cumulative, p) / 60
+            assert abs(stats[f'p{p}'] - exact) <= exact * 0.035 + 0.05, (name, p, stats, exact)
+    assert report['planned']['all']['count'] == 0
+    assert set(report['by_priority']) == {'High'}
+    bihar = analytics.report(state='Bihar', now=EPOCH_NOW)['arrival']['all']['count']
+    kerala = analytics.report(state='Kerala', now=EPOCH_NOW)['arrival']['all']['count']
+    assert bihar + kerala == 800
+    # The last hour is 12 five-minute buckets: 30 minutes later the oldest calls have left it
+    later = analytics.report(now=EPOCH_NOW + 1800)
+    assert later['arrival']['hour']['count'] == 0 and later['arrival']['day']['count'] == 400
+    print(f"[OK] p90 last hour {report['arrival']['hour']['p90']} min, all time {report['arrival']['all']['p90']} min")
+
+
+def test_report_cached_per_generation():
+    """Reports are served from the cache until invalidate() or the next 5-minute bucket"""
+    print("\n=== Testing Report Cache ===")
+    path, conn = _temp_db()
+    statements = []
+
+    def connect():
+        traced = sqlite3.connect(path)
+        traced.set_trace_callback(statements.append)
+        return traced
+    analytics = AmbulanceAnalytics(connect)
+    analytics.record(conn, 'planned', 'Goa', 'Low', 1200, NOW)
+    conn.commit()
+    first = analytics.report(now=EPOCH_NOW)
+    issued = len(statements)
+    assert analytics.report(now=EPOCH_NOW + 60) is first and len(statements) == issued
+    analytics.record(conn, 'planned', 'Goa', 'Low', 600, NOW)
+    conn.commit()
+    assert analytics.report(now=EPOCH_NOW)['planned']['all']['count'] == 1  # Not invalidated yet
+    analytics.invalidate()
+    assert analytics.report(now=EPOCH_NOW)['planned']['all']['count'] == 2
+    print("[OK] Cached until invalidated")
+
+
+def test_rebuild_matches_live():
+    """Replaying the emergencies table gives the same aggregates as live recording"""
+    print("\n=== Testing Rebuild ===")
+    path, conn = _temp_db()
+    analytics = AmbulanceAnalytics(lambda: sqlite3.connect(path))
+    rng = random.Random(8)
+    for emergency_id in range(1, 151):
+        requested = NOW - timedelta(minutes=rng.randrange(60 * 24 * 10))
+        row = (emergency_id, rng.choice(['Bihar', None]), rng.choice(['High', 'Low']), requested.isoformat(),
+               rng.choice([5, 10, 15, 20]))
+        arrived = requested + timedelta(seconds=rng.randrange(300, 3000)) if emergency_id % 3 == 0 else None
+        conn.execute('INSERT INTO emergencies VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     row + (ARRIVED if arrived else 1, arrived.isoformat() if arrived else None))
+        analytics.record_planned(conn, row[1], row[2], row[4], requested)
+    # Arrivals come in later, out of request order
+    for emergency_id, updated_at in conn.execute('SELECT id, status_updated_at FROM emergencies '
+                                                 'WHERE status_code = ? ORDER BY status_updated_at',
+                                                 (ARRIVED,)).fetchall():
+        analytics.record_arrival(conn, emergency_id, datetime.fromisoformat(updated_at))
+    conn.commit()
+    live = analytics.report(now=EPOCH_NOW)
+    assert analytics.rebuild(conn) == 150
+    conn.commit()
+    analytics.invalidate()
+    rebuilt = analytics.report(now=EPOCH_NOW)
+    for metric in ('planned', 'arrival'):
+        assert live[metric]['all'] == rebuilt[metric]['all'], metric
+        assert live[metric]['day'] == rebuilt[metric]['day'], metric
+    assert rebuilt['arrival']['all']['count'] == 50
+    print(f"[OK] {rebuilt['planned']['all']['count']} planned and 50 arrival times rebuilt identically")
+
+
+def test_endpoint_etag_and_arrivals(app_db):
+    """/analytics/ambulance answers 304 while nothing changed and counts measured arrivals"""
+    print("\n=== Testing /analytics/ambulance ===")
+    import app
+    client = app.app.test_client()
+    form = {'location': 'Patna', 'phone': '9999999999', 'symptoms': 'fever', 'state': 'Bihar',
+            'emergency_type': 'EMS'}
+    client.post('/emergency', data=form)
+
+    first = client.get('/analytics/ambulance')
+    body = first.get_json()
+    assert first.status_code == 200 and first.headers['ETag']
+    assert body['total_emergencies'] == 1 and body['response_times']['planned']['hour']['count'] == 1
+    assert body['avg_response_time'] == body['response_times']['planned']['all']['p50']
+    again = client.get('/analytics/ambulance', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and not again.get_data()
+
+    conn = app.get_db_connection()
+    conn.execute('UPDATE emergencies SET hospital_id = 1 WHERE id = 1')  # No hospitals to route to in this DB
+    conn.commit()
+    conn.close()
+    with client.session_transaction() as session:
+        session['role'] = 'hospital'
+        session['user_id'] = 1
+    assert client.post('/emergency/1/status', data={'status': 'Arrived'}).status_code == 200
+    changed = client.get('/analytics/ambulance', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.get_json()['response_times']['arrival']['hour']['count'] == 1
+    assert client.get('/analytics/ambulance?state=Kerala').get_json()['response_times']['planned']['all'][
+        'count'] == 0
+    print("[OK] 304 on a matching ETag, arrival recorded when the unit arrives")
+
+
+if __name__ == '__main__':
+    test_histogram_buckets()
+    test_windows_and_percentiles()
+    test_report_cached_per_generation()
+    test_rebuild_matches_live()
+    with temporary_app_db() as db_path:
+        test_endpoint_etag_and_arrivals(db_path)
+    print("\n[SUCCESS] All ambulance analytics tests passed!")
@@ -0,0 +1,142 @@
+"""
+Test script for structured logging
+Checks the JSON lines, redaction, per-module levels, the non-blocking writer and the login routes
+"""
+import sys
+import os
+import io
+import json
+import logging
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app_logging
+from app_logging import configure, debug_sampled, parse_levels
+from conftest import temporary_app_db
+
+
+def _lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_json_lines_are_redacted():
+    """Each record is one JSON object; phone numbers, emails and sensitive extras are masked"""
+    print("\n=== Testing JSON Lines ===")
+    stream = io.StringIO()
+    handler = configure('INFO', stream=stream)
+    try:
+        log = logging.getLogger('test.logging')
+        log.info('Login for %s from %s', 'asha@example.com', '9876543210', extra={'otp_code': '123456', 'route': 'x'})
+        log.debug('Not written at INFO')
+        try:
+            raise ValueError('code 654321 rejected')
+        except ValueError:
+            log.exception('Verification failed')
+        log.info('model v2@1234567abc active')
+        handler.stop()
+    finally:
+        configure('INFO')
+    first, error, version = _lines(stream)
+    assert first['level'] == 'INFO' and first['logger'] == 'test.logging'
+    assert first['message'] == 'Login for [redacted] from [redacted]'
+    assert first['otp_code'] == '[redacted]' and first['route'] == 'x'
+    assert 'ValueError' in error['exc'] and '654321' not in error['exc']
+    assert version['message'] == 'model v2@1234567abc active'  # Digits inside a version are kept
+    print(f"[OK] {first}")
+
+
+def test_per_module_levels():
+    """LOG_LEVEL sets the root level and per-logger levels"""
+    print("\n=== Testing Log Levels ===")
+    assert parse_levels('WARNING, sql_profiler=debug,app=INFO') == ('WARNING', {'sql_profiler': 'DEBUG',
+                                                                                  'app': 'INFO'})
+    assert parse_levels('') == ('INFO', {})
+    try:
+        parse_levels('INFO,app=LOUD')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('unknown level accepted')
+    stream = io.StringIO()
+    handler = configure('WARNING,test.chatty=DEBUG', stream=stream)
+    try:
+        logging.getLogger('test.quiet').info('dropped')
+        logging.getLogger('test.chatty').debug('kept')
+        debug_sampled(logging.getLogger('test.chatty'), 0.0, 'never sampled')
+        handler.stop()
+    finally:
+        logging.getLogger('test.chatty').setLevel(logging.NOTSET)
+        configure('INFO')
+    assert [line['message'] for line in _lines(stream)] == ['kept']
+    print("[OK] Root at WARNING, test.chatty at DEBUG")
+
+
+def test_slow_output_does_not_block():
+    """Records queue up behind a slow stream instead of delaying the caller; overflow is dropped"""
+    print("\n=== Testing Background Writer ===")
+
+    class SlowStream(io.StringIO):
+        def write(self, text):
+            time.sleep(0.01)
+            return super().write(text)
+
+    stream = SlowStream()
+    handler = configure('INFO', stream=stream, queue_size=50)
+    try:
+        log = logging.getLogger('test.slow')
+        start = time.perf_counter()
+        for i in range(200):
+            log.info('record %d', i)
+        elapsed = time.perf_counter() - start
+        handler.stop()
+    finally:
+        configure('INFO')
+    written = len(_lines(stream))
+    assert elapsed < 0.5, elapsed  # 200 writes would take at least 2 s
+    assert handler.dropped > 0 and written + handler.dropped == 200
+    print(f"[OK] 200 records logged in {elapsed * 1000:.1f} ms; {written} written, {handler.dropped} dropped")
+
+
+def test_login_logs_no_credentials(app_db):
+    """Login routes log field names, never the password, OTP or phone number"""
+    print("\n=== Testing Login Logging ===")
+    import app
+    saved_rate = app.LOG_DEBUG_SAMPLE_RATE
+    app.LOG_DEBUG_SAMPLE_RATE = 1.0
+    stream = io.StringIO()
+    handler = configure('DEBUG', stream=stream)
+    try:
+        conn = app.get_db_connection()
+        conn.execute("INSERT INTO users (name, email, password, phone, address, health_id) "
+                     "VALUES ('Patient', 'p@example.com', 'hunter2-secret', '9123456780', 'Patna', 'H-LOG')")
+        conn.commit()
+        conn.close()
+        client = app.app.test_client()
+        client.post('/user/login', data={'login_type': 'password', 'identifier': 'H-LOG',
+                                         'password': 'hunter2-secret'})
+        client.post('/user/login', data={'login_type': 'otp', 'action': 'send_otp', 'identifier': 'H-LOG',
+                                         'phone': '9123456780'})
+        conn = app.get_db_connection()
+        code = conn.execute('SELECT code FROM otp_codes').fetchone()['code']
+        conn.close()
+        handler.stop()
+    finally:
+        app.LOG_DEBUG_SAMPLE_RATE = saved_rate
+        configure(app.LOG_LEVEL)
+    output = stream.getvalue()
+    lines = _lines(stream)
+    attempts = [line for line in lines if line['message'] == 'User login attempt']
+    assert len(attempts) == 2 and 'password' in attempts[0]['fields']
+    assert any(line['message'] == 'OTP issued' and line['role'] == 'user' for line in lines)
+    for secret in ('hunter2-secret', '9123456780', code):
+        assert secret not in output, secret
+    print(f"[OK] {len(lines)} lines, no password, phone or OTP")
+
+
+if __name__ == '__main__':
+    test_json_lines_are_redacted()
+    test_per_module_levels()
+    test_slow_output_does_not_block()
+    with temporary_app_db() as db_path:
+        test_login_logs_no_credentials(db_path)
+    print("\n[SUCCESS] All logging tests passed!")
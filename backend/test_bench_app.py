@@ -0,0 +1,74 @@
+"""
+Test script for the whole-app load test
+Checks seeding, the regression gate and a short run through WSGI
+"""
+import sys
+import os
+import json
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_app import MIX, WSGITransport, compare, main, run, seed
+from conftest import temporary_app_db
+
+
+def _route(p50, p95=None, p99=None, rps=100.0, errors=0):
+    return {'p50_ms': p50, 'p95_ms': p95 or p50 * 2, 'p99_ms': p99 or p50 * 3, 'throughput_rps': rps,
+            'errors': errors}
+
+
+def test_gate_flags_regressions_only():
+    """Slower routes, lost throughput and new errors fail; noise does not"""
+    print("\n=== Testing Regression Gate ===")
+    baseline = {'routes': {'a': _route(10.0), 'b': _route(10.0), 'c': _route(10.0), 'd': _route(1.0),
+                           'gone': _route(1.0)}}
+    results = {'routes': {
+        'a': _route(12.0, rps=90.0),          # within tolerance
+        'b': _route(10.0, p95=40.0),          # p95 regression
+        'c': _route(10.0, rps=50.0),          # throughput halved
+        'd': _route(1.0, errors=3),           # new errors
+    }}
+    regressions = compare(results, baseline)
+    assert [r.split(':')[0] for r in regressions] == ['b p95_ms', 'c throughput_rps', 'd errors'], regressions
+    print(f"[OK] {len(regressions)} regressions flagged, noise and missing routes ignored")
+
+
+def test_short_wsgi_run(app_db):
+    """Every route of the mix is exercised without errors and the seed is reused"""
+    print("\n=== Testing WSGI Run ===")
+    import app
+    conn = app.get_db_connection()
+    fixture = seed(conn, hospitals=2, doctors_per_hospital=2, patients=20, records_per_patient=2)
+    assert seed(conn) == fixture  # Already seeded: reused, nothing added
+    assert conn.execute('SELECT COUNT(*) FROM records').fetchone()[0] == 40
+    conn.close()
+    results = run(WSGITransport(app.app), fixture, users=3, duration=1.5, burst_size=3, burst_interval=0.5)
+    routes = results['routes']
+    assert set(MIX) | {'emergency_burst', 'total'} == set(routes), routes.keys()
+    assert all(r['errors'] == 0 and r['requests'] > 0 for r in routes.values()), routes
+    assert routes['total']['p50_ms'] <= routes['total']['p95_ms'] <= routes['total']['p99_ms']
+    assert results['meta']['transport'] == 'wsgi' and results['meta']['patients'] == 20
+    print(f"[OK] {routes['total']['requests']} requests at {routes['total']['throughput_rps']}/s, "
+          f"p95 {routes['total']['p95_ms']} ms")
+
+
+def test_main_writes_and_checks_baseline(app_db):
+    """The first run writes the baseline, the next one compares against it"""
+    print("\n=== Testing Baselines ===")
+    baseline = os.path.join(os.path.dirname(app_db), 'baseline.json')
+    args = ['--db', app_db, '--users', '2', '--duration', '0.5', '--burst-size', '0',
+            '--patients', '10', '--baseline', baseline]
+    assert main(args) == 0
+    with open(baseline) as f:
+        written = json.load(f)
+    assert written['meta']['users'] == 2 and 'total' in written['routes']
+    assert main(args + ['--tolerance', '1000', '--p99-tolerance', '1000', '--throughput-tolerance', '1']) == 0
+    print("[OK] Baseline written, then compared")
+
+
+if __name__ == '__main__':
+    test_gate_flags_regressions_only()
+    with temporary_app_db() as db_path:
+        test_short_wsgi_run(db_path)
+    with temporary_app_db() as db_path:
+        test_main_writes_and_checks_baseline(db_path)
+    print("\n[SUCCESS] All app load test checks passed!")
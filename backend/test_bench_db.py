@@ -0,0 +1,90 @@
+"""
+Test script for the benchmark database builder
+Checks row counts, skew, deferred indexes, determinism and shared snapshots
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_db
+from bench_app import seed
+from bench_db import build, copy_snapshot, snapshot
+
+PARAMS = dict(hospitals=3, doctors_per_hospital=2, users=300, records_per_user=4, emergencies=400)
+
+
+def _contents(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [conn.execute(f'SELECT * FROM {table} ORDER BY id').fetchall()
+                for table in ('hospitals', 'doctors', 'users', 'records', 'emergencies')]
+    finally:
+        conn.close()
+
+
+def test_build_counts_skew_and_indexes():
+    """The requested rows are loaded with skewed visits, indexes restored and rollups filled"""
+    print("\n=== Testing Build ===")
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'bench.db')
+    manifest = build(path, **PARAMS)
+    rows = manifest['rows']
+    assert (rows['hospitals'], rows['doctors'], rows['users'], rows['emergencies'], rows['ambulances']) == \
+        (3, 6, 300, 400, 6)
+    assert 0.8 * 1200 < rows['records'] < 1.25 * 1200, rows
+    assert os.path.exists(f'{path}.json') and not os.path.exists(f'{path}.partial')
+
+    conn = sqlite3.connect(path)
+    busiest = conn.execute('SELECT MAX(n) FROM (SELECT COUNT(*) AS n FROM records GROUP BY user_id)').fetchone()[0]
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    analyzed = conn.execute('SELECT COUNT(*) FROM sqlite_stat1').fetchone()[0]
+    demand = conn.execute('SELECT COUNT(*) FROM emergency_demand').fetchone()[0]
+    conn.close()
+    assert busiest > 4 * PARAMS['records_per_user']
+    assert {'idx_emergencies_status_code', 'idx_emergencies_record', 'idx_ambulances_status_code'} <= indexes
+    assert analyzed > 0 and demand > 0
+
+    conn = sqlite3.connect(path)
+    fixture = seed(conn)  # bench_app finds the generated doctors instead of seeding its own
+    conn.close()
+    assert len(fixture.doctors) == 6 and len(fixture.patients) == 300
+    again = os.path.join(folder, 'again.db')
+    build(again, **PARAMS)
+    assert _contents(again) == _contents(path)
+    print(f"[OK] {rows['records']} records, busiest patient {busiest}; same seed, same rows")
+
+
+def test_snapshot_is_built_once():
+    """snapshot() builds a named, versioned file once; copies are private"""
+    print("\n=== Testing Snapshots ===")
+    folder = tempfile.mkdtemp()
+    saved_scales = bench_db.SCALES
+    bench_db.SCALES = dict(saved_scales, test=PARAMS)
+    try:
+        path = snapshot('test', seed=3, directory=folder)
+        built_at = os.path.getmtime(path)
+        assert snapshot('test', seed=3, directory=folder) == path and os.path.getmtime(path) == built_at
+        assert os.path.basename(path).startswith(f'test-s3-v{bench_db.FORMAT_VERSION}-')
+        try:
+            snapshot('enormous', directory=folder)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('unknown scale accepted')
+    finally:
+        bench_db.SCALES = saved_scales
+    copy = copy_snapshot(path)
+    conn = sqlite3.connect(copy)
+    conn.execute('DELETE FROM records')
+    conn.commit()
+    conn.close()
+    assert _contents(path)[3]
+    print(f"[OK] {os.path.basename(path)} reused; the copy is independent")
+
+
+if __name__ == '__main__':
+    test_build_counts_skew_and_indexes()
+    test_snapshot_is_built_once()
+    print("\n[SUCCESS] All benchmark database tests passed!")
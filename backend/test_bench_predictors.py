@@ -0,0 +1,65 @@
+"""
+Test script for the predictor benchmark suite
+Checks the regression gate and a small end-to-end run
+"""
+import sys
+import os
+import json
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_predictors import compare, health_corpus, main, run_suite
+
+
+def _case(p50, p99=None, peak=1000.0, retained=0.0):
+    return {'p50_us': p50, 'p99_us': p99 or p50 * 2, 'peak_bytes': peak, 'retained_bytes': retained}
+
+
+def test_gate_flags_regressions_only():
+    """Slowdowns and allocation growth past the tolerance fail; noise does not"""
+    print("\n=== Testing Regression Gate ===")
+    baseline = {'cases': {'a': _case(100.0), 'b': _case(100.0), 'c': _case(2.0), 'gone': _case(1.0)}}
+    results = {'cases': {
+        'a': _case(120.0),               # within 25% + slack
+        'b': _case(200.0, p99=400.0),    # clear regression
+        'c': _case(6.0, peak=5000.0),    # tiny timing, but allocations grew
+    }}
+    regressions = compare(results, baseline)
+    assert any(r.startswith('b p50_us') for r in regressions)
+    assert any(r.startswith('b p99_us') for r in regressions)
+    assert any(r.startswith('c peak_bytes') for r in regressions)
+    assert not any(r.startswith('a ') or r.startswith('c p50') for r in regressions), regressions
+    print(f"[OK] {len(regressions)} regressions flagged")
+
+
+def test_corpora_are_seeded():
+    """The same seed always yields the same corpus"""
+    print("\n=== Testing Seeded Corpora ===")
+    assert health_corpus(50) == health_corpus(50)
+    assert health_corpus(50) != health_corpus(50, seed=7)
+    print("[OK] Corpora are reproducible")
+
+
+def test_suite_records_and_compares_baseline():
+    """A run writes a baseline, and the next run is compared against it"""
+    print("\n=== Testing Benchmark Run ===")
+    results = run_suite(corpus_size=30, rounds=1)
+    for case in ('health_risk.single', 'emergency_rulebased.single',
+                 'health_risk.model_missing', 'emergency.model_missing'):
+        assert results['cases'][case]['p50_us'] > 0, case
+
+    baseline = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+    assert main(['--baseline', baseline, '--corpus-size', '30', '--rounds', '1']) == 0
+    with open(baseline) as f:
+        assert 'emergency.model_missing' in json.load(f)['cases']
+    # Generous tolerance: only the comparison path is under test here
+    assert main(['--baseline', baseline, '--corpus-size', '30', '--rounds', '1', '--tolerance', '100',
+                 '--p99-tolerance', '100', '--alloc-tolerance', '100']) == 0
+    print("[OK] Baseline recorded and compared")
+
+
+if __name__ == '__main__':
+    test_gate_flags_regressions_only()
+    test_corpora_are_seeded()
+    test_suite_records_and_compares_baseline()
+    print("\n[SUCCESS] All benchmark suite tests passed!")
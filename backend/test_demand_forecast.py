@@ -0,0 +1,138 @@
+"""
+Test script for the incremental demand rollup and forecaster
+Covers the EWMA against a full recomputation, late calls, rebuilds and /emergency
+"""
+import sys
+import os
+import random
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import temporary_app_db
+from demand_forecast import ALL, ALL_HOURS, CREATE_TABLE_SQL, DemandForecaster, week_number
+
+MONDAY_9 = datetime(2026, 3, 2, 9, 15)
+
+
+def _temp_db():
+    conn = sqlite3.connect(os.path.join(tempfile.mkdtemp(), 'demand.db'))
+    conn.execute(CREATE_TABLE_SQL)
+    conn.execute('CREATE TABLE emergencies (state TEXT, zone TEXT, day TEXT, time_slot TEXT, requested_at TEXT)')
+    return conn
+
+
+def _reference(weekly_counts, alpha, first_week, week):
+    """Bias-corrected EWMA recomputed from the full weekly series."""
+    ewma = 0.0
+    for w in range(first_week, week):
+        ewma = (1 - alpha) * ewma + alpha * weekly_counts.get(w, 0)
+    return ewma / (1 - (1 - alpha) ** (week - first_week))
+
+
+def test_incremental_matches_recomputation():
+    """In-order, gapped and late calls give the same average as a full recomputation"""
+    print("\n=== Testing EWMA Updates ===")
+    conn = _temp_db()
+    forecaster = DemandForecaster(alpha=0.3)
+    rng = random.Random(5)
+    calls = [MONDAY_9 + timedelta(weeks=w) for w in range(12) if w not in (4, 5) for _ in range(rng.randrange(1, 6))]
+    late = [MONDAY_9 + timedelta(weeks=2), MONDAY_9 - timedelta(weeks=1)]  # Arrive after later weeks
+    for when in calls + late:
+        forecaster.record(conn, 'Bihar', 'Urban', 'Monday', 'Morning', when)
+
+    weekly_counts = {}
+    for when in calls + late:
+        weekly_counts[week_number(when)] = weekly_counts.get(week_number(when), 0) + 1
+    first_week = min(weekly_counts)
+    for weeks_ahead in (12, 13, 20):
+        when = MONDAY_9 + timedelta(weeks=weeks_ahead)
+        expected = _reference(weekly_counts, 0.3, first_week, week_number(when))
+        for key in (('Bihar', 'Urban', 'Monday', 'Morning', 9), ('Bihar', ALL, 'Monday', ALL, 9),
+                    ('Bihar', ALL, ALL, ALL, ALL_HOURS)):
+            assert abs(forecaster.expected(conn, key, when) - expected) < 1e-9
+    assert forecaster.expected(conn, ('Bihar', ALL, 'Monday', ALL, 9), MONDAY_9 - timedelta(weeks=1)) is None
+    assert forecaster.expected(conn, ('Kerala', ALL, 'Monday', ALL, 9), MONDAY_9) is None
+    print(f"[OK] {len(calls) + len(late)} calls over 13 weeks match the recomputed average")
+
+
+def test_levels_follow_rates():
+    """A busy hour is HIGH, a quiet one LOW, and no history says so"""
+    print("\n=== Testing Demand Levels ===")
+    conn = _temp_db()
+    forecaster = DemandForecaster()
+    start = MONDAY_9.replace(hour=0)
+    for week in range(8):
+        for _ in range(6):  # Busy Monday mornings
+            forecaster.record(conn, 'Delhi', 'Urban', 'Monday', 'Morning', MONDAY_9 + timedelta(weeks=week))
+        for hour in range(168):  # One call every hour of the week
+            when = start + timedelta(weeks=week, hours=hour)
+            forecaster.record(conn, 'Delhi', 'Urban', when.strftime('%A'), 'Night', when)
+    now = MONDAY_9 + timedelta(weeks=8)
+    busy = forecaster.forecast(conn, 'Delhi', 'Urban', 'Monday', 'Morning', now, available_ambulances=10)
+    quiet = forecaster.forecast(conn, 'Delhi', 'Urban', 'Tuesday', 'Night', now + timedelta(days=1), 10)
+    unknown = forecaster.forecast(conn, 'Goa', None, 'Monday', None, now, 10)
+    assert busy['level'] == 'HIGH' and busy['ratio'] > 2, busy
+    assert quiet['level'] == 'LOW' and quiet['ratio'] < 1, quiet
+    assert unknown['level'] == 'MEDIUM' and 'No demand history' in unknown['factors'][0]
+    assert forecaster.forecast(conn, 'Delhi', 'Urban', 'Monday', 'Morning', now, 2)['factors'][-1].startswith('Limited')
+    print(f"[OK] Monday 09:00 {busy['expected_per_hour']}/h -> HIGH, Tuesday {quiet['expected_per_hour']}/h -> LOW")
+
+
+def test_rebuild_matches_incremental():
+    """Replaying the emergencies table gives the same rollup as live updates"""
+    print("\n=== Testing Rebuild ===")
+    conn = _temp_db()
+    forecaster = DemandForecaster()
+    rng = random.Random(9)
+    for _ in range(300):
+        when = MONDAY_9 + timedelta(hours=rng.randrange(24 * 7 * 10))
+        row = (rng.choice(['Bihar', 'Kerala', None]), rng.choice(['Urban', 'Rural']), when.strftime('%A'), 'Night')
+        conn.execute('INSERT INTO emergencies VALUES (?, ?, ?, ?, ?)', row + (when.isoformat(),))
+        forecaster.record(conn, *row, when)
+    live = sorted(conn.execute('SELECT * FROM emergency_demand').fetchall())
+    assert forecaster.rebuild(conn) == 300
+    rebuilt = sorted(conn.execute('SELECT * FROM emergency_demand').fetchall())
+    assert len(live) == len(rebuilt)
+    for a, b in zip(live, rebuilt):
+        assert a[:6] == b[:6] and abs(a[6] - b[6]) < 1e-9 and a[7:] == b[7:]
+    print(f"[OK] {len(live)} rollup rows rebuilt identically")
+
+
+def test_emergency_uses_rollup(app_db):
+    """/emergency records the call in the rollup and no longer counts emergencies by state"""
+    print("\n=== Testing /emergency ===")
+    import app
+    statements = []
+    client = app.app.test_client()
+    form = {'location': 'Patna', 'phone': '9999999999', 'symptoms': 'fever', 'state': 'Bihar',
+            'zone': 'Urban', 'emergency_type': 'EMS'}
+    original_connect = app.get_db_connection
+
+    def traced_connection():
+        conn = original_connect()
+        conn.set_trace_callback(statements.append)
+        return conn
+    app.get_db_connection = traced_connection
+    try:
+        page = client.post('/emergency', data=form).get_data(as_text=True)
+    finally:
+        app.get_db_connection = original_connect
+    assert 'No demand history for Bihar' in page
+    assert not any('COUNT(*) AS c FROM emergencies WHERE state' in sql for sql in statements)
+
+    conn = app.get_db_connection()
+    totals = conn.execute("SELECT hour, total FROM emergency_demand WHERE state = 'Bihar' ORDER BY hour").fetchall()
+    conn.close()
+    assert len(totals) == 3 and all(row['total'] == 1 for row in totals)
+    print("[OK] Call recorded under 3 rollup keys")
+
+
+if __name__ == '__main__':
+    test_incremental_matches_recomputation()
+    test_levels_follow_rates()
+    test_rebuild_matches_incremental()
+    with temporary_app_db() as db_path:
+        test_emergency_uses_rollup(db_path)
+    print("\n[SUCCESS] All demand forecast tests passed!")
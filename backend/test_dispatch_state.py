@@ -0,0 +1,139 @@
+"""
+Test script for the emergency dispatch lifecycle
+Covers transitions, shared active counts across processes and the status endpoint
+"""
+import sys
+import os
+import multiprocessing
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import temporary_app_db
+from dispatch_state import (ARRIVED, CLOSED, DISPATCHED, EN_ROUTE, INDEX_SQL, DispatchState,
+                            InvalidTransition, parse_status)
+
+
+def _temp_db(n_dispatched=3):
+    path = os.path.join(tempfile.mkdtemp(), 'dispatch.db')
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE emergencies (id INTEGER PRIMARY KEY AUTOINCREMENT, status TEXT,
+                    status_code INTEGER, status_updated_at TEXT)''')
+    conn.execute(INDEX_SQL)
+    conn.executemany('INSERT INTO emergencies (status, status_code) VALUES (?, ?)',
+                     [('Ambulance Dispatched', DISPATCHED)] * n_dispatched + [('Closed', CLOSED)] * 5)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_status_parsing():
+    """Codes and labels in any case map to the same status"""
+    print("\n=== Testing Status Parsing ===")
+    assert parse_status('en route') == parse_status('En_Route') == parse_status('2') == EN_ROUTE
+    assert parse_status(ARRIVED) == ARRIVED
+    try:
+        parse_status('teleported')
+    except ValueError:
+        print("[OK] Unknown statuses rejected")
+    else:
+        raise AssertionError('unknown status accepted')
+
+
+def test_lifecycle_and_counts():
+    """Transitions follow the lifecycle and keep the active counts in step"""
+    print("\n=== Testing Lifecycle ===")
+    path = _temp_db()
+    state = DispatchState(lambda: sqlite3.connect(path), resync_interval=3600)
+    assert state.active_count() == 3  # Closed rows are not active
+
+    assert state.advance(1, 'En Route') == DISPATCHED
+    assert state.advance(1, 'Arrived') == EN_ROUTE
+    assert state.advance(2, 'Closed') == DISPATCHED  # Cancelled straight from Dispatched
+    assert state.counts() == {'Pending': 0, 'Dispatched': 1, 'En Route': 0, 'Arrived': 1}
+    assert state.active_count() == 2
+
+    for emergency_id, status in ((1, 'En Route'), (2, 'Arrived'), (1, 'Dispatched')):
+        try:
+            state.advance(emergency_id, status)
+        except InvalidTransition as e:
+            print(f"[OK] Rejected: {e}")
+        else:
+            raise AssertionError(f'{emergency_id} -> {status} should be rejected')
+    try:
+        state.advance(999, 'Closed')
+    except LookupError:
+        pass
+    else:
+        raise AssertionError('unknown emergency accepted')
+
+    # Counters match a fresh count from the database
+    counts = state.counts()
+    state.resync()
+    assert state.counts() == counts
+    print(f"[OK] Active counts: {counts}")
+
+
+def _child_dispatch(state, path, n):
+    conn = sqlite3.connect(path)
+    for _ in range(n):
+        conn.execute('INSERT INTO emergencies (status, status_code) VALUES (?, ?)', ('Ambulance Dispatched', DISPATCHED))
+        conn.commit()
+        state.opened(DISPATCHED)
+    conn.close()
+
+
+def test_counts_shared_across_forked_workers():
+    """Workers forked after import (gunicorn preload) share one set of counters"""
+    print("\n=== Testing Shared Counters ===")
+    path = _temp_db(n_dispatched=0)
+    state = DispatchState(lambda: sqlite3.connect(path), resync_interval=3600)
+    state.resync()
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_child_dispatch, args=(state, path, 25)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert state.active_count() == 100, state.active_count()
+    print("[OK] 4 forked workers x 25 dispatches = 100 active in the parent")
+
+
+def test_status_endpoint(app_db):
+    """Hospitals advance their own emergencies over HTTP; other hospitals and callers are refused"""
+    print("\n=== Testing Status Endpoint ===")
+    import app
+    conn = app.get_db_connection()
+    conn.execute('''INSERT INTO emergencies (location, status, requested_at, status_code, hospital_id)
+                    VALUES ('Patna', 'Ambulance Dispatched', '2026-01-01T00:00:00', ?, 1)''', (DISPATCHED,))
+    conn.commit()
+    conn.close()
+    app.dispatch_state.resync()
+    active_before = app.dispatch_state.active_count()
+
+    client = app.app.test_client()
+    assert client.post('/emergency/1/status', data={'status': 'En Route'}).status_code == 403
+    with client.session_transaction() as session:
+        session['role'] = 'hospital'
+        session['user_id'] = 2
+    assert client.post('/emergency/1/status', data={'status': 'En Route'}).status_code == 403  # Not routed to it
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    response = client.post('/emergency/1/status', data={'status': 'en route'})
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json() == {'id': 1, 'status': 'En Route', 'previous_status': 'Dispatched'}
+    assert client.post('/emergency/1/status', data={'status': 'Dispatched'}).status_code == 409
+    assert client.post('/emergency/1/status', data={'status': 'nowhere'}).status_code == 400
+    assert client.post('/emergency/42/status', data={'status': 'Closed'}).status_code == 404
+    assert client.post('/emergency/1/status', data={'status': 'Closed'}).status_code == 200
+    assert app.dispatch_state.active_count() == active_before - 1
+    print("[OK] Status endpoint enforces the lifecycle")
+
+
+if __name__ == '__main__':
+    test_status_parsing()
+    test_lifecycle_and_counts()
+    test_counts_shared_across_forked_workers()
+    with temporary_app_db() as db_path:
+        test_status_endpoint(db_path)
+    print("\n[SUCCESS] All dispatch state tests passed!")
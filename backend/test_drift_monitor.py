@@ -0,0 +1,184 @@
+"""
+Test script for live feature-drift monitoring
+Covers sketch merging, PSI/KL scoring, cross-worker aggregation and the admin endpoint
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from drift_monitor import (CREATE_TABLE_SQL, PSI_MODERATE, PSI_SIGNIFICANT, DriftMonitor, FeatureSketch,
+                           drift_report, load_merged_sketch, reference_stats)
+from featurizer import emergency_feature_names
+
+NAMES = ['a', 'b', 'Age']
+
+
+def _temp_db():
+    path = os.path.join(tempfile.mkdtemp(), 'drift.db')
+    conn = sqlite3.connect(path)
+    conn.execute(CREATE_TABLE_SQL)
+    conn.close()
+    return path
+
+
+def test_sketch_matches_batch_statistics():
+    """Row-by-row updates merged across sketches equal the batch statistics"""
+    print("\n=== Testing Sketch Statistics ===")
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.random(3000), rng.beta(2, 5, 3000), rng.integers(1, 95, 3000) / 100])
+    labels = rng.choice(['Low', 'High'], 3000)
+
+    parts = [FeatureSketch(NAMES) for _ in range(3)]
+    for i, (row, label) in enumerate(zip(X, labels)):
+        parts[i % 3].update(row, label)
+    merged = FeatureSketch.from_dict(parts[0].to_dict()).merge(parts[1]).merge(parts[2])
+    batch = FeatureSketch(NAMES).update_batch(X, labels)
+
+    assert merged.count == batch.count == 3000
+    assert np.allclose(merged.mean, X.mean(axis=0)) and np.allclose(batch.mean, X.mean(axis=0))
+    assert np.allclose(merged.std(), X.std(axis=0)) and np.allclose(batch.std(), X.std(axis=0))
+    assert np.array_equal(merged.hist, batch.hist)
+    assert merged.class_counts == batch.class_counts
+    print("[OK] Welford updates and merges agree with NumPy")
+
+
+def test_drift_scores():
+    """Same distribution scores stable; a shifted feature or class mix is flagged"""
+    print("\n=== Testing Drift Scores ===")
+    rng = np.random.default_rng(1)
+    reference = FeatureSketch.from_dict(reference_stats(NAMES, rng.random((5000, 3)),
+                                                        rng.choice(['Low', 'High'], 5000)))
+    same = FeatureSketch(NAMES).update_batch(rng.random((2000, 3)), rng.choice(['Low', 'High'], 2000))
+    report = drift_report(same, reference)
+    assert report['status'] == 'stable', report
+
+    shifted_rows = rng.random((2000, 3))
+    shifted_rows[:, 1] = rng.beta(8, 2, 2000)
+    shifted = FeatureSketch(NAMES).update_batch(shifted_rows, ['High'] * 2000)
+    report = drift_report(shifted, reference)
+    assert report['status'] == 'significant'
+    assert report['features']['b']['psi'] > 0.25 and report['features']['a']['psi'] < 0.1
+    assert report['classes']['psi'] > 0.25 and report['classes']['rates'] == {'High': 1.0}
+    print(f"[OK] Shifted feature PSI {report['features']['b']['psi']}, class PSI {report['classes']['psi']}")
+
+
+def test_age_shift_through_predictor():
+    """Encoded rows from predict_emergency_priority spread over the bins, so an older intake raises Age PSI"""
+    print("\n=== Testing Age Drift End to End ===")
+    import app
+    from model_artifacts import build_model_registry
+    from train_emergency_model import train_emergency_model
+    folder = tempfile.mkdtemp()
+    emergency_path = os.path.join(folder, 'Logistic_regression_prediction.pkl')
+    train_emergency_model(n_samples=2000, version='vdrift', output=emergency_path)
+    registry = build_model_registry(os.path.join(folder, 'svm_health_risk_model.pkl'), emergency_path, poll_interval=0)
+    registry.load_all()
+    rng = np.random.default_rng(2)
+
+    def sketch(ages):
+        monitor = DriftMonitor(_temp_db(), publish_interval=3600)
+        app.drift_monitor = monitor
+        for age in ages:
+            app.predict_emergency_priority('chest pain', age=int(age), zone='Urban', weather='Clear')
+        monitor.publish()
+        merged, _ = load_merged_sketch(monitor.db_path, 'emergency', registry.version('emergency'))
+        return merged
+
+    saved = app.model_registry, app.drift_monitor
+    app.model_registry = registry
+    try:
+        reference = sketch(rng.integers(5, 90, 400))
+        same = sketch(rng.integers(5, 90, 300))
+        older = sketch(rng.integers(65, 90, 300))
+    finally:
+        app.model_registry, app.drift_monitor = saved
+
+    age = reference.feature_names.index('Age')
+    assert reference.count == 400 and np.count_nonzero(reference.hist[age]) >= 8, reference.hist[age]
+    stable_psi = drift_report(same, reference)['features']['Age']['psi']
+    shifted_psi = drift_report(older, reference)['features']['Age']['psi']
+    assert stable_psi < PSI_MODERATE and shifted_psi > PSI_SIGNIFICANT, (stable_psi, shifted_psi)
+    print(f"[OK] Age PSI {stable_psi} for the same ages, {shifted_psi} for an older intake")
+
+
+def test_one_hot_frequencies():
+    """One-hot columns are reported as category frequencies, baseline included"""
+    print("\n=== Testing One-hot Frequencies ===")
+    names = emergency_feature_names(include_numeric=False, drop_first=True)
+    zone_columns = [i for i, name in enumerate(names) if name.startswith('Zone_')]
+    X = np.zeros((100, len(names)))
+    X[:30, zone_columns[0]] = 1
+    report = drift_report(FeatureSketch(names).update_batch(X))
+    zones = report['one_hot']['Zone']['frequencies']
+    assert zones[names[zone_columns[0]][len('Zone_'):]] == 0.3 and zones['(baseline)'] == 0.7
+    assert not report['features'] and report['status'] == 'no_reference'
+    print(f"[OK] Zone frequencies: {zones}")
+
+
+def test_workers_are_aggregated():
+    """Each worker publishes its own row; the reader merges them"""
+    print("\n=== Testing Cross-worker Aggregation ===")
+    db_path = _temp_db()
+    workers = [DriftMonitor(db_path, publish_interval=3600) for _ in range(2)]
+    for n, monitor in enumerate(workers):
+        monitor.observe('emergency', 'v1', NAMES, [0.5, 0.5, 0.4], 'Low')
+        monitor.worker_id = f'worker-{n}'  # Same process here, so give each its own id
+        for _ in range(9):
+            monitor.observe('emergency', 'v1', NAMES, [0.2, 0.8, 0.7], 'High')
+        monitor.publish()
+    workers[0].publish()  # Republishing replaces the worker's row instead of adding to it
+
+    merged, n_workers = load_merged_sketch(db_path, 'emergency', 'v1')
+    assert n_workers == 2 and merged.count == 20
+    assert merged.class_counts == {'Low': 2, 'High': 18}
+    assert load_merged_sketch(db_path, 'emergency', 'v2') == (None, 0)
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        workers[0].observe('emergency', 'v1', NAMES, [0.2, 0.8, 0.7], 'High')
+    per_call_us = (time.perf_counter() - start) / 1000 * 1e6
+    assert per_call_us < 200, per_call_us
+    print(f"[OK] 2 workers merged, {per_call_us:.1f} us per observe()")
+
+
+def test_admin_endpoint():
+    """The endpoint needs the admin token and reports every model"""
+    print("\n=== Testing /admin/model_drift ===")
+    import app
+    db_path = _temp_db()
+    saved = app.ADMIN_TOKEN, app.DB_PATH, app.drift_monitor
+    app.ADMIN_TOKEN, app.DB_PATH = 'test-token', db_path
+    app.drift_monitor = DriftMonitor(db_path, publish_interval=3600)
+    try:
+        for status in ('Stable', 'Critical', 'Recovered'):
+            app.predict_health_risk({'age': 50}, 'fever', 'viral infection', status, '', {'bmi': 24})
+        client = app.app.test_client()
+        assert client.get('/admin/model_drift').status_code == 403
+        assert client.get('/admin/model_drift', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+        response = client.get('/admin/model_drift', headers={'X-Admin-Token': 'test-token'})
+        assert response.status_code == 200
+        health = response.get_json()['models']['health_risk']
+    finally:
+        app.ADMIN_TOKEN, app.DB_PATH, app.drift_monitor = saved
+
+    assert health['observed'] == 3 and health['workers'] == 1
+    assert health['reference_source'] in ('artifact', 'synthetic') and health['reference'] > 0
+    assert health['status'] == 'insufficient_data'
+    assert set(health['features']) >= {'age_normalized', 'bmi_normalized'}
+    print(f"[OK] health_risk {health['version']}: {health['observed']} observed, "
+          f"reference from {health['reference_source']}")
+
+
+if __name__ == '__main__':
+    test_sketch_matches_batch_statistics()
+    test_drift_scores()
+    test_age_shift_through_predictor()
+    test_one_hot_frequencies()
+    test_workers_are_aggregated()
+    test_admin_endpoint()
+    print("\n[SUCCESS] All drift monitor tests passed!")
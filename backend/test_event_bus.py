@@ -0,0 +1,150 @@
+"""
+Test script for the dashboard event stream
+Covers cross-worker delivery, per-hospital filtering, replay, overflow and the /events endpoint
+"""
+import sys
+import os
+import json
+import multiprocessing
+import sqlite3
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import temporary_app_db
+from event_bus import CREATE_TABLE_SQL, EventBus, format_event
+
+
+def _temp_bus(**kwargs):
+    path = os.path.join(tempfile.mkdtemp(), 'events.db')
+    conn = sqlite3.connect(path)
+    conn.execute(CREATE_TABLE_SQL)
+    conn.commit()
+    conn.close()
+    return EventBus(lambda: sqlite3.connect(path), poll_interval=0.02, **kwargs)
+
+
+def _collect(subscription, n, timeout=5.0):
+    events = []
+    deadline = time.time() + timeout
+    while len(events) < n and time.time() < deadline:
+        events += subscription.wait(0.1)
+    return events
+
+
+def _child_publish(bus, worker, n):
+    for i in range(n):
+        bus.publish('emergency', {'worker': worker, 'i': i}, hospital_id=worker % 2 + 1)
+
+
+def test_forked_workers_and_filtering():
+    """Events published by forked workers reach subscribers; hospitals only get their own and broadcasts"""
+    print("\n=== Testing Cross-Worker Delivery ===")
+    bus = _temp_bus()
+    hospital_1 = bus.subscribe(1)
+    everyone = bus.subscribe(None)
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_child_publish, args=(bus, worker, 20)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    bus.publish('counts', {'available_ambulances': 3})
+
+    received = _collect(hospital_1, 41)
+    assert len(received) == 41, len(received)
+    assert all(event.hospital_id in (1, None) for event in received)
+    assert [event.id for event in received] == sorted(event.id for event in received)
+    broadcast_only = _collect(everyone, 1)
+    assert [event.topic for event in broadcast_only] == ['counts']
+    assert json.loads(received[-1].data) == {'available_ambulances': 3}
+    bus.unsubscribe(hospital_1)
+    bus.unsubscribe(everyone)
+    assert bus.subscriber_count() == 0
+    print("[OK] 80 events from 4 forked workers, 41 delivered to hospital 1 in order")
+
+
+def test_replay_and_overflow():
+    """Last-Event-ID replays missed events; a full queue marks the subscriber lost"""
+    print("\n=== Testing Replay and Overflow ===")
+    bus = _temp_bus(retention=150, queue_size=10)
+    ids = [bus.publish('counts', {'n': i}) for i in range(250)]
+    missed = bus.replay(ids[199], None)
+    assert [event.id for event in missed] == ids[200:]
+    assert bus.replay(0, 7)[0].id == 51  # Pruned at id 200 down to the last 150
+    assert format_event(missed[0]) == f'id: {ids[200]}\nevent: counts\ndata: {{"n":200}}\n\n'
+
+    slow = bus.subscribe(2)
+    for i in range(30):
+        bus.publish('counts', {'n': i})
+    deadline = time.time() + 5
+    while not slow.lost and time.time() < deadline:
+        time.sleep(0.02)
+    assert slow.lost and slow.wait(0) == []
+    bus.unsubscribe(slow)
+    print("[OK] Replay from Last-Event-ID, slow subscribers cut off")
+
+
+def test_events_endpoint(app_db):
+    """/events streams the signed-in hospital's emergencies and dispatch counts"""
+    print("\n=== Testing /events ===")
+    import app
+    saved = app.EVENT_HEARTBEAT_SECONDS, app.event_bus.poll_interval
+    app.EVENT_HEARTBEAT_SECONDS = 0.2
+    app.event_bus.poll_interval = 0.02
+    try:
+        conn = app.get_db_connection()
+        for reg_no, district in (('R1', 'Ranchi'), ('R2', 'Dhanbad')):
+            cur = conn.execute('INSERT INTO hospitals (name, reg_no, email, password, state, district) '
+                               'VALUES (?, ?, ?, ?, ?, ?)', (district, reg_no, f'{reg_no}@example.com', 'x',
+                                                             'Jharkhand', district))
+            conn.execute('INSERT INTO doctors (hospital_id, name, email, password, specialization) '
+                         'VALUES (?, ?, ?, ?, ?)', (cur.lastrowid, 'Dr', f'dr{reg_no}@example.com', 'x', 'General'))
+        conn.commit()
+        conn.close()
+        app.hospital_index.invalidate()
+
+        client = app.app.test_client()
+        assert client.get('/events').status_code == 403
+        with client.session_transaction() as session:
+            session['role'] = 'hospital'
+            session['user_id'] = 1
+        stream = client.get('/events', buffered=False)
+        assert stream.mimetype == 'text/event-stream'
+        chunks = iter(stream.response)
+        assert next(chunks).startswith(b'retry:')
+
+        form = {'location': 'Town', 'phone': '9999999999', 'symptoms': 'fever', 'state': 'Jharkhand',
+                'emergency_type': 'EMS'}
+        client.post('/emergency', data=dict(form, district='Dhanbad'))  # Routed to hospital 2
+        client.post('/emergency', data=dict(form, district='Ranchi'))
+        frames = []
+        while len([f for f in frames if f.startswith('id:')]) < 3:
+            frames.append(next(chunks).decode())
+        events = [f for f in frames if f.startswith('id:')]
+        topics = [f.split('\n')[1] for f in events]
+        assert topics == ['event: counts', 'event: emergency', 'event: counts'], frames
+        emergency = json.loads(events[1].split('data: ')[1])
+        assert emergency['emergency_id'] == 2 and emergency['district'] == 'Ranchi'
+        assert 'phone' not in emergency and 'name' not in emergency
+        assert any(f.startswith(': keep-alive') for f in [next(chunks).decode()])
+        stream.close()
+        assert app.event_bus.subscriber_count() == 0
+
+        first_id = events[0].split('\n')[0][4:]
+        resumed = client.get('/events', headers={'Last-Event-ID': first_id}, buffered=False)
+        chunks = iter(resumed.response)
+        next(chunks)
+        assert next(chunks).decode().split('\n')[1] == 'event: emergency'
+        resumed.close()
+    finally:
+        app.EVENT_HEARTBEAT_SECONDS, app.event_bus.poll_interval = saved
+    print(f"[OK] {len(events)} events and a keep-alive streamed, replayed after reconnect")
+
+
+if __name__ == '__main__':
+    test_forked_workers_and_filtering()
+    test_replay_and_overflow()
+    with temporary_app_db() as db_path:
+        test_events_endpoint(db_path)
+    print("\n[SUCCESS] All event bus tests passed!")
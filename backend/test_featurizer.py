@@ -0,0 +1,116 @@
+"""
+Test script for the shared health risk featurizer
+Checks train/serve parity over a large random input set and the encoding thresholds
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import featurizer
+import train_model
+from app import build_health_features
+
+N_ROWS = 20000
+STATUSES = ['Recovered', 'Stable', 'Under Observation', 'Critical', 'Emergency', 'Unknown', None]
+SYMPTOMS = ['', 'chest pain and sweating', 'mild fever', 'dry cough', 'itchy eyes', None]
+DIAGNOSES = ['', 'cardiac arrest', 'diabetes type 2', 'routine checkup', 'sprain', None]
+MEDICINES = ['', 'paracetamol', 'a, b', 'a, b, c, d, e, f', None]
+
+
+def _random_metric(rng, n, mean, sd, edges, decimals=0):
+    """Random readings with exact threshold values and missing (None / 0) mixed in."""
+    values = np.round(rng.normal(mean, sd, n), decimals).astype(object)
+    pick = rng.random(n)
+    values[pick < 0.1] = None
+    values[(pick >= 0.1) & (pick < 0.12)] = 0
+    on_edge = (pick >= 0.12) & (pick < 0.2)
+    values[on_edge] = rng.choice(edges, int(on_edge.sum()))
+    return values
+
+
+def _random_inputs(seed=0, n=N_ROWS):
+    """Raw inputs the way add_record hands them to predict_health_risk."""
+    rng = np.random.default_rng(seed)
+    coded = lambda choices: rng.choice(np.array(choices, dtype=object), n)
+    return {
+        'age': _random_metric(rng, n, 50, 25, [1, 100, 120]),
+        'systolic_bp': _random_metric(rng, n, 120, 25, [89, 90, 140, 141, 240]),
+        'diastolic_bp': _random_metric(rng, n, 80, 15, [59, 60, 90, 91]),
+        'bmi': _random_metric(rng, n, 25, 6, [18.4, 18.5, 25.0, 25.1, 30.0, 30.1], decimals=1),
+        'cholesterol': _random_metric(rng, n, 200, 40, [200.0, 200.1, 240.0, 240.1], decimals=1),
+        'glucose': _random_metric(rng, n, 100, 25, [100.0, 100.1, 125.0, 125.1], decimals=1),
+        'smoking': coded(['0', '1', '', None]),
+        'alcohol': coded(['0', '1', '', None]),
+        'physical_activity': coded(['0', '1', '2', '3', '4', '5', '', None]),
+        'family_history': coded(['0', '1', '', None]),
+        'treatment_status': coded(STATUSES),
+        'symptoms': coded(SYMPTOMS),
+        'diagnosis': coded(DIAGNOSES),
+        'medicines': coded(MEDICINES),
+    }
+
+
+def test_serving_matches_vectorized_path():
+    """One-row serving features equal the vectorized (training) path on every row"""
+    print("\n=== Testing Train/Serve Parity ===")
+    raw = _random_inputs()
+    metrics = ['age', 'systolic_bp', 'diastolic_bp', 'bmi', 'cholesterol', 'glucose']
+    flags = ['smoking', 'alcohol', 'physical_activity', 'family_history']
+
+    vectorized = featurizer.health_risk_features(
+        symptom_severity=[featurizer.symptom_severity(t) for t in raw['symptoms']],
+        diagnosis_severity=[featurizer.diagnosis_severity(t) for t in raw['diagnosis']],
+        treatment_status=raw['treatment_status'],
+        medicine_complexity=[featurizer.medicine_complexity(m) for m in raw['medicines']],
+        **{name: [featurizer.parse_metric(v) for v in raw[name]] for name in metrics},
+        **{name: [featurizer.parse_coded(v) for v in raw[name]] for name in flags},
+    )
+    assert vectorized.shape == (N_ROWS, featurizer.N_HEALTH_FEATURES)
+
+    for i in range(N_ROWS):
+        health_metrics = {name: raw[name][i] for name in metrics + flags}
+        row = build_health_features(None, raw['symptoms'][i], raw['diagnosis'][i],
+                                    raw['treatment_status'][i], raw['medicines'][i], health_metrics)
+        assert np.array_equal(row[0], vectorized[i]), f"Row {i} differs: {row[0]} vs {vectorized[i]}"
+    print(f"[OK] {N_ROWS} random rows identical between serving and vectorized paths")
+
+
+def test_training_uses_featurizer():
+    """Synthetic training rows only contain values the featurizer can produce"""
+    print("\n=== Testing Training Feature Layout ===")
+    assert list(train_model.FEATURE_NAMES) == featurizer.HEALTH_FEATURE_NAMES
+    X, _ = train_model.generate_synthetic_data(5000)
+    assert set(np.unique(X[:, 3])) <= set(featurizer.TREATMENT_STATUS_ENCODING.values())
+    assert set(np.unique(X[:, 6])) <= {0.3, 0.6, 0.7, 1.0}
+    assert set(np.unique(X[:, 7])) <= {0.3, 0.7, 1.0}
+    high_bp = X[:, 5][(X[:, 5] > 0.3) & (X[:, 5] != 0.8)]
+    assert len(np.unique(high_bp)) > 10, "High BP should be graded by systolic pressure"
+    print("[OK] Training features come from the shared featurizer")
+
+
+def test_thresholds():
+    """Spot checks of each encoder, including boundaries and missing values"""
+    print("\n=== Testing Encoder Thresholds ===")
+    nan = np.nan
+    assert np.allclose(featurizer.encode_bp([160, 141, 120, 85, 120, nan], [80, 80, 80, 70, 95, 80]),
+                       [0.7, 0.51, 0.3, 0.8, 0.3, 0.5])
+    assert np.allclose(featurizer.encode_bp(300, 120), 1.0)
+    assert np.allclose(featurizer.encode_bmi([18.4, 18.5, 25, 25.1, 30, 30.1, nan]),
+                       [0.6, 0.3, 0.3, 0.7, 0.7, 1.0, 0.5])
+    assert np.allclose(featurizer.encode_cholesterol([200, 200.1, 240, 241, nan]), [0.3, 0.7, 0.7, 1.0, 0.5])
+    assert np.allclose(featurizer.encode_glucose([100, 101, 125, 126, nan]), [0.3, 0.7, 0.7, 1.0, 0.5])
+    assert np.allclose(featurizer.encode_activity([0, 1, 5, 7, nan]), [1.0, 0.8, 0.0, 0.0, 1.0])
+    assert np.allclose(featurizer.encode_age([30, 150, nan]), [0.3, 1.0, 0.4])
+    assert np.allclose(featurizer.encode_treatment_status(['Critical', 'Stable', 'Other']), [1.0, 0.4, 0.5])
+    assert featurizer.parse_metric('') != featurizer.parse_metric('')  # NaN
+    assert featurizer.parse_coded('yes') == 0.0
+    print("[OK] Encoder thresholds match the documented bands")
+
+
+if __name__ == '__main__':
+    test_serving_matches_vectorized_path()
+    test_training_uses_featurizer()
+    test_thresholds()
+    print("\n[SUCCESS] All featurizer tests passed!")
@@ -0,0 +1,193 @@
+"""
+Test script for proximity routing
+Covers the gazetteer, exact k-nearest queries, hospital capability and /emergency routing
+"""
+import sys
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ambulance_allocator import AVAILABLE, AmbulanceAllocator
+from bench_allocator import make_db
+from conftest import temporary_app_db
+from dispatch_state import DispatchState
+from gazetteer import DISTRICT_COORDINATES, locate, parse_coordinates
+from geo_index import GridIndex, HospitalIndex, haversine_km
+
+APP_JS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'static', 'app.js')
+
+
+def test_gazetteer_covers_app_js():
+    """Every district in the state -> district dropdown has coordinates"""
+    print("\n=== Testing Gazetteer Coverage ===")
+    with open(APP_JS, encoding='utf-8') as f:
+        source = f.read()
+    block = source[source.index('const indiaDistricts'):source.index('};', source.index('const indiaDistricts'))]
+    listed = {state: re.findall(r"'([^']+)'", districts)
+              for state, districts in re.findall(r"'([^']+)':\s*\[([^\]]*)\]", block)}
+    assert listed
+    for state, districts in listed.items():
+        missing = set(districts) - set(DISTRICT_COORDINATES.get(state, {}))
+        assert not missing, (state, missing)
+        for lat, lon in DISTRICT_COORDINATES[state].values():
+            assert 6 <= lat <= 36 and 68 <= lon <= 98
+    print(f"[OK] {sum(len(d) for d in listed.values())} districts in {len(listed)} states")
+
+
+def test_locate():
+    """Free-text names resolve through case, suffixes, aliases and the state fallback"""
+    print("\n=== Testing Lookups ===")
+    assert locate('karnataka', 'Mysuru District') == DISTRICT_COORDINATES['Karnataka']['Mysuru']
+    assert locate('Karnataka', 'bangalore') == DISTRICT_COORDINATES['Karnataka']['Bengaluru Urban']
+    assert locate(None, 'Varanasi') == DISTRICT_COORDINATES['Uttar Pradesh']['Varanasi']
+    assert locate('Kerala', 'Ernakulam') == locate('Kerala')  # Unknown district: state capital
+    assert locate('Odisha') == locate('Orissa') is not None
+    assert locate('Atlantis', 'Nowhere') is None
+    assert parse_coordinates('12.9716', '77.5946') == (12.9716, 77.5946)
+    assert parse_coordinates('', '77.5') is None and parse_coordinates('95', '10') is None
+    print("[OK] Districts, aliases and capitals resolved")
+
+
+def test_grid_index_is_exact():
+    """k-nearest answers match a brute-force scan, with and without a filter"""
+    print("\n=== Testing GridIndex ===")
+    rng = random.Random(3)
+    index = GridIndex()
+    points = {}
+    for key in range(3000):
+        points[key] = (rng.uniform(8, 34), rng.uniform(68, 97))
+        index.insert(key, *points[key])
+    for key in range(0, 3000, 3):
+        index.remove(key)
+        del points[key]
+    assert len(index) == 2000
+
+    for _ in range(200):
+        query = (rng.uniform(6, 36), rng.uniform(66, 99))
+        k = rng.choice((1, 5, 20))
+        accept = (lambda key, _: key % 5 == 0) if rng.random() < 0.5 else None
+        found = [key for _, key, _ in index.nearest(query[0], query[1], k, accept)]
+        candidates = [key for key in points if accept is None or accept(key, None)]
+        assert found == sorted(candidates, key=lambda key: haversine_km(query, points[key]))[:k]
+
+    start = time.perf_counter()
+    for _ in range(2000):
+        index.nearest(19.07, 72.88, k=3)
+    per_query_us = (time.perf_counter() - start) / 2000 * 1e6
+    assert per_query_us < 500, per_query_us
+    print(f"[OK] Exact against brute force, {per_query_us:.1f} us per 3-nearest query over 2000 points")
+
+
+def _hospital_db():
+    path = os.path.join(tempfile.mkdtemp(), 'hospitals.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE hospitals (id INTEGER PRIMARY KEY, name TEXT, state TEXT, district TEXT)')
+    conn.execute('CREATE TABLE doctors (id INTEGER PRIMARY KEY, hospital_id INTEGER, specialization TEXT)')
+    conn.executemany('INSERT INTO hospitals VALUES (?, ?, ?, ?)', [
+        (1, 'Pune General', 'Maharashtra', 'Pune'),
+        (2, 'Satara Trauma Centre', 'Maharashtra', 'Satara'),
+        (3, 'Mumbai Clinic', 'Maharashtra', 'Mumbai City'),
+        (4, 'Unplaced Hospital', 'Atlantis', ''),
+    ])
+    conn.executemany('INSERT INTO doctors (hospital_id, specialization) VALUES (?, ?)',
+                     [(1, 'General Physician'), (2, 'Orthopaedics'), (4, 'Trauma')])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_hospital_capability():
+    """The closest capable hospital wins; invalidate() picks up new doctors"""
+    print("\n=== Testing Hospital Selection ===")
+    path = _hospital_db()
+    hospitals = HospitalIndex(lambda: sqlite3.connect(path))
+    pune = locate('Maharashtra', 'Pune')
+    assert len(hospitals) == 3  # Unplaced hospitals are left out
+    assert hospitals.nearest(pune, 'EMS')[0]['name'] == 'Pune General'
+    traffic = hospitals.nearest(pune, 'Traffic')[0]
+    assert traffic['name'] == 'Satara Trauma Centre' and traffic['capable'] and traffic['distance_km'] > 50
+    # No capable hospital for fires: the closest staffed one, flagged as not capable
+    fire = hospitals.nearest(pune, 'Fire')[0]
+    assert fire['name'] == 'Pune General' and not fire['capable']
+
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO doctors (hospital_id, specialization) VALUES (1, 'Burns and Plastic Surgery')")
+    conn.commit()
+    conn.close()
+    assert hospitals.nearest(pune, 'Traffic')[0]['name'] == 'Satara Trauma Centre'  # Not rebuilt yet
+    hospitals.invalidate()
+    assert hospitals.nearest(pune, 'Traffic')[0]['name'] == 'Pune General'
+    print(f"[OK] Traffic -> {traffic['name']} ({traffic['distance_km']} km), fire fallback -> {fire['name']}")
+
+
+def test_allocator_sends_closest_unit():
+    """With a location the closest free unit is dispatched"""
+    print("\n=== Testing Nearest Ambulance ===")
+    path = os.path.join(tempfile.mkdtemp(), 'fleet.db')
+    make_db(path, 0)
+    conn = sqlite3.connect(path)
+    conn.executemany('INSERT INTO ambulances (call_sign, state, district, status_code) VALUES (?, ?, ?, ?)',
+                     [('MUM-1', 'Maharashtra', 'Mumbai City', AVAILABLE), ('PUN-1', 'Maharashtra', 'Pune', AVAILABLE),
+                      ('NAG-1', 'Maharashtra', 'Nagpur', AVAILABLE)])
+    conn.execute("INSERT INTO emergencies (priority, requested_at, status_code) VALUES ('High', 't1', 0)")
+    conn.execute("INSERT INTO emergencies (priority, requested_at, status_code) VALUES ('High', 't2', 0)")
+    conn.commit()
+    conn.close()
+    connect = lambda: sqlite3.connect(path)
+    dispatch_state = DispatchState(connect, resync_interval=3600)
+    allocator = AmbulanceAllocator(connect, dispatch_state)
+    allocator.refresh()
+
+    first = allocator.request(1, 'High', 't1', 'Maharashtra', locate('Maharashtra', 'Satara'))
+    second = allocator.request(2, 'High', 't2', 'Maharashtra', locate('Maharashtra', 'Satara'))
+    assert (first.call_sign, second.call_sign) == ('PUN-1', 'MUM-1'), (first, second)
+    assert 0 < first.distance_km < second.distance_km
+    print(f"[OK] Satara call got {first.call_sign} ({first.distance_km} km), then {second.call_sign}")
+
+
+def test_emergency_routes_to_nearest_hospital(app_db):
+    """/emergency stores the location and the chosen hospital"""
+    print("\n=== Testing /emergency Routing ===")
+    import app
+    conn = app.get_db_connection()
+    for reg_no, name, district, specialization in (('R1', 'Ranchi Sadar', 'Ranchi', 'Emergency Medicine'),
+                                                    ('R2', 'Dhanbad Central', 'Dhanbad', 'Cardiology')):
+        cur = conn.execute('INSERT INTO hospitals (name, reg_no, email, password, state, district) '
+                           'VALUES (?, ?, ?, ?, ?, ?)', (name, reg_no, f'{reg_no}@example.com', 'x',
+                                                         'Jharkhand', district))
+        conn.execute('INSERT INTO doctors (hospital_id, name, email, password, specialization) '
+                     'VALUES (?, ?, ?, ?, ?)', (cur.lastrowid, 'Dr', f'dr{reg_no}@example.com', 'x', specialization))
+    conn.commit()
+    conn.close()
+    app.hospital_index.invalidate()
+
+    client = app.app.test_client()
+    form = {'location': 'Bokaro Steel City', 'phone': '9999999999', 'symptoms': 'breathing difficulty',
+            'state': 'Jharkhand', 'emergency_type': 'EMS', 'latitude': '23.79', 'longitude': '86.42'}
+    page = client.post('/emergency', data=form).get_data(as_text=True)
+    assert 'Dhanbad Central' in page
+    page = client.post('/emergency', data=dict(form, latitude='', longitude='', district='Khunti',
+                                               emergency_type='Traffic')).get_data(as_text=True)
+    assert 'Ranchi Sadar' in page
+
+    conn = app.get_db_connection()
+    rows = conn.execute('SELECT district, latitude, hospital_id FROM emergencies ORDER BY id').fetchall()
+    conn.close()
+    assert [row['hospital_id'] for row in rows] == [2, 1]
+    assert rows[0]['latitude'] == 23.79 and rows[1]['district'] == 'Khunti'
+    print("[OK] Device location -> Dhanbad Central, Khunti district -> Ranchi Sadar")
+
+
+if __name__ == '__main__':
+    test_gazetteer_covers_app_js()
+    test_locate()
+    test_grid_index_is_exact()
+    test_hospital_capability()
+    test_allocator_sends_closest_unit()
+    with temporary_app_db() as db_path:
+        test_emergency_routes_to_nearest_hospital(db_path)
+    print("\n[SUCCESS] All geo index tests passed!")
@@ -0,0 +1,134 @@
+"""
+Test script for duplicate emergency submissions
+Covers the TTL index, key and fingerprint replays, concurrent repeats and retries after a refusal
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import temporary_app_db
+from idempotency import CREATE_TABLE_SQL, INDEX_SQL, SubmissionGuard, TTLIndex, fingerprint
+from intake import IntakeGate
+
+
+def test_ttl_index_and_fingerprint():
+    """Entries expire after their ttl; fingerprints ignore phone and location formatting"""
+    print("\n=== Testing TTL Index and Fingerprints ===")
+    index = TTLIndex()
+    index.put('a', 1, ttl=10, now=100)
+    index.put('b', 2, ttl=1, now=100)
+    assert index.get('a', now=105) == 1 and index.get('b', now=105) is None
+    index.put('c', 3, ttl=10, now=105)  # Purges the expired entry
+    assert len(index) == 2 and index.get('a', now=111) is None
+
+    assert fingerprint('+91 99999-99999', 'Gandhi Maidan, Patna') == fingerprint('09999999999', 'gandhi maidan patna')
+    assert fingerprint('9999999999', 'Patna') != fingerprint('9999999999', 'Gaya')
+    assert fingerprint('', 'Patna') is None
+    print("[OK] Expiry, purge and normalized fingerprints")
+
+
+def test_guard_claims_and_releases():
+    """A claimed key is found by key or fingerprint once complete, and is gone once released"""
+    print("\n=== Testing Submission Guard ===")
+    path = os.path.join(tempfile.mkdtemp(), 'submissions.db')
+    conn = sqlite3.connect(path)
+    conn.execute(CREATE_TABLE_SQL)
+    for sql in INDEX_SQL:
+        conn.execute(sql)
+    conn.close()
+    guard = SubmissionGuard(lambda: sqlite3.connect(path, timeout=30), window=60, wait=0.2)
+    fingerprint_ = fingerprint('9999999999', 'Patna')
+
+    submission_id = guard.claim('key-1', fingerprint_)
+    assert submission_id is not None and guard.claim('key-1', None) is None
+    assert guard.find('key-1', None).response is None  # Still running after the wait
+    guard.complete(submission_id, 'key-1', fingerprint_, 7, '<html>done</html>')
+    other = SubmissionGuard(lambda: sqlite3.connect(path, timeout=30), window=60)  # Another worker
+    assert other.find(None, fingerprint_) == (submission_id, 7, '<html>done</html>', 'key-1')
+    assert other.find('key-2', fingerprint('9999999999', 'Gaya')) is None
+
+    retry_id = guard.claim('key-3', fingerprint('8888888888', 'Patna'))
+    guard.release(retry_id, 'key-3', fingerprint('8888888888', 'Patna'))
+    assert guard.find('key-3', fingerprint('8888888888', 'Patna')) is None
+    assert guard.claim('key-3', None) is not None
+    print("[OK] Claim, complete, cross-worker lookup and release")
+
+
+def _count_emergencies(app):
+    conn = app.get_db_connection()
+    count = conn.execute('SELECT COUNT(*) FROM emergencies').fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_emergency_route_replays_repeats(app_db):
+    """Repeats by key, by phone and location, and concurrent ones create one emergency; only the caller sees it"""
+    print("\n=== Testing /emergency Replays ===")
+    import app
+    form = {'name': 'Test', 'phone': '9876500001', 'location': 'Patna', 'symptoms': 'fever',
+            'state': 'Bihar', 'emergency_type': 'EMS', 'idempotency_key': 'form-1'}
+    client = app.app.test_client()
+    first = client.post('/emergency', data=form)
+    assert first.status_code == 200 and 'Idempotent-Replay' not in first.headers
+    again = client.post('/emergency', data=form)
+    assert again.headers['Idempotent-Replay'] == 'true'
+    assert again.get_data(as_text=True) == first.get_data(as_text=True)
+    reloaded = client.post('/emergency', data=dict(form, phone='+91 98765 00001', idempotency_key='form-2'))
+    assert reloaded.headers.get('Idempotent-Replay') == 'true'
+    # Another caller with the same phone and location is not shown the first caller's details
+    stranger = app.app.test_client().post('/emergency', data=dict(form, idempotency_key='form-5'))
+    assert stranger.status_code == 202 and 'Idempotent-Replay' not in stranger.headers
+    assert 'already been received' in stranger.get_data(as_text=True)
+    assert '9876500001' not in stranger.get_data(as_text=True)
+    assert _count_emergencies(app) == 1
+
+    results = []
+    concurrent = dict(form, phone='9876500002', idempotency_key='form-3')
+    threads = [threading.Thread(target=lambda: results.append(
+        app.app.test_client().post('/emergency', data=concurrent))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    originals = [r for r in results if r.status_code == 200 and 'Idempotent-Replay' not in r.headers]
+    assert len(originals) == 1
+    assert all(r.status_code == 202 or r.headers.get('Idempotent-Replay') == 'true'
+               for r in results if r is not originals[0])
+    assert _count_emergencies(app) == 2
+    print("[OK] 1 emergency per repeated key, reloaded form and concurrent burst")
+
+
+def test_refused_submission_can_retry(app_db):
+    """A submission refused with 503 never reaches the guard, so the caller's retry goes through"""
+    print("\n=== Testing Retry After Refusal ===")
+    import app
+    saved_gate = app.intake_gate
+    form = {'phone': '9876500003', 'location': 'Patna', 'symptoms': 'fever', 'state': 'Bihar',
+            'emergency_type': 'EMS', 'idempotency_key': 'form-4'}
+    try:
+        client = app.app.test_client()
+        app.intake_gate = IntakeGate(capacity=0, queue_size=0, max_wait=1, critical_reserve=0)
+        assert client.post('/emergency', data=form).status_code == 503
+        conn = app.get_db_connection()
+        assert conn.execute('SELECT COUNT(*) FROM emergency_submissions').fetchone()[0] == 0  # Refused before the guard
+        conn.close()
+        app.intake_gate = saved_gate
+        retry = client.post('/emergency', data=form)
+        assert retry.status_code == 200 and 'Idempotent-Replay' not in retry.headers
+        assert _count_emergencies(app) == 1
+    finally:
+        app.intake_gate = saved_gate
+    print("[OK] 503 released the key; the retry created the emergency")
+
+
+if __name__ == '__main__':
+    test_ttl_index_and_fingerprint()
+    test_guard_claims_and_releases()
+    with temporary_app_db() as db_path:
+        test_emergency_route_replays_repeats(db_path)
+    with temporary_app_db() as db_path:
+        test_refused_submission_can_retry(db_path)
+    print("\n[SUCCESS] All idempotency tests passed!")
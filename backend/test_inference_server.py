@@ -0,0 +1,145 @@
+"""
+Test script for the inference sidecar
+Checks parity with in-process inference, batching and the fallback path
+"""
+import sys
+import os
+import subprocess
+import tempfile
+import time
+import warnings
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from inference_client import InferenceClient
+from inference_server import predict_batch
+from model_artifacts import build_model_registry
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BACKEND_DIR, 'pkl', 'svm_health_risk_model.pkl')
+EMERGENCY_MODEL_PATH = os.path.join(BACKEND_DIR, 'pkl', 'Logistic_regression_prediction.pkl')
+
+
+def _registry():
+    registry = build_model_registry(MODEL_PATH, EMERGENCY_MODEL_PATH, poll_interval=0)
+    registry.load_all()
+    return registry
+
+
+def test_batch_matches_single_rows():
+    """A vectorized batch gives the same answers as row-by-row inference"""
+    print("\n=== Testing Batched Prediction ===")
+    registry = _registry()
+    loaded = registry.get('emergency')
+    if loaded is None:
+        print("[WARNING] Emergency model not loaded - skipping")
+        return
+    rows = np.random.default_rng(0).integers(0, 2, (32, loaded.model.n_features_in_)).tolist()
+    batched = predict_batch(registry, 'emergency', rows)
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', category=UserWarning)
+        expected = loaded.model.predict(np.array(rows, dtype=float))
+    assert [r['prediction'] for r in batched] == list(expected)
+    assert all(r['version'] == loaded.version for r in batched)
+    checked = predict_batch(registry, 'emergency', rows[:3], [loaded.version, 'other', None])
+    assert [r.get('prediction') for r in checked] == [batched[0]['prediction'], None, batched[2]['prediction']]
+    assert 'error' in checked[1]
+    print(f"[OK] {len(rows)} rows predicted in one batch")
+
+
+def test_sidecar_round_trip():
+    """Rows sent over the Unix socket come back with predictions and versions"""
+    print("\n=== Testing Sidecar Round Trip ===")
+    registry = _registry()
+    if registry.get('emergency') is None:
+        print("[WARNING] Emergency model not loaded - skipping")
+        return
+    socket_path = os.path.join(tempfile.mkdtemp(), 'inference.sock')
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, 'inference_server.py'), '--socket', socket_path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        client = InferenceClient(socket_path, timeout=2.0, retry_after=0.1)
+        deadline = time.time() + 30
+        while client.ping() is None:
+            assert time.time() < deadline, "Inference server did not start"
+            time.sleep(0.1)
+
+        row = [0.0] * registry.get('emergency').model.n_features_in_
+        result = client.predict('emergency', row)
+        assert result is not None, "Sidecar should answer"
+        assert result['prediction'] in result['classes']
+        assert abs(sum(result['probabilities']) - 1.0) < 1e-6
+        assert result['version'] == registry.version('emergency')
+        print(f"[OK] Sidecar prediction: {result['prediction']} ({result['version']})")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def test_rollout_falls_back_in_process():
+    """Rows encoded for the worker's model are scored in-process once the sidecar swaps to another"""
+    print("\n=== Testing Sidecar Version Check ===")
+    import app
+    from train_emergency_model import train_emergency_model
+    models_dir = tempfile.mkdtemp()
+    train_emergency_model(n_samples=2000, version='vA',
+                          output=os.path.join(models_dir, 'Logistic_regression_prediction-vA.pkl'))
+    worker_registry = build_model_registry(os.path.join(models_dir, os.path.basename(MODEL_PATH)),
+                                           os.path.join(models_dir, os.path.basename(EMERGENCY_MODEL_PATH)),
+                                           poll_interval=0)
+    worker_registry.load_all()
+    socket_path = os.path.join(tempfile.mkdtemp(), 'inference.sock')
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, 'inference_server.py'), '--socket', socket_path,
+         '--models-dir', models_dir],
+        env={**os.environ, 'MODEL_RELOAD_INTERVAL': '1'}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    saved = app.model_registry, app.inference_client, app.drift_monitor
+    try:
+        client = InferenceClient(socket_path, timeout=2.0, retry_after=0.1)
+        deadline = time.time() + 30
+        while client.ping() is None:
+            assert time.time() < deadline, "Inference server did not start"
+            time.sleep(0.1)
+        app.model_registry, app.inference_client, app.drift_monitor = worker_registry, client, None
+        row = app.featurizer.emergency_encoder(worker_registry.get('emergency').metadata['feature_names']) \
+            .transform_one(symptoms='chest pain', age=70)[0]
+        assert client.predict('emergency', row, version='vA')['version'] == 'vA'
+
+        # The sidecar picks up vB (with its own schema) before the worker does
+        train_emergency_model(n_samples=2000, seed=11, version='vB',
+                              output=os.path.join(models_dir, 'Logistic_regression_prediction-vB.pkl'))
+        while client.ping()['emergency'] != 'vB':
+            assert time.time() < deadline, "Inference server did not reload"
+            time.sleep(0.1)
+        assert client.predict('emergency', row, version='vA') is None
+        assert client.available(), "A version mismatch is not a transport failure"
+        priority, _, _ = app.predict_emergency_priority('chest pain', age=70)
+        assert app.last_model_version() == 'vA' and priority in ('Low', 'Medium', 'High', 'Critical')
+        print(f"[OK] Sidecar on vB refused a vA row; the worker scored it in-process ({priority})")
+    finally:
+        app.model_registry, app.inference_client, app.drift_monitor = saved
+        server.terminate()
+        server.wait()
+
+
+def test_fallback_when_sidecar_down():
+    """A missing sidecar makes the client return None quickly"""
+    print("\n=== Testing Sidecar Fallback ===")
+    client = InferenceClient(os.path.join(tempfile.mkdtemp(), 'missing.sock'), retry_after=60)
+    start = time.perf_counter()
+    assert client.predict('emergency', [0.0]) is None
+    assert not client.available(), "Client should back off after a failure"
+    assert client.predict('emergency', [0.0]) is None
+    print(f"[OK] Fallback decided in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    test_batch_matches_single_rows()
+    test_sidecar_round_trip()
+    test_rollout_falls_back_in_process()
+    test_fallback_when_sidecar_down()
+    print("\n[SUCCESS] All inference server tests passed!")
@@ -0,0 +1,182 @@
+"""
+Test script for emergency admission control
+Covers pre-triage, priority ordering, backpressure, the Critical reserve and the surge scenario
+"""
+import sys
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import temporary_app_db
+from intake import IntakeGate, IntakeRejected, pre_triage
+
+
+def test_pre_triage():
+    """Form-only rules rank requests without touching the database"""
+    print("\n=== Testing Pre-Triage ===")
+    assert pre_triage({'symptoms': 'Father collapsed, NOT BREATHING'}) == 'Critical'
+    assert pre_triage({'symptoms': 'chest pain since morning'}) == 'High'
+    assert pre_triage({'symptoms': 'fever', 'emergency_type': 'Traffic'}) == 'High'
+    assert pre_triage({'symptoms': 'fever', 'age': '78'}) == 'High'
+    assert pre_triage({'symptoms': 'fever', 'age': 'unknown'}) == 'Medium'
+    assert pre_triage({}) == 'Low'
+    print("[OK] Critical/High/Medium/Low from symptoms, type and age")
+
+
+def _waiter(gate, priority, order, errors):
+    try:
+        with gate.admit(priority):
+            order.append(priority)
+    except IntakeRejected as e:
+        errors.append(e)
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+    assert condition()
+
+
+def test_priority_order_and_backpressure():
+    """Waiters are admitted most urgent first; a full queue refuses or displaces"""
+    print("\n=== Testing Priority Queue ===")
+    gate = IntakeGate(capacity=1, queue_size=3, max_wait=5, critical_reserve=1)
+    order, errors = [], []
+    with gate.admit('Medium'):
+        threads = []
+        for priority in ('Low', 'Medium', 'High'):
+            threads.append(threading.Thread(target=_waiter, args=(gate, priority, order, errors)))
+            threads[-1].start()
+            _wait_for(lambda: gate.stats()['waiting'] == len(threads))
+
+        try:
+            with gate.admit('Low'):
+                pass
+        except IntakeRejected as e:
+            assert e.reason == 'intake queue full' and e.retry_after == 5
+        else:
+            raise AssertionError('a Low request was queued past the limit')
+        # A full queue and no free slot: the Critical request still runs at once, on the reserve
+        with gate.admit('Critical'):
+            assert gate.stats()['running'] == 2
+        # A High request displaces the Low waiter
+        threads.append(threading.Thread(target=_waiter, args=(gate, 'High', order, errors)))
+        threads[-1].start()
+        _wait_for(lambda: gate.stats()['rejected'].get('Low') == 2)
+    for thread in threads:
+        thread.join()
+    assert order == ['High', 'High', 'Medium'], order
+    assert [e.priority for e in errors] == ['Low'] and 'displaced' in errors[0].reason
+    stats = gate.stats()
+    assert stats['running'] == 0 and stats['rejected'] == {'Low': 2}
+    print(f"[OK] Admitted {order}, Low refused and displaced")
+
+
+def test_wait_times_out():
+    """Requests that cannot be admitted within max_wait are refused"""
+    print("\n=== Testing Wait Timeout ===")
+    gate = IntakeGate(capacity=1, queue_size=4, max_wait=0.1)
+    with gate.admit('High'):
+        start = time.monotonic()
+        try:
+            with gate.admit('High'):
+                pass
+        except IntakeRejected as e:
+            assert 'timed out' in e.reason
+        else:
+            raise AssertionError('request admitted past a held slot')
+        assert 0.09 < time.monotonic() - start < 1
+        assert gate.stats()['waiting'] == 0
+
+    now = [0.0]
+    gate = IntakeGate(capacity=1, queue_size=4, max_wait=5, clock=lambda: now[0])
+    order, errors = [], []
+    with gate.admit('High'):
+        threads = []
+        for priority in ('High', 'Low'):
+            threads.append(threading.Thread(target=_waiter, args=(gate, priority, order, errors)))
+            threads[-1].start()
+            _wait_for(lambda: gate.stats()['waiting'] == len(threads))
+            now[0] += 3
+    # The slot frees at t=6: the High request queued at t=0 is past max_wait, the Low one from t=3 is not
+    for thread in threads:
+        thread.join()
+    assert order == ['Low'] and [(e.priority, e.reason) for e in errors] == [('High', 'timed out waiting for intake')]
+    print("[OK] Refused after max_wait")
+
+
+SURGE = ('Low', 'Medium', 'Low', 'High', 'Medium', 'Critical', 'Low', 'High', 'Critical', 'Medium', 'Low', 'Critical')
+
+
+def _surge(gate, ranked=True):
+    """Offer SURGE (6x the capacity) one arrival at a time while every slot is held; returns admissions and refusals"""
+    order, errors = [], []
+    with ExitStack() as held:
+        for _ in range(gate.capacity):
+            held.enter_context(gate.admit('Medium'))
+        threads = []
+        for priority in SURGE:
+            args = (gate, priority if ranked else 'Medium', order, errors)
+            threads.append(threading.Thread(target=_waiter, args=args))
+            threads[-1].start()
+            # Settled: the arrival is queued, admitted or refused, and anyone it displaced has been refused
+            _wait_for(lambda: len(order) + len(errors) + gate.stats()['waiting'] == len(threads))
+        queued = gate.stats()['waiting']
+    for thread in threads:
+        thread.join()
+    return order, errors, queued
+
+
+def test_surge_keeps_critical_flat():
+    """At 6x capacity Critical requests are admitted at once, the rest by rank; a FIFO gate refuses Critical ones"""
+    print("\n=== Testing Surge Scenario ===")
+    order, errors, queued = _surge(IntakeGate(capacity=2, queue_size=4, max_wait=30, critical_reserve=1))
+    assert queued == 4
+    # Critical requests ran on the reserve while the queue was full; the queue drained High first, then Medium
+    assert order == ['Critical'] * 3 + ['High', 'High', 'Medium', 'Medium'], order
+    refused = Counter(e.priority for e in errors)
+    assert refused == {'Low': 4, 'Medium': 1}, refused
+    assert sum('displaced' in e.reason for e in errors) == 2
+
+    fifo_order, fifo_errors, _ = _surge(IntakeGate(capacity=2, queue_size=4, max_wait=30, critical_reserve=0),
+                                        ranked=False)
+    assert len(fifo_order) == 4 and len(fifo_errors) == 8  # The first four arrivals, whatever their priority
+    assert [e.reason for e in fifo_errors] == ['intake queue full'] * 8
+    print(f"[OK] Admitted {order}; refused {dict(refused)}; FIFO refused 8 of {len(SURGE)} including every Critical")
+
+
+def test_emergency_route_refuses_with_retry_after(app_db):
+    """/emergency answers 503 with Retry-After when full, but still takes a Critical request"""
+    print("\n=== Testing /emergency Intake ===")
+    import app
+    saved_gate = app.intake_gate
+    app.intake_gate = IntakeGate(capacity=0, queue_size=0, max_wait=3, critical_reserve=1)
+    try:
+        client = app.app.test_client()
+        form = {'location': 'Patna', 'phone': '9999999999', 'state': 'Bihar', 'emergency_type': 'EMS'}
+        refused = client.post('/emergency', data=dict(form, symptoms='mild fever'))
+        assert refused.status_code == 503 and refused.headers['Retry-After'] == '3'
+        assert 'call 108' in refused.get_data(as_text=True)
+        accepted = client.post('/emergency', data=dict(form, symptoms='patient unconscious'))
+        assert accepted.status_code == 200
+        conn = app.get_db_connection()
+        assert conn.execute('SELECT COUNT(*) FROM emergencies').fetchone()[0] == 1
+        conn.close()
+        assert client.get('/emergency').status_code == 200
+    finally:
+        app.intake_gate = saved_gate
+    print("[OK] 503 + Retry-After for the fever, unconscious patient admitted")
+
+
+if __name__ == '__main__':
+    test_pre_triage()
+    test_priority_order_and_backpressure()
+    test_wait_times_out()
+    test_surge_keeps_critical_flat()
+    with temporary_app_db() as db_path:
+        test_emergency_route_refuses_with_retry_after(db_path)
+    print("\n[SUCCESS] All intake tests passed!")
@@ -0,0 +1,135 @@
+"""
+Test script for the /metrics registry
+Checks the exposition format, merging across workers, recording cost and the app's instrumentation
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import temporary_app_db
+from metrics import CREATE_TABLE_SQL, MetricsRegistry
+
+
+def _registry(path, publish_interval=3600):
+    registry = MetricsRegistry(lambda: sqlite3.connect(path), publish_interval=publish_interval)
+    requests = registry.counter('demo_requests_total', 'Requests.', ('route', 'status'))
+    latency = registry.histogram('demo_latency_seconds', 'Latency.', ('route',), buckets=(0.1, 1.0))
+    return registry, requests, latency
+
+
+def _temp_db():
+    path = os.path.join(tempfile.mkdtemp(), 'metrics.db')
+    conn = sqlite3.connect(path)
+    conn.execute(CREATE_TABLE_SQL)
+    conn.close()
+    return path
+
+
+def test_exposition_format():
+    """Counters and cumulative histogram buckets in the text format, label values escaped"""
+    print("\n=== Testing Exposition Format ===")
+    registry, requests, latency = _registry(_temp_db(), publish_interval=0)
+    requests.inc('home', '200')
+    requests.inc('home', '200')
+    requests.inc('say "hi"', '500')
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(seconds, 'home')
+    text = registry.exposition()
+    lines = text.splitlines()
+    assert '# TYPE demo_requests_total counter' in lines
+    assert 'demo_requests_total{route="home",status="200"} 2' in lines
+    assert 'demo_requests_total{route="say \\"hi\\"",status="500"} 1' in lines
+    assert '# TYPE demo_latency_seconds histogram' in lines
+    assert 'demo_latency_seconds_bucket{route="home",le="0.1"} 2' in lines  # le is inclusive
+    assert 'demo_latency_seconds_bucket{route="home",le="1.0"} 3' in lines
+    assert 'demo_latency_seconds_bucket{route="home",le="+Inf"} 4' in lines
+    assert 'demo_latency_seconds_count{route="home"} 4' in lines
+    assert 'demo_latency_seconds_sum{route="home"} 3.65' in lines
+    assert 'swasthya_workers 1' in lines and text.endswith('\n')
+    try:
+        registry.counter('demo_requests_total', 'Again.')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('duplicate metric accepted')
+    print(f"[OK] {len(lines)} lines")
+
+
+def test_workers_are_summed():
+    """/metrics adds up the published values of every worker"""
+    print("\n=== Testing Worker Merge ===")
+    path = _temp_db()
+    workers = [_registry(path) for _ in range(2)]
+    for n, (registry, requests, latency) in enumerate(workers):
+        registry.worker_id = f'worker-{n}'
+        for _ in range(n + 1):
+            requests.inc('home', '200')
+            latency.observe(0.5, 'home')
+        registry.publish()
+    merged, live = workers[0][0].collect()
+    assert live == 2
+    assert merged['demo_requests_total'] == {('home', '200'): 3}
+    assert merged['demo_latency_seconds'] == {('home',): [0, 3, 0, 1.5]}
+    print("[OK] 2 workers merged: 3 requests")
+
+
+def test_recording_cost():
+    """inc() and observe() stay under a microsecond"""
+    print("\n=== Testing Recording Cost ===")
+    registry, requests, latency = _registry(_temp_db(), publish_interval=0)
+    n = 100000
+    costs = {}
+    for name, record in (('inc', lambda: requests.inc('doctor_dashboard', '200')),
+                         ('observe', lambda: latency.observe(0.012, 'doctor_dashboard'))):
+        best = float('inf')
+        for _ in range(3):
+            start = time.perf_counter()
+            for _ in range(n):
+                record()
+            best = min(best, (time.perf_counter() - start) / n)
+        costs[name] = best * 1e9
+    assert all(ns < 1000 for ns in costs.values()), costs
+    print(f"[OK] inc {costs['inc']:.0f} ns, observe {costs['observe']:.0f} ns (lambda call included)")
+
+
+def test_app_metrics_endpoint(app_db):
+    """Requests, their statements, OTP sends and emergencies show up at /metrics"""
+    print("\n=== Testing /metrics ===")
+    import app
+    saved_token = app.ADMIN_TOKEN
+    app.ADMIN_TOKEN = 'test-token'
+    try:
+        client = app.app.test_client()
+        assert client.get('/metrics').status_code == 403
+        with client.session_transaction() as session:
+            session['role'] = 'doctor'
+            session['user_id'] = 1
+        assert client.get('/doctor/dashboard').status_code == 200
+        with app.app.test_request_context():
+            assert app.send_otp('9999999999', 'doctor', 'd@example.com')[0]
+        client.post('/emergency', data={'location': 'Patna', 'phone': '9999999999', 'state': 'Bihar',
+                                        'emergency_type': 'EMS', 'symptoms': 'patient unconscious'})
+        response = client.get('/metrics', headers={'Authorization': 'Bearer test-token'})
+    finally:
+        app.ADMIN_TOKEN = saved_token
+
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'swasthya_http_requests_total{route="doctor_dashboard",method="GET",status="200"}' in text
+    assert 'swasthya_db_queries_per_request_bucket{route="doctor_dashboard",le="5"}' in text
+    assert 'swasthya_otp_sent_total{role="doctor",purpose="login",outcome="sent"}' in text
+    assert 'source="form"} 1' in text  # The emergency, under whatever priority the model gave it
+    assert '9999999999' not in text and 'd@example.com' not in text
+    print(f"[OK] {len(text.splitlines())} exposition lines, no phone numbers or emails")
+
+
+if __name__ == '__main__':
+    test_exposition_format()
+    test_workers_are_summed()
+    test_recording_cost()
+    with temporary_app_db() as db_path:
+        test_app_metrics_endpoint(db_path)
+    print("\n[SUCCESS] All metrics tests passed!")
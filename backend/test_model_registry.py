@@ -0,0 +1,110 @@
+"""
+Test script for the hot-reloadable model registry
+Covers version detection, golden-set rejection and atomic swaps
+"""
+import sys
+import os
+import pickle
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from model_registry import ModelRegistry, ModelValidationError
+
+
+class ConstantModel:
+    """Tiny picklable stand-in for a scikit-learn classifier."""
+
+    def __init__(self, label):
+        self.label = label
+
+    def predict(self, X):
+        return [self.label] * len(X)
+
+
+def _loader(path):
+    with open(path, 'rb') as f:
+        data = pickle.load(f)
+    return data['model'], None, {'version': data.get('version')}
+
+
+def _validator(model, scaler):
+    if model.predict([[0.0]]) != ['ok']:
+        raise ModelValidationError('golden row did not predict ok')
+
+
+def _write(path, label, version=None, mtime=None):
+    with open(path, 'wb') as f:
+        pickle.dump({'model': ConstantModel(label), 'version': version}, f)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_load_and_swap():
+    """Newest valid artifact is loaded, and a newer one is swapped in"""
+    print("\n=== Testing Model Registry Swap ===")
+    with tempfile.TemporaryDirectory() as models_dir:
+        now = time.time()
+        _write(os.path.join(models_dir, 'risk.pkl'), 'ok', mtime=now - 100)
+
+        registry = ModelRegistry(models_dir, poll_interval=0)
+        registry.register('risk', 'risk*.pkl', _loader, _validator)
+        swaps = []
+        registry.add_listener(lambda name, loaded: swaps.append(loaded.version))
+        registry.load_all()
+
+        first = registry.get('risk')
+        assert first is not None, "Model should be loaded"
+        assert first.version.startswith('risk@'), "Unversioned artifact should get a content hash version"
+        print(f"[OK] Initial version: {first.version}")
+
+        # Nothing changed on disk: no reload
+        assert registry.refresh('risk') is False
+
+        _write(os.path.join(models_dir, 'risk-v2.pkl'), 'ok', version='v2', mtime=now)
+        assert registry.refresh('risk') is True
+        assert registry.version('risk') == 'v2'
+        assert first.version != 'v2', "Old snapshot must be left untouched by the swap"
+        assert swaps == [first.version, 'v2']
+        print(f"[OK] Swapped to version: {registry.version('risk')}")
+
+
+def test_rejects_invalid_candidate():
+    """A candidate that fails the golden set never replaces the serving model"""
+    print("\n=== Testing Model Registry Validation ===")
+    with tempfile.TemporaryDirectory() as models_dir:
+        now = time.time()
+        _write(os.path.join(models_dir, 'risk.pkl'), 'ok', version='v1', mtime=now - 100)
+
+        registry = ModelRegistry(models_dir, poll_interval=0)
+        registry.register('risk', 'risk*.pkl', _loader, _validator)
+        registry.load_all()
+
+        _write(os.path.join(models_dir, 'risk-v2.pkl'), 'broken', version='v2', mtime=now)
+        assert registry.refresh('risk') is False
+        assert registry.version('risk') == 'v1', "Bad model must not be swapped in"
+        assert 'golden row' in registry.status()['risk']['last_error']
+        print(f"[OK] Rejected candidate: {registry.status()['risk']['last_error']}")
+
+
+def test_prediction_records_version():
+    """Predictors expose the model version they used"""
+    print("\n=== Testing Prediction Model Version ===")
+    from app import predict_health_risk, predict_emergency_priority, last_model_version, model_registry
+
+    predict_health_risk({'age': 40}, 'fever', 'infection', 'Stable', 'paracetamol')
+    expected = model_registry.version('health_risk') or 'rule-based'
+    assert last_model_version() == expected
+    print(f"[OK] Health risk version: {last_model_version()}")
+
+    predict_emergency_priority('chest pain', age=60)
+    expected = model_registry.version('emergency') or 'rule-based'
+    assert last_model_version() == expected
+    print(f"[OK] Emergency version: {last_model_version()}")
+
+
+if __name__ == '__main__':
+    test_load_and_swap()
+    test_rejects_invalid_candidate()
+    test_prediction_records_version()
+    print("\n[SUCCESS] All model registry tests passed!")
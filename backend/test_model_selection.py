@@ -0,0 +1,55 @@
+"""
+Test script for latency-aware model selection
+Checks the winner rule and a small end-to-end selection run
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sklearn.preprocessing import StandardScaler
+
+from model_artifacts import validate_health_risk_model
+from model_selection import pick_winner, select_model
+from train_model import generate_synthetic_data
+
+
+def _result(name, accuracy, p99):
+    return {'name': name, 'accuracy': accuracy, 'single_row_p99_ms': p99}
+
+
+def test_pick_winner():
+    """Most accurate within budget wins; near-ties go to the fastest"""
+    print("\n=== Testing Winner Selection ===")
+    results = [_result('slow_best', 0.99, 5.0), _result('good', 0.97, 1.0),
+               _result('near_tie_fast', 0.967, 0.3), _result('bad', 0.80, 0.1)]
+    winner, within_budget = pick_winner(results, latency_budget_ms=2.0)
+    assert within_budget and winner['name'] == 'near_tie_fast'
+
+    winner, _ = pick_winner(results, latency_budget_ms=10.0)
+    assert winner['name'] == 'slow_best'
+
+    winner, within_budget = pick_winner(results, latency_budget_ms=0.01)
+    assert not within_budget and winner['name'] == 'bad', "Nothing fits: fastest wins"
+    print("[OK] Winner rule respects accuracy, budget and near-ties")
+
+
+def test_select_model_end_to_end():
+    """Candidates are trained in worker processes and measured"""
+    print("\n=== Testing Candidate Training ===")
+    X, y = generate_synthetic_data(2000)
+    scaler = StandardScaler().fit(X[:1600])
+    winner, results = select_model(scaler.transform(X[:1600]), y[:1600], X[1600:], y[1600:], scaler,
+                                   candidates=['logistic_regression', 'linear_svc'], jobs=2,
+                                   latency_budget_ms=1000.0)
+    assert {r['name'] for r in results} == {'logistic_regression', 'linear_svc'}
+    for r in results:
+        assert 0.5 < r['accuracy'] <= 1.0
+        assert r['single_row_p50_ms'] > 0 and r['size_kb'] > 0 and r['load_ms'] >= 0
+    validate_health_risk_model(winner['model'], scaler)
+    print(f"[OK] Selected {winner['name']} ({winner['accuracy']:.3f} accuracy)")
+
+
+if __name__ == '__main__':
+    test_pick_winner()
+    test_select_model_end_to_end()
+    print("\n[SUCCESS] All model selection tests passed!")
@@ -0,0 +1,132 @@
+"""
+Test script for the transactional outbox
+Covers retries with backoff, lease expiry after a crash, and AI-triggered emergencies from add_record
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import temporary_app_db
+from outbox import CREATE_TABLE_SQL, INDEX_SQL, OutboxDispatcher, enqueue
+
+
+def _outbox_db():
+    path = os.path.join(tempfile.mkdtemp(), 'outbox.db')
+    conn = sqlite3.connect(path)
+    conn.execute(CREATE_TABLE_SQL)
+    for sql in INDEX_SQL:
+        conn.execute(sql)
+    conn.close()
+    return lambda: sqlite3.connect(path, timeout=30)
+
+
+def test_retry_with_backoff():
+    """A failing handler is retried after a growing delay; an unknown topic is kept, not dropped"""
+    print("\n=== Testing Retries ===")
+    connect = _outbox_db()
+    handled, failures = [], {'left': 2}
+
+    def flaky(message_id, payload):
+        if failures['left']:
+            failures['left'] -= 1
+            raise RuntimeError('database is locked')
+        handled.append(payload['n'])
+
+    dispatcher = OutboxDispatcher(connect, {'job': flaky}, poll_interval=0, retry_base=1, max_backoff=60)
+    conn = connect()
+    enqueue(conn, 'job', {'n': 1}, now=100)
+    enqueue(conn, 'nobody', {'n': 2}, now=100)
+    conn.commit()
+    conn.close()
+
+    assert dispatcher.drain(now=100) == 2 and handled == []
+    assert dispatcher.drain(now=100.5) == 0            # First retry after 1 s
+    assert dispatcher.drain(now=101) == 2 and handled == []
+    assert dispatcher.drain(now=102.5) == 0            # Second retry after 2 s
+    assert dispatcher.drain(now=103) == 2 and handled == [1]
+    assert dispatcher.pending_count() == 1
+    conn = connect()
+    attempts, error = conn.execute("SELECT attempts, last_error FROM outbox WHERE topic = 'nobody'").fetchone()
+    conn.close()
+    assert attempts == 3 and 'no handler' in error
+    print(f"[OK] Delivered on attempt 3; unknown topic kept after {attempts} attempts")
+
+
+def test_lease_expires_after_crash():
+    """A message leased by a worker that died is delivered by another once the lease runs out"""
+    print("\n=== Testing Lease Expiry ===")
+    connect = _outbox_db()
+    handled = []
+    crashed = OutboxDispatcher(connect, {'job': lambda i, p: handled.append(i)}, poll_interval=0, lease_seconds=30)
+    other = OutboxDispatcher(connect, {'job': lambda i, p: handled.append(i)}, poll_interval=0, lease_seconds=30)
+    conn = connect()
+    message_id = enqueue(conn, 'job', {}, now=100)
+    conn.commit()
+    conn.close()
+
+    assert len(crashed._lease(100)) == 1  # Leased, then the worker dies before handling it
+    assert other.drain(now=110) == 0
+    assert other.drain(now=130) == 1 and handled == [message_id]
+    assert other.drain(now=1000) == 0 and other.pending_count() == 0
+    print("[OK] Lease honoured for 30 s, then redelivered once")
+
+
+def test_add_record_queues_emergency(app_db):
+    """add_record saves the record and its outbox message together; delivery creates one emergency"""
+    print("\n=== Testing add_record Outbox ===")
+    import app
+    saved = app.predict_health_risk, app.outbox_dispatcher
+    app.predict_health_risk = lambda *args, **kwargs: ('Critical', 0.93, True)
+    app.outbox_dispatcher = OutboxDispatcher(lambda: app.get_db_connection(),
+                                             {'ai_emergency': app.deliver_ai_emergency}, poll_interval=0)
+    try:
+        conn = app.get_db_connection()
+        cur = conn.execute("INSERT INTO hospitals (name, reg_no, email, password, state, district) "
+                           "VALUES ('City', 'R1', 'h@example.com', 'x', 'Bihar', 'Patna')")
+        conn.execute("INSERT INTO doctors (hospital_id, name, email, password, specialization) "
+                     "VALUES (?, 'Dr', 'd@example.com', 'x', 'General')", (cur.lastrowid,))
+        conn.execute("INSERT INTO users (name, email, password, phone, address, health_id) "
+                     "VALUES ('Patient', 'p@example.com', 'x', '9999999999', 'Boring Road', 'H-1')")
+        conn.commit()
+        conn.close()
+        client = app.app.test_client()
+        with client.session_transaction() as session:
+            session['role'] = 'doctor'
+            session['user_id'] = 1
+
+        response = client.post('/doctor/add_record/1', data={'date': '2026-01-01', 'symptoms': 'chest pain'},
+                               follow_redirects=True)
+        assert 'being dispatched' in response.get_data(as_text=True)
+        assert app.outbox_dispatcher.drain() == 1
+        conn = app.get_db_connection()
+        record_id = conn.execute('SELECT id FROM records').fetchone()[0]
+        rows = conn.execute('SELECT priority, state, ambulance_id FROM emergencies WHERE record_id = ?',
+                            (record_id,)).fetchall()
+        assert len(rows) == 1 and rows[0]['priority'] == 'Critical' and rows[0]['ambulance_id'] is not None
+
+        # Redelivery (say the worker died before marking the message) creates no second emergency
+        conn.execute('UPDATE outbox SET processed_at = NULL, available_at = 0')
+        conn.commit()
+        assert app.outbox_dispatcher.drain() == 1
+        assert conn.execute('SELECT COUNT(*) FROM emergencies').fetchone()[0] == 1
+
+        # Without its outbox message the record is not saved either
+        conn.execute('DROP TABLE outbox')
+        conn.commit()
+        failed = client.post('/doctor/add_record/1', data={'date': '2026-01-02', 'symptoms': 'chest pain'})
+        assert failed.status_code == 500
+        assert conn.execute('SELECT COUNT(*) FROM records').fetchone()[0] == 1
+        conn.close()
+    finally:
+        app.predict_health_risk, app.outbox_dispatcher = saved
+    print("[OK] Record and message committed together; 1 emergency after 2 deliveries")
+
+
+if __name__ == '__main__':
+    test_retry_with_backoff()
+    test_lease_expires_after_crash()
+    with temporary_app_db() as db_path:
+        test_add_record_queues_emergency(db_path)
+    print("\n[SUCCESS] All outbox tests passed!")
@@ -0,0 +1,116 @@
+"""
+Test script for the asynchronous prediction log
+Covers batching, rotation into .npz files, the NumPy reader and the app hook
+"""
+import sys
+import os
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from prediction_log import PredictionLogger, load_prediction_log
+
+CLASSES = ['High', 'Low', 'Medium']
+
+
+def _log_rows(logger, n, version='v1', offset=0):
+    for i in range(n):
+        features = np.full(4, float(offset + i))
+        logger.log('emergency', features, [0.2, 0.5, 0.3], CLASSES, version, 1.5, 'Low')
+
+
+def test_rotation_and_reader():
+    """Rows are rotated into columnar .npz files and read back in order"""
+    print("\n=== Testing Rotation and Reader ===")
+    log_dir = tempfile.mkdtemp()
+    logger = PredictionLogger(log_dir, batch_size=16, flush_interval=60, rotate_rows=40)
+    _log_rows(logger, 100)
+    logger.flush()
+
+    directory = os.path.join(log_dir, 'emergency')
+    npz_files = [name for name in os.listdir(directory) if name.endswith('.npz')]
+    assert len(npz_files) >= 2, os.listdir(directory)
+    stats = logger.stats()
+    assert stats['written'] == 100 and stats['dropped'] == 0, stats
+
+    data = load_prediction_log(log_dir, 'emergency')
+    assert data['features'].shape == (100, 4)
+    assert data['probabilities'].shape == (100, 3)
+    assert list(data['classes']) == CLASSES
+    assert np.array_equal(data['features'][:, 0], np.arange(100, dtype=float))
+    assert set(data['model_version']) == {'v1'}
+
+    # Closing the active segment leaves only .npz files behind, same contents
+    logger.flush(rotate=True)
+    assert not [name for name in os.listdir(directory) if name.endswith('.jsonl')]
+    assert load_prediction_log(log_dir, 'emergency', include_active=False)['features'].shape == (100, 4)
+    print(f"[OK] {len(npz_files)} rotated segments, 100 rows read back")
+
+
+def test_version_filter_and_schema_change():
+    """A reader can keep one model version; rows of an older schema are skipped"""
+    print("\n=== Testing Version Filter ===")
+    log_dir = tempfile.mkdtemp()
+    logger = PredictionLogger(log_dir, batch_size=8, flush_interval=60, rotate_rows=1000)
+    logger.log('emergency', np.zeros(3), [0.5, 0.5], ['High', 'Low'], 'v0', 1.0, 'High')
+    logger.flush()
+    time.sleep(0.01)
+    _log_rows(logger, 10, version='v1')
+    _log_rows(logger, 5, version='v2', offset=10)
+    logger.flush()
+
+    assert load_prediction_log(log_dir, 'emergency')['features'].shape == (15, 4)
+    assert load_prediction_log(log_dir, 'emergency', model_version='v2')['features'].shape == (5, 4)
+    assert load_prediction_log(log_dir, 'emergency', model_version='v9') is None
+    print("[OK] Version filter and schema grouping work")
+
+
+def test_log_does_not_block():
+    """log() only queues: cheap per call, and drops rows instead of waiting when full"""
+    print("\n=== Testing Non-blocking log() ===")
+    logger = PredictionLogger(tempfile.mkdtemp(), batch_size=10**6, flush_interval=60, max_queue=500)
+    features = np.zeros(13)
+    start = time.perf_counter()
+    for _ in range(1000):
+        logger.log('health_risk', features, None, None, 'rule-based', 0.1, 'Low')
+    per_call_us = (time.perf_counter() - start) / 1000 * 1e6
+    stats = logger.stats()
+    assert stats['queued'] == 500 and stats['dropped'] == 500, stats
+    assert per_call_us < 50, per_call_us
+    print(f"[OK] {per_call_us:.1f} us per log() call, {stats['dropped']} dropped when full")
+
+
+def test_app_predictions_are_logged():
+    """predict_health_risk and predict_emergency_priority hand their rows to the log"""
+    print("\n=== Testing App Hook ===")
+    import app
+    log_dir = tempfile.mkdtemp()
+    previous = app.prediction_logger
+    app.prediction_logger = PredictionLogger(log_dir, flush_interval=60)
+    try:
+        app.predict_health_risk({'age': 60}, 'chest pain', 'hypertension', 'Stable', 'aspirin',
+                                {'systolic_bp': 150, 'bmi': 31})
+        app.predict_emergency_priority('unconscious', age=70, state='Bihar', zone='Highway', day='Friday',
+                                       time_slot='Night', emergency_type='Traffic', weather='Fog')
+        app.prediction_logger.flush()
+    finally:
+        app.prediction_logger = previous
+
+    health = load_prediction_log(log_dir, 'health_risk')
+    assert health['features'].shape == (1, 13)
+    assert health['latency_ms'][0] > 0
+    emergency = load_prediction_log(log_dir, 'emergency')
+    if app.model_registry.get('emergency') is not None:
+        assert emergency['features'].shape[0] == 1
+        assert len(emergency['classes']) == emergency['probabilities'].shape[1]
+    print("[OK] Both predictors logged with latency and version")
+
+
+if __name__ == '__main__':
+    test_rotation_and_reader()
+    test_version_filter_and_schema_change()
+    test_log_does_not_block()
+    test_app_predictions_are_logged()
+    print("\n[SUCCESS] All prediction log tests passed!")
@@ -0,0 +1,136 @@
+"""
+Test script for the per-request SQL profiler
+Covers statement timing, N+1 and duplicate detection, slow-query plans and the admin report
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import temporary_app_db
+from sql_profiler import CREATE_TABLE_SQL, SQLProfiler, connect, load_report
+
+
+def _temp_db():
+    path = os.path.join(tempfile.mkdtemp(), 'profile.db')
+    conn = sqlite3.connect(path)
+    conn.execute(CREATE_TABLE_SQL)
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, owner TEXT)')
+    conn.executemany('INSERT INTO items (owner) VALUES (?)', [(f'owner{i % 10}',) for i in range(200)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_request_profile_flags_repeats():
+    """Each statement is counted once; N+1 loops and identical re-runs are flagged"""
+    print("\n=== Testing Request Profile ===")
+    path = _temp_db()
+    profiler = SQLProfiler(lambda: sqlite3.connect(path), slow_query_ms=1e9, repeat_threshold=5,
+                           publish_interval=0)
+    profile = profiler.begin('items')
+    conn = connect(path, profile)
+    conn.row_factory = sqlite3.Row
+    owners = conn.execute('SELECT DISTINCT owner FROM items').fetchall()
+    for owner in owners:  # One query per row of the first: the N+1 shape
+        conn.execute('SELECT COUNT(*) FROM items WHERE owner = ?', (owner['owner'],)).fetchone()
+    cur = conn.cursor()
+    for _ in range(3):
+        cur.execute('SELECT id FROM items WHERE id = ?', (1,))
+        assert [row['id'] for row in cur] == [1]
+    conn.executemany('UPDATE items SET owner = ? WHERE id = ?', [('x', 1), ('y', 2)])
+    conn.close()
+
+    count, total_ms, repeated, duplicates = profile.summary()
+    assert count == 1 + 10 + 3 + 1 and total_ms > 0
+    assert repeated == ['SELECT COUNT(*) FROM items WHERE owner = ?']
+    assert duplicates == 2
+    header = profiler.finish(profile)
+    assert header.startswith('statements=15; ') and header.endswith('repeated=1; duplicates=2'), header
+
+    plain = connect(path)
+    assert type(plain) is sqlite3.Connection
+    plain.close()
+    print(f"[OK] {header}")
+
+
+def test_slow_query_logs_plan_without_parameters():
+    """A slow statement is logged once with its plan; its parameters are not kept"""
+    print("\n=== Testing Slow Query Log ===")
+    path = _temp_db()
+    profiler = SQLProfiler(lambda: sqlite3.connect(path), slow_query_ms=0, publish_interval=0)
+    profile = profiler.begin('lookup')
+    conn = connect(path, profile)
+    rows = conn.execute('SELECT id FROM items WHERE owner = ?', ('secret-phone-9999',)).fetchall()
+    conn.close()
+    profiler.finish(profile)
+
+    slow = profiler.state()['slow']
+    assert rows == [] and len(slow) == 1
+    assert slow[0]['route'] == 'lookup' and 'SCAN' in slow[0]['plan'], slow
+    assert 'secret-phone' not in repr(profiler.state())
+    assert len(profile.statements) == 1  # The EXPLAIN itself is not profiled
+    print(f"[OK] {slow[0]['sql']} -> {slow[0]['plan']}")
+
+
+def test_workers_merge_in_report():
+    """Published totals of two workers add up per route and statement"""
+    print("\n=== Testing Worker Merge ===")
+    path = _temp_db()
+    workers = [SQLProfiler(lambda: sqlite3.connect(path), publish_interval=0) for _ in range(2)]
+    for n, profiler in enumerate(workers):
+        profile = profiler.begin('items')
+        conn = connect(path, profile)
+        for _ in range(n + 1):
+            conn.execute('SELECT COUNT(*) FROM items').fetchone()
+        conn.close()
+        profiler.finish(profile)
+        profiler.worker_id = f'worker-{n}'
+        profiler.publish()
+
+    report, count = load_report(lambda: sqlite3.connect(path))
+    assert count == 2
+    route = report['routes']['items']
+    assert route['requests'] == 2 and route['statements'] == 3 and route['max_statements'] == 2
+    assert route['avg_statements'] == 1.5
+    assert report['statements'][0]['sql'] == 'SELECT COUNT(*) FROM items'
+    assert report['statements'][0]['count'] == 3
+    print(f"[OK] 2 workers, {route['statements']} statements over {route['requests']} requests")
+
+
+def test_app_header_and_admin_page(app_db):
+    """Profiled requests carry X-SQL-Profile; /admin/sql_profile reports them"""
+    print("\n=== Testing App Integration ===")
+    import app
+    saved = app.ADMIN_TOKEN, app.sql_profiler
+    app.ADMIN_TOKEN = 'test-token'
+    app.sql_profiler = None
+    try:
+        client = app.app.test_client()
+        with client.session_transaction() as session:
+            session['role'] = 'doctor'
+            session['user_id'] = 1
+        assert 'X-SQL-Profile' not in client.get('/doctor/dashboard').headers
+        assert client.get('/admin/sql_profile', headers={'X-Admin-Token': 'test-token'}).status_code == 404
+
+        app.sql_profiler = SQLProfiler(lambda: sqlite3.connect(app_db), publish_interval=0)
+        response = client.get('/doctor/dashboard')
+        assert response.headers['X-SQL-Profile'].startswith('statements=4; '), response.headers
+        assert client.get('/admin/sql_profile').status_code == 403
+        report = client.get('/admin/sql_profile', headers={'X-Admin-Token': 'test-token'}).get_json()
+    finally:
+        app.ADMIN_TOKEN, app.sql_profiler = saved
+
+    assert report['workers'] == 1
+    assert report['routes']['doctor_dashboard']['statements'] == 4
+    print(f"[OK] doctor_dashboard: {response.headers['X-SQL-Profile']}")
+
+
+if __name__ == '__main__':
+    test_request_profile_flags_repeats()
+    test_slow_query_logs_plan_without_parameters()
+    test_workers_merge_in_report()
+    with temporary_app_db() as db_path:
+        test_app_header_and_admin_page(db_path)
+    print("\n[SUCCESS] All SQL profiler tests passed!")
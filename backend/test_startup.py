@@ -0,0 +1,153 @@
+"""
+Test script for the startup profile and deferred loading
+Checks phase marks, the warm-up, first-use model loading, what `import app` leaves unimported and the master preload
+"""
+import sys
+import os
+import json
+import pickle
+import subprocess
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from model_registry import ModelRegistry
+from startup import StartupProfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_phases_and_warm_up():
+    """Phases record time and RSS; warm-up tasks run once, after the delay or when asked again"""
+    print("\n=== Testing Startup Profile ===")
+    profile = StartupProfile()
+    time.sleep(0.02)
+    profile.mark('configuration')
+    ran = []
+
+    def failing():
+        raise RuntimeError('no credentials')
+
+    profile.add_warm_up('models', lambda: ran.append('models'))
+    profile.add_warm_up('firebase', failing)
+    profile.warm_up(delay=30)
+    time.sleep(0.05)
+    assert ran == [] and not profile.warm_up_done  # Still waiting out the delay
+    profile.warm_up()  # e.g. the first request finished
+    for _ in range(200):
+        if profile.warm_up_done:
+            break
+        time.sleep(0.01)
+    profile.warm_up()
+    assert ran == ['models'] and profile.warm_up_done
+    phases = [phase['phase'] for phase in profile.report()]
+    assert phases == ['imports', 'configuration', 'warm-up models', 'warm-up firebase'], phases
+    configuration = profile.report()[1]
+    assert configuration['ms'] >= 20 and configuration['rss_mb'] > 0
+    assert 'configuration' in profile.summary()
+    print(f"[OK] {profile.summary()}")
+
+
+def test_registry_loads_on_first_use():
+    """get() loads every slot once, even when several threads ask at the same time"""
+    print("\n=== Testing First-Use Loading ===")
+    loads = []
+
+    def loader(path):
+        loads.append(path)
+        time.sleep(0.05)
+        with open(path, 'rb') as f:
+            return pickle.load(f), None, {'version': 'v1'}
+
+    with tempfile.TemporaryDirectory() as models_dir:
+        with open(os.path.join(models_dir, 'risk.pkl'), 'wb') as f:
+            pickle.dump({'weights': [1, 2]}, f)
+        registry = ModelRegistry(models_dir, poll_interval=0)
+        registry.register('risk', 'risk*.pkl', loader)
+        assert loads == []  # Registering loads nothing
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get('risk'))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert len(loads) == 1
+    assert [loaded.version for loaded in results] == ['v1'] * 4
+    print("[OK] 4 concurrent get() calls, 1 load")
+
+
+def test_import_defers_heavy_modules():
+    """import app leaves scikit-learn, Firebase, qrcode and PIL for later; model aliases still resolve"""
+    print("\n=== Testing Deferred Imports ===")
+    heavy = ('sklearn', 'scipy', 'firebase_admin', 'qrcode', 'PIL', 'requests')
+    code = (
+        "import json, sys\n"
+        "import app\n"
+        f"heavy = {heavy!r}\n"
+        "before = [name for name in heavy if name in sys.modules]\n"
+        "model = app.emergency_model\n"
+        "print('RESULT ' + json.dumps({'before': before, 'model': type(model).__name__,\n"
+        "                              'sklearn': 'sklearn' in sys.modules}))\n"
+    )
+    env = dict(os.environ, WARM_UP_IN_BACKGROUND='True', LOG_LEVEL='WARNING')
+    output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True,
+                            check=True, cwd=BACKEND_DIR).stdout
+    result = json.loads(next(line for line in output.splitlines() if line.startswith('RESULT '))[7:])
+    assert result['before'] == [], result
+    if result['model'] != 'NoneType':
+        assert result['sklearn']  # Loaded by the first access to app.emergency_model
+    print(f"[OK] Nothing heavy at import; app.emergency_model -> {result['model']}")
+
+
+def test_admin_startup_report():
+    """/admin/startup shows this worker's phases to admins only"""
+    print("\n=== Testing /admin/startup ===")
+    import app
+    saved = app.ADMIN_TOKEN
+    app.ADMIN_TOKEN = 'test-token'
+    try:
+        client = app.app.test_client()
+        assert client.get('/admin/startup').status_code == 403
+        response = client.get('/admin/startup', headers={'X-Admin-Token': 'test-token'})
+    finally:
+        app.ADMIN_TOKEN = saved
+    assert response.status_code == 200
+    report = response.get_json()
+    phases = [phase['phase'] for phase in report['phases']]
+    assert phases[:2] == ['imports', 'configuration'] and 'routes and services' in phases
+    assert report['rss_mb'] > 0 and report['pid'] == os.getpid()
+    print(f"[OK] {phases}")
+
+
+def test_gunicorn_master_preloads_models():
+    """when_ready loads the models in the master, so forked workers' warm-up leaves them alone"""
+    print("\n=== Testing Preloaded Models ===")
+    import importlib.util
+    import app
+    path = os.path.join(os.path.dirname(BACKEND_DIR), 'gunicorn_config.py')
+    spec = importlib.util.spec_from_file_location('gunicorn_config', path)
+    gunicorn_config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(gunicorn_config)
+    gunicorn_config.when_ready(None)
+    assert app.model_registry.loaded
+    assert 'preloaded models' in [phase['phase'] for phase in app.startup_profile.report()]
+
+    loads = []
+    saved = app.load_models
+    app.load_models = lambda: loads.append(os.getpid())
+    try:
+        app.warm_up_models()  # What a worker forked from that master runs
+    finally:
+        app.load_models = saved
+    assert loads == []
+    print("[OK] Models loaded once before the fork; the worker warm-up skips them")
+
+
+if __name__ == '__main__':
+    test_phases_and_warm_up()
+    test_registry_loads_on_first_use()
+    test_import_defers_heavy_modules()
+    test_admin_startup_report()
+    test_gunicorn_master_preloads_models()
+    print("\n[SUCCESS] All startup tests passed!")
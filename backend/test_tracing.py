@@ -0,0 +1,146 @@
+"""
+Test script for request tracing
+Checks span nesting, sampling, the OTLP file export, the app's instrumentation and the trace viewer
+"""
+import sys
+import os
+import io
+import json
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import temporary_app_db
+import tracing
+from tracing import NO_SPAN, SpanFileExporter, Tracer, traced
+import trace_view
+
+
+def _tracer(sample_rate=1.0):
+    path = os.path.join(tempfile.mkdtemp(), 'traces.jsonl')
+    return Tracer(SpanFileExporter(path, flush_interval=3600), sample_rate=sample_rate), path
+
+
+def _spans(path):
+    return [span for line in open(path) for resource in json.loads(line)['resourceSpans']
+            for scope in resource['scopeSpans'] for span in scope['spans']]
+
+
+def test_spans_nest_under_the_root():
+    """span() and @traced() build a tree under the current root; nothing is recorded outside one"""
+    print("\n=== Testing Span Nesting ===")
+
+    @traced('work')
+    def work():
+        with tracing.span('inner', rows=3):
+            return getattr(tracing.current_span(), 'name', None)
+
+    assert tracing.span('outside') is NO_SPAN and tracing.start_span('outside') is None
+    assert work() is None
+    tracer, _ = _tracer()
+    root = tracer.begin('GET /demo')
+    assert work() == 'inner'
+    try:
+        with tracing.span('failing'):
+            raise KeyError('x')
+    except KeyError:
+        pass
+    spans = {span.name: span for span in root.trace.spans}
+    tracer.finish(root)
+    assert tracing.current_span() is None
+    assert spans['work'].parent_id == root.span_id and spans['inner'].parent_id == spans['work'].span_id
+    assert spans['inner'].attributes == {'rows': 3} and spans['failing'].error == 'KeyError'
+    assert all(span.end_ns >= span.start_ns for span in spans.values())
+    unsampled, _ = _tracer(sample_rate=0.0)
+    assert unsampled.begin('GET /demo') is None
+    print(f"[OK] {len(spans)} spans under the root")
+
+
+def test_otlp_file_export():
+    """Traces are appended as OTLP JSON lines, one line per flush"""
+    print("\n=== Testing OTLP Export ===")
+    tracer, path = _tracer()
+    for n in range(3):
+        root = tracer.begin('POST /emergency', {'http.route': '/emergency'})
+        with tracing.span('predict.emergency', version='v1', score=0.5, cached=False):
+            pass
+        tracer.finish(root)
+        if n != 1:
+            assert tracer.exporter.flush() > 0
+    lines = open(path).read().splitlines()
+    assert len(lines) == 2
+    request = json.loads(lines[0])['resourceSpans'][0]
+    assert {'key': 'service.name', 'value': {'stringValue': 'swasthya-sampark'}} in request['resource']['attributes']
+    root, child = sorted(request['scopeSpans'][0]['spans'], key=lambda span: 'parentSpanId' in span)
+    assert root['kind'] == tracing.KIND_SERVER and len(root['traceId']) == 32 and len(root['spanId']) == 16
+    assert child['parentSpanId'] == root['spanId'] and child['traceId'] == root['traceId']
+    assert int(child['endTimeUnixNano']) >= int(child['startTimeUnixNano'])
+    assert {'key': 'score', 'value': {'doubleValue': 0.5}} in child['attributes']
+    assert {'key': 'cached', 'value': {'boolValue': False}} in child['attributes']
+    assert len(_spans(path)) == 6
+    print(f"[OK] {len(lines)} lines, 6 spans")
+
+
+def test_app_request_traces(app_db):
+    """An emergency request traces its SQL, features, prediction, forecast and template"""
+    print("\n=== Testing App Tracing ===")
+    import app
+    tracer, path = _tracer()
+    saved_tracer = app.tracer
+    app.tracer = tracer
+    try:
+        client = app.app.test_client()
+        response = client.post('/emergency', data={'location': 'Patna', 'phone': '9999999999', 'state': 'Bihar',
+                                                   'emergency_type': 'EMS', 'symptoms': 'patient unconscious'})
+        client.get('/')
+        tracer.exporter.flush()
+    finally:
+        app.tracer = saved_tracer
+    trace_id = response.headers['X-Trace-Id']
+    spans = [span for span in _spans(path) if span['traceId'] == trace_id]
+    names = {span['name'] for span in spans}
+    root = next(span for span in spans if 'parentSpanId' not in span)
+    assert root['name'] == 'POST /emergency'
+    assert {'key': 'http.status_code', 'value': {'intValue': str(response.status_code)}} in root['attributes']
+    assert {'predict.emergency', 'demand_forecast.record', 'demand_forecast.forecast', 'INSERT emergencies',
+            'render_template'} <= names, names
+    statements = [attribute['value']['stringValue'] for span in spans for attribute in span['attributes']
+                  if attribute['key'] == 'db.statement']
+    assert any(statement.startswith('INSERT INTO emergencies') for statement in statements)
+    assert '9999999999' not in open(path).read()  # Statements are traced without their parameters
+    print(f"[OK] {len(spans)} spans in the /emergency trace: {sorted(names)[:6]}...")
+
+
+def test_trace_view_summary():
+    """The viewer merges traces per route into a flame summary"""
+    print("\n=== Testing Trace Viewer ===")
+    tracer, path = _tracer()
+    for _ in range(4):
+        root = tracer.begin('GET /doctor/dashboard')
+        with tracing.span('SELECT records'):
+            pass
+        with tracing.span('render_template'):
+            pass
+        tracer.finish(root)
+    root = tracer.begin('POST /emergency')
+    tracer.finish(root)
+    tracer.exporter.flush()
+
+    routes = trace_view.summarize(trace_view.build_traces(trace_view.load_spans(path)))
+    dashboard = routes['GET /doctor/dashboard']
+    assert len(dashboard['durations_ms']) == 4
+    assert dashboard['tree']['calls'] == 4 and dashboard['tree']['children']['SELECT records']['calls'] == 4
+    out = io.StringIO()
+    assert trace_view.render(routes, route_filter='dashboard', min_share=0, out=out) == 1
+    text = out.getvalue()
+    assert 'GET /doctor/dashboard  traces=4' in text and '    SELECT records' in text
+    assert 'POST /emergency' not in text
+    print(f"[OK] {len(text.splitlines())} lines for the dashboard route")
+
+
+if __name__ == '__main__':
+    test_spans_nest_under_the_root()
+    test_otlp_file_export()
+    with temporary_app_db() as db_path:
+        test_app_request_traces(db_path)
+    test_trace_view_summary()
+    print("\n[SUCCESS] All tracing tests passed!")
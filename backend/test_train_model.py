@@ -0,0 +1,119 @@
+"""
+Test script for the health risk training data
+Checks the vectorized generator against the original per-sample rules and the streamed dataset files
+"""
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from featurizer import health_risk_features
+from train_model import (FEATURE_NAMES, N_FEATURES, TREATMENT_STATUSES, generate_synthetic_chunks,
+                         generate_synthetic_data, load_dataset, write_dataset)
+
+SEED = 7
+
+
+def _per_row_encoding(systolic, diastolic, bmi, cholesterol, glucose):
+    """BP, BMI, cholesterol and glucose bands as the original per-sample loop computed them."""
+    if systolic > 140 or diastolic > 90:
+        bp = min(1.0, 0.5 + (systolic - 140) / 100)
+    elif systolic < 90 or diastolic < 60:
+        bp = 0.8
+    else:
+        bp = 0.3
+    if bmi < 18.5:
+        bmi_band = 0.6
+    elif bmi > 30:
+        bmi_band = 1.0
+    elif bmi > 25:
+        bmi_band = 0.7
+    else:
+        bmi_band = 0.3
+    cholesterol_band = 1.0 if cholesterol > 240 else 0.7 if cholesterol > 200 else 0.3
+    glucose_band = 1.0 if glucose > 125 else 0.7 if glucose > 100 else 0.3
+    return bp, bmi_band, cholesterol_band, glucose_band
+
+
+def _per_row_label(row):
+    """Label of one feature row by the original loop's if/elif rules."""
+    (_, symptom, diagnosis, treatment, medicine, bp, bmi, cholesterol, glucose,
+     smoking, alcohol, activity, family_history) = row
+    base_risk = symptom * 0.2 + diagnosis * 0.2 + treatment * 0.2 + medicine * 0.1
+    health_risk = (bp * 0.1 + bmi * 0.1 + cholesterol * 0.05 + glucose * 0.05 + smoking * 0.05
+                   + alcohol * 0.03 + activity * 0.03 + family_history * 0.02)
+    risk_score = min(base_risk + health_risk, 1.0)
+    if risk_score >= 0.8 or treatment >= 0.9:
+        label = 3
+    elif risk_score >= 0.6:
+        label = 2
+    elif risk_score >= 0.4:
+        label = 1
+    else:
+        label = 0
+    if (symptom >= 0.9 or diagnosis >= 0.9) and label < 2:
+        label = 2
+    return label
+
+
+def test_labels_match_per_row_rules():
+    """Vectorized encoding and labels equal the original per-sample rules on a fixed seed"""
+    print("\n=== Testing Label Parity ===")
+    rng = np.random.default_rng(SEED)
+    n = 2000
+    raw = {'systolic': rng.normal(120, 20, n), 'diastolic': rng.normal(80, 15, n), 'bmi': rng.normal(25, 5, n),
+           'cholesterol': rng.normal(200, 40, n), 'glucose': rng.normal(100, 25, n)}
+    X = health_risk_features(
+        rng.integers(18, 85, n), rng.beta(2, 5, n), rng.beta(2, 5, n), rng.choice(TREATMENT_STATUSES, n),
+        rng.beta(2, 4, n), raw['systolic'], raw['diastolic'], raw['bmi'], raw['cholesterol'], raw['glucose'],
+        rng.random(n) < 0.3, rng.random(n) < 0.4, rng.choice(6, n), rng.random(n) < 0.3,
+    )
+    expected = [_per_row_encoding(*values) for values in zip(*raw.values())]
+    assert np.allclose(X[:, 5:9], expected)
+
+    X, y = generate_synthetic_data(5000, seed=SEED)
+    assert X.shape == (5000, N_FEATURES) and y.dtype == np.int8
+    assert y.tolist() == [_per_row_label(row) for row in X]
+    assert set(np.unique(y)) == {0, 1, 2, 3}
+    print(f"[OK] 5000 labels match the per-row rules; class counts {np.bincount(y).tolist()}")
+
+
+def test_streamed_dataset_matches_memory():
+    """write_dataset streams the same rows and columns the in-memory generator returns"""
+    print("\n=== Testing Streamed Dataset ===")
+    n = 1000
+    with tempfile.TemporaryDirectory() as folder:
+        whole = write_dataset(os.path.join(folder, 'whole'), n, chunk_size=n, seed=SEED)
+        X, y = load_dataset(whole)
+        X_mem, y_mem = generate_synthetic_data(n, seed=SEED)
+        assert X.shape == X_mem.shape == (n, len(FEATURE_NAMES)) and len(y) == len(y_mem) == n
+        assert np.array_equal(X, X_mem) and np.array_equal(y, y_mem)
+
+        chunked = write_dataset(os.path.join(folder, 'chunked'), n, chunk_size=300, seed=SEED)
+        X, y = load_dataset(chunked)
+        chunks = list(generate_synthetic_chunks(n, chunk_size=300, seed=SEED))
+        assert [len(chunk_y) for _, chunk_y in chunks] == [300, 300, 300, 100]
+        assert np.array_equal(X, np.concatenate([chunk_X for chunk_X, _ in chunks]))
+        assert np.array_equal(y, np.concatenate([chunk_y for _, chunk_y in chunks]))
+
+        X_sub, y_sub = load_dataset(chunked, max_samples=200)
+        assert X_sub.shape == (200, N_FEATURES) and len(y_sub) == 200
+
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("[INFO] pyarrow not installed; Parquet output not checked")
+        else:
+            path = write_dataset(os.path.join(folder, 'parquet'), n, chunk_size=300, seed=SEED, fmt='parquet')
+            assert pq.read_table(path).column_names == FEATURE_NAMES + ['label']
+            X_pq, y_pq = load_dataset(path)
+            assert np.array_equal(X_pq, X) and np.array_equal(y_pq, y)
+    print(f"[OK] {n} rows x {N_FEATURES} columns, streamed in one chunk and in chunks of 300")
+
+
+if __name__ == '__main__':
+    test_labels_match_per_row_rules()
+    test_streamed_dataset_matches_memory()
+    print("\n[SUCCESS] All training data tests passed!")
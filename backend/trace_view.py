@@ -0,0 +1,130 @@
+"""
+Per-route flame summaries of a TRACE_FILE written by tracing.py.
+
+Reads the OTLP JSON lines, rebuilds each trace from its spans and groups the
+traces by root span (one per route, e.g. "POST /emergency"). For every
+route it prints the request count and latency percentiles, then the span
+tree merged over all its traces. Each node shows its total time, its share
+of the route's time, its self time (minus its children) and its call count:
+
+    python trace_view.py traces.jsonl
+    python trace_view.py traces.jsonl --route /emergency --min-share 2
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+
+
+def load_spans(path):
+    """Every span in the file as a dict: trace, id, parent, name, start_ns, end_ns."""
+    spans = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource in json.loads(line).get('resourceSpans', []):
+                for scope in resource.get('scopeSpans', []):
+                    for span in scope.get('spans', []):
+                        spans.append({
+                            'trace': span['traceId'],
+                            'id': span['spanId'],
+                            'parent': span.get('parentSpanId'),
+                            'name': span['name'],
+                            'start_ns': int(span['startTimeUnixNano']),
+                            'end_ns': int(span['endTimeUnixNano']),
+                        })
+    return spans
+
+
+def build_traces(spans):
+    """[(root span, {span id: [children]})] for every trace that has its root."""
+    by_trace = defaultdict(list)
+    for span in spans:
+        by_trace[span['trace']].append(span)
+    traces = []
+    for members in by_trace.values():
+        children = defaultdict(list)
+        root = None
+        for span in members:
+            if span['parent']:
+                children[span['parent']].append(span)
+            else:
+                root = span
+        if root is not None:
+            traces.append((root, children))
+    return traces
+
+
+def _duration(span):
+    return max(0, span['end_ns'] - span['start_ns'])
+
+
+def _fold(node, span, children):
+    """Add a span and its subtree into the aggregate node."""
+    total = _duration(span)
+    kids = children.get(span['id'], ())
+    node['total_ns'] += total
+    node['self_ns'] += max(0, total - sum(_duration(child) for child in kids))
+    node['calls'] += 1
+    for child in kids:
+        _fold(node['children'][child['name']], child, children)
+
+
+def _node():
+    return {'total_ns': 0, 'self_ns': 0, 'calls': 0, 'children': defaultdict(_node)}
+
+
+def summarize(traces):
+    """{route: {'durations_ms': [...], 'tree': aggregate root node}}."""
+    routes = {}
+    for root, children in traces:
+        route = routes.setdefault(root['name'], {'durations_ms': [], 'tree': _node()})
+        route['durations_ms'].append(_duration(root) / 1e6)
+        _fold(route['tree'], root, children)
+    return routes
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+
+def _print_tree(name, node, route_ns, depth, min_share, out):
+    share = 100.0 * node['total_ns'] / route_ns if route_ns else 0.0
+    if depth and share < min_share:
+        return
+    out.write(f"{node['total_ns'] / 1e6:>10.1f} {share:>6.1f}% {node['self_ns'] / 1e6:>9.1f} {node['calls']:>6}  "
+              f"{'  ' * depth}{name}\n")
+    for child_name, child in sorted(node['children'].items(), key=lambda item: -item[1]['total_ns']):
+        _print_tree(child_name, child, route_ns, depth + 1, min_share, out)
+
+
+def render(routes, route_filter=None, min_share=1.0, top=None, out=sys.stdout):
+    selected = [(name, route) for name, route in routes.items() if not route_filter or route_filter in name]
+    selected.sort(key=lambda item: -item[1]['tree']['total_ns'])
+    for name, route in selected[:top]:
+        durations = route['durations_ms']
+        out.write(f"\n{name}  traces={len(durations)}  p50={percentile(durations, 50):.1f} ms  "
+                  f"p95={percentile(durations, 95):.1f} ms\n")
+        out.write(f"{'total ms':>10} {'share':>7} {'self ms':>9} {'calls':>6}  span\n")
+        _print_tree(name, route['tree'], route['tree']['total_ns'], 0, min_share, out)
+    return len(selected)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('trace_file')
+    parser.add_argument('--route', help='Only routes whose root span name contains this text')
+    parser.add_argument('--min-share', type=float, default=1.0, help='Hide spans under this %% of the route time')
+    parser.add_argument('--top', type=int, default=None, help='Only the N routes with the most total time')
+    args = parser.parse_args(argv)
+
+    routes = summarize(build_traces(load_spans(args.trace_file)))
+    if not render(routes, args.route, args.min_share, args.top):
+        print("[INFO] No matching traces")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Lightweight in-process request tracing, exported as OTLP JSON lines.
+
+Tracer.begin() opens a root span for a sampled request and makes it the
+current span (a ContextVar, so greenlet- and thread-local). Code under it
+opens child spans with span() or @traced(). When no trace is active,
+span() returns a shared no-op, so untraced and unsampled requests pay one
+ContextVar lookup per call site.
+
+Tracer.finish() hands the trace's spans to a SpanFileExporter. A
+background thread appends them in batches to a JSON Lines file. Each line
+is an OTLP ExportTraceServiceRequest (resourceSpans -> scopeSpans ->
+spans), the format of the OpenTelemetry file exporter. The file can be
+loaded into OTLP tooling or summarised with trace_view.py.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = 'swasthya-sampark'
+SCOPE_NAME = 'swasthya.tracing'
+# OTLP SpanKind and StatusCode values
+KIND_INTERNAL, KIND_SERVER = 1, 2
+STATUS_OK, STATUS_ERROR = 1, 2
+
+_current = contextvars.ContextVar('swasthya_current_span', default=None)
+
+
+class Span:
+    """One timed operation; mutable until its trace is exported."""
+
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'kind', 'start_ns', 'end_ns', 'attributes', 'error',
+                 '_token')
+
+    def __init__(self, trace, name, parent_id=None, kind=KIND_INTERNAL, attributes=None):
+        self.trace = trace
+        self.span_id = f'{random.getrandbits(64):016x}'
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes else {}
+        self.error = None
+        self.end_ns = None
+        self.start_ns = time.time_ns()
+        trace.spans.append(self)
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, error=None):
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = type(error).__name__
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.end(exc)
+        return False
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns or self.start_ns),
+            'attributes': [_attribute(key, value) for key, value in self.attributes.items()],
+            'status': {'code': STATUS_ERROR, 'message': self.error} if self.error else {'code': STATUS_OK},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class Trace:
+    __slots__ = ('trace_id', 'spans')
+
+    def __init__(self):
+        self.trace_id = f'{random.getrandbits(128):032x}'
+        self.spans = []
+
+
+class _NoSpan:
+    """Stand-in when nothing is traced: every operation is a no-op."""
+
+    def set(self, key, value):
+        pass
+
+    def end(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+def current_span():
+    return _current.get()
+
+
+def span(name, **attributes):
+    """Child span of the current one, as a context manager (NO_SPAN when not tracing)."""
+    parent = _current.get()
+    if parent is None:
+        return NO_SPAN
+    return Span(parent.trace, name, parent.span_id, attributes=attributes)
+
+
+def start_span(name, attributes=None):
+    """Child span that does not become current; the caller ends it. None when not tracing."""
+    parent = _current.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, name, parent.span_id, attributes=attributes)
+
+
+def traced(name):
+    """Decorator: run the function inside a span when a trace is active."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            parent = _current.get()
+            if parent is None:
+                return func(*args, **kwargs)
+            with Span(parent.trace, name, parent.span_id):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class SpanFileExporter:
+    """Buffers finished traces and appends them to a JSON Lines file from a background thread."""
+
+    def __init__(self, path, batch_size=256, flush_interval=2.0, max_pending=10000, service_name=SERVICE_NAME):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.resource = {'attributes': [_attribute('service.name', service_name),
+                                        _attribute('host.name', socket.gethostname())]}
+        self.dropped = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer_pid = None
+
+    def export(self, spans):
+        if self._writer_pid != os.getpid():
+            self._start_writer()
+        with self._lock:
+            if len(self._pending) + len(spans) > self.max_pending:
+                self.dropped += len(spans)
+                return
+            self._pending.extend(spans)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _start_writer(self):
+        # gunicorn forks after preload: every worker appends from its own thread
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+            self._pending = []
+            self._wake = threading.Event()
+        thread = threading.Thread(target=self._write_loop, name='trace-exporter', daemon=True)
+        thread.start()
+        atexit.register(self.flush)
+
+    def _write_loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning('Trace export failed: %s', e)
+
+    def flush(self):
+        """Append everything pending as one OTLP request line."""
+        with self._lock:
+            spans, self._pending = self._pending, []
+        if not spans:
+            return 0
+        line = json.dumps({'resourceSpans': [{
+            'resource': self.resource,
+            'scopeSpans': [{'scope': {'name': SCOPE_NAME}, 'spans': [s.to_otlp() for s in spans]}],
+        }]}, separators=(',', ':')) + '\n'
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One O_APPEND write per batch, so lines from several workers don't interleave
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+        return len(spans)
+
+
+class Tracer:
+    """Samples requests, opens their root span and exports each finished trace."""
+
+    def __init__(self, exporter, sample_rate=0.1):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def begin(self, name, attributes=None):
+        """Root span for a new request (and make it current), or None when not sampled."""
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return None
+        root = Span(Trace(), name, kind=KIND_SERVER, attributes=attributes)
+        root._token = _current.set(root)
+        return root
+
+    def finish(self, root, error=None):
+        """End the root span, restore the previous context and export the trace."""
+        _current.reset(root._token)
+        root.end(error)
+        self.exporter.export(root.trace.spans)
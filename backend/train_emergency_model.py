@@ -0,0 +1,249 @@
+"""
+Emergency Priority Model Training Script
+Trains the logistic regression behind predict_emergency_priority, using the
+same encoder as serving (featurizer.EmergencyEncoder), and saves a versioned
+artifact that carries its feature schema.
+
+Usage (from the backend directory):
+    python train_emergency_model.py                       # synthetic data
+    python train_emergency_model.py --data emergencies.csv
+    python train_emergency_model.py --benchmark-only pkl/Logistic_regression_prediction.pkl
+
+CSV input needs a Priority column (Low/Medium/High) and any of the columns
+State, Zone, Day, Time_Slot, Emergency_Type, Weather, Age, Symptoms.
+"""
+
+import argparse
+import csv
+import json
+import os
+import pickle
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import sklearn
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report
+from sklearn.model_selection import train_test_split
+
+from featurizer import EMERGENCY_CATEGORIES, EMERGENCY_FIELDS, emergency_encoder, emergency_feature_names
+from drift_monitor import reference_stats
+from model_artifacts import load_emergency_artifact, validate_emergency_model
+
+DEFAULT_SEED = 42
+PRIORITY_CLASSES = ['Low', 'Medium', 'High']
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pkl')
+ARTIFACT_STEM = 'Logistic_regression_prediction'
+
+# Symptom descriptions for synthetic requests, grouped by encoder severity
+SYMPTOM_PHRASES = [
+    'chest pain and sweating', 'difficulty breathing', 'unconscious after fall', 'road accident injuries',
+    'high fever and vomiting', 'dizziness and nausea', 'back pain',
+    'mild discomfort', 'ache in the knee', 'feeling tired',
+    'needs a checkup', 'sprained ankle',
+]
+
+# Additive priority contributions of each context value (synthetic ground truth)
+CONTEXT_WEIGHTS = {
+    'emergency_type': {'Fire': 0.25, 'Traffic': 0.2},
+    'zone': {'Highway': 0.15, 'Rural': 0.1},
+    'weather': {'Fog': 0.1, 'Rain': 0.08, 'Heatwave': 0.08},
+    'time_slot': {'Night': 0.1, 'Evening': 0.05},
+}
+
+
+def generate_synthetic_requests(n_samples=20000, seed=DEFAULT_SEED):
+    """
+    Generate emergency requests (dicts shaped like the /emergency form) and
+    their priorities. Returns (requests, labels).
+    """
+    rng = np.random.default_rng(seed)
+    columns = {field: rng.choice(EMERGENCY_CATEGORIES[prefix], n_samples)
+               for prefix, field in EMERGENCY_FIELDS.items()}
+    ages = rng.integers(1, 95, n_samples)
+    symptoms = rng.choice(SYMPTOM_PHRASES, n_samples)
+
+    requests = [
+        {'age': int(ages[i]), 'symptoms': str(symptoms[i]),
+         **{field: str(values[i]) for field, values in columns.items()}}
+        for i in range(n_samples)
+    ]
+
+    # Priority score: symptoms dominate, context and vulnerable ages add to it
+    encoder = emergency_encoder(['Symptom_Severity'])
+    score = 0.45 * encoder.transform(requests)[:, 0]
+    score += 0.15 * ((ages >= 65) | (ages < 5))
+    for field, weights in CONTEXT_WEIGHTS.items():
+        score += np.vectorize(lambda v: weights.get(v, 0.0), otypes=[float])(columns[field])
+    score += rng.normal(0, 0.05, n_samples)
+    labels = np.select([score >= 0.65, score >= 0.4], ['High', 'Medium'], default='Low')
+    return requests, labels
+
+
+def load_requests_csv(path):
+    """Read emergency requests and priorities from a CSV file."""
+    keys = {prefix: field for prefix, field in EMERGENCY_FIELDS.items()}
+    keys.update({'Age': 'age', 'Symptoms': 'symptoms'})
+    requests, labels = [], []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            requests.append({field: row.get(column) or None for column, field in keys.items()})
+            labels.append(row['Priority'])
+    return requests, np.array(labels)
+
+
+def measure_artifact(path, sample_requests, repeat=300):
+    """Load time and inference latency of a saved artifact, the way serving runs it."""
+    start = time.perf_counter()
+    model, scaler, metadata = load_emergency_artifact(path)
+    load_ms = (time.perf_counter() - start) * 1000.0
+    encoder = emergency_encoder(metadata['feature_names'])
+
+    def predict(requests):
+        X = encoder.transform(requests)
+        if scaler is not None:
+            X = scaler.transform(X)
+        model.predict_proba(X)
+
+    timings = []
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', category=UserWarning)
+        for request in sample_requests[:20]:
+            predict([request])  # Warm-up
+        for i in range(repeat):
+            start = time.perf_counter()
+            predict([sample_requests[i % len(sample_requests)]])
+            timings.append(time.perf_counter() - start)
+        batch = sample_requests[:256]
+        start = time.perf_counter()
+        predict(batch)
+        batch_us = (time.perf_counter() - start) * 1e6 / len(batch)
+
+    return {
+        'path': path,
+        'version': metadata.get('version'),
+        'n_features': len(metadata['feature_names']),
+        'size_kb': os.path.getsize(path) / 1024.0,
+        'load_ms': load_ms,
+        'single_row_p50_ms': float(np.percentile(timings, 50)) * 1000.0,
+        'single_row_p99_ms': float(np.percentile(timings, 99)) * 1000.0,
+        'batch_per_row_us': batch_us,
+    }
+
+
+def print_report(report):
+    print(f"\nArtifact report: {os.path.basename(report['path'])} (version {report['version'] or 'unversioned'})")
+    print(f"  Features:           {report['n_features']}")
+    print(f"  Size:               {report['size_kb']:.1f} KB")
+    print(f"  Load time:          {report['load_ms']:.2f} ms")
+    print(f"  Single row p50/p99: {report['single_row_p50_ms']:.3f} / {report['single_row_p99_ms']:.3f} ms")
+    print(f"  Batch (256 rows):   {report['batch_per_row_us']:.1f} us/row")
+    if 'test_accuracy' in report:
+        print(f"  Test accuracy:      {report['test_accuracy']:.4f}")
+
+
+def train_emergency_model(n_samples=20000, data=None, seed=DEFAULT_SEED, version=None, output=None):
+    """
+    Train the emergency priority model and save it with its feature schema.
+
+    Args:
+        n_samples: Synthetic requests to generate (ignored with data)
+        data: Optional CSV of real requests (see module docstring)
+        seed: Random seed for data generation and the train/test split
+        version: Version label stored in the artifact (default: UTC timestamp)
+        output: Artifact path (default: pkl/Logistic_regression_prediction-<version>.pkl,
+            which the model registry picks up as the newest version)
+    Returns: (artifact_path, report)
+    """
+    print("=" * 60)
+    print("Emergency Priority Model Training")
+    print("=" * 60)
+
+    if data:
+        print(f"Loading requests from {data}...")
+        requests, labels = load_requests_csv(data)
+    else:
+        print("Generating synthetic emergency requests...")
+        requests, labels = generate_synthetic_requests(n_samples, seed)
+    print(f"\n{len(requests)} requests")
+    for label in PRIORITY_CLASSES:
+        count = int(np.sum(labels == label))
+        print(f"  {label}: {count} ({count / len(labels) * 100:.1f}%)")
+
+    # Same encoder serving uses, so train and serve see identical columns
+    feature_names = emergency_feature_names()
+    X = emergency_encoder(feature_names).transform(requests)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, labels, test_size=0.2, random_state=seed, stratify=labels
+    )
+    print(f"\nTraining logistic regression on {len(X_train)} samples, {X.shape[1]} features...")
+    model = LogisticRegression(C=1.0, max_iter=1000)
+    model.fit(X_train, y_train)
+    validate_emergency_model(model, None)
+
+    y_pred = model.predict(X_test)
+    test_accuracy = accuracy_score(y_test, y_pred)
+    print(f"\nTest Accuracy: {test_accuracy:.4f}")
+    print("\nClassification Report (Test Set):")
+    print(classification_report(y_test, y_pred))
+
+    version = version or datetime.utcnow().strftime('v%Y%m%d%H%M%S')
+    output = output or os.path.join(MODEL_DIR, f'{ARTIFACT_STEM}-{version}.pkl')
+    artifact = {
+        'model': model,
+        'scaler': None,
+        'feature_names': feature_names,
+        'classes': [str(c) for c in model.classes_],
+        'version': version,
+        'trained_at': datetime.utcnow().isoformat(),
+        'training': {'source': data or 'synthetic', 'n_samples': len(requests), 'seed': seed},
+        'sklearn_version': sklearn.__version__,
+        'test_accuracy': float(test_accuracy),
+        'reference_stats': reference_stats(feature_names, X_train, y_train),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'wb') as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"[SUCCESS] Model saved to: {output}")
+
+    report = measure_artifact(output, requests[:1000])
+    report['test_accuracy'] = float(test_accuracy)
+    print_report(report)
+    return output, report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Train the emergency priority model')
+    parser.add_argument('--samples', type=int, default=20000,
+                        help='Synthetic requests to generate (default: 20000)')
+    parser.add_argument('--data', help='Train from a CSV of real emergency requests instead')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--version', help='Version label stored in the artifact')
+    parser.add_argument('--output', help='Artifact path (default: pkl/Logistic_regression_prediction-<version>.pkl)')
+    parser.add_argument('--benchmark-only', metavar='ARTIFACT',
+                        help='Only report load time and latency of an existing artifact')
+    parser.add_argument('--report', metavar='PATH', help='Also write the report as JSON')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    try:
+        if args.benchmark_only:
+            sample_requests, _ = generate_synthetic_requests(1000, args.seed)
+            report = measure_artifact(args.benchmark_only, sample_requests)
+            print_report(report)
+        else:
+            _, report = train_emergency_model(args.samples, args.data, args.seed, args.version, args.output)
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"[SUCCESS] Report saved to: {args.report}")
+    except Exception as e:
+        print(f"\n[ERROR] Training failed: {e}")
+        import traceback
+        traceback.print_exc()
+        raise SystemExit(1)
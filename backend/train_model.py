@@ -1,160 +1,190 @@
 """
 Health Risk Prediction Model Training Script
-Trains an SVM model for health risk prediction using health metrics.
+Trains candidate models for health risk prediction using health metrics and
+keeps the most accurate one that fits the serving latency budget.
 """
 
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.svm import SVC
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
+import json
 import pickle
 import os
 
-# Set random seed for reproducibility
-np.random.seed(42)
+from model_selection import CANDIDATES, DEFAULT_LATENCY_BUDGET_MS, report_rows, select_model
 
-def generate_synthetic_data(n_samples=5000):
+from featurizer import HEALTH_FEATURE_NAMES, RISK_LEVELS, health_risk_features, rule_based_risk_score
+from drift_monitor import reference_stats
+
+# Feature layout shared with app.predict_health_risk via featurizer.py
+FEATURE_NAMES = HEALTH_FEATURE_NAMES
+N_FEATURES = len(FEATURE_NAMES)
+DEFAULT_SEED = 42
+
+TREATMENT_STATUSES = np.array(['Recovered', 'Stable', 'Under Observation', 'Critical'])
+
+
+def _generate_chunk(rng, n_samples):
+    """
+    Generate one chunk of synthetic samples, a whole column at a time.
+    Raw measurements are drawn here and encoded by the shared featurizer,
+    the same code path app.predict_health_risk uses at serving time.
+    Returns: (X, y) with X float64 of shape (n_samples, 13) and y int8.
+    """
+    age = rng.integers(18, 85, n_samples)
+
+    # Symptom / diagnosis severity (0-1), skewed towards lower severity
+    symptom_severity = rng.beta(2, 5, n_samples)
+    diagnosis_severity = rng.beta(2, 5, n_samples)
+
+    treatment_status = rng.choice(TREATMENT_STATUSES, n_samples, p=[0.4, 0.3, 0.2, 0.1])
+
+    # Medicine complexity (0-1)
+    medicine_complexity = rng.beta(2, 4, n_samples)
+
+    systolic = rng.normal(120, 20, n_samples)
+    diastolic = rng.normal(80, 15, n_samples)
+    bmi = rng.normal(25, 5, n_samples)
+    cholesterol = rng.normal(200, 40, n_samples)
+    glucose = rng.normal(100, 25, n_samples)
+
+    # Smoking / alcohol / family history: binary 0 or 1
+    smoking = rng.random(n_samples) < 0.3
+    alcohol = rng.random(n_samples) < 0.4
+
+    # Physical Activity: 0-5 hours/week
+    activity_value = rng.choice(6, n_samples, p=[0.2, 0.15, 0.15, 0.2, 0.15, 0.15])
+
+    family_history = rng.random(n_samples) < 0.3
+
+    X = health_risk_features(
+        age, symptom_severity, diagnosis_severity, treatment_status, medicine_complexity,
+        systolic, diastolic, bmi, cholesterol, glucose,
+        smoking, alcohol, activity_value, family_history,
+    )
+    treatment_severity = X[:, 3]
+
+    # Risk score: same weights as the rule-based assessment in app.py
+    risk_score = rule_based_risk_score(X)
+
+    # Assign labels: 3=Critical, 2=High, 1=Medium, 0=Low
+    y = np.select(
+        [(risk_score >= 0.8) | (treatment_severity >= 0.9), risk_score >= 0.6, risk_score >= 0.4],
+        [3, 2, 1],
+        default=0,
+    ).astype(np.int8)
+
+    # Critical symptoms/diagnosis override: at least High
+    escalate = ((symptom_severity >= 0.9) | (diagnosis_severity >= 0.9)) & (y < 2)
+    y[escalate] = 2
+
+    return X, y
+
+
+def generate_synthetic_chunks(n_samples, chunk_size=1_000_000, seed=DEFAULT_SEED):
+    """Yield (X, y) chunks totalling n_samples; memory is bounded by chunk_size."""
+    rng = np.random.default_rng(seed)
+    remaining = n_samples
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        yield _generate_chunk(rng, size)
+        remaining -= size
+
+
+def generate_synthetic_data(n_samples=5000, seed=DEFAULT_SEED):
     """
     Generate synthetic training data based on realistic health scenarios.
     Returns: (X, y) where X is features and y is risk level (0=Low, 1=Medium, 2=High, 3=Critical)
     """
     print("Generating synthetic training data...")
-    
-    features = []
-    labels = []
-    
-    for i in range(n_samples):
-        # Age (normalized 0-1)
-        age = np.random.randint(18, 85)
-        age_normalized = min(age / 100.0, 1.0)
-        
-        # Symptom severity (0-1)
-        symptom_severity = np.random.beta(2, 5)  # Skewed towards lower severity
-        
-        # Diagnosis severity (0-1)
-        diagnosis_severity = np.random.beta(2, 5)
-        
-        # Treatment status severity (0-1)
-        treatment_options = [0.1, 0.4, 0.8, 1.0]  # Recovered, Stable, Under Observation, Critical
-        treatment_severity = np.random.choice(treatment_options, p=[0.4, 0.3, 0.2, 0.1])
-        
-        # Medicine complexity (0-1)
-        medicine_complexity = np.random.beta(2, 4)
-        
-        # BP normalized (0-1)
-        systolic = np.random.normal(120, 20)
-        diastolic = np.random.normal(80, 15)
-        if systolic > 140 or diastolic > 90:
-            bp_normalized = min(1.0, 0.5 + (systolic - 140) / 100)
-        elif systolic < 90 or diastolic < 60:
-            bp_normalized = 0.8
-        else:
-            bp_normalized = 0.3
-        
-        # BMI normalized (0-1)
-        bmi = np.random.normal(25, 5)
-        if bmi < 18.5:
-            bmi_normalized = 0.6
-        elif bmi > 30:
-            bmi_normalized = 1.0
-        elif bmi > 25:
-            bmi_normalized = 0.7
-        else:
-            bmi_normalized = 0.3
-        
-        # Cholesterol normalized (0-1)
-        cholesterol = np.random.normal(200, 40)
-        if cholesterol > 240:
-            cholesterol_normalized = 1.0
-        elif cholesterol > 200:
-            cholesterol_normalized = 0.7
-        else:
-            cholesterol_normalized = 0.3
-        
-        # Glucose normalized (0-1)
-        glucose = np.random.normal(100, 25)
-        if glucose > 125:
-            glucose_normalized = 1.0
-        elif glucose > 100:
-            glucose_normalized = 0.7
-        else:
-            glucose_normalized = 0.3
-        
-        # Smoking: 0 = Non-Smoker, 1 = Smoker (binary)
-        smoking_risk = np.random.choice([0, 1], p=[0.7, 0.3])
-        
-        # Alcohol: 0 = Habit Absent, 1 = Habit Present (binary)
-        alcohol_risk = np.random.choice([0, 1], p=[0.6, 0.4])
-        
-        # Physical Activity: 0-5 scale (0 = No activity, 5 = 5+ hours/week)
-        # For model: normalize to 0-1, but higher activity = lower risk (inverted)
-        activity_value = np.random.choice([0, 1, 2, 3, 4, 5], p=[0.2, 0.15, 0.15, 0.2, 0.15, 0.15])
-        activity_risk = 1.0 - (activity_value / 5.0)  # Invert: 0 (no activity) = 1.0, 5 (active) = 0.0
-        
-        # Family History: 0 = No family history, 1 = Family history present (binary)
-        family_history_risk = np.random.choice([0, 1], p=[0.7, 0.3])
-        
-        # Create feature vector
-        feature_vector = [
-            age_normalized,
-            symptom_severity,
-            diagnosis_severity,
-            treatment_severity,
-            medicine_complexity,
-            bp_normalized,
-            bmi_normalized,
-            cholesterol_normalized,
-            glucose_normalized,
-            smoking_risk,
-            alcohol_risk,
-            activity_risk,
-            family_history_risk
-        ]
-        
-        # Calculate risk score (weighted combination)
-        base_risk = (symptom_severity * 0.2 + diagnosis_severity * 0.2 + 
-                    treatment_severity * 0.2 + medicine_complexity * 0.1)
-        
-        # Health metrics risk calculation
-        # smoking_risk, alcohol_risk, family_history_risk are now 0 or 1 (binary)
-        # activity_risk is inverted (0 = no activity = high risk 1.0, 5 = active = low risk 0.0)
-        health_risk = (bp_normalized * 0.1 + bmi_normalized * 0.1 + 
-                      cholesterol_normalized * 0.05 + glucose_normalized * 0.05 +
-                      float(smoking_risk) * 0.05 + float(alcohol_risk) * 0.03 + 
-                      activity_risk * 0.03 + float(family_history_risk) * 0.02)
-        
-        risk_score = min(base_risk + health_risk, 1.0)
-        
-        # Assign label based on risk score
-        if risk_score >= 0.8 or treatment_severity >= 0.9:
-            label = 3  # Critical
-        elif risk_score >= 0.6:
-            label = 2  # High
-        elif risk_score >= 0.4:
-            label = 1  # Medium
-        else:
-            label = 0  # Low
-        
-        # Add some noise: critical symptoms/diagnosis override
-        if symptom_severity >= 0.9 or diagnosis_severity >= 0.9:
-            if label < 2:
-                label = 2  # At least High
-        
-        features.append(feature_vector)
-        labels.append(label)
-    
-    return np.array(features), np.array(labels)
+    return _generate_chunk(np.random.default_rng(seed), n_samples)
+
+
+def write_dataset(output_dir, n_samples, chunk_size=1_000_000, seed=DEFAULT_SEED, fmt='npy'):
+    """
+    Stream a synthetic dataset to disk chunk by chunk.
+
+    fmt='npy' writes X.npy / y.npy by appending one chunk at a time, so a
+    10M-sample set (~1 GB of features) never needs to fit in RAM.
+    fmt='parquet' writes one row group per chunk (requires pyarrow).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if fmt == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow: pip install pyarrow")
+        path = os.path.join(output_dir, 'dataset.parquet')
+        schema = pa.schema([(name, pa.float64()) for name in FEATURE_NAMES] + [('label', pa.int8())])
+        with pq.ParquetWriter(path, schema) as writer:
+            for X, y in generate_synthetic_chunks(n_samples, chunk_size, seed):
+                columns = [pa.array(X[:, i]) for i in range(N_FEATURES)] + [pa.array(y)]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+        return path
+
+    # Write the .npy headers up front, then append raw chunk bytes so only one
+    # chunk is ever resident
+    with open(os.path.join(output_dir, 'X.npy'), 'wb') as X_file, \
+            open(os.path.join(output_dir, 'y.npy'), 'wb') as y_file:
+        for f, dtype, shape in ((X_file, np.float64, (n_samples, N_FEATURES)), (y_file, np.int8, (n_samples,))):
+            header = {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                      'fortran_order': False, 'shape': shape}
+            np.lib.format.write_array_header_1_0(f, header)
+        for X, y in generate_synthetic_chunks(n_samples, chunk_size, seed):
+            X_file.write(np.ascontiguousarray(X).tobytes())
+            y_file.write(y.tobytes())
+    return output_dir
+
 
+def load_dataset(path, max_samples=None, seed=DEFAULT_SEED):
+    """
+    Load a dataset written by write_dataset.
+
+    .npy datasets are memory-mapped; with max_samples a random subset is
+    copied into memory (used to keep SVM training tractable).
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        X = np.column_stack([table.column(name).to_numpy() for name in FEATURE_NAMES])
+        y = table.column('label').to_numpy()
+    else:
+        X = np.load(os.path.join(path, 'X.npy'), mmap_mode='r')
+        y = np.load(os.path.join(path, 'y.npy'), mmap_mode='r')
+    if max_samples and len(y) > max_samples:
+        idx = np.sort(np.random.default_rng(seed).choice(len(y), max_samples, replace=False))
+        return np.asarray(X[idx]), np.asarray(y[idx])
+    return np.asarray(X), np.asarray(y)
+
+
+def train_model(n_samples=5000, dataset=None, max_train_samples=None, candidates=None,
+                latency_budget_ms=DEFAULT_LATENCY_BUDGET_MS, jobs=None, report_path=None):
+    """
+    Train candidate models, pick one under the latency budget and save it.
 
-def train_model():
-    """Train the SVM model and save it."""
+    Args:
+        n_samples: Number of synthetic samples to generate in memory
+        dataset: Optional dataset written by write_dataset (directory or .parquet);
+            overrides n_samples
+        max_train_samples: Random subset size for large datasets (RBF SVM training
+            is quadratic in the number of samples)
+        candidates: Candidate names from model_selection.CANDIDATES (default: all)
+        latency_budget_ms: Single-row p99 budget the winner must fit
+        jobs: Worker processes used to train candidates (default: one per candidate, up to CPU count)
+        report_path: Optional path for a JSON copy of the candidate report
+    """
     print("=" * 60)
     print("Health Risk Prediction Model Training")
     print("=" * 60)
     
-    # Generate training data
-    X, y = generate_synthetic_data(n_samples=5000)
+    # Generate or load training data
+    if dataset:
+        print(f"Loading dataset from {dataset}...")
+        X, y = load_dataset(dataset, max_samples=max_train_samples)
+    else:
+        X, y = generate_synthetic_data(n_samples=n_samples)
     
     print(f"\nGenerated {len(X)} training samples")
     print(f"Feature shape: {X.shape}")
@@ -178,19 +208,11 @@ def train_model():
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
     
-    # Train SVM model
-    print("\nTraining SVM model...")
-    # Using RBF kernel with balanced class weights
-    model = SVC(
-        kernel='rbf',
-        C=1.0,
-        gamma='scale',
-        probability=True,  # Enable predict_proba
-        class_weight='balanced',  # Handle class imbalance
-        random_state=42
-    )
-    
-    model.fit(X_train_scaled, y_train)
+    # Train candidates and pick the winner
+    winner, results = select_model(X_train_scaled, y_train, X_test, y_test, scaler,
+                                   candidates=candidates, jobs=jobs, latency_budget_ms=latency_budget_ms)
+    model = winner['model']
+    print(f"\nSelected model: {winner['description']}")
     
     # Evaluate model
     print("\nEvaluating model...")
@@ -221,21 +243,12 @@ def train_model():
     model_package = {
         'model': model,
         'scaler': scaler,
-        'feature_names': [
-            'age_normalized',
-            'symptom_severity',
-            'diagnosis_severity',
-            'treatment_severity',
-            'medicine_complexity',
-            'bp_normalized',
-            'bmi_normalized',
-            'cholesterol_normalized',
-            'glucose_normalized',
-            'smoking_risk',
-            'alcohol_risk',
-            'activity_risk',
-            'family_history_risk'
-        ]
+        'feature_names': list(FEATURE_NAMES),
+        'model_type': winner['name'],
+        'latency_budget_ms': latency_budget_ms,
+        'selection_report': report_rows(results),
+        # Training distribution that /admin/model_drift compares live traffic with
+        'reference_stats': reference_stats(FEATURE_NAMES, X_train, np.take(RISK_LEVELS, y_train)),
     }
     
     with open(model_path, 'wb') as f:
@@ -243,17 +256,55 @@ def train_model():
     
     print(f"\n[SUCCESS] Model saved to: {model_path}")
     print(f"[SUCCESS] Scaler saved to: {scaler_path}")
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump({'winner': winner['name'], 'latency_budget_ms': latency_budget_ms,
+                       'candidates': report_rows(results)}, f, indent=2)
+        print(f"[SUCCESS] Candidate report saved to: {report_path}")
     print("\nModel training completed successfully!")
     
     return model, scaler, test_accuracy
 
 
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Train the health risk model on synthetic data')
+    parser.add_argument('--samples', type=int, default=5000,
+                        help='Synthetic samples to generate (default: 5000)')
+    parser.add_argument('--write-dataset', metavar='DIR',
+                        help='Only stream a synthetic dataset of --samples rows to DIR, then exit')
+    parser.add_argument('--format', choices=['npy', 'parquet'], default='npy',
+                        help='On-disk dataset format for --write-dataset')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000,
+                        help='Rows generated per chunk when writing a dataset')
+    parser.add_argument('--dataset', help='Train from a dataset written by --write-dataset')
+    parser.add_argument('--max-train-samples', type=int, default=50000,
+                        help='Random subset of --dataset used for training')
+    parser.add_argument('--candidates', nargs='+', choices=list(CANDIDATES), default=list(CANDIDATES),
+                        help='Candidate models to train (default: all)')
+    parser.add_argument('--latency-budget-ms', type=float, default=DEFAULT_LATENCY_BUDGET_MS,
+                        help='Single-row p99 inference budget the selected model must fit')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Worker processes used to train candidates')
+    parser.add_argument('--report', metavar='PATH', help='Also write the candidate report as JSON')
+    return parser.parse_args(argv)
+
+
 if __name__ == '__main__':
+    args = parse_args()
+    if args.write_dataset:
+        import time
+        start = time.perf_counter()
+        path = write_dataset(args.write_dataset, args.samples, args.chunk_size, fmt=args.format)
+        print(f"[SUCCESS] Wrote {args.samples} samples to {path} in {time.perf_counter() - start:.1f}s")
+        raise SystemExit(0)
     try:
-        model, scaler, accuracy = train_model()
+        model, scaler, accuracy = train_model(args.samples, args.dataset, args.max_train_samples,
+                                              candidates=args.candidates, latency_budget_ms=args.latency_budget_ms,
+                                              jobs=args.jobs, report_path=args.report)
         print(f"\n{'='*60}")
         print("Training Summary:")
-        print(f"  Model Type: SVM (RBF Kernel)")
+        print(f"  Model Type: {type(model).__name__}")
         print(f"  Test Accuracy: {accuracy:.4f}")
         print(f"  Features: 13")
         print(f"  Classes: 4 (Low, Medium, High, Critical)")
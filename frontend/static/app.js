@@ -171,8 +171,37 @@ function setupHospitalPatientSearch() {
   });
 }
 
+// Emergency form: optional device coordinates for nearest ambulance / hospital routing.
+function setupEmergencyLocation() {
+  const btn = document.getElementById('use-location');
+  const lat = document.getElementById('latitude');
+  const lon = document.getElementById('longitude');
+  const status = document.getElementById('location-status');
+  if (!btn || !lat || !lon) return;
+  if (!navigator.geolocation) {
+    btn.style.display = 'none';
+    return;
+  }
+
+  btn.addEventListener('click', () => {
+    if (status) status.textContent = 'Locating...';
+    navigator.geolocation.getCurrentPosition(
+      (pos) => {
+        lat.value = pos.coords.latitude.toFixed(5);
+        lon.value = pos.coords.longitude.toFixed(5);
+        if (status) status.textContent = `Location shared (${lat.value}, ${lon.value})`;
+      },
+      () => {
+        if (status) status.textContent = 'Location unavailable; the selected district will be used';
+      },
+      { enableHighAccuracy: true, timeout: 10000 }
+    );
+  });
+}
+
 // Run immediately so the listener is attached as soon as script loads.
 setupStateDistrictDropdowns();
+setupEmergencyLocation();
 
 // --- Doctor dashboard: client-side filter for medical history by status ---
 
@@ -208,8 +237,11 @@ function setupHospitalEmergencyStats() {
       const avg = data && typeof data.avg_response_time !== 'undefined'
         ? data.avg_response_time
         : null;
+      const day = data && data.response_times ? data.response_times.planned.day : null;
       if (avg !== null && avg !== undefined) {
-        target.textContent = `Avg response: ${avg} min`;
+        target.textContent = day && day.p90 !== null
+          ? `Avg response: ${avg} min (p90 today: ${day.p90} min)`
+          : `Avg response: ${avg} min`;
       } else {
         target.textContent = 'Avg response: N/A';
       }
@@ -219,6 +251,56 @@ function setupHospitalEmergencyStats() {
     });
 }
 
+// Live dashboard updates pushed over /events (server-sent events)
+function setupHospitalEventStream() {
+  const panel = document.getElementById('emergency-live');
+  if (!panel || !window.EventSource) return;
+
+  const feed = document.getElementById('emergency-feed');
+  const countEl = document.getElementById('emergency-count');
+  const countsText = document.getElementById('dispatch-counts-text');
+  const source = new EventSource('/events');
+
+  const addItem = (text, category) => {
+    const item = document.createElement('div');
+    item.className = `flash flash-${category}`;
+    item.textContent = text;
+    feed.prepend(item);
+    while (feed.children.length > 10) feed.lastElementChild.remove();
+    panel.hidden = false;
+  };
+  const bumpCount = () => {
+    if (countEl) countEl.textContent = String((parseInt(countEl.textContent, 10) || 0) + 1);
+  };
+  const unitText = (data) => (data.ambulance ? `ambulance ${data.ambulance} dispatched` : 'awaiting ambulance');
+
+  source.addEventListener('emergency', (e) => {
+    const data = JSON.parse(e.data);
+    const place = [data.district, data.state].filter(Boolean).join(', ') || 'location not given';
+    const urgent = data.priority === 'High' || data.priority === 'Critical';
+    addItem(`#${data.emergency_id} ${data.priority} priority emergency in ${place}, ${unitText(data)}`,
+      urgent ? 'danger' : 'info');
+    bumpCount();
+  });
+  const seenAlerts = new Set();  // Outbox delivery is at least once, so an alert can repeat
+  source.addEventListener('alert', (e) => {
+    const data = JSON.parse(e.data);
+    if (seenAlerts.has(data.emergency_id)) return;
+    seenAlerts.add(data.emergency_id);
+    addItem(`AI alert #${data.emergency_id}: ${data.risk_level} risk (score ${data.risk_score}), ${unitText(data)}`,
+      'warning');
+    bumpCount();
+  });
+  source.addEventListener('counts', (e) => {
+    const data = JSON.parse(e.data);
+    if (!countsText) return;
+    const active = Object.entries(data.active_by_status || {})
+      .map(([status, n]) => `${status}: ${n}`)
+      .join(' · ');
+    countsText.textContent = `${active} · Free units: ${data.available_ambulances}`;
+  });
+}
+
 function setupHospitalDoctorSearch() {
   const table = document.getElementById('hospital-doctor-table');
   const input = document.getElementById('doctor-search');
@@ -254,5 +336,6 @@ setupDoctorStatusFilter();
 setupDoctorOwnVisitsFilter();
 setupDoctorUseLastTreatment();
 setupHospitalEmergencyStats();
+setupHospitalEventStream();
 setupHospitalDoctorSearch();
 setupDoctorDeleteConfirm();
@@ -21,7 +21,8 @@ keepalive = 2
 # Logging
 accesslog = '-'
 errorlog = '-'
-loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+# LOG_LEVEL may carry per-module levels for the app ('INFO,sql_profiler=DEBUG'); gunicorn takes the first
+loglevel = os.environ.get('LOG_LEVEL', 'info').split(',')[0].strip().lower()
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(D)s'
 
 # Process naming
@@ -49,3 +50,23 @@ graceful_timeout = 30
 max_requests = 1000
 max_requests_jitter = 50
 
+
+def _app_module():
+    import sys
+    return sys.modules.get('backend.app') or sys.modules.get('app')
+
+
+# Models: with preload_app the master unpickles them once before forking, so the workers
+# share them copy-on-write and no request waits for scikit-learn to load.
+def when_ready(server):
+    app_module = _app_module()
+    if app_module is not None:
+        app_module.preload_models()
+
+
+# Warm-up: the app defers Firebase (and the models, without a preloading master; backend/startup.py).
+# Each worker starts it after its first request, or 2 s after boot if none arrives.
+def post_worker_init(worker):
+    app_module = _app_module()
+    if app_module is not None:
+        app_module.startup_profile.warm_up(delay=2.0)